@@ -1,17 +1,35 @@
 from __future__ import annotations
+import asyncio
+from collections import deque
 import contextlib
 from dataclasses import dataclass, field
 import errno
+import logging
 import os
 import os.path
 from pathlib import Path
 import shutil
 import threading
-from typing import Callable, ContextManager, Iterator, List, Tuple
+from typing import (
+    AsyncContextManager,
+    Callable,
+    ContextManager,
+    Deque,
+    Dict,
+    Hashable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+import pyspawner
 from cjwkernel.util import tempdir_context, tempfile_context
 from cjwkernel.errors import ModuleExitedError
 
 
+logger = logging.getLogger(__name__)
+
+
 assert (
     shutil.rmtree.avoids_symlink_attacks
 ), "chroot is unusable: a child's symlinks can make a parent delete files"
@@ -101,6 +119,17 @@ class Chroot:
     learn what the upper layer is.
     """
 
+    network_config: pyspawner.NetworkConfig = field(
+        default_factory=pyspawner.NetworkConfig
+    )
+    """
+    Network interfaces and addresses for modules that run in this chroot.
+
+    Modules in different chroots may run at the same time, so each chroot
+    needs its own veth names and IP addresses. `setup-sandboxes.sh` writes
+    iptables rules to match.
+    """
+
     lock: threading.Lock = field(default_factory=threading.Lock)
     """
     Sanity check.
@@ -294,11 +323,205 @@ class ChrootContext:
         os.chown(path, old_stat.st_uid, old_stat.st_gid)
 
 
+class ChrootPool:
+    """
+    A fixed set of editable chroots, for running modules concurrently.
+
+    Each chroot runs one module at a time. Callers `await` a free chroot:
+
+        async with EDITABLE_CHROOT_POOL.acquire_context() as chroot_context:
+            ...
+
+    Callers may pass a `group` (e.g., a workflow ID). When several callers
+    wait, a freed chroot goes to the waiter whose group holds the fewest
+    chroots (first come, first served among ties). So a group may use every
+    chroot while nobody else needs one; but once others wait, each group soon
+    holds an equal share.
+
+    When a caller is done, we wipe its chroot (by exiting its ChrootContext)
+    and check its health before the next caller gets it. An unhealthy chroot
+    -- one that isn't mounted, or one with leftover files -- is dropped from
+    the pool. If every chroot is dropped, the pool raises RuntimeError: the
+    process should die and let its supervisor restart it.
+
+    This is thread-safe, and it works across event loops (handy in unit
+    tests): waiters are plain futures, resolved on their own loops.
+    """
+
+    def __init__(self, chroots: List[Chroot]):
+        self.chroots = chroots
+        self._lock = threading.Lock()
+        self._free: List[Chroot] = list(chroots)
+        self._n_healthy = len(chroots)
+        self._waiters: Deque[Tuple[asyncio.Future, Hashable]] = deque()
+        self._n_held: Dict[Hashable, int] = {}  # group => number of chroots
+
+    @property
+    def size(self) -> int:
+        return len(self.chroots)
+
+    @property
+    def n_healthy(self) -> int:
+        """Number of chroots still in the pool (free or in use)."""
+        with self._lock:
+            return self._n_healthy
+
+    def _raise_if_all_unhealthy(self) -> None:
+        # Call with self._lock held
+        if self._n_healthy == 0:
+            raise RuntimeError("Every chroot in the pool is unhealthy")
+
+    def _hold(self, group: Hashable) -> None:
+        # Call with self._lock held
+        self._n_held[group] = self._n_held.get(group, 0) + 1
+
+    def _unhold(self, group: Hashable) -> None:
+        # Call with self._lock held
+        self._n_held[group] -= 1
+        if self._n_held[group] == 0:
+            del self._n_held[group]  # so we don't grow forever
+
+    async def _acquire(self, group: Hashable) -> Chroot:
+        with self._lock:
+            self._raise_if_all_unhealthy()
+            if self._free:
+                self._hold(group)
+                return self._free.pop()
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.append((future, group))
+        return await future
+
+    def _give_to_waiter(
+        self, future: asyncio.Future, group: Hashable, chroot: Chroot
+    ) -> None:
+        # Called on the waiter's event loop
+        if future.cancelled():
+            self._release(chroot, group)  # the waiter gave up; try the next one
+        else:
+            future.set_result(chroot)
+
+    def _release(self, chroot: Chroot, group: Hashable) -> None:
+        with self._lock:
+            self._unhold(group)
+            if self._waiters:
+                # min() picks the first of equals: FIFO among ties
+                waiter = min(self._waiters, key=lambda w: self._n_held.get(w[1], 0))
+                self._waiters.remove(waiter)
+                future, waiter_group = waiter
+                self._hold(waiter_group)
+                future.get_loop().call_soon_threadsafe(
+                    self._give_to_waiter, future, waiter_group, chroot
+                )
+            else:
+                self._free.append(chroot)
+
+    def _fail_waiter(self, future: asyncio.Future) -> None:
+        # Called on the waiter's event loop
+        if not future.cancelled():
+            future.set_exception(RuntimeError("Every chroot in the pool is unhealthy"))
+
+    def _drop(self, chroot: Chroot, group: Hashable) -> None:
+        with self._lock:
+            self._unhold(group)
+            self._n_healthy -= 1
+            if self._n_healthy == 0:
+                while self._waiters:
+                    future, _ = self._waiters.popleft()
+                    future.get_loop().call_soon_threadsafe(self._fail_waiter, future)
+
+    @staticmethod
+    def _find_health_problem(chroot: Chroot) -> Optional[str]:
+        """
+        Describe what is wrong with a (wiped) chroot, or return None.
+        """
+        if not os.path.ismount(chroot.root):
+            return "%s is not mounted" % chroot.root
+        garbage = list((chroot.root / "var" / "tmp").glob("*"))
+        if garbage:
+            return "%s leaked" % garbage[0]
+        return None
+
+    def _release_or_drop(self, chroot: Chroot, group: Hashable) -> None:
+        problem = self._find_health_problem(chroot)
+        if problem is not None:
+            # Maybe our caller's cleanup crashed midway. Try once more.
+            try:
+                _walk_and_delete_upper_files(chroot)
+            except OSError:
+                logger.exception("Error wiping chroot %s", chroot.root)
+            problem = self._find_health_problem(chroot)
+
+        if problem is None:
+            self._release(chroot, group)
+        else:
+            logger.error("Dropping unhealthy chroot from pool: %s", problem)
+            self._drop(chroot, group)
+
+    @contextlib.asynccontextmanager
+    async def acquire_context(
+        self, group: Hashable = None
+    ) -> AsyncContextManager[ChrootContext]:
+        """
+        Wait for a free chroot; yield its (entered) ChrootContext.
+
+        On exit, wipe the chroot and hand it to the next waiter: the one whose
+        `group` holds the fewest chroots.
+
+        Raise RuntimeError if every chroot in the pool is unhealthy.
+        """
+        chroot = await self._acquire(group)
+        try:
+            with chroot.acquire_context() as chroot_context:
+                yield chroot_context
+        finally:
+            self._release_or_drop(chroot, group)
+
+
 _chroots = Path("/var/lib/cjwkernel/chroot")
 _base = Path("/var/lib/cjwkernel/chroot-layers/base")
 
 
-EDITABLE_CHROOT = Chroot(
-    _chroots / "editable" / "root", _base, _chroots / "editable" / "upperfs" / "upper"
+def _editable_chroot(index: int) -> Chroot:
+    """
+    Build the Chroot that `setup-sandboxes.sh` creates as number `index`.
+
+    Chroot 0 uses the original paths and pyspawner's default network config.
+    """
+    if index == 0:
+        dirname = "editable"
+        network_config = pyspawner.NetworkConfig()
+    else:
+        dirname = "editable-%d" % index
+        network_config = pyspawner.NetworkConfig(
+            kernel_veth_name="veth-pys-%d" % index,
+            child_veth_name="veth-pys-%d-c" % index,
+            kernel_ipv4_address="192.168.%d.1" % (123 + index),
+            child_ipv4_address="192.168.%d.2" % (123 + index),
+        )
+    return Chroot(
+        _chroots / dirname / "root",
+        _base,
+        _chroots / dirname / "upperfs" / "upper",
+        network_config,
+    )
+
+
+N_EDITABLE_CHROOTS = int(os.environ.get("CJW_N_EDITABLE_CHROOTS", "4"))
+"""
+Number of editable chroots `setup-sandboxes.sh` creates.
+
+This caps how many modules a fetcher or renderer process may run at once.
+`setup-sandboxes.sh` reads the same environment variable.
+"""
+
+
+EDITABLE_CHROOT_POOL = ChrootPool(
+    [_editable_chroot(i) for i in range(N_EDITABLE_CHROOTS)]
 )
+EDITABLE_CHROOT = EDITABLE_CHROOT_POOL.chroots[0]
+"""
+The first chroot of EDITABLE_CHROOT_POOL.
+
+Only use this directly when nothing else in the process uses the pool.
+"""
 READONLY_CHROOT_DIR = _chroots / "readonly" / "root"
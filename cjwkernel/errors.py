@@ -30,6 +30,17 @@ class ModuleExitedError(ModuleError):
         self.log = log
 
 
+class ModuleCancelledError(Exception):
+    """The caller cancelled the module while it ran.
+
+    This is not a ModuleError: the module has no bug. We just don't want its
+    result any more.
+    """
+
+    def __init__(self, module_slug: str):
+        super().__init__("Module '%s' was cancelled" % module_slug)
+
+
 def format_for_user_debugging(err: ModuleError) -> str:
     """Return a string for showing hapless users.
 
@@ -2,17 +2,23 @@ import io
 import logging
 import os
 import os.path
+import pickle
 import selectors
+import threading
 import time
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, NamedTuple, Optional
 
 import pyspawner
 import thrift.protocol.TBinaryProtocol
 import thrift.transport.TTransport
 from cjwkernel.chroot import READONLY_CHROOT_DIR, ChrootContext
-from cjwkernel.errors import ModuleExitedError, ModuleTimeoutError
+from cjwkernel.errors import (
+    ModuleCancelledError,
+    ModuleExitedError,
+    ModuleTimeoutError,
+)
 from cjwkernel.thrift import ttypes
 from cjwkernel.types import (
     ArrowTable,
@@ -32,6 +38,7 @@ from cjwkernel.types import (
     thrift_render_result_to_arrow,
 )
 from cjwkernel.validate import ValidateError
+from cjwkernel.warm_children import WarmChildren, WarmChildrenStats
 
 logger = logging.getLogger(__name__)
 
@@ -39,6 +46,7 @@ logger = logging.getLogger(__name__)
 TIMEOUT = 600  # seconds
 DEAD_PROCESS_N_WAITS = 50  # number of waitpid() calls after process exits
 DEAD_PROCESS_WAIT_POLL_INTERVAL = 0.02  # seconds between waitpid() calls
+CANCEL_POLL_INTERVAL = 0.1  # seconds between checks of a `cancelled` Event
 LOG_BUFFER_MAX_BYTES = 100 * 1024  # waaaay too much log output
 OUTPUT_BUFFER_MAX_BYTES = (
     2 * 1024 * 1024
@@ -52,6 +60,22 @@ ENCODING_IMPORTS = [
 ]
 
 
+class KernelStats(NamedTuple):
+    n_runs: int
+    """Number of children that ran a module function."""
+
+    spawn_seconds: float
+    """Total time between starting a run and handing a child its request.
+
+    With a warm child, this is the time spent waiting for it (usually ~0).
+    """
+
+    execute_seconds: float
+    """Total time between handing a child its request and reaping it."""
+
+    warm_children: WarmChildrenStats
+
+
 @dataclass
 class ChildReader:
     fileno: int
@@ -130,6 +154,9 @@ class Kernel:
     Child processes cannot be trusted to return sane values. So we communicate
     via Thrift (which errors on unexpected data) rather than Python pickle
     (which executes code on unexpected data).
+
+    To avoid paying for fork and sandbox setup on every call, we keep a "warm"
+    child waiting in each sandbox we've used. See `WarmChildren`.
     """
 
     def __init__(
@@ -239,10 +266,26 @@ class Kernel:
                 "cjwparse.api",
             ],
         )
+        self._warm_children = WarmChildren(self._spawn_warm_child)
+        self._stats_lock = threading.Lock()
+        self._n_runs = 0
+        self._spawn_seconds = 0.0
+        self._execute_seconds = 0.0
 
     def __del__(self):
+        self._warm_children.close()
         self._pyspawner.close()
 
+    def stats(self) -> KernelStats:
+        """Report how long children took to spawn and to execute."""
+        with self._stats_lock:
+            return KernelStats(
+                n_runs=self._n_runs,
+                spawn_seconds=self._spawn_seconds,
+                execute_seconds=self._execute_seconds,
+                warm_children=self._warm_children.stats(),
+            )
+
     def validate(self, compiled_module: CompiledModule) -> None:
         """Detect common errors in the user's code.
 
@@ -253,7 +296,7 @@ class Kernel:
             network_config=None,
             compiled_module=compiled_module,
             timeout=self.validate_timeout,
-            result=ttypes.ValidateModuleResult(),
+            results=[ttypes.ValidateModuleResult()],
             function="validate_thrift",
             args=[],
         )
@@ -263,17 +306,39 @@ class Kernel:
     ) -> None:
         """Call a module's migrate_params()."""
         request = arrow_raw_params_to_thrift(RawParams(params))
-        response = self._run_in_child(
+        [response] = self._run_in_child(
             chroot_dir=READONLY_CHROOT_DIR,
             network_config=None,
             compiled_module=compiled_module,
             timeout=self.migrate_params_timeout,
-            result=ttypes.RawParams(),
+            results=[ttypes.RawParams()],
             function="migrate_params_thrift",
             args=[request],
         )
         return thrift_raw_params_to_arrow(response).params
 
+    def migrate_params_batch(
+        self, compiled_module: CompiledModule, params_list: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Call a module's migrate_params() on each of `params_list`.
+
+        This runs a single child, rather than one per element.
+
+        Raise ModuleError if migrate_params() fails on any element. (To learn
+        which, call `migrate_params()` on each.)
+        """
+        requests = [arrow_raw_params_to_thrift(RawParams(p)) for p in params_list]
+        responses = self._run_in_child(
+            chroot_dir=READONLY_CHROOT_DIR,
+            network_config=None,
+            compiled_module=compiled_module,
+            timeout=self.migrate_params_timeout,
+            results=[ttypes.RawParams() for _ in requests],
+            function="migrate_params_batch_thrift",
+            args=[requests],
+        )
+        return [thrift_raw_params_to_arrow(response).params for response in responses]
+
     def render(
         self,
         compiled_module: CompiledModule,
@@ -284,10 +349,14 @@ class Kernel:
         tab: Tab,
         fetch_result: Optional[FetchResult],
         output_filename: str,
+        cancelled: Optional[threading.Event] = None,
     ) -> RenderResult:
         """Run the module's `render_thrift()` function and return its result.
 
         Raise ModuleError if the module has a bug.
+
+        If another thread sets `cancelled` while the module runs, kill the
+        module and raise ModuleCancelledError.
         """
         chroot_dir = chroot_context.chroot.root
         basedir_seen_by_module = Path("/") / basedir.relative_to(chroot_dir)
@@ -305,14 +374,16 @@ class Kernel:
         )
         try:
             with chroot_context.writable_file(basedir / output_filename):
-                result = self._run_in_child(
+                [result] = self._run_in_child(
                     chroot_dir=chroot_dir,
-                    network_config=pyspawner.NetworkConfig(),  # TODO disallow networking
+                    # TODO disallow networking
+                    network_config=chroot_context.chroot.network_config,
                     compiled_module=compiled_module,
                     timeout=self.render_timeout,
-                    result=ttypes.RenderResult(),
+                    results=[ttypes.RenderResult()],
                     function="render_thrift",
                     args=[request],
+                    cancelled=cancelled,
                 )
         finally:
             chroot_context.clear_unowned_edits()
@@ -346,10 +417,14 @@ class Kernel:
         last_fetch_result: Optional[FetchResult],
         input_parquet_filename: Optional[str],
         output_filename: str,
+        timeout: Optional[float] = None,
     ) -> FetchResult:
         """Run the module's `fetch_thrift()` function and return its result.
 
         Raise ModuleError if the module has a bug.
+
+        Kill the module after `timeout` seconds (default `self.fetch_timeout`)
+        and raise ModuleTimeoutError.
         """
         chroot_dir = chroot_context.chroot.root
         basedir_seen_by_module = Path("/") / basedir.relative_to(chroot_dir)
@@ -367,12 +442,12 @@ class Kernel:
         )
         try:
             with chroot_context.writable_file(basedir / output_filename):
-                result = self._run_in_child(
+                [result] = self._run_in_child(
                     chroot_dir=chroot_dir,
-                    network_config=pyspawner.NetworkConfig(),
+                    network_config=chroot_context.chroot.network_config,
                     compiled_module=compiled_module,
-                    timeout=self.fetch_timeout,
-                    result=ttypes.FetchResult(),
+                    timeout=self.fetch_timeout if timeout is None else timeout,
+                    results=[ttypes.FetchResult()],
                     function="fetch_thrift",
                     args=[request],
                 )
@@ -390,6 +465,47 @@ class Kernel:
         # maximum file size.
         return thrift_fetch_result_to_arrow(result, basedir)
 
+    def _spawn_warm_child(
+        self, chroot_dir: Path, network_config: Optional[pyspawner.NetworkConfig]
+    ) -> pyspawner.ChildProcess:
+        return self._pyspawner.spawn_child(
+            args=[],  # child will read its request from stdin
+            process_name="warm-child",
+            sandbox_config=pyspawner.SandboxConfig(
+                chroot_dir=chroot_dir, network=network_config
+            ),
+        )
+
+    def _spawn_child(
+        self,
+        *,
+        chroot_dir: Path,
+        network_config: Optional[pyspawner.NetworkConfig],
+        compiled_module: CompiledModule,
+        function: str,
+        args: List[Any],
+    ) -> pyspawner.ChildProcess:
+        """Start running `function` in a child: a warm one if we have one."""
+        module_process = self._warm_children.take(chroot_dir)
+        if module_process is not None:
+            try:
+                with module_process.stdin as stdin:
+                    pickle.dump([compiled_module, function, args], stdin)
+                return module_process
+            except OSError:
+                # The warm child died while it waited. Spawn a new one.
+                logger.exception("Warm child died; spawning another")
+                module_process.kill()
+                module_process.wait(0)
+
+        return self._pyspawner.spawn_child(
+            args=[compiled_module, function, args],
+            process_name=compiled_module.module_slug,
+            sandbox_config=pyspawner.SandboxConfig(
+                chroot_dir=chroot_dir, network=network_config
+            ),
+        )
+
     def _run_in_child(
         self,
         *,
@@ -397,30 +513,36 @@ class Kernel:
         network_config: Optional[pyspawner.NetworkConfig],
         compiled_module: CompiledModule,
         timeout: float,
-        result: Any,
+        results: List[Any],
         function: str,
         args: List[Any],
-    ) -> None:
+        cancelled: Optional[threading.Event] = None,
+    ) -> List[Any]:
         """Fork a child process to run `function` with `args`.
 
-        `args` must be Thrift data types. `result` must also be a Thrift type --
-        its `.read()` function will be called, which may produce an error if
-        the child process has a bug. (EOFError is very likely.)
+        `args` must be Thrift data types. `results` must be Thrift types, too:
+        we'll call each one's `.read()` function in turn, which may produce an
+        error if the child process has a bug. (EOFError is very likely.)
 
         Raise ModuleExitedError if the child process did not behave as expected.
 
         Raise ModuleTimeoutError if it did not exit after a delay -- or if it
         closed its file descriptors long before it exited.
+
+        Raise ModuleCancelledError if `cancelled` is set before the child
+        exits. We check it every `CANCEL_POLL_INTERVAL` seconds.
         """
         limit_time = time.time() + timeout
 
-        module_process = self._pyspawner.spawn_child(
-            args=[compiled_module, function, args],
-            process_name=compiled_module.module_slug,
-            sandbox_config=pyspawner.SandboxConfig(
-                chroot_dir=chroot_dir, network=network_config
-            ),
+        spawn_start = time.monotonic()
+        module_process = self._spawn_child(
+            chroot_dir=chroot_dir,
+            network_config=network_config,
+            compiled_module=compiled_module,
+            function=function,
+            args=args,
         )
+        execute_start = time.monotonic()
 
         # stdout is Thrift package; stderr is logs
         output_reader = ChildReader(
@@ -433,15 +555,25 @@ class Kernel:
             selector.register(log_reader.fileno, selectors.EVENT_READ)
 
             timed_out = False
+            was_cancelled = False
             while selector.get_map():
                 remaining = limit_time - time.time()
-                if remaining <= 0:
-                    if not timed_out:
+                if (
+                    cancelled is not None
+                    and cancelled.is_set()
+                    and not (timed_out or was_cancelled)
+                ):
+                    was_cancelled = True
+                    module_process.kill()
+                if remaining <= 0 or was_cancelled:
+                    if not (timed_out or was_cancelled):
                         timed_out = True
                         module_process.kill()  # untrusted code could ignore SIGTERM
                     remaining = None  # wait as long as it takes for everything to die
                     # Fall through. After SIGKILL the child will close each fd,
                     # sending EOF to us. That means the selector _must_ return.
+                elif cancelled is not None:
+                    remaining = min(remaining, CANCEL_POLL_INTERVAL)
 
                 events = selector.select(timeout=remaining)
                 ready = frozenset(key.fd for key, _ in events)
@@ -474,6 +606,16 @@ class Kernel:
         else:
             raise RuntimeError("Unhandled wait() status: %r" % exit_status)
 
+        # The child is dead, so its sandbox is free. Prepare the next child.
+        self._warm_children.refill(chroot_dir, network_config)
+        with self._stats_lock:
+            self._n_runs += 1
+            self._spawn_seconds += execute_start - spawn_start
+            self._execute_seconds += time.monotonic() - execute_start
+
+        if was_cancelled:
+            raise ModuleCancelledError(compiled_module.module_slug)
+
         if timed_out:
             raise ModuleTimeoutError(compiled_module.module_slug, timeout)
 
@@ -485,7 +627,8 @@ class Kernel:
         transport = thrift.transport.TTransport.TMemoryBuffer(output_reader.buffer)
         protocol = thrift.protocol.TBinaryProtocol.TBinaryProtocol(transport)
         try:
-            result.read(protocol)
+            for result in results:
+                result.read(protocol)
         except EOFError:  # TODO handle other errors Thrift may throw
             raise ModuleExitedError(
                 compiled_module.module_slug, exit_code, log_reader.to_str()
@@ -501,4 +644,4 @@ class Kernel:
         if log_reader.buffer:
             logger.info("Output from module process: %s", log_reader.to_str())
 
-        return result
+        return results
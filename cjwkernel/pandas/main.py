@@ -1,20 +1,33 @@
+import pickle
 import sys
 import types
-from typing import Any, List
+from typing import Any, List, Optional
 import thrift.protocol.TBinaryProtocol
 import thrift.transport.TTransport
 from cjwkernel.types import CompiledModule
 import cjwkernel.pandas.module
 
 
-def main(compiled_module: CompiledModule, function: str, args: List[Any]) -> None:
+def main(
+    compiled_module: Optional[CompiledModule] = None,
+    function: Optional[str] = None,
+    args: Optional[List[Any]] = None,
+) -> None:
     """
     Run `function` with `args`, and write the (Thrift) result to stdout.
+
+    If `compiled_module` is None, we're a "warm" child: read a pickled
+    `(compiled_module, function, args)` from stdin. (The parent is trusted, so
+    pickle is safe here.) We read the request before running any module code.
     """
+    if compiled_module is None:
+        compiled_module, function, args = pickle.load(sys.stdin.buffer)
+        sys.stdin.close()
 
     assert function in (
         "render_thrift",
         "migrate_params_thrift",
+        "migrate_params_batch_thrift",
         "fetch_thrift",
         "validate_thrift",
     )
@@ -31,6 +44,9 @@ def run_in_sandbox(
 ) -> None:
     """
     Run `function` with `args`, and write the (Thrift) result to `sys.stdout`.
+
+    "migrate_params_batch_thrift" is special: it calls `migrate_params_thrift`
+    on each element of `args[0]` and writes one result after the other.
     """
     # TODO sandbox -- will need an OS `clone()` with namespace, cgroups, ....
 
@@ -68,18 +84,21 @@ def run_in_sandbox(
             module.__dict__[fn] = user_code_module.__dict__[fn]
 
     if function == "render_thrift":
-        result = module.render_thrift(*args)
+        results = [module.render_thrift(*args)]
     elif function == "migrate_params_thrift":
-        result = module.migrate_params_thrift(*args)
+        results = [module.migrate_params_thrift(*args)]
+    elif function == "migrate_params_batch_thrift":
+        results = [module.migrate_params_thrift(params) for params in args[0]]
     elif function == "validate_thrift":
-        result = module.validate_thrift(*args)
+        results = [module.validate_thrift(*args)]
     elif function == "fetch_thrift":
-        result = module.fetch_thrift(*args)
+        results = [module.fetch_thrift(*args)]
     else:
         raise NotImplementedError
 
     transport = thrift.transport.TTransport.TFileObjectTransport(sys.__stdout__.buffer)
     protocol = thrift.protocol.TBinaryProtocol.TBinaryProtocol(transport)
-    if result is not None:
-        result.write(protocol)
+    for result in results:
+        if result is not None:
+            result.write(protocol)
     transport.flush()
@@ -5,10 +5,12 @@
 import asyncio
 import inspect
 from pathlib import Path
+import shutil
 from typing import Any, Dict, List, Optional, Union
 
 import cjwparquet
 import pandas as pd
+import pyarrow
 from cjwkernel import settings, types
 from cjwkernel.pandas import types as ptypes
 from cjwkernel.thrift import ttypes
@@ -226,6 +228,102 @@ def __render_arrow(
     return types.RenderResult(table, errors)
 
 
+def __render_metadata(
+    *,
+    table: types.ArrowTable,
+    params: Dict[str, Any],
+    tab_name: str,
+    fetch_result: Optional[types.FetchResult],
+    output_path: Path,
+) -> types.RenderResult:
+    """
+    Call `render(input_columns, params)`, which never sees table data.
+
+    This suits modules that only select, reorder, rename or format columns.
+    `render()` returns a dict with optional keys:
+
+    * "columns": List[str] of input column names to output, in order.
+      (Default: all input columns.)
+    * "rename": Dict[str, str] mapping input column name to output name.
+    * "formats": Dict[str, str] mapping output Number column name to format.
+
+    ... or a str error message.
+
+    We apply the result to the mmapped input table without converting it to
+    Pandas. If the column names and order don't change, we copy the input
+    file's bytes verbatim: formats live in metadata, not in the Arrow file.
+    """
+    # call render()
+    spec = inspect.getfullargspec(render)
+    kwargs = {}
+    varkw = bool(spec.varkw)  # if True, function accepts **kwargs
+    kwonlyargs = spec.kwonlyargs
+    if varkw or "settings" in kwonlyargs:
+        kwargs["settings"] = settings
+    if varkw or "tab_name" in kwonlyargs:
+        kwargs["tab_name"] = tab_name
+    input_columns = {
+        c.name: __arrow_column_to_render_column(c) for c in table.metadata.columns
+    }
+    raw_result = render(input_columns, params, **kwargs)
+
+    # coerce result
+    if isinstance(raw_result, str):
+        return types.RenderResult(
+            errors=[types.RenderError(types.I18nMessage.TODO_i18n(raw_result))]
+        )
+    if not isinstance(raw_result, dict):
+        raise ValueError("render() must return a dict or str")
+    input_names = [c.name for c in table.metadata.columns]
+    names = raw_result.get("columns", input_names)
+    renames = raw_result.get("rename", {})
+    formats = raw_result.get("formats", {})
+
+    input_types = {c.name: c.type for c in table.metadata.columns}
+    columns = []
+    for name in names:
+        if name not in input_types:
+            raise ValueError("render() selected nonexistent column %r" % name)
+        output_name = renames.get(name, name)
+        column_type = input_types[name]
+        if output_name in formats:
+            if not isinstance(column_type, types.ColumnType.Number):
+                raise ValueError("render() formatted non-Number %r" % output_name)
+            ptypes.NumberFormatter(formats[output_name])  # raise ValueError
+            column_type = types.ColumnType.Number(formats[output_name])
+        columns.append(types.Column(output_name, column_type))
+    output_names = [c.name for c in columns]
+    if len(set(output_names)) != len(output_names):
+        raise ValueError("render() output duplicate column names")
+
+    if not columns:
+        return types.RenderResult(
+            types.ArrowTable.from_zero_column_metadata(
+                types.TableMetadata(table.metadata.n_rows, [])
+            )
+        )
+
+    if names == input_names and all(renames.get(n, n) == n for n in names):
+        # Same data, same names: only formats may differ. (Use read()/write(), not sendfile(): we're sandboxed.)
+        with table.path.open("rb") as src, output_path.open("wb") as dest:
+            shutil.copyfileobj(src, dest)
+    else:
+        # Reference the input's mmapped columns; write them under new names.
+        arrow_table = pyarrow.Table.from_arrays(
+            [table.table.column(name) for name in names], names=output_names
+        )
+        with pyarrow.RecordBatchFileWriter(
+            str(output_path), arrow_table.schema
+        ) as writer:
+            writer.write_table(arrow_table)
+
+    return types.RenderResult(
+        types.ArrowTable.from_trusted_file(
+            output_path, types.TableMetadata(table.metadata.n_rows, columns)
+        )
+    )
+
+
 def __render_by_signature(
     *,
     table: types.ArrowTable,
@@ -235,13 +333,16 @@ def __render_by_signature(
     output_path: Path,
 ) -> types.RenderResult:
     """
-    Call `__render_arrow()` or `__render_pandas()`, depending on signature.
+    Call `__render_arrow()`, `__render_metadata()` or `__render_pandas()`,
+    depending on signature.
 
-    Either function calls (user-defined) `render()`, writing to `output_path`.
+    Each function calls (user-defined) `render()`, writing to `output_path`.
     """
     spec = inspect.getfullargspec(render)
     if spec.args[0] == "arrow_table":
         fn = __render_arrow
+    elif spec.args[0] == "input_columns":
+        fn = __render_metadata
     else:
         fn = __render_pandas
 
@@ -262,11 +363,10 @@ def render_thrift(request: ttypes.RenderRequest) -> ttypes.RenderResult:
     the process), call `render_arrow()`, and then convert the result back to
     Thrift. This uses very little RAM.
 
-    Module authors may overwrite this function to avoid reading or writing the
-    data table entirely -- for instance, a "change number format" module may
-    not need to read any data, so it could operate on the Thrift layer. Most
-    modules _do_ look at table data, so they should not overwrite this
-    function.
+    Modules that don't need to read data -- for instance, a "change number
+    format" module -- should define `render(input_columns, params)`. See
+    `__render_metadata()`. Most modules _do_ look at table data, so they should
+    not overwrite this function.
     """
     basedir = Path(request.basedir)
     arrow_table = thrift_arrow_table_to_arrow(
@@ -517,6 +617,11 @@ def validate_thrift() -> ttypes.ValidateModuleResult:
             set(render_spec.kwonlyargs)
             - {"fetch_result", "columns", "settings", "tab_name"}
         ), "a render() keyword argument is misspelled"
+    elif render_spec.args and render_spec.args[0] == "input_columns":
+        assert len(render_spec.args) == 2, "render must take two positional arguments"
+        assert not (
+            set(render_spec.kwonlyargs) - {"tab_name", "settings"}
+        ), "a render() keyword argument is misspelled"
     else:
         assert len(render_spec.args) == 2, "render must take two positional arguments"
         assert not (
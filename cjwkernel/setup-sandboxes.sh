@@ -11,8 +11,9 @@
 # is a source of frustration: integration-test runs privileged but staging
 # and production don't. If you're messing with sandboxes, test on staging.
 #
-# This is _one_ chroot environment, suitable for _one_ command. Assume
-# pyspawner never runs two commands at once.
+# Each editable chroot environment is suitable for _one_ command at a time.
+# We create $CJW_N_EDITABLE_CHROOTS of them (default 4), so a process can run
+# that many commands at once. cjwkernel/chroot.py reads the same variable.
 #
 # We use overlay mounts:
 #
@@ -35,12 +36,13 @@
 #       * var/tmp/ (empty folder)
 #       * ...
 #   * chroot/ (on a separate filesystem)
-#     * editable/ (a singleton)
+#     * editable/ (chroot 0)
 #       * upperfs.ext4 (a 20GB sparse file with ext4 filesystem)
 #       * upperfs/ (upperfs.ext4, loopback-mounted)
 #         * upper/ (empty: where mounts and edits from caller+module go)
 #         * work/ (for overlayfs -- do not read/modify)
 #       * root/ (overlay dev volumes + layers/base + upper)
+#     * editable-1/, editable-2/, ... (chroots 1, 2, ...; same layout)
 #     * readonly/
 #       * upper/ (do not modify -- contains mountpoints)
 #       * work/ (for overlayfs -- do not read/modify)
@@ -72,12 +74,21 @@ fi
 
 CHROOT=/var/lib/cjwkernel/chroot
 LAYERS=/var/lib/cjwkernel/chroot-layers
-EDITABLE_CHROOT_SIZE=20G  # max size of user edits in EDITABLE_CHROOT
+EDITABLE_CHROOT_SIZE=20G  # max size of user edits in each editable chroot
+N_EDITABLE_CHROOTS=${CJW_N_EDITABLE_CHROOTS:-4}
 VENV_PATH="/root/.local/share/virtualenvs" # only exits in dev
 
-# NetworkConfig mimics pyspawner/pyspawner/sandbox.py
-KERNEL_VETH=veth-pyspawn
-CHILD_VETH_IP4="192.168.123.2"
+# NetworkConfig mimics pyspawner/pyspawner/sandbox.py for chroot 0, and
+# cjwkernel/chroot.py:_editable_chroot() for the others.
+editable_chroot_dir() {
+  if [ "$1" = 0 ]; then echo "$CHROOT/editable"; else echo "$CHROOT/editable-$1"; fi
+}
+kernel_veth() {
+  if [ "$1" = 0 ]; then echo veth-pyspawn; else echo "veth-pys-$1"; fi
+}
+child_veth_ip4() {
+  echo "192.168.$((123 + $1)).2"
+}
 
 
 # /app/cjwkernel (base layer)
@@ -105,14 +116,14 @@ fi
 mount -o remount,ro "$CHROOT/readonly/root"
 
 
-# Only fetcher|renderer need EDITABLE_CHROOT and networking. If we aren't
+# Only fetcher|renderer need editable chroots and networking. If we aren't
 # fetcher|renderer, return.
 if [ "$MODE" = "only-readonly" ]; then
   exit 0
 fi
 
 
-# EDITABLE_CHROOT
+# Editable chroots
 # Build upperfs.ext4 and mount it
 # What's upperfs.ext4? It's a space-limited filesystem. If users write data
 # larger than $EDITABLE_CHROOT_SIZE to the chroot filesystem, they'll get
@@ -120,31 +131,34 @@ fi
 # script super-fast on producion. (We don't care much about FS speed. The
 # intended use case is large tempfiles and no fsync. When files grow beyond
 # the Linux I/O cache size, users should expect slowdowns.)
-mkdir -p $CHROOT/editable/upperfs
-truncate --size=$EDITABLE_CHROOT_SIZE $CHROOT/editable/upperfs.ext4  # create sparse file
-mkfs.ext4 -q -O ^has_journal $CHROOT/editable/upperfs.ext4
-if ! mount -o loop $CHROOT/editable/upperfs.ext4 $CHROOT/editable/upperfs; then
-  # Docker without --privileged doesn't provide a loopback device. This affects
-  # dev mode (which we don't care about). But it should never happen on production.
-  echo "******* WARNING: failed to mount loopback filesystem $CHROOT/editable/upperfs *****" >&2
-  echo "Workbench will not constrain modules' disk usage. If a module writes" >&2
-  echo "too much to disk, Workbench will experience undefined behavior." >&2
-fi
-# Build overlay filesystem, with upper layer on upperfs
-mkdir -p $CHROOT/editable/upperfs/{upper,work}
-mkdir -p $CHROOT/editable/root
-mount -t overlay overlay -o dirsync,lowerdir=$LAYERS/base,upperdir=$CHROOT/editable/upperfs/upper,workdir=$CHROOT/editable/upperfs/work $CHROOT/editable/root
-# Bind-mount /root/.local/share/virtualenvs in dev mode. (On production, the
-# Python environment is different and packages are installed in
-# /usr/local/lib/python3.7/site-packages, baked into the Docker image, so this
-# step isn't needed.)
-#
-# We set up a mount per chroot.
-if test -d "$VENV_PATH"; then
-  mountpoint="$CHROOT/editable/root$VENV_PATH"
-  mkdir -p "$mountpoint"
-  mount --bind -o ro "$VENV_PATH" "$mountpoint"
-fi
+for i in $(seq 0 $((N_EDITABLE_CHROOTS - 1))); do
+  dir=$(editable_chroot_dir $i)
+  mkdir -p $dir/upperfs
+  truncate --size=$EDITABLE_CHROOT_SIZE $dir/upperfs.ext4  # create sparse file
+  mkfs.ext4 -q -O ^has_journal $dir/upperfs.ext4
+  if ! mount -o loop $dir/upperfs.ext4 $dir/upperfs; then
+    # Docker without --privileged doesn't provide a loopback device. This affects
+    # dev mode (which we don't care about). But it should never happen on production.
+    echo "******* WARNING: failed to mount loopback filesystem $dir/upperfs *****" >&2
+    echo "Workbench will not constrain modules' disk usage. If a module writes" >&2
+    echo "too much to disk, Workbench will experience undefined behavior." >&2
+  fi
+  # Build overlay filesystem, with upper layer on upperfs
+  mkdir -p $dir/upperfs/{upper,work}
+  mkdir -p $dir/root
+  mount -t overlay overlay -o dirsync,lowerdir=$LAYERS/base,upperdir=$dir/upperfs/upper,workdir=$dir/upperfs/work $dir/root
+  # Bind-mount /root/.local/share/virtualenvs in dev mode. (On production, the
+  # Python environment is different and packages are installed in
+  # /usr/local/lib/python3.7/site-packages, baked into the Docker image, so this
+  # step isn't needed.)
+  #
+  # We set up a mount per chroot.
+  if test -d "$VENV_PATH"; then
+    mountpoint="$dir/root$VENV_PATH"
+    mkdir -p "$mountpoint"
+    mount --bind -o ro "$VENV_PATH" "$mountpoint"
+  fi
+done
 
 
 # iptables
@@ -152,10 +166,12 @@ fi
 #     1.1.1.1 via 192.168.86.1 dev wlp2s0 src 192.168.86.70 uid 1000
 # Grep for the "src x.x.x.x" part and store the "x.x.x.x"
 ipv4_snat_source=$(ip route get 1.1.1.1 | grep -oe "src [^ ]\+" | cut -d' ' -f2)
-cat << EOF | iptables-legacy-restore --noflush
-*filter
-:INPUT ACCEPT
-:FORWARD DROP
+
+# filter rules for one editable chroot's veth interface and child IP address
+filter_rules() {
+  KERNEL_VETH=$(kernel_veth $1)
+  CHILD_VETH_IP4=$(child_veth_ip4 $1)
+  cat << EOF
 # Block access to the host itself from a module.
 -A INPUT -i $KERNEL_VETH -j REJECT
 # Allow forwarding response packets back to our module (even
@@ -185,9 +201,21 @@ cat << EOF | iptables-legacy-restore --noflush
 # shouldn't happen) it should not be able to spoof source
 # addresses.
 -A FORWARD -i $KERNEL_VETH -s $CHILD_VETH_IP4 -j ACCEPT
-COMMIT
-*nat
-:POSTROUTING ACCEPT
--A POSTROUTING -s $CHILD_VETH_IP4 -j SNAT --to-source $ipv4_snat_source
-COMMIT
 EOF
+}
+
+nat_rules() {
+  echo "-A POSTROUTING -s $(child_veth_ip4 $1) -j SNAT --to-source $ipv4_snat_source"
+}
+
+{
+  echo "*filter"
+  echo ":INPUT ACCEPT"
+  echo ":FORWARD DROP"
+  for i in $(seq 0 $((N_EDITABLE_CHROOTS - 1))); do filter_rules $i; done
+  echo "COMMIT"
+  echo "*nat"
+  echo ":POSTROUTING ACCEPT"
+  for i in $(seq 0 $((N_EDITABLE_CHROOTS - 1))); do nat_rules $i; done
+  echo "COMMIT"
+} | iptables-legacy-restore --noflush
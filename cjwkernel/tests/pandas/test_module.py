@@ -310,6 +310,61 @@ class RenderTests(unittest.TestCase):
                 ],
             )
 
+    def test_render_metadata_default_returns_input(self):
+        # The param name "input_columns" is a special case
+        def render(input_columns, params):
+            return {}
+
+        result = self._test_render(render, {"A": [1], "B": ["x"]})
+        assert_arrow_table_equals(result.table, {"A": [1], "B": ["x"]})
+
+    def test_render_metadata_select_and_rename(self):
+        def render(input_columns, params):
+            return {"columns": ["B", "A"], "rename": {"A": "C"}}
+
+        result = self._test_render(render, {"A": [1], "B": ["x"]})
+        assert_arrow_table_equals(result.table, {"B": ["x"], "C": [1]})
+
+    def test_render_metadata_reorder_and_swap_names(self):
+        # Output names match input names, but the data doesn't
+        def render(input_columns, params):
+            return {"columns": ["B", "A"], "rename": {"B": "A", "A": "B"}}
+
+        result = self._test_render(render, {"A": [1], "B": ["x"]})
+        assert_arrow_table_equals(result.table, {"A": ["x"], "B": [1]})
+
+    def test_render_metadata_format(self):
+        def render(input_columns, params):
+            self.assertEqual(input_columns["A"].format, "{:,}")
+            return {"formats": {"A": "{:.2f}"}}
+
+        result = self._test_render(render, {"A": [1]})
+        self.assertEqual(
+            result.table.metadata.columns, [Column("A", ColumnType.Number("{:.2f}"))]
+        )
+
+    def test_render_metadata_error(self):
+        def render(input_columns, params):
+            return "bad"
+
+        result = self._test_render(render, {"A": [1]})
+        self.assertIsNone(result.table.path)
+        self.assertEqual(result.errors, [RenderError(I18nMessage.TODO_i18n("bad"))])
+
+    def test_render_metadata_invalid_column_raises(self):
+        def render(input_columns, params):
+            return {"columns": ["X"]}
+
+        with self.assertRaises(ValueError):
+            self._test_render(render, {"A": [1]})
+
+    def test_render_metadata_format_text_raises(self):
+        def render(input_columns, params):
+            return {"formats": {"A": "{:d}"}}
+
+        with self.assertRaises(ValueError):
+            self._test_render(render, {"A": ["x"]})
+
     def test_render_exception_raises(self):
         def render(table, params, **kwargs):
             raise RuntimeError("move along")
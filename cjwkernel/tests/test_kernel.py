@@ -1,10 +1,15 @@
 import contextlib
 import marshal
 import textwrap
+import threading
 import unittest
 from unittest.mock import patch
 import pyarrow
-from cjwkernel.errors import ModuleExitedError, ModuleTimeoutError
+from cjwkernel.errors import (
+    ModuleCancelledError,
+    ModuleExitedError,
+    ModuleTimeoutError,
+)
 from cjwkernel.kernel import Kernel
 from cjwkernel.tests.util import arrow_table_context
 from cjwkernel.chroot import EDITABLE_CHROOT
@@ -120,6 +125,28 @@ class KernelTests(unittest.TestCase):
         result = self.kernel.migrate_params(mod, {"foo": 123})
         self.assertEquals(result, {"nested": {"foo": 123}})
 
+    def test_migrate_params_uses_warm_child(self):
+        mod = _compile("foo", "def migrate_params(params): return {'nested': params}")
+        self.kernel.migrate_params(mod, {"foo": 123})  # leaves a warm child
+        n_taken = self.kernel.stats().warm_children.n_taken
+        result = self.kernel.migrate_params(mod, {"foo": 456})
+        self.assertEquals(result, {"nested": {"foo": 456}})
+        self.assertEqual(self.kernel.stats().warm_children.n_taken, n_taken + 1)
+
+    def test_migrate_params_batch(self):
+        mod = _compile("foo", "def migrate_params(params): return {'nested': params}")
+        result = self.kernel.migrate_params_batch(mod, [{"foo": 1}, {"foo": 2}])
+        self.assertEquals(result, [{"nested": {"foo": 1}}, {"nested": {"foo": 2}}])
+
+    def test_migrate_params_batch_error(self):
+        mod = _compile(
+            "foo",
+            "def migrate_params(params): return {'x': 1 / params['x']}",
+        )
+        with self.assertRaises(ModuleExitedError) as cm:
+            self.kernel.migrate_params_batch(mod, [{"x": 1}, {"x": 0}])
+        self.assertRegex(cm.exception.log, r"ZeroDivisionError")
+
     def test_migrate_params_retval_not_thrift_ready(self):
         mod = _compile("foo", "def migrate_params(params): return range(2)")
         with self.assertRaises(ModuleExitedError):
@@ -260,6 +287,30 @@ class KernelTests(unittest.TestCase):
                             output_filename=output_path.name,
                         )
 
+    def test_render_kill_cancelled(self):
+        mod = _compile(
+            "foo", "import time\ndef render(table, params):\n  time.sleep(2)"
+        )
+        cancelled = threading.Event()
+        cancelled.set()
+        with self.assertRaises(ModuleCancelledError):
+            with arrow_table_context({"A": [1]}, dir=self.basedir) as input_table:
+                input_table.path.chmod(0o644)
+                with self.chroot_context.tempfile_context(
+                    prefix="output-", dir=self.basedir
+                ) as output_path:
+                    self.kernel.render(
+                        mod,
+                        self.chroot_context,
+                        self.basedir,
+                        input_table,
+                        types.Params({}),
+                        types.Tab("tab-1", "Tab 1"),
+                        None,
+                        output_filename=output_path.name,
+                        cancelled=cancelled,
+                    )
+
     def test_fetch_happy_path(self):
         mod = _compile(
             "foo",
@@ -0,0 +1,150 @@
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+import logging
+from pathlib import Path
+import threading
+import time
+from typing import Callable, Dict, NamedTuple, Optional, Set
+
+import pyspawner
+
+logger = logging.getLogger(__name__)
+
+
+class WarmChildrenStats(NamedTuple):
+    n_taken: int
+    """Number of times `take()` returned a warm child."""
+
+    n_missed: int
+    """Number of times `take()` returned None (so the caller spawned a child)."""
+
+    n_spawned: int
+    """Number of warm children spawned in the background."""
+
+    spawn_seconds: float
+    """Total time spent spawning warm children in the background."""
+
+
+class WarmChildren:
+    """Spawned, sandboxed children, each waiting for a request on stdin.
+
+    Spawning a child means forking pyspawner and setting up its sandbox
+    (chroot, namespaces, network). For cheap modules, that takes longer than
+    the module's own work. So after each child exits, we spawn a replacement
+    in the background -- in the same sandbox -- and it waits for the next
+    request on that sandbox.
+
+    Each child is still single-use: it runs one request and exits. A warm
+    child only runs _our_ code while it waits: it does not know which module
+    it will run until it reads its request. (If it ran the module's code
+    early, that untrusted code could read the next user's files as they
+    appear in the chroot.)
+
+    We keep at most one warm child per chroot. An editable chroot has its own
+    network interface, so two children can't share it at once: `take()` waits
+    for a background spawn to finish instead of letting the caller spawn a
+    conflicting child.
+
+    This is thread-safe.
+    """
+
+    def __init__(
+        self,
+        spawn: Callable[
+            [Path, Optional[pyspawner.NetworkConfig]], pyspawner.ChildProcess
+        ],
+    ):
+        self._spawn = spawn
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="kernel-warm-children-"
+        )
+        self._condition = threading.Condition()
+        self._children: Dict[Path, pyspawner.ChildProcess] = {}
+        self._spawning: Set[Path] = set()
+        self._closed = False
+        self._n_taken = 0
+        self._n_missed = 0
+        self._n_spawned = 0
+        self._spawn_seconds = 0.0
+
+    def take(self, chroot_dir: Path) -> Optional[pyspawner.ChildProcess]:
+        """Return the warm child waiting in `chroot_dir`, or None.
+
+        If a warm child is being spawned in `chroot_dir`, wait for it.
+
+        The caller must write a request to the child's stdin and then treat it
+        like any other child. Afterwards, the caller should call `refill()`.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: chroot_dir not in self._spawning)
+            child = self._children.pop(chroot_dir, None)
+            if child is None:
+                self._n_missed += 1
+            else:
+                self._n_taken += 1
+            return child
+
+    def refill(
+        self, chroot_dir: Path, network_config: Optional[pyspawner.NetworkConfig]
+    ) -> None:
+        """Spawn a warm child in `chroot_dir`, in the background.
+
+        Call this only after the previous child in `chroot_dir` has exited.
+        No-op if there is already a warm child there.
+        """
+        with self._condition:
+            if (
+                self._closed
+                or chroot_dir in self._children
+                or chroot_dir in self._spawning
+            ):
+                return
+            self._spawning.add(chroot_dir)
+        self._executor.submit(self._spawn_in_background, chroot_dir, network_config)
+
+    def _spawn_in_background(
+        self, chroot_dir: Path, network_config: Optional[pyspawner.NetworkConfig]
+    ) -> None:
+        start_time = time.monotonic()
+        try:
+            child = self._spawn(chroot_dir, network_config)
+        except Exception:
+            logger.exception("Error spawning warm child in %s", chroot_dir)
+            child = None
+        spawn_seconds = time.monotonic() - start_time
+
+        with self._condition:
+            self._spawning.discard(chroot_dir)
+            self._spawn_seconds += spawn_seconds
+            if child is not None:
+                self._n_spawned += 1
+                if self._closed:
+                    _kill(child)
+                else:
+                    self._children[chroot_dir] = child
+            self._condition.notify_all()
+
+    def close(self) -> None:
+        """Kill all warm children. Refuse to spawn more."""
+        with self._condition:
+            self._closed = True
+            children = list(self._children.values())
+            self._children.clear()
+        for child in children:
+            _kill(child)
+        self._executor.shutdown(wait=False)
+
+    def stats(self) -> WarmChildrenStats:
+        """Report hit/miss counters and background spawn time."""
+        with self._condition:
+            return WarmChildrenStats(
+                n_taken=self._n_taken,
+                n_missed=self._n_missed,
+                n_spawned=self._n_spawned,
+                spawn_seconds=self._spawn_seconds,
+            )
+
+
+def _kill(child: pyspawner.ChildProcess) -> None:
+    child.kill()
+    child.wait(0)
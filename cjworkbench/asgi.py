@@ -20,7 +20,9 @@ from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
 from django.conf.urls import url
 from django.core.asgi import get_asgi_application
+from django.urls import path, re_path
 
+from server.views.steps import StepPublicCsvConsumer, StepPublicJsonConsumer
 from server.websockets import WorkflowConsumer
 from cjwstate.models.module_registry import MODULE_REGISTRY
 import cjwstate.modules
@@ -43,6 +45,42 @@ def create_url_router():  # used in unit tests
     )
 
 
+def create_http_router():  # used in unit tests
+    """Route streaming exports to ASGI consumers; route the rest to Django.
+
+    Django 3.1 can't stream a response without blocking the event loop, so
+    long-running downloads bypass it.
+    """
+    return URLRouter(
+        [
+            path(
+                "public/moduledata/live/<int:step_id>.csv",
+                AuthMiddlewareStack(StepPublicCsvConsumer.as_asgi()),
+            ),
+            path(
+                "public/moduledata/live/<int:step_id>.json",
+                AuthMiddlewareStack(StepPublicJsonConsumer.as_asgi()),
+            ),
+            re_path(r"", get_asgi_application()),
+        ]
+    )
+
+
+async def handle_lifespan(scope, receive, send):
+    """Listen for module updates for as long as the server runs.
+
+    This lets MODULE_REGISTRY serve `all_latest()` -- called on every
+    websocket update -- without querying the database.
+    """
+    message = await receive()
+    assert message["type"] == "lifespan.startup"
+    async with MODULE_REGISTRY.listening_for_updates():
+        await send({"type": "lifespan.startup.complete"})
+        message = await receive()
+        assert message["type"] == "lifespan.shutdown"
+    await send({"type": "lifespan.shutdown.complete"})
+
+
 def create_application() -> ProtocolTypeRouter:
     """Create an ASGI application."""
     # Load static modules on startup.
@@ -65,12 +103,13 @@ def create_application() -> ProtocolTypeRouter:
         MODULE_REGISTRY.all_latest()
         del os.environ["DJANGO_ALLOW_ASYNC_UNSAFE"]
 
-    return ProtocolTypeRouter(
-        {
-            "http": get_asgi_application(),
-            "websocket": create_url_router(),
-        }
-    )
+    protocols = {
+        "http": create_http_router(),
+        "websocket": create_url_router(),
+    }
+    if not settings.I_AM_TESTING:
+        protocols["lifespan"] = handle_lifespan
+    return ProtocolTypeRouter(protocols)
 
 
 application = create_application()
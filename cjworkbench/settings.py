@@ -510,6 +510,30 @@ elif len(os.environ["MINIO_BUCKET_PREFIX"]) > 0:
     )
 else:
     S3_BUCKET_NAME_PATTERN = "%s" + os.environ.get("MINIO_BUCKET_SUFFIX", "")
+S3_SUPPORTS_DELETE_OBJECTS = (
+    os.environ.get(
+        "CJW_S3_SUPPORTS_DELETE_OBJECTS",
+        # Google Cloud Storage's AWS emulation doesn't support DeleteObjects
+        "false" if "storage.googleapis.com" in AWS_S3_ENDPOINT else "true",
+    ).lower()
+    in ("true", "1")
+)
+"""True if the S3 backend supports multi-object DeleteObjects requests.
+
+When False, we delete objects one at a time -- `S3_N_CONCURRENT_DELETES` at
+once.
+"""
+
+S3_N_CONCURRENT_DELETES = int(os.environ.get("CJW_S3_N_CONCURRENT_DELETES", 16))
+"""Number of single-object deletes each process may send to S3 at once."""
+
+S3_N_CONCURRENT_TRANSFERS = int(os.environ.get("CJW_S3_N_CONCURRENT_TRANSFERS", 8))
+"""Number of `s3.*_async()` calls each process may run at once.
+
+These run on their own threads, so an asyncio service waiting on S3 holds
+neither its event loop nor a database thread. The renderer uses them to
+download fetch results and to upload (and compare) render results.
+"""
 if "MINIO_STATIC_URL_PATTERN" in os.environ:
     STATIC_URL = os.environ["MINIO_STATIC_URL_PATTERN"]
 
@@ -544,3 +568,154 @@ BIG_TABLE_COLUMNS_PER_TILE = 20
 A smaller number means more HTTP requests are needed to fill a table. A larger
 number means each request returns more data -- and React renders are slower.
 """
+
+N_CONCURRENT_EXPORTS = int(os.environ.get("CJW_N_CONCURRENT_EXPORTS", 4))
+"""Number of public CSV/JSON exports each web server encodes at once.
+
+Each export reads from S3 and encodes on a thread. More requests than this
+wait their turn.
+"""
+
+PUBLIC_DATA_MAX_AGE = int(os.environ.get("CJW_PUBLIC_DATA_MAX_AGE", 60))
+"""Seconds browsers and CDNs may reuse a public workflow's step data.
+
+Applies to CSV/JSON exports and embed data. Past this age, clients revalidate
+with an ETag: cheap, because the ETag only changes with the cached result.
+"""
+
+RENDERCACHE_LOCAL_DIR = os.environ.get(
+    "CJW_RENDERCACHE_LOCAL_DIR", "/var/tmp/cjw-rendercache"
+)
+"""Directory where we keep local copies of cached render results.
+
+Each process creates its own subdirectory here. Files in it are copies of
+`s3.CachedRenderResultsBucket` objects. Their keys include delta IDs, so a
+local copy never goes stale.
+"""
+
+RENDERCACHE_LOCAL_MAX_BYTES = int(
+    os.environ.get("CJW_RENDERCACHE_LOCAL_MAX_BYTES", 2 * 1024 * 1024 * 1024)
+)
+"""Number of bytes of local render-cache copies each process may keep on disk.
+
+When the local cache grows past this limit, we delete least-recently-used files
+that no reader is using. Set to 0 to delete each file as soon as its last
+reader is done with it.
+"""
+
+RENDERCACHE_TABLES_DIR = os.environ.get(
+    "CJW_RENDERCACHE_TABLES_DIR", "/var/tmp/cjw-rendercache-tables"
+)
+"""Directory where we keep Arrow copies of cached render results, for tiles.
+
+Each process creates its own subdirectory here.
+"""
+
+RENDERCACHE_TABLES_MAX_BYTES = int(
+    os.environ.get("CJW_RENDERCACHE_TABLES_MAX_BYTES", 1024 * 1024 * 1024)
+)
+"""Number of bytes of memory-mapped Arrow tables each process may keep open.
+
+Serving a table-viewer tile from an open table is a cheap slice; serving it
+from Parquet means decoding the file. 0 means, "keep only the most recently
+converted table": we never evict the table we just converted.
+"""
+
+RENDERER_HOT_OUTPUTS_DIR = os.environ.get(
+    "CJW_RENDERER_HOT_OUTPUTS_DIR", "/var/tmp/cjw-renderer-hot-outputs"
+)
+"""Directory where renderer keeps Arrow copies of the step outputs it wrote.
+
+Each process creates its own subdirectory here.
+"""
+
+RENDERER_HOT_OUTPUTS_MAX_BYTES = int(
+    os.environ.get("CJW_RENDERER_HOT_OUTPUTS_MAX_BYTES", 1024 * 1024 * 1024)
+)
+"""Number of bytes of Arrow step outputs each renderer may keep on disk.
+
+A re-render can read its input from here instead of from the render cache,
+saving an S3 download and a Parquet decode. Set to 0 to disable.
+"""
+
+RENDERER_N_CONCURRENT_RENDERS = int(
+    os.environ.get("CJW_RENDERER_N_CONCURRENT_RENDERS", 4)
+)
+"""Number of workflows each renderer process may render at once.
+
+Renders share the process's pool of editable chroots (`CJW_N_EDITABLE_CHROOTS`)
+and its database connections. A workflow may render as many tabs at once as
+there are free chroots. While other workflows wait for chroots, the pool
+hands each freed chroot to the workflow holding the fewest, so one
+many-tabbed workflow can't starve the others.
+"""
+
+RENDERER_N_PREFETCHED_RENDERS = int(
+    os.environ.get("CJW_RENDERER_N_PREFETCHED_RENDERS", 20)
+)
+"""Number of background render requests each renderer holds, per queue.
+
+This applies to the autofetch and bulk queues. The renderer picks which held
+request to render next (see `renderer.scheduler`). It can only favor requests
+it holds: this should be several times `RENDERER_N_CONCURRENT_RENDERS`.
+
+Renderers hold only `RENDERER_N_CONCURRENT_RENDERS` requests from the
+`render` queue (users' edits), so a busy renderer doesn't sit on requests
+an idle one could start.
+"""
+
+RENDERER_STATS_INTERVAL = int(os.environ.get("CJW_RENDERER_STATS_INTERVAL", 60))
+"""Seconds between log lines reporting render-queue depths and wait times."""
+
+FETCHER_N_CONCURRENT_FETCHES = int(
+    os.environ.get("CJW_FETCHER_N_CONCURRENT_FETCHES", 4)
+)
+"""Number of fetches each fetcher process may run at once.
+
+Fetches share the process's pool of editable chroots (`CJW_N_EDITABLE_CHROOTS`).
+Fetches that wait on slow servers hold a chroot but little memory. So this may
+be as large as the chroot count.
+"""
+
+FETCHER_N_PREFETCHED_FETCHES = int(
+    os.environ.get("CJW_FETCHER_N_PREFETCHED_FETCHES", 20)
+)
+"""Number of fetch requests each fetcher process holds.
+
+A held request that waits for `FETCHER_N_CONCURRENT_FETCHES_PER_DOMAIN`
+doesn't take one of the `FETCHER_N_CONCURRENT_FETCHES` slots; so other held
+requests can run meanwhile. This should be several times
+`FETCHER_N_CONCURRENT_FETCHES`.
+"""
+
+FETCHER_N_CONCURRENT_FETCHES_PER_DOMAIN = int(
+    os.environ.get("CJW_FETCHER_N_CONCURRENT_FETCHES_PER_DOMAIN", 2)
+)
+"""Number of fetches each fetcher process may run at once against one domain.
+
+A domain is a "url" param's hostname. This keeps one slow server from taking
+all of a fetcher's `FETCHER_N_CONCURRENT_FETCHES`. Fetches without a "url"
+param have no per-domain limit.
+"""
+
+FETCHER_TIMEOUT = int(os.environ.get("CJW_FETCHER_TIMEOUT", 600))
+"""Seconds each fetch may spend in its chroot before we kill it.
+
+The budget covers preparing inputs and running the module's `fetch()`. Time
+spent waiting for a chroot, for `FETCHER_N_CONCURRENT_FETCHES_PER_DOMAIN` or
+for `FETCHER_N_CONCURRENT_FETCHES` doesn't count.
+"""
+
+FETCHER_COALESCE_SECONDS = int(os.environ.get("CJW_FETCHER_COALESCE_SECONDS", 60))
+"""Seconds a fetcher reuses a fetch result for identical fetches.
+
+Identical fetches (same module, params, secrets and last result) that run at
+the same time always share one upstream request. Within this many seconds
+after it finishes, new identical fetches reuse its result, too. 0 means,
+"only share concurrent fetches."
+"""
+
+FETCHER_COALESCE_DIR = os.environ.get(
+    "CJW_FETCHER_COALESCE_DIR", "/var/tmp/cjw-fetch-coalescer"
+)
+"""Directory where a fetcher keeps results it shares among identical fetches."""
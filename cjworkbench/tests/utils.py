@@ -83,6 +83,7 @@ _Tables = [
     "delta",
     "module_version",
     "stored_object",
+    "stored_object_blob",
     "uploaded_file",
     "step",
     "tab",
@@ -24,6 +24,7 @@ longer exists! Don't panic: this is fine. Indeed, the default
 import datetime
 from typing import Any, Dict, Optional, Tuple
 
+from django.db import connection
 from django.db.models import Q
 
 from cjworkbench.sync import database_sync_to_async
@@ -32,6 +33,26 @@ from cjwstate.models import Delta, Step, Workflow
 from cjwstate.models.commands import NAME_TO_COMMAND, InitWorkflow, SetStepDataVersion
 
 
+RENDER_DELTA_NOTIFY_CHANNEL = "workflow_render_delta"
+"""Postgres channel we NOTIFY when a Delta changes what a Workflow renders.
+
+The payload is "<workflow_id> <delta_id>": the workflow must now render
+`delta_id`. Renderers LISTEN, so they can abandon renders of older deltas.
+"""
+
+
+def _notify_render_delta(workflow_id: int, delta_id: int) -> None:
+    """Tell renderers (in all processes) that older renders are obsolete.
+
+    Postgres delivers the NOTIFY when the current transaction commits.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_notify(%s, %s)",
+            [RENDER_DELTA_NOTIFY_CHANNEL, "%d %d" % (workflow_id, delta_id)],
+        )
+
+
 async def websockets_notify(workflow_id: int, update: clientside.Update) -> None:
     """Notify Websockets clients of `update`; return immediately.
 
@@ -47,10 +68,16 @@ def _workflow_has_notifications(workflow_id: int) -> bool:
 
 
 async def _maybe_queue_render(
-    workflow_id: int, relevant_delta_id: int, delta: Delta
+    workflow_id: int,
+    relevant_delta_id: int,
+    delta: Delta,
+    render_queue: str = rabbitmq.Render,
 ) -> None:
     """Tell renderer to render workflow; return immediately.
 
+    `render_queue` is the RabbitMQ queue to render a SetStepDataVersion on
+    (see `rabbitmq.RenderQueues`). Other Deltas render on `rabbitmq.Render`.
+
     `delta` is used to check for SetStepDataVersion, which gets special
     logic. But to be clear: the `delta` in question might have been undo()-ne.
     We are queueing a render of version `workflow.last_delta_id`, which may or
@@ -85,11 +112,18 @@ async def _maybe_queue_render(
         #
         #     * Websockets consumers queue a render when we ask them.
         #     * The Django page-load view queues a render when needed.
+        #
+        # Whether anybody is waiting for the render depends on where the Delta
+        # came from. The caller knows: cron-scheduled fetches pass
+        # RenderAutofetch, so they won't delay renders of users' edits. A
+        # user's "Update" click or version pick uses the default, Render.
         if await _workflow_has_notifications(workflow_id):
-            await rabbitmq.queue_render(workflow_id, relevant_delta_id)
+            await rabbitmq.queue_render(
+                workflow_id, relevant_delta_id, queue=render_queue
+            )
         else:
             await rabbitmq.queue_render_if_consumers_are_listening(
-                workflow_id, relevant_delta_id
+                workflow_id, relevant_delta_id, queue=render_queue
             )
     else:
         # Normal case: the Delta says we need a render. Assume there's a user
@@ -155,11 +189,13 @@ def _first_forward_and_save_returning_clientside_update(
                 # to them.
                 workflow.delete_orphan_soft_deleted_models()
 
-            return (
-                delta,
-                command.load_clientside_update(delta),
-                delta.id if command.get_modifies_render_output(delta) else None,
-            )
+            if command.get_modifies_render_output(delta):
+                render_delta_id = delta.id
+                _notify_render_delta(workflow.id, render_delta_id)
+            else:
+                render_delta_id = None
+
+            return (delta, command.load_clientside_update(delta), render_delta_id)
     except Workflow.DoesNotExist:
         return None, None, None
 
@@ -189,11 +225,13 @@ def _call_forward_and_load_clientside_update(
             delta.last_applied_at = now
             delta.save(update_fields=["last_applied_at"])
 
-            return (
-                delta,
-                command.load_clientside_update(delta),
-                delta.id if command.get_modifies_render_output(delta) else None,
-            )
+            if command.get_modifies_render_output(delta):
+                render_delta_id = delta.id
+                _notify_render_delta(workflow.id, render_delta_id)
+            else:
+                render_delta_id = None
+
+            return (delta, command.load_clientside_update(delta), render_delta_id)
     except Workflow.DoesNotExist:
         return None, None, None
 
@@ -225,28 +263,33 @@ def _call_backward_and_load_clientside_update(
             delta.last_applied_at = now
             delta.save(update_fields=["last_applied_at"])
 
-            return (
-                delta,
-                command.load_clientside_update(delta),
-                (
-                    workflow.last_delta_id
-                    if command.get_modifies_render_output(delta)
-                    else None
-                ),
-            )
+            if command.get_modifies_render_output(delta):
+                render_delta_id = workflow.last_delta_id
+                _notify_render_delta(workflow.id, render_delta_id)
+            else:
+                render_delta_id = None
+
+            return (delta, command.load_clientside_update(delta), render_delta_id)
     except (Workflow.DoesNotExist, Delta.DoesNotExist):
         return None, None, None
 
 
 async def do(
-    cls, *, workflow_id: int, mutation_id: Optional[str] = None, **kwargs
+    cls,
+    *,
+    workflow_id: int,
+    mutation_id: Optional[str] = None,
+    render_queue: str = rabbitmq.Render,
+    **kwargs,
 ) -> Delta:
     """Create a Delta and run its Command's .forward().
 
     If `amend_create_kwargs()` returns `None`, no-op.
 
     If Delta suggests sending a clientside.Update data, send it over RabbitMQ
-    and possibly schedule a render.
+    and possibly schedule a render. For a SetStepDataVersion, pass
+    `render_queue=rabbitmq.RenderAutofetch` when nobody is waiting for the
+    render (e.g., after a cron-scheduled fetch).
 
     Keyword arguments vary by cls, but `workflow_id` is always required.
 
@@ -281,7 +324,7 @@ async def do(
         await websockets_notify(workflow_id, update)
 
     if render_delta_id is not None:
-        await _maybe_queue_render(workflow_id, render_delta_id, delta)
+        await _maybe_queue_render(workflow_id, render_delta_id, delta, render_queue)
 
     return delta
 
@@ -0,0 +1,211 @@
+import atexit
+from collections import OrderedDict
+from dataclasses import dataclass
+import os
+from pathlib import Path
+import shutil
+import tempfile
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Set
+
+
+_process_dirs: Set[Path] = set()
+"""Directories `make_process_dir()` created for this process."""
+
+
+def _is_process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # another user's process
+    return True
+
+
+def remove_dead_process_dirs(parent_dir: Path) -> None:
+    """Delete "pid-N-*" directories whose process N is gone.
+
+    A directory named after our own PID is gone, too, unless we created it: it
+    belongs to a dead process whose PID we inherited (e.g., in a restarted
+    container).
+    """
+    my_pid = os.getpid()
+    for path in parent_dir.glob("pid-*-*"):
+        try:
+            pid = int(path.name.split("-")[1])
+        except ValueError:
+            continue  # not ours
+        if path in _process_dirs:
+            continue
+        if pid == my_pid or not _is_process_alive(pid):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def make_process_dir(parent_dir: Path) -> Path:
+    """Create and return a directory in `parent_dir` for this process's files.
+
+    We delete it when Python exits. Processes that die hard (e.g., `os._exit()`
+    or SIGKILL) can't do that; so first, we delete directories that dead
+    processes left in `parent_dir`.
+    """
+    parent_dir.mkdir(parents=True, exist_ok=True)
+    remove_dead_process_dirs(parent_dir)
+    path = Path(tempfile.mkdtemp(prefix="pid-%d-" % os.getpid(), dir=parent_dir))
+    _process_dirs.add(path)
+    atexit.register(shutil.rmtree, path, ignore_errors=True)
+    return path
+
+
+@dataclass
+class LruFile:
+    path: Path
+    size: int
+    value: Any
+    """Whatever the caller stored alongside the file."""
+
+    n_pins: int = 0
+    is_discarded: bool = False
+    """True when the file is gone from the cache but a reader still pins it.
+
+    The last reader to unpin a discarded file deletes it.
+    """
+
+
+class LruFiles:
+    """Size-bounded, least-recently-used files in a directory of our own.
+
+    The directory is `make_process_dir(parent_dir)`, created on first use.
+
+    Readers "pin" files with `get(key, pin=True)` and must `unpin()` them. We
+    never delete a pinned file; so the total may grow past `max_bytes` while
+    large files are in use. It shrinks as readers unpin. We never evict the
+    file we just added, either: a file larger than `max_bytes` stays until
+    the next `add()`.
+
+    This is thread-safe.
+    """
+
+    def __init__(self, parent_dir: Path, max_bytes: int):
+        self.parent_dir = parent_dir
+        self.max_bytes = max_bytes
+        self._root: Optional[Path] = None
+        self._lock = threading.Lock()
+        self._files: Dict[Hashable, LruFile] = OrderedDict()  # oldest first
+        self._n_bytes = 0
+        self._n_evictions = 0
+
+    @property
+    def root(self) -> Path:
+        """Directory holding this process's files. Created on first use."""
+        with self._lock:
+            if self._root is None:
+                self._root = make_process_dir(self.parent_dir)
+            return self._root
+
+    def mkstemp(self, prefix: str, suffix: str = "") -> Path:
+        """Create an empty file for the caller to write and then `add()`."""
+        fd, path_str = tempfile.mkstemp(prefix=prefix, suffix=suffix, dir=self.root)
+        os.close(fd)
+        return Path(path_str)
+
+    def _forget(self, key: Hashable) -> None:
+        """Delete a file, or mark it discarded. Call with self._lock held."""
+        file = self._files.pop(key)
+        self._n_bytes -= file.size
+        if file.n_pins == 0:
+            file.path.unlink()
+        else:
+            file.is_discarded = True
+
+    def _evict(self, keep_key: Any = None) -> None:
+        """Delete unpinned files until we are within budget.
+
+        Call with self._lock held.
+        """
+        for key, file in list(self._files.items()):
+            if self._n_bytes <= self.max_bytes:
+                break
+            if file.n_pins == 0 and key != keep_key:
+                self._forget(key)
+                self._n_evictions += 1
+
+    def get(self, key: Hashable, *, pin: bool = False) -> Optional[LruFile]:
+        """Find a file and mark it recently used; or return None."""
+        with self._lock:
+            file = self._files.get(key)
+            if file is not None:
+                self._files.move_to_end(key)
+                if pin:
+                    file.n_pins += 1
+            return file
+
+    def add(
+        self,
+        key: Hashable,
+        path: Path,
+        value: Any = None,
+        *,
+        pin: bool = False,
+        replace: bool = True,
+    ) -> LruFile:
+        """Take ownership of `path` (from `mkstemp()`); return the file for `key`.
+
+        If `key` is already cached: with `replace=True`, forget the old file;
+        with `replace=False`, delete `path` and return the old file.
+        """
+        size = path.stat().st_size
+        with self._lock:
+            old_file = self._files.get(key)
+            if old_file is not None:
+                if not replace:
+                    path.unlink()
+                    self._files.move_to_end(key)
+                    if pin:
+                        old_file.n_pins += 1
+                    return old_file
+                self._forget(key)
+
+            file = LruFile(path, size, value, n_pins=1 if pin else 0)
+            self._files[key] = file
+            self._n_bytes += size
+            self._evict(keep_key=key)
+            return file
+
+    def unpin(self, file: LruFile) -> None:
+        with self._lock:
+            file.n_pins -= 1
+            if file.n_pins == 0:
+                if file.is_discarded:
+                    file.path.unlink()
+                else:
+                    self._evict()
+
+    def discard_matching(self, predicate: Callable[[Hashable, LruFile], bool]) -> None:
+        """Forget files for which `predicate(key, file)` is True.
+
+        Pinned files are deleted when their last reader unpins them.
+        """
+        with self._lock:
+            for key, file in list(self._files.items()):
+                if predicate(key, file):
+                    self._forget(key)
+
+    def discard(self, key: Hashable) -> None:
+        self.discard_matching(lambda k, _: k == key)
+
+    def clear(self) -> None:
+        """Forget all files. (Useful in unit tests.)"""
+        self.discard_matching(lambda k, _: True)
+
+    @property
+    def n_files(self) -> int:
+        return len(self._files)
+
+    @property
+    def n_bytes(self) -> int:
+        return self._n_bytes
+
+    @property
+    def n_evictions(self) -> int:
+        return self._n_evictions
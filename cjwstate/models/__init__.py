@@ -7,4 +7,4 @@ from .tab import Tab
 from .module_version import ModuleVersion
 from .delta import Delta
 from .uploaded_file import UploadedFile
-from .stored_object import StoredObject
+from .stored_object import StoredObject, StoredObjectBlob
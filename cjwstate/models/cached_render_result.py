@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 from cjwkernel.types import RenderError, TableMetadata
 
 
@@ -14,8 +14,9 @@ class CachedRenderResult:
     but that has no pros, only cons.)
 
     Part of this result is also stored on disk. The bucket is always
-    s3.CachedRenderResultsBucket, and the key is always
-    "wf-{workflow.id}/wfm-{step.id}/delta-{delta.id}.dat".
+    s3.CachedRenderResultsBucket, and the key is
+    "wf-{workflow.id}/wfm-{step.id}/delta-{delta.id}-{nonce}.dat" (or
+    "delta-{delta.id}.dat" for results cached before we used nonces).
 
     The `cjwstate.rendercache` module manipulates this data.
     """
@@ -27,3 +28,6 @@ class CachedRenderResult:
     errors: List[RenderError]
     json: Dict[str, Any]
     table_metadata: TableMetadata
+    hash: Optional[str] = None  # digest of the Parquet file, if there is one
+    input_hash: Optional[str] = None  # digest of render() inputs, if known
+    nonce: Optional[str] = None  # part of S3 keys; None for old results
@@ -2,6 +2,7 @@ from django.db.models import F, Q
 
 from cjwstate import clientside
 from ..dbutil import make_gap_in_list, remove_gap_from_list
+from ..step import notify_autofetch_schedule_changed
 from .base import BaseCommand
 from .util import ChangesStepOutputs
 
@@ -78,6 +79,9 @@ class DeleteStep(ChangesStepOutputs, BaseCommand):
 
         delta.step.is_deleted = False
         delta.step.save(update_fields=["is_deleted"])
+        if delta.step.auto_update_data:
+            # Autofetch forgot the step when it came due while deleted
+            notify_autofetch_schedule_changed(delta.step_id)
 
         blocks = delta.values_for_backward.get("blocks", [])
         for block_kwargs in blocks:
@@ -2,6 +2,7 @@ from django.db.models import F, Q, QuerySet
 
 from cjwstate import clientside
 from ..dbutil import make_gap_in_list, remove_gap_from_list
+from ..step import notify_autofetch_schedule_changed
 from .base import BaseCommand
 
 
@@ -78,6 +79,11 @@ class DeleteTab(BaseCommand):
 
         delta.tab.is_deleted = False
         delta.tab.save(update_fields=["is_deleted"])
+        # Autofetch forgot steps that came due while the tab was deleted
+        for step_id in delta.tab.live_steps.filter(auto_update_data=True).values_list(
+            "id", flat=True
+        ):
+            notify_autofetch_schedule_changed(step_id)
 
         # Re-create deleted Blocks
         blocks = delta.values_for_backward.get("blocks", [])
@@ -1,13 +1,20 @@
+import asyncio
+from contextlib import asynccontextmanager
 import datetime
 import json
 import logging
 from pathlib import Path
 import threading
-from typing import Any, Dict, NamedTuple
+from typing import Any, Dict, NamedTuple, Optional
 import zipfile
+import asyncpg
+from django.conf import settings
 from django.db.models import F, OuterRef, Subquery
 from cjwstate import s3
-from cjwstate.models.module_version import ModuleVersion as DbModuleVersion
+from cjwstate.models.module_version import (
+    NOTIFY_CHANNEL,
+    ModuleVersion as DbModuleVersion,
+)
 import cjwstate.modules
 from cjwstate.modules.types import ModuleId, ModuleVersion, ModuleZipfile
 
@@ -22,6 +29,15 @@ _CacheEntry = NamedTuple(
 )
 
 
+_Snapshot = NamedTuple(
+    "_Snapshot",
+    [
+        ("generation", int),
+        ("db_modules", Dict[ModuleId, DbModuleVersion]),
+    ],
+)
+
+
 logger = logging.getLogger(__name__)
 
 
@@ -34,12 +50,118 @@ class ModuleRegistry:
       database's `last_update_time` field has a new value.
     * Otherwise, modules at a given version are immutable. We test the database
       for a newer `version`.
+
+    Long-running processes should wrap their work in `listening_for_updates()`.
+    While it is active, we keep a snapshot of the latest database records and
+    only re-query when Postgres notifies us that `module_version` changed. So
+    `latest()` and `all_latest()` don't run any SQL in the common case. Outside
+    `listening_for_updates()` (e.g., in unit tests and management commands),
+    every call queries the database.
     """
 
     def __init__(self, tempdir: Path):
         self.tempdir = tempdir
         self._cache: Dict[ModuleId, _CacheEntry] = {}
         self._load_lock = threading.Lock()
+        self._is_listening = False
+        self._generation = 0  # incremented on each NOTIFY
+        self._snapshot: Optional[_Snapshot] = None
+
+    @asynccontextmanager
+    async def listening_for_updates(self):
+        """Serve `latest()` and `all_latest()` from a snapshot, within this block.
+
+        We LISTEN on a dedicated asyncpg connection. Each NOTIFY (sent when a
+        ModuleVersion is saved or deleted) invalidates the snapshot, and the
+        next `latest()` or `all_latest()` call re-queries the database.
+
+        If the listening connection dies, we log it and revert to querying the
+        database on every call.
+        """
+        pg_config = settings.DATABASES["default"]
+        pg_connection = await asyncpg.connect(
+            host=pg_config["HOST"],
+            user=pg_config["USER"],
+            password=pg_config["PASSWORD"],
+            database=pg_config["NAME"],
+            port=pg_config["PORT"],
+            timeout=pg_config["CONN_MAX_AGE"],
+            command_timeout=pg_config["CONN_MAX_AGE"],
+        )
+
+        def on_notify(connection, pid, channel, payload):
+            self._generation += 1
+
+        await pg_connection.add_listener(NOTIFY_CHANNEL, on_notify)
+        # Start with no snapshot: anything written before LISTEN is unknown.
+        self._snapshot = None
+        self._is_listening = True
+
+        heartbeat_task = asyncio.get_event_loop().create_task(
+            self._send_pg_heartbeats_forever(pg_connection, pg_config["CONN_MAX_AGE"])
+        )
+
+        try:
+            yield
+        finally:
+            heartbeat_task.cancel()
+            self._is_listening = False
+            self._snapshot = None
+            # Like PgRenderLocker, don't try to .close(): terminate() can't
+            # be interrupted.
+            pg_connection.terminate()
+
+    async def _send_pg_heartbeats_forever(
+        self, pg_connection: asyncpg.Connection, interval: float
+    ) -> None:
+        """Keep the LISTEN connection alive; stop using snapshots if it dies."""
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                await pg_connection.fetchval(
+                    "SELECT 'module_registry_heartbeat'", timeout=interval
+                )
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception(
+                "Lost LISTEN connection; ModuleRegistry will query every time"
+            )
+            self._is_listening = False
+            self._snapshot = None
+
+    def _load_db_modules(self) -> Dict[ModuleId, DbModuleVersion]:
+        """Query the latest DbModuleVersion of each module, indexed by ID."""
+        # https://docs.djangoproject.com/en/2.2/ref/models/expressions/#subquery-expressions
+        latest = Subquery(
+            (
+                DbModuleVersion.objects.filter(id_name=OuterRef("id_name"))
+                .order_by("-last_update_time")
+                .values("id")
+            )[:1]
+        )
+        return {
+            m.id_name: m
+            for m in DbModuleVersion.objects.annotate(_latest=latest).filter(
+                id=F("_latest")
+            )
+        }
+
+    def _snapshot_db_modules(self) -> Dict[ModuleId, DbModuleVersion]:
+        """Return the snapshot; query the database if it is stale.
+
+        Only call this while `self._is_listening`.
+        """
+        snapshot = self._snapshot
+        generation = self._generation
+        if snapshot is not None and snapshot.generation == generation:
+            return snapshot.db_modules
+
+        # Read `generation` _before_ querying. If a NOTIFY arrives while we
+        # query, our snapshot will be stale and the next call will re-query.
+        db_modules = self._load_db_modules()
+        self._snapshot = _Snapshot(generation, db_modules)
+        return db_modules
 
     def latest(self, module_id: ModuleId) -> ModuleZipfile:
         """
@@ -54,11 +176,14 @@ class ModuleRegistry:
           file or a .yaml spec file.
         * ... and so on. `RuntimeError` is considered unrecoverable.
         """
-        db_module = (
-            DbModuleVersion.objects.filter(id_name=module_id)
-            .order_by("-last_update_time")
-            .first()
-        )
+        if self._is_listening:
+            db_module = self._snapshot_db_modules().get(module_id)
+        else:
+            db_module = (
+                DbModuleVersion.objects.filter(id_name=module_id)
+                .order_by("-last_update_time")
+                .first()
+            )
         if db_module is None:
             raise KeyError("No such module '%s'" % module_id)
         else:
@@ -66,19 +191,15 @@ class ModuleRegistry:
 
     def all_latest(self) -> Dict[str, ModuleZipfile]:
         """Return all modules, unordered, indexed by ID."""
-        # https://docs.djangoproject.com/en/2.2/ref/models/expressions/#subquery-expressions
-        latest = Subquery(
-            (
-                DbModuleVersion.objects.filter(id_name=OuterRef("id_name"))
-                .order_by("-last_update_time")
-                .values("id")
-            )[:1]
-        )
-        db_modules = list(
-            DbModuleVersion.objects.annotate(_latest=latest).filter(id=F("_latest"))
-        )
+        if self._is_listening:
+            db_modules = self._snapshot_db_modules()
+        else:
+            db_modules = self._load_db_modules()
 
-        return {m.id_name: self._download_or_reuse_zipfile(m) for m in db_modules}
+        return {
+            module_id: self._download_or_reuse_zipfile(db_module)
+            for module_id, db_module in db_modules.items()
+        }
 
     def _download_or_reuse_zipfile(self, db_module: DbModuleVersion) -> ModuleZipfile:
         """Ensure `self._cache` contains a `ModuleZipfile` for `db_module`, and return it.
@@ -137,6 +258,7 @@ class ModuleRegistry:
         This is great for unit tests. It isn't production-ready.
         """
         self._cache.clear()
+        self._snapshot = None
         for path in self.tempdir.glob("*.zip"):
             path.unlink()
 
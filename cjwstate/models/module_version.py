@@ -1,11 +1,14 @@
 from typing import Any
 from django.core.exceptions import ValidationError
-from django.db import models
-from django.db.models.signals import post_delete
+from django.db import connection, models
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from cjwstate import s3
 from cjwstate.modules.module_loader import validate_module_spec
 
+NOTIFY_CHANNEL = "module_version"
+"""Postgres channel we NOTIFY when a ModuleVersion is saved or deleted."""
+
 
 def _django_validate_module_spec(spec: Any) -> None:
     try:
@@ -66,3 +69,14 @@ def _delete_from_s3_post_delete(sender, instance, **kwargs):
     """
     prefix = "%s/%s/" % (sender.id_name, sender.source_version_hash)
     s3.remove_recursive(s3.ExternalModulesBucket, prefix)
+
+
+@receiver([post_save, post_delete], sender=ModuleVersion)
+def _notify_post_save_or_delete(sender, instance, **kwargs):
+    """
+    Tell ModuleRegistry snapshots (in all processes) to reload.
+
+    Postgres delivers the NOTIFY when the current transaction commits.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("NOTIFY " + NOTIFY_CHANNEL)
@@ -4,7 +4,7 @@ import secrets
 from typing import Any, Dict, List, Optional, Union
 from uuid import UUID
 
-from django.db import models
+from django.db import connection, models
 from django.db.models import Q
 
 from cjwkernel.types import TableMetadata
@@ -18,6 +18,25 @@ from .workflow import Workflow
 logger = logging.getLogger(__name__)
 
 
+AUTOFETCH_NOTIFY_CHANNEL = "step_autofetch"
+"""Postgres channel we NOTIFY when a Step's autofetch schedule may change.
+
+The payload is the Step ID. `cron.autoupdate` listens.
+"""
+
+
+def notify_autofetch_schedule_changed(step_id: int) -> None:
+    """Tell the autofetch scheduler to re-read the Step's `next_update`.
+
+    Call this after writing `auto_update_data`, `next_update` or `is_busy`.
+    Postgres delivers the NOTIFY when the current transaction commits.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_notify(%s, %s)", [AUTOFETCH_NOTIFY_CHANNEL, str(step_id)]
+        )
+
+
 class Step(models.Model):
     """An instance of a Module in a Tab."""
 
@@ -142,6 +161,29 @@ class Step(models.Model):
     cached_render_result_json = models.BinaryField(blank=True)
     cached_render_result_columns = ColumnsField(null=True, blank=True)
     cached_render_result_nrows = models.IntegerField(null=True, blank=True)
+    cached_render_result_hash = models.CharField(null=True, blank=True, max_length=64)
+    """Digest of the cached Parquet file, or None if there is no file.
+
+    It is also None for results cached before we computed digests.
+    """
+
+    cached_render_result_input_hash = models.CharField(
+        null=True, blank=True, max_length=64
+    )
+    """Digest of everything that went into render(), or None if unknown.
+
+    That's module version, params, input table, fetch result and tab name. If
+    a stale cached result's input hash matches a render we're about to start,
+    we can use the stale result instead of rendering.
+    """
+
+    cached_render_result_nonce = models.CharField(null=True, blank=True, max_length=16)
+    """Random string in the cached result's S3 keys, or None for old results.
+
+    Each render (and each copy of a result) gets a new nonce, so its keys are
+    new, too. A delete that another process queued for an older result's keys
+    can't clobber it.
+    """
 
     # TODO once we auto-compute stale module outputs, nix is_busy -- it will
     # be implied by the fact that the cached output revision is wrong.
@@ -320,7 +362,16 @@ class Step(models.Model):
         if cached_result is not None and self.tab.name == to_tab.name:
             # assuming file-copy succeeds, copy cached results.
             new_step.cached_render_result_delta_id = new_step.last_relevant_delta_id
-            for attr in ("status", "errors", "json", "columns", "nrows"):
+            for attr in (
+                "status",
+                "errors",
+                "json",
+                "columns",
+                "nrows",
+                "hash",
+                "input_hash",
+                "nonce",
+            ):
                 full_attr = f"cached_render_result_{attr}"
                 setattr(new_step, full_attr, getattr(self, full_attr))
 
@@ -330,22 +381,27 @@ class Step(models.Model):
             # CachedRenderResult, because all the DB values are set. It'll have
             # a .parquet_key ... but there won't be a file there (because we
             # never wrote it).
-            from cjwstate.rendercache.io import BUCKET, crr_parquet_key
-
-            old_parquet_key = crr_parquet_key(cached_result)
-            new_parquet_key = crr_parquet_key(new_step.cached_render_result)
+            from cjwstate.rendercache.io import (
+                BUCKET,
+                crr_column_stats_key,
+                crr_parquet_key,
+            )
 
-            try:
-                s3.copy(
-                    s3.CachedRenderResultsBucket,
-                    new_parquet_key,
-                    "%(Bucket)s/%(Key)s" % {"Bucket": BUCKET, "Key": old_parquet_key},
-                )
-            except s3.layer.error.NoSuchKey:
-                # DB and filesystem are out of sync. CachedRenderResult handles
-                # such cases gracefully. So `new_result` will behave exactly
-                # like `cached_result`.
-                pass
+            new_cached_result = new_step.cached_render_result
+            for key_fn in (crr_parquet_key, crr_column_stats_key):
+                try:
+                    s3.copy(
+                        s3.CachedRenderResultsBucket,
+                        key_fn(new_cached_result),
+                        "%(Bucket)s/%(Key)s"
+                        % {"Bucket": BUCKET, "Key": key_fn(cached_result)},
+                    )
+                except s3.layer.error.NoSuchKey:
+                    # DB and filesystem are out of sync. CachedRenderResult
+                    # handles such cases gracefully. So `new_result` will
+                    # behave exactly like `cached_result`. (And column stats
+                    # are optional.)
+                    pass
         else:
             new_step.save()
 
@@ -485,6 +541,9 @@ class Step(models.Model):
             errors=errors,
             json=json_dict,
             table_metadata=TableMetadata(nrows, columns),
+            hash=self.cached_render_result_hash,
+            input_hash=self.cached_render_result_input_hash,
+            nonce=self.cached_render_result_nonce,
         )
 
     def delete(self, *args, **kwargs):
@@ -1,6 +1,7 @@
 import datetime
 
 from django.db import models
+from django.db.models import F
 from django.db.models.signals import pre_delete
 from django.dispatch import receiver
 
@@ -9,11 +10,52 @@ from cjwstate import s3
 from .step import Step
 
 
+class StoredObjectBlob(models.Model):
+    """A file in s3.StoredObjectsBucket, shared by StoredObjects.
+
+    The key is "blobs/{hash}-{size}.dat": identical fetch results (in any
+    Step of any Workflow) share a single file. `n_references` counts the
+    StoredObjects that point to it.
+
+    When `n_references` drops to 0 we leave the file alone: the transaction
+    that dropped it may yet roll back. `cron.storedobjectblobdeleter` deletes
+    the file (and this row) later.
+    """
+
+    class Meta:
+        app_label = "server"
+        db_table = "stored_object_blob"
+        indexes = [
+            # for cron.storedobjectblobdeleter
+            models.Index(
+                fields=["key"],
+                name="stored_object_blob_orphans",
+                condition=models.Q(n_references=0),
+            )
+        ]
+
+    KEY_PREFIX = "blobs/"
+
+    key = models.CharField(max_length=255, primary_key=True)
+    size = models.IntegerField()
+    n_references = models.IntegerField()
+
+    @classmethod
+    def build_key(cls, file_hash: str, size: int) -> str:
+        return f"{cls.KEY_PREFIX}{file_hash}-{size}.dat"
+
+    @classmethod
+    def is_blob_key(cls, key: str) -> bool:
+        return key.startswith(cls.KEY_PREFIX)
+
+
 class StoredObject(models.Model):
     """EVIL way of storing fetch results.
 
-    StoredObject links to an S3 key in s3.StoredObjectsBucket. The key must
-    adhere to the format: "{workflow_id}/{step_id}/{uuidv1()}"
+    StoredObject links to an S3 key in s3.StoredObjectsBucket. Newer keys point
+    to a `StoredObjectBlob`. Older keys adhere to the format:
+    "{workflow_id}/{step_id}/{uuidv1()}"; each older file belongs to a single
+    StoredObject.
 
     TODO store fetch results as fetches.
     """
@@ -39,8 +81,18 @@ class StoredObject(models.Model):
     # and delivered to the frontend
     read = models.BooleanField(default=False)
 
-    # make a deep copy for another Step
+    # make a copy for another Step
     def duplicate(self, to_step):
+        if StoredObjectBlob.is_blob_key(self.key):
+            # Share the file. `self` references the blob, so no one can
+            # delete it while we add our reference.
+            StoredObjectBlob.objects.filter(key=self.key).update(
+                n_references=F("n_references") + 1
+            )
+            return to_step.stored_objects.create(
+                stored_at=self.stored_at, hash=self.hash, key=self.key, size=self.size
+            )
+
         basename = self.key.split("/")[-1]
         key = f"{to_step.workflow_id}/{to_step.id}/{basename}"
         s3.copy(s3.StoredObjectsBucket, key, f"{s3.StoredObjectsBucket}/{self.key}")
@@ -58,6 +110,13 @@ def _delete_from_s3_pre_delete(sender, instance, **kwargs):
     _gone_, completely, forever -- that's what "delete" means to the user. If
     deletion fails, we need the link to remain in our database -- that's how
     the user will know it isn't deleted.
+
+    Blobs are shared, so we only drop our reference to them. (If there are no
+    other references, `cron.storedobjectblobdeleter` will delete the file.)
     """
-    if instance.key:
+    if StoredObjectBlob.is_blob_key(instance.key):
+        StoredObjectBlob.objects.filter(key=instance.key).update(
+            n_references=F("n_references") - 1
+        )
+    elif instance.key:
         s3.remove(s3.StoredObjectsBucket, instance.key)
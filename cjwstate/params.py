@@ -1,6 +1,6 @@
 import logging
 import time
-from typing import Any, Dict
+from typing import Any, Dict, List
 from cjwkernel.errors import ModuleError
 from cjwstate.models import Step
 from cjwstate.models.module_registry import MODULE_REGISTRY
@@ -41,13 +41,7 @@ def get_migrated_params(
         # raise KeyError
         module_zipfile = MODULE_REGISTRY.latest(step.module_id_name)
 
-    stale = (
-        module_zipfile.version == "develop"
-        # works if cached version (and thus cached _result_) is None
-        or module_zipfile.version != step.cached_migrated_params_module_version
-    )
-
-    if not stale:
+    if not are_cached_migrated_params_stale(step, module_zipfile):
         return step.cached_migrated_params
     else:
         # raise ModuleError
@@ -68,6 +62,19 @@ def get_migrated_params(
         return params
 
 
+def are_cached_migrated_params_stale(step: Step, module_zipfile: ModuleZipfile) -> bool:
+    """Return True if `step.cached_migrated_params` can't be used as-is.
+
+    "develop" modules' params are always stale: their code may change at any
+    time without a version change.
+    """
+    return (
+        module_zipfile.version == "develop"
+        # works if cached version (and thus cached _result_) is None
+        or module_zipfile.version != step.cached_migrated_params_module_version
+    )
+
+
 def invoke_migrate_params(
     module_zipfile: ModuleZipfile, raw_params: Dict[str, Any]
 ) -> Dict[str, Any]:
@@ -102,3 +109,45 @@ def invoke_migrate_params(
             status,
             int((time2 - time1) * 1000),
         )
+
+
+def invoke_migrate_params_batch(
+    module_zipfile: ModuleZipfile, raw_params_list: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """Call module `migrate_params()` on each of `raw_params_list`.
+
+    This spawns one kernel child in total, rather than one per params dict.
+
+    Raise ModuleError if module code did not execute for any element. (Retry
+    with `invoke_migrate_params()` to find which one.)
+
+    As with `invoke_migrate_params()`, results may not be valid.
+
+    Log the outcome. Don't log ModuleError details: callers should retry, and
+    the retry will log them.
+    """
+    time1 = time.time()
+    logger.info(
+        "%s:migrate_params() x%d begin",
+        module_zipfile.path.name,
+        len(raw_params_list),
+    )
+    status = "???"
+    try:
+        result = cjwstate.modules.kernel.migrate_params_batch(
+            module_zipfile.compile_code_without_executing(), raw_params_list
+        )  # raise ModuleError
+        status = "ok"
+        return result
+    except ModuleError as err:
+        status = type(err).__name__
+        raise
+    finally:
+        time2 = time.time()
+        logger.info(
+            "%s:migrate_params() x%d => %s in %dms",
+            module_zipfile.path.name,
+            len(raw_params_list),
+            status,
+            int((time2 - time1) * 1000),
+        )
@@ -32,6 +32,24 @@ logger = logging.getLogger(__name__)
 
 
 Render = "render"
+"""Queue of renders somebody is waiting for: e.g., after an edit."""
+
+RenderAutofetch = "render-autofetch"
+"""Queue of renders nobody asked for: e.g., after a scheduled fetch.
+
+Every hour, cron-scheduled fetches queue thousands of these at once. They
+have their own queue so they don't delay the renders in `Render`.
+"""
+
+RenderBulk = "render-bulk"
+"""Queue of renders for API clients and admin tasks.
+
+These come in bursts, too; they may wait behind everything else.
+"""
+
+RenderQueues = [Render, RenderAutofetch, RenderBulk]
+"""All render queues, most urgent first. The renderer consumes them all."""
+
 Fetch = "fetch"
 
 
@@ -89,24 +107,32 @@ async def _get_connection_async():
     return ret
 
 
-async def queue_render(workflow_id: int, delta_id: int) -> None:
+async def queue_render(workflow_id: int, delta_id: int, *, queue: str = Render) -> None:
     """
     Queue render in RabbitMQ.
 
     Spurious renders are fine: these messages are tiny, and renderers ignore
     them gracefully.
 
+    `queue` is one of `RenderQueues`. The renderer favors renders in `Render`.
+
     Start and cache a RetryingConnection on the current event loop if there
     isn't one already. (`loop.close()` will be monkey-patched to disconnect.)
     """
     connection = await _get_connection_async()
-    await connection.publish("render", dict(workflow_id=workflow_id, delta_id=delta_id))
+    await connection.publish(queue, dict(workflow_id=workflow_id, delta_id=delta_id))
 
 
-async def queue_fetch(workflow_id: int, step_id: int) -> None:
+async def queue_fetch(
+    workflow_id: int, step_id: int, *, render_queue: str = Render
+) -> None:
     """
     Queue fetch in RabbitMQ.
 
+    If the fetch finds new data, the fetcher queues a render on `render_queue`.
+    Cron passes `RenderAutofetch`. When a user clicks "Update", the default,
+    `Render`, is right: the user is waiting.
+
     The fetcher will set is_busy=False when fetch is complete. Spurious fetches
     may make the is_busy flag flicker, but if the user goes away we're
     guaranteed that the fetcher will have the last word and is_busy will be
@@ -120,7 +146,10 @@ async def queue_fetch(workflow_id: int, step_id: int) -> None:
     isn't one already. (`loop.close()` will be monkey-patched to disconnect.)
     """
     connection = await _get_connection_async()
-    await connection.publish("fetch", dict(workflow_id=workflow_id, step_id=step_id))
+    await connection.publish(
+        "fetch",
+        dict(workflow_id=workflow_id, step_id=step_id, render_queue=render_queue),
+    )
 
 
 async def _queue_for_group(*, workflow_id: int, **kwargs) -> None:
@@ -174,13 +203,13 @@ async def send_update_to_workflow_clients(
 
 
 async def queue_render_if_consumers_are_listening(
-    workflow_id: int, delta_id: int
+    workflow_id: int, delta_id: int, *, queue: str = Render
 ) -> None:
     """
     Tell workflow consumers to call `queue_render(workflow_id, delta_id)`.
 
     In other words: "queue a render, but only if somebody has this workflow
-    open in a web browser."
+    open in a web browser." Consumers queue it on `queue`.
 
     Django Channels will call Websockets consumers' `queue_render()` method.
     Each consumer will (presumably) call `cjwstate.rabbitmq.queue_render()`.
@@ -202,5 +231,8 @@ async def queue_render_if_consumers_are_listening(
     browser", the user probably won't notice that we drop the message.
     """
     await _queue_for_group(
-        workflow_id=workflow_id, type="queue_render", delta_id=delta_id
+        workflow_id=workflow_id,
+        type="queue_render",
+        delta_id=delta_id,
+        queue=queue,
     )
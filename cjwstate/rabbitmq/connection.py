@@ -23,6 +23,9 @@ class DeclaredQueueConsume(NamedTuple):
     callback: Callable[[Any], Awaitable[None]]
     """Function to run on every queue element."""
 
+    prefetch_count: int
+    """Maximum number of un-acked elements `callback` may be handling at once."""
+
 
 class RetryingConnection:
     """A connection that will retry connecting.
@@ -129,9 +132,11 @@ class RetryingConnection:
                 # actual channel. https://www.rabbitmq.com/consumer-prefetch.html
                 #
                 # leave prefetch_size at its default, 0: "no octet-size limit"
-                await channel.basic_qos(prefetch_count=1)
+                await channel.basic_qos(prefetch_count=queue.prefetch_count)
 
-                # call `callback` for every message. It must ack.
+                # call `callback` for every message. It must ack. aiormq runs
+                # each callback in its own task, so up to `prefetch_count`
+                # callbacks run concurrently.
                 await channel.basic_consume(queue.name, queue.callback)
             except AMQPConnectionError:
                 logger.exception()
@@ -169,15 +174,22 @@ class RetryingConnection:
             pass
 
     def declare_queue_consume(
-        self, queue: str, callback: Callable[[Any], Awaitable[None]]
+        self,
+        queue: str,
+        callback: Callable[[Any], Awaitable[None]],
+        prefetch_count: int = 1,
     ) -> None:
         """Declare a queue to be consumed after connect.
 
+        `callback` will be called on up to `prefetch_count` messages at once.
+
         Call this only during initialization. Do not call it after connect.
 
         (This is used on fetcher/renderer.)
         """
-        self._declared_queues.append(DeclaredQueueConsume(queue, callback))
+        self._declared_queues.append(
+            DeclaredQueueConsume(queue, callback, prefetch_count)
+        )
 
     async def publish(
         self, queue: str, message: Dict[str, Any], *, exchange: str = ""
@@ -1,19 +1,45 @@
 from cjwstate.models.cached_render_result import CachedRenderResult
 from .io import (
     cache_render_result,
+    commit_staged_render_result,
+    discard_cached_render_result_export,
+    discard_staged_render_result,
+    download_parquet_file_async,
     downloaded_parquet_file,
     load_cached_render_result,
     open_cached_render_result,
+    open_cached_render_result_export,
+    read_cached_render_result_column_stats,
+    read_cached_render_result_slice_as_rows,
     read_cached_render_result_slice_as_text,
+    stage_cached_render_result_copy,
+    stage_render_result,
+    stage_render_result_async,
+    store_cached_render_result_export,
+    streamed_cached_render_result_as_text,
     CorruptCacheError,
+    StagedRenderResult,
 )
 
 __all__ = (
     "CachedRenderResult",
     "CorruptCacheError",
+    "StagedRenderResult",
     "cache_render_result",
+    "commit_staged_render_result",
+    "discard_cached_render_result_export",
+    "discard_staged_render_result",
+    "download_parquet_file_async",
     "downloaded_parquet_file",
     "load_cached_render_result",
     "open_cached_render_result",
+    "open_cached_render_result_export",
+    "read_cached_render_result_column_stats",
+    "read_cached_render_result_slice_as_rows",
     "read_cached_render_result_slice_as_text",
+    "stage_cached_render_result_copy",
+    "stage_render_result",
+    "stage_render_result_async",
+    "store_cached_render_result_export",
+    "streamed_cached_render_result_as_text",
 )
@@ -0,0 +1,126 @@
+import json
+import math
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import pyarrow
+import pyarrow.compute
+
+from .jsonformat import format_timestamp
+
+
+MaxNValueCounts = 10000
+"""Maximum number of distinct values we count per text column.
+
+Past this, `ColumnStats.value_counts` is `None`: callers that need counts must
+scan the table themselves.
+"""
+
+
+class ColumnStats(NamedTuple):
+    """Summary of a column's values, computed when we cache a render result."""
+
+    n_nulls: int
+
+    n_distinct: int
+    """Number of distinct non-null values."""
+
+    min: Optional[Any] = None
+    """Smallest number or timestamp (as an ISO8601 string); None for text."""
+
+    max: Optional[Any] = None
+    """Largest number or timestamp (as an ISO8601 string); None for text."""
+
+    value_counts: Optional[Dict[str, int]] = None
+    """Count of each non-null text value.
+
+    None if the column is not text or has more than `MaxNValueCounts` distinct
+    values.
+    """
+
+
+def _is_text(dtype: pyarrow.DataType) -> bool:
+    return pyarrow.types.is_string(dtype) or pyarrow.types.is_dictionary(dtype)
+
+
+def _text_column_stats(chunked_array: pyarrow.ChunkedArray) -> ColumnStats:
+    if chunked_array.num_chunks == 0:
+        value_counts = {}
+    else:
+        pyarrow_value_counts = chunked_array.value_counts()
+        # values can be either a StringArray or a DictionaryArray. In either
+        # case, .to_pylist() converts to a Python List[str].
+        values = pyarrow_value_counts.field("values").to_pylist()
+        counts = pyarrow_value_counts.field("counts").to_pylist()
+        value_counts = {v: c for v, c in zip(values, counts) if v is not None}
+
+    n_distinct = len(value_counts)
+    return ColumnStats(
+        n_nulls=chunked_array.null_count,
+        n_distinct=n_distinct,
+        value_counts=value_counts if n_distinct <= MaxNValueCounts else None,
+    )
+
+
+def _min_max(chunked_array: pyarrow.ChunkedArray):
+    if chunked_array.num_chunks == 0:
+        return None, None
+    dtype = chunked_array.type
+    if pyarrow.types.is_timestamp(dtype):
+        min_max = pyarrow.compute.min_max(chunked_array.cast(pyarrow.int64())).as_py()
+        return tuple(
+            None if v is None else format_timestamp(v, dtype.unit)
+            for v in (min_max["min"], min_max["max"])
+        )
+    else:
+        min_max = pyarrow.compute.min_max(chunked_array).as_py()
+        return tuple(
+            None if v is None or (isinstance(v, float) and not math.isfinite(v)) else v
+            for v in (min_max["min"], min_max["max"])
+        )
+
+
+def _number_or_timestamp_column_stats(
+    chunked_array: pyarrow.ChunkedArray,
+) -> ColumnStats:
+    unique = chunked_array.unique()
+    min_value, max_value = _min_max(chunked_array)
+    return ColumnStats(
+        n_nulls=chunked_array.null_count,
+        n_distinct=len(unique) - unique.null_count,
+        min=min_value,
+        max=max_value,
+    )
+
+
+def compute_column_stats(table: pyarrow.Table) -> List[ColumnStats]:
+    """Summarize each column of `table`, in order.
+
+    This scans every value. Call it once, when caching a render result.
+    """
+    ret = []
+    for column in table.columns:
+        if _is_text(column.type):
+            ret.append(_text_column_stats(column))
+        else:
+            ret.append(_number_or_timestamp_column_stats(column))
+    return ret
+
+
+def column_stats_to_json_bytes(column_stats: List[ColumnStats]) -> bytes:
+    return json.dumps(
+        [stats._asdict() for stats in column_stats],
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def column_stats_from_json_bytes(data: bytes) -> List[ColumnStats]:
+    """Parse the output of `column_stats_to_json_bytes()`.
+
+    Raise ValueError if `data` is not valid.
+    """
+    try:
+        return [ColumnStats(**d) for d in json.loads(data)]
+    except (TypeError, AttributeError) as err:
+        raise ValueError("Invalid column stats") from err
@@ -1,12 +1,38 @@
+import asyncio
 import contextlib
+import io
 from pathlib import Path
-from typing import ContextManager
+import secrets
+from typing import (
+    Any,
+    ContextManager,
+    Iterator,
+    List,
+    Literal,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
 import cjwparquet
 import pyarrow
+import pyarrow.parquet
 from cjwkernel.types import ArrowTable, RenderResult, TableMetadata
 from cjwkernel.util import json_encode, tempfile_context
 from cjwstate import s3
 from cjwstate.models import Step, Workflow, CachedRenderResult
+from cjwstate.util import hash_file
+from .columnstats import (
+    ColumnStats,
+    column_stats_from_json_bytes,
+    column_stats_to_json_bytes,
+    compute_column_stats,
+)
+from .jsonformat import chunked_array_to_json_values
+from . import rowgroups
+from .localcache import LOCAL_CACHE
+from .rowgroups import FOOTER_CACHE, read_parquet_footer, read_row_range, write_parquet
+from .tablecache import TABLE_CACHE
+from .textstream import iter_parquet_file_as_text
 
 
 BUCKET = s3.CachedRenderResultsBucket
@@ -19,6 +45,9 @@ STEP_FIELDS = [
     "cached_render_result_columns",
     "cached_render_result_status",
     "cached_render_result_nrows",
+    "cached_render_result_hash",
+    "cached_render_result_input_hash",
+    "cached_render_result_nonce",
 ]
 
 
@@ -35,34 +64,228 @@ def parquet_prefix(workflow_id: int, step_id: int) -> str:
     return "wf-%d/wfm-%d/" % (workflow_id, step_id)
 
 
-def parquet_key(workflow_id: int, step_id: int, delta_id: int) -> str:
+def _new_nonce() -> str:
+    """Random string for a new result's keys. See `parquet_key()`."""
+    return secrets.token_hex(8)
+
+
+def _key_stem(
+    workflow_id: int, step_id: int, delta_id: int, nonce: Optional[str]
+) -> str:
+    if nonce is None:
+        # Cached before we used nonces
+        return "%sdelta-%d" % (parquet_prefix(workflow_id, step_id), delta_id)
+    else:
+        return "%sdelta-%d-%s" % (parquet_prefix(workflow_id, step_id), delta_id, nonce)
+
+
+def parquet_key(
+    workflow_id: int, step_id: int, delta_id: int, nonce: Optional[str]
+) -> str:
     """
     Path to a file, where the specified result should be saved.
+
+    Each render writes a new `nonce`, so we never write a key twice. That
+    matters because we delete stale keys in the background, and renders of
+    one step can run in different processes: a delete one process queued for
+    a stale result must not clobber the same delta's result, rendered again
+    elsewhere.
     """
-    return "%sdelta-%d.dat" % (parquet_prefix(workflow_id, step_id), delta_id)
+    return _key_stem(workflow_id, step_id, delta_id, nonce) + ".dat"
 
 
 def crr_parquet_key(crr: CachedRenderResult) -> str:
-    return parquet_key(crr.workflow_id, crr.step_id, crr.delta_id)
+    return parquet_key(crr.workflow_id, crr.step_id, crr.delta_id, crr.nonce)
 
 
-def cache_render_result(
-    workflow: Workflow, step: Step, delta_id: int, result: RenderResult
-) -> None:
-    """Save `result` for later viewing.
+def column_stats_key(
+    workflow_id: int, step_id: int, delta_id: int, nonce: Optional[str]
+) -> str:
+    """
+    Path to a file, where the specified result's column stats should be saved.
 
-    Raise AssertionError if `delta_id` is not what we expect.
+    It's a "sidecar" next to `parquet_key()`, under the same prefix.
+    """
+    return _key_stem(workflow_id, step_id, delta_id, nonce) + ".stats.json"
+
+
+def crr_column_stats_key(crr: CachedRenderResult) -> str:
+    return column_stats_key(crr.workflow_id, crr.step_id, crr.delta_id, crr.nonce)
+
+
+def export_key(
+    workflow_id: int,
+    step_id: int,
+    delta_id: int,
+    nonce: Optional[str],
+    file_hash: str,
+    format: Literal["csv", "json"],
+) -> str:
+    """
+    Path to a file, where the specified result's CSV or JSON export is saved.
+
+    It's a "sidecar" next to `parquet_key()`, under the same prefix. The key
+    includes the Parquet file's hash, so a re-render of the same delta (which
+    may produce a different table) never serves an old export.
+    """
+    return "%s.%s.%s" % (
+        _key_stem(workflow_id, step_id, delta_id, nonce),
+        file_hash,
+        format,
+    )
 
-    Since this alters data, be sure to call it within a lock:
+
+def crr_export_key(crr: CachedRenderResult, format: Literal["csv", "json"]) -> str:
+    return export_key(
+        crr.workflow_id, crr.step_id, crr.delta_id, crr.nonce, crr.hash, format
+    )
+
+
+def _crr_keys(crr: Optional[CachedRenderResult]) -> List[str]:
+    """All files we may have stored for `crr`: Parquet, stats and exports."""
+    if crr is None or not crr.table_metadata.columns:
+        return []  # zero-column tables aren't written to cache
+    keys = [crr_parquet_key(crr), crr_column_stats_key(crr)]
+    if crr.hash is not None:
+        keys += [crr_export_key(crr, format) for format in ("csv", "json")]
+    return keys
+
+
+class StagedRenderResult(NamedTuple):
+    """A render result on S3 that the database does not point to (yet).
+
+    Build it with `stage_render_result()`, outside of any lock. Then call
+    either `commit_staged_render_result()` (within a lock) or
+    `discard_staged_render_result()`.
+    """
+
+    workflow_id: int
+    step_id: int
+    delta_id: int
+    result: RenderResult
+    hash: Optional[str]
+    """Digest of the uploaded Parquet file; None if there is no table."""
+
+    input_hash: Optional[str]
+
+    nonce: Optional[str]
+    """Part of the uploaded files' keys; None if there is no table."""
+
+
+def _encode_render_result(
+    result: RenderResult, parquet_path: Path
+) -> Tuple[str, bytes]:
+    """Write `result`'s table to `parquet_path`; return its hash and stats JSON."""
+    write_parquet(parquet_path, result.table.table)
+    file_hash = hash_file(parquet_path)
+    column_stats = compute_column_stats(result.table.table)
+    return file_hash, column_stats_to_json_bytes(column_stats)
+
+
+def stage_render_result(
+    workflow_id: int,
+    step_id: int,
+    delta_id: int,
+    result: RenderResult,
+    parquet_path: Path,
+    input_hash: Optional[str] = None,
+) -> StagedRenderResult:
+    """Write `result` to `parquet_path` and upload it, without a lock.
+
+    This is the slow part of caching a render result: it encodes Parquet,
+    computes column stats and uploads both. It does not touch the database.
+    Nobody reads the uploaded files until `commit_staged_render_result()`
+    points the database at them: their keys include a new nonce.
+
+    `parquet_path` is left empty if `result` has no table.
+
+    `input_hash` is a digest of the render() inputs that produced `result`, if
+    the caller knows it. See `stage_cached_render_result_copy()`.
+    """
+    assert result is not None
+
+    if not result.table.metadata.columns:  # only write non-zero-column tables
+        return StagedRenderResult(
+            workflow_id, step_id, delta_id, result, None, input_hash, None
+        )
+
+    file_hash, column_stats_json = _encode_render_result(result, parquet_path)
+    nonce = _new_nonce()
+    # Column stats are optional: readers fall back to scanning the table when
+    # they're missing. So write them before the Parquet file.
+    s3.put_bytes(
+        BUCKET,
+        column_stats_key(workflow_id, step_id, delta_id, nonce),
+        column_stats_json,
+    )
+    s3.fput_file(
+        BUCKET, parquet_key(workflow_id, step_id, delta_id, nonce), parquet_path
+    )
+    return StagedRenderResult(
+        workflow_id, step_id, delta_id, result, file_hash, input_hash, nonce
+    )
+
+
+async def stage_render_result_async(
+    workflow_id: int,
+    step_id: int,
+    delta_id: int,
+    result: RenderResult,
+    parquet_path: Path,
+    input_hash: Optional[str] = None,
+) -> StagedRenderResult:
+    """Like `stage_render_result()`, without blocking the event loop.
+
+    Encoding runs on the default executor. Uploads use `s3.*_async()`, so
+    they wait for one of the process's `S3_N_CONCURRENT_TRANSFERS` threads.
+    """
+    assert result is not None
+
+    if not result.table.metadata.columns:  # only write non-zero-column tables
+        return StagedRenderResult(
+            workflow_id, step_id, delta_id, result, None, input_hash, None
+        )
+
+    loop = asyncio.get_running_loop()
+    file_hash, column_stats_json = await loop.run_in_executor(
+        None, _encode_render_result, result, parquet_path
+    )
+    nonce = _new_nonce()
+    # Stats before Parquet, as in stage_render_result()
+    await s3.put_bytes_async(
+        BUCKET,
+        column_stats_key(workflow_id, step_id, delta_id, nonce),
+        column_stats_json,
+    )
+    await s3.fput_file_async(
+        BUCKET, parquet_key(workflow_id, step_id, delta_id, nonce), parquet_path
+    )
+    return StagedRenderResult(
+        workflow_id, step_id, delta_id, result, file_hash, input_hash, nonce
+    )
+
+
+def commit_staged_render_result(step: Step, staged: StagedRenderResult) -> None:
+    """Point `step`'s cached render result at `staged`.
+
+    Raise AssertionError if `staged.delta_id` is not what we expect.
+
+    This only writes to the database, so it is quick. Since it alters data, be
+    sure to call it within a lock:
 
         with workflow.cooperative_lock():
             step.refresh_from_db()  # may change delta_id
-            cache_render_result(workflow, step, delta_id, result)
+            commit_staged_render_result(step, staged)
+
+    The database won't point to the previous result's files any more: we
+    queue them on `s3.background_remover` instead of waiting for S3. (Their
+    keys have a different nonce than `staged`'s, so the delete can't clobber
+    `staged`.)
     """
-    assert delta_id == step.last_relevant_delta_id
-    assert result is not None
+    assert staged.delta_id == step.last_relevant_delta_id
+    result = staged.result
+    old_keys = _crr_keys(step.cached_render_result)
 
-    json_bytes = json_encode(result.json).encode("utf-8")
     if not result.table.metadata.columns:
         if result.errors:
             status = "error"
@@ -71,23 +294,128 @@ def cache_render_result(
     else:
         status = "ok"
 
-    step.cached_render_result_delta_id = delta_id
+    step.cached_render_result_delta_id = staged.delta_id
     step.cached_render_result_errors = result.errors
     step.cached_render_result_status = status
-    step.cached_render_result_json = json_bytes
+    step.cached_render_result_json = json_encode(result.json).encode("utf-8")
     step.cached_render_result_columns = result.table.metadata.columns
     step.cached_render_result_nrows = result.table.metadata.n_rows
+    step.cached_render_result_hash = staged.hash
+    step.cached_render_result_input_hash = staged.input_hash
+    step.cached_render_result_nonce = staged.nonce
+    step.save(update_fields=STEP_FIELDS)
+
+    new_keys = _crr_keys(step.cached_render_result)
+    old_keys = [key for key in old_keys if key not in new_keys]
+    for key in old_keys:
+        LOCAL_CACHE.discard(BUCKET, key)
+    s3.background_remover.remove_many(BUCKET, old_keys)
+
+
+def discard_staged_render_result(staged: StagedRenderResult) -> None:
+    """Delete `staged`'s files, in the background.
+
+    Call this when the caller can't commit `staged` -- for instance, because
+    the step changed while we staged it.
+    """
+    if staged.nonce is None:
+        return  # we uploaded nothing
+    s3.background_remover.remove_many(
+        BUCKET,
+        [
+            parquet_key(
+                staged.workflow_id, staged.step_id, staged.delta_id, staged.nonce
+            ),
+            column_stats_key(
+                staged.workflow_id, staged.step_id, staged.delta_id, staged.nonce
+            ),
+        ],
+    )
+
+
+def cache_render_result(
+    workflow: Workflow,
+    step: Step,
+    delta_id: int,
+    result: RenderResult,
+    input_hash: Optional[str] = None,
+) -> None:
+    """Save `result` for later viewing.
+
+    Raise AssertionError if `delta_id` is not what we expect.
 
-    # Now we get to the part where things can end up inconsistent. Try to
-    # err on the side of not-caching when that happens.
-    delete_parquet_files_for_step(workflow.id, step.id)  # makes old cache inconsistent
-    step.save(update_fields=STEP_FIELDS)  # makes new cache inconsistent
-    if result.table.metadata.columns:  # only write non-zero-column tables
-        with tempfile_context() as parquet_path:
-            cjwparquet.write(parquet_path, result.table.table)
-            s3.fput_file(
-                BUCKET, parquet_key(workflow.id, step.id, delta_id), parquet_path
-            )  # makes new cache consistent
+    This stages and commits in one go. Since this alters data, be sure to call
+    it within a lock:
+
+        with workflow.cooperative_lock():
+            step.refresh_from_db()  # may change delta_id
+            cache_render_result(workflow, step, delta_id, result)
+
+    Callers that care about lock contention should call
+    `stage_render_result()` _before_ taking the lock and only call
+    `commit_staged_render_result()` within it.
+    """
+    assert delta_id == step.last_relevant_delta_id
+
+    with tempfile_context(prefix="render-result-", suffix=".parquet") as path:
+        staged = stage_render_result(
+            workflow.id, step.id, delta_id, result, path, input_hash
+        )
+        try:
+            commit_staged_render_result(step, staged)
+        except BaseException:
+            discard_staged_render_result(staged)
+            raise
+
+
+def stage_cached_render_result_copy(
+    crr: CachedRenderResult, delta_id: int, result: RenderResult
+) -> StagedRenderResult:
+    """Copy `crr`'s files to new keys for `delta_id`, without a lock.
+
+    Call this instead of rendering when the caller knows rendering would
+    produce the same result: for instance, when a stale result's
+    `input_hash` matches the inputs of the render the caller was about to
+    start. `result` is `crr`, loaded (e.g., by `load_cached_render_result()`).
+
+    Like `stage_render_result()`, this only touches S3. Then call either
+    `commit_staged_render_result()` (within a lock, after checking `crr` is
+    still the step's stale result) or `discard_staged_render_result()`.
+
+    Raise CorruptCacheError if the cached Parquet file is missing.
+    """
+    if not crr.table_metadata.columns:
+        # Zero-column tables aren't written to cache
+        return StagedRenderResult(
+            crr.workflow_id, crr.step_id, delta_id, result, None, crr.input_hash, None
+        )
+
+    nonce = _new_nonce()
+    try:
+        s3.copy(
+            BUCKET,
+            parquet_key(crr.workflow_id, crr.step_id, delta_id, nonce),
+            "%s/%s" % (BUCKET, crr_parquet_key(crr)),
+        )
+    except s3.layer.error.NoSuchKey:
+        raise CorruptCacheError
+    try:
+        s3.copy(
+            BUCKET,
+            column_stats_key(crr.workflow_id, crr.step_id, delta_id, nonce),
+            "%s/%s" % (BUCKET, crr_column_stats_key(crr)),
+        )
+    except s3.layer.error.NoSuchKey:
+        pass  # the result predates column stats
+    return StagedRenderResult(
+        crr.workflow_id,
+        crr.step_id,
+        delta_id,
+        result,
+        crr.hash,
+        crr.input_hash,
+        nonce,
+    )
 
 
 @contextlib.contextmanager
@@ -97,6 +425,11 @@ def downloaded_parquet_file(crr: CachedRenderResult, dir=None) -> ContextManager
     This is cheaper than open_cached_render_result() because it does not parse
     the file. Use this function when you suspect you won't need the table data.
 
+    Unless you pass `dir`, the yielded file is a read-only copy from
+    `LOCAL_CACHE`: recently-read files aren't downloaded again. Pass `dir` to
+    download a private copy into `dir` instead (e.g., so a module can read it
+    from within a chroot).
+
     Raise CorruptCacheError if the cached data is missing.
 
     Usage:
@@ -109,15 +442,51 @@ def downloaded_parquet_file(crr: CachedRenderResult, dir=None) -> ContextManager
     """
     with contextlib.ExitStack() as ctx:
         try:
-            path = ctx.enter_context(
-                s3.temporarily_download(BUCKET, crr_parquet_key(crr), dir=dir)
-            )
+            if dir is None:
+                path = ctx.enter_context(
+                    LOCAL_CACHE.downloaded_file(BUCKET, crr_parquet_key(crr))
+                )
+            else:
+                path = ctx.enter_context(
+                    s3.temporarily_download(BUCKET, crr_parquet_key(crr), dir=dir)
+                )
         except FileNotFoundError:
             raise CorruptCacheError
 
         yield path
 
 
+async def download_parquet_file_async(crr: CachedRenderResult, path: Path) -> None:
+    """Download `crr`'s Parquet file to `path`, without blocking the event loop.
+
+    Unlike `downloaded_parquet_file()`, this skips `LOCAL_CACHE`: it's for
+    asyncio callers that want a private copy. The download waits for one of
+    the process's `S3_N_CONCURRENT_TRANSFERS` threads.
+
+    Raise CorruptCacheError if the cached data is missing.
+    """
+    try:
+        await s3.download_async(BUCKET, crr_parquet_key(crr), path)
+    except FileNotFoundError:
+        raise CorruptCacheError
+
+
+def _write_arrow_file(crr: CachedRenderResult, path: Path) -> None:
+    """Convert the cached Parquet file for `crr` to an Arrow file at `path`.
+
+    Raise CorruptCacheError if the Parquet file is missing or corrupt.
+    """
+    # raises CorruptCacheError
+    with downloaded_parquet_file(crr) as parquet_path:
+        try:
+            # raises ArrowException or OSError
+            rowgroups.convert_parquet_file_to_arrow_file(parquet_path, path)
+        except (pyarrow.ArrowException, OSError) as err:
+            # Maybe S3 holds a valid file now; don't keep a bad local copy
+            LOCAL_CACHE.discard(BUCKET, crr_parquet_key(crr))
+            raise CorruptCacheError from err
+
+
 def load_cached_render_result(crr: CachedRenderResult, path: Path) -> RenderResult:
     """Return a RenderResult equivalent to the one passed to `cache_render_result()`.
 
@@ -144,13 +513,7 @@ def load_cached_render_result(crr: CachedRenderResult, path: Path) -> RenderResu
             crr.json,
         )
 
-    # raises CorruptCacheError
-    with downloaded_parquet_file(crr) as parquet_path:
-        try:
-            # raises ArrowIOError
-            cjwparquet.convert_parquet_file_to_arrow_file(parquet_path, path)
-        except pyarrow.ArrowIOError as err:
-            raise CorruptCacheError from err
+    _write_arrow_file(crr, path)  # raise CorruptCacheError
     # TODO handle validation errors => CorruptCacheError
     arrow_table = ArrowTable.from_trusted_file(path, crr.table_metadata)
     return RenderResult(arrow_table, crr.errors, crr.json)
@@ -227,19 +590,223 @@ def read_cached_render_result_slice_as_text(
                 only_rows=only_rows,
             )
     except (pyarrow.ArrowIOError, FileNotFoundError):  # FIXME unit-test
+        LOCAL_CACHE.discard(BUCKET, crr_parquet_key(crr))
         raise CorruptCacheError
 
 
+def read_cached_render_result_slice_as_rows(
+    crr: CachedRenderResult, only_columns: range, only_rows: range
+) -> List[List[Any]]:
+    """Return JSON-ready rows: `[[col0, col1, ...], ...]`.
+
+    Ignore out-of-range rows and columns.
+
+    Raise CorruptCacheError if the cached data does not match `crr`. (See
+    `read_cached_render_result_slice_as_text()`.)
+
+    Values are formatted the way `parquet-to-text-stream` formats JSON. Unlike
+    `read_cached_render_result_slice_as_text()`, this never downloads a big
+    table: see `_read_column_slices()`.
+    """
+    if not crr.table_metadata.columns:
+        # Zero-column tables aren't written to cache
+        return []
+
+    column_indices = range(len(crr.table_metadata.columns))[
+        only_columns.start : only_columns.stop : only_columns.step
+    ]
+    row_indices = range(crr.table_metadata.n_rows)[only_rows.start : only_rows.stop]
+    if not column_indices or not row_indices:
+        return []
+    # raise CorruptCacheError
+    column_slices = _read_column_slices(crr, column_indices, row_indices)
+    columns = [chunked_array_to_json_values(column) for column in column_slices]
+    return [list(row) for row in zip(*columns)]
+
+
+def _read_parquet_footer(crr: CachedRenderResult) -> rowgroups.ParquetFooter:
+    try:
+        return read_parquet_footer(BUCKET, crr_parquet_key(crr))
+    except FileNotFoundError:
+        raise CorruptCacheError
+    except (pyarrow.ArrowException, OSError) as err:
+        raise CorruptCacheError from err
+
+
+def _read_column_slices(
+    crr: CachedRenderResult, column_indices: range, row_indices: range
+) -> List[pyarrow.ChunkedArray]:
+    """Read part of a cached table: non-empty, in-bounds rows and columns.
+
+    Big tables are written in row groups (see `rowgroups.RowGroupNRows`). For
+    those, we read the (cached) footer and then only the column chunks we
+    need, with S3 Range requests: rows 900,000-900,100 cost one row group's
+    worth of I/O, not the whole file.
+
+    Small tables -- and big tables cached before we wrote row groups -- are a
+    single row group. We read those from `TABLE_CACHE`: after the first call,
+    slicing the same `crr` costs no download, no Parquet decoding and no
+    subprocess.
+
+    Raise CorruptCacheError if the cached data does not match `crr`.
+    """
+    if crr.table_metadata.n_rows > rowgroups.RowGroupNRows:
+        # raise CorruptCacheError
+        footer = FOOTER_CACHE.footer(crr, lambda: _read_parquet_footer(crr))
+        if footer.metadata.num_row_groups > 1:
+            try:
+                return read_row_range(
+                    BUCKET, crr_parquet_key(crr), footer, column_indices, row_indices
+                )
+            except FileNotFoundError:
+                raise CorruptCacheError
+            except (pyarrow.ArrowException, OSError) as err:
+                raise CorruptCacheError from err
+
+    # raise CorruptCacheError
+    table = TABLE_CACHE.table(crr, lambda path: _write_arrow_file(crr, path))
+    table_slice = table.slice(row_indices.start, len(row_indices))
+    return [table_slice.column(i) for i in column_indices]
+
+
+def _iter_text_or_raise_corrupt_cache_error(
+    text_iterator: Iterator[bytes],
+) -> Iterator[bytes]:
+    try:
+        yield from text_iterator
+    except (pyarrow.ArrowException, OSError) as err:
+        raise CorruptCacheError from err
+
+
+@contextlib.contextmanager
+def streamed_cached_render_result_as_text(
+    crr: CachedRenderResult, format: Literal["csv", "json"]
+) -> ContextManager[Iterator[bytes]]:
+    """Yield an iterator over the result as CSV or JSON bytes.
+
+    This does not download the Parquet file first: it reads the Parquet
+    footer and then one row group at a time, using S3 Range requests. Each
+    `next()` may read from S3 and encode thousands of rows: asyncio callers
+    should call it from a thread.
+
+    Raise CorruptCacheError if the cached file is missing or invalid. The
+    iterator may raise CorruptCacheError, too, if the file is corrupt partway
+    through.
+
+    Usage:
+
+        with rendercache.streamed_cached_render_result_as_text(crr, "csv") as it:
+            for chunk in it:
+                send(chunk)
+    """
+    if not crr.table_metadata.columns:
+        # Zero-column tables aren't written to cache
+        yield iter([b"[]" if format == "json" else b""])
+        return
+
+    try:
+        f = s3.open_range_file(BUCKET, crr_parquet_key(crr))
+    except FileNotFoundError:
+        raise CorruptCacheError
+
+    with f:
+        try:
+            parquet_file = pyarrow.parquet.ParquetFile(f)
+        except (pyarrow.ArrowException, OSError) as err:
+            raise CorruptCacheError from err
+        yield _iter_text_or_raise_corrupt_cache_error(
+            iter_parquet_file_as_text(parquet_file, format)
+        )
+
+
+def open_cached_render_result_export(
+    crr: CachedRenderResult, format: Literal["csv", "json"]
+) -> Optional[io.BufferedReader]:
+    """Open the export `store_cached_render_result_export()` saved, or None.
+
+    The returned file reads from S3 with Range requests, so callers can stream
+    it; `file.raw.size` is its size in bytes. Each read may wait for S3:
+    asyncio callers should read from a thread. The caller must close it.
+
+    Return None if nobody stored the export yet, or if `crr` has no Parquet
+    file to export.
+    """
+    if crr.hash is None:
+        return None
+
+    try:
+        return s3.open_range_file(
+            BUCKET, crr_export_key(crr, format), buffer_size=1024 * 1024
+        )
+    except FileNotFoundError:
+        return None
+
+
+def store_cached_render_result_export(
+    crr: CachedRenderResult, format: Literal["csv", "json"], path: Path
+) -> None:
+    """Upload `path`, the complete output of `streamed_cached_render_result_as_text()`.
+
+    Later, `open_cached_render_result_export()` will return it, so exporting
+    the same result again costs no Parquet decoding.
+
+    `commit_staged_render_result()` deletes stored exports when it replaces
+    `crr`. If it replaced `crr` while we were exporting, it may have deleted
+    the key before we wrote it: callers should check the database afterwards
+    and `discard_cached_render_result_export()` if `crr` is stale.
+    """
+    assert crr.hash is not None
+    s3.fput_file(BUCKET, crr_export_key(crr, format), path)
+
+
+def discard_cached_render_result_export(
+    crr: CachedRenderResult, format: Literal["csv", "json"]
+) -> None:
+    """Delete a stored export, in the background."""
+    s3.background_remover.remove_many(BUCKET, [crr_export_key(crr, format)])
+
+
+def read_cached_render_result_column_stats(
+    crr: CachedRenderResult,
+) -> Optional[List[ColumnStats]]:
+    """Return per-column stats computed by `cache_render_result()`, or None.
+
+    Return None if there are no stats -- for instance, if the result was cached
+    before we computed stats, or if the stats file is missing or invalid.
+    Callers should fall back to reading the table.
+
+    The returned list has one ColumnStats per column in `crr.table_metadata`.
+    """
+    if not crr.table_metadata.columns:
+        return []
+
+    key = crr_column_stats_key(crr)
+    try:
+        with LOCAL_CACHE.downloaded_file(BUCKET, key) as path:
+            column_stats = column_stats_from_json_bytes(path.read_bytes())
+    except FileNotFoundError:
+        return None
+    except ValueError:
+        LOCAL_CACHE.discard(BUCKET, key)
+        return None
+
+    if len(column_stats) != len(crr.table_metadata.columns):
+        return None
+    return column_stats
+
+
 def delete_parquet_files_for_step(workflow_id: int, step_id: int) -> None:
     """Delete all Parquet files cached for `step`.
 
     Different deltas on the same module produce different Parquet
     filenames. This function removes all of them.
 
-    This deletes from s3 but not from the database. Beware -- this can leave
-    the database in an inconsistent state.
+    This deletes from s3 (and `LOCAL_CACHE`) but not from the database.
+    Beware -- this can leave the database in an inconsistent state.
     """
-    s3.remove_recursive(BUCKET, parquet_prefix(workflow_id, step_id))
+    prefix = parquet_prefix(workflow_id, step_id)
+    LOCAL_CACHE.discard_prefix(BUCKET, prefix)
+    s3.remove_recursive(BUCKET, prefix)
 
 
 def clear_cached_render_result_for_step(step: Step) -> None:
@@ -256,5 +823,8 @@ def clear_cached_render_result_for_step(step: Step) -> None:
     step.cached_render_result_status = None
     step.cached_render_result_columns = None
     step.cached_render_result_nrows = None
+    step.cached_render_result_hash = None
+    step.cached_render_result_input_hash = None
+    step.cached_render_result_nonce = None
 
     step.save(update_fields=STEP_FIELDS)
@@ -0,0 +1,58 @@
+import datetime
+import math
+from typing import Any, List
+
+import pyarrow
+
+
+_TimestampUnitNanoseconds = {"s": 1000000000, "ms": 1000000, "us": 1000, "ns": 1}
+_Epoch = datetime.datetime(1970, 1, 1)
+
+
+def format_timestamp_ns(ns: int) -> str:
+    """Format like `parquet-to-text-stream`: ISO8601, UTC, minimal precision.
+
+    >>> format_timestamp_ns(1546398245006007000)
+    '2019-01-02T03:04:05.006007Z'
+    >>> format_timestamp_ns(1546398245000000000)
+    '2019-01-02T03:04:05Z'
+    """
+    seconds, ns = divmod(ns, 1000000000)
+    text = (_Epoch + datetime.timedelta(seconds=seconds)).strftime("%Y-%m-%dT%H:%M:%S")
+    if ns == 0:
+        fraction = ""
+    elif ns % 1000000 == 0:
+        fraction = ".%03d" % (ns // 1000000)
+    elif ns % 1000 == 0:
+        fraction = ".%06d" % (ns // 1000)
+    else:
+        fraction = ".%09d" % ns
+    return text + fraction + "Z"
+
+
+def format_timestamp(value: int, unit: str) -> str:
+    """Format an Arrow timestamp value (in `unit`) like `parquet-to-text-stream`."""
+    return format_timestamp_ns(value * _TimestampUnitNanoseconds[unit])
+
+
+def chunked_array_to_json_values(chunked_array: pyarrow.ChunkedArray) -> List[Any]:
+    """Convert Arrow values to values `json.dumps()` accepts.
+
+    Timestamps become ISO8601 strings; dates become "YYYY-MM-DD"; NaN and
+    infinity become `None` (JSON has no way to represent them).
+    """
+    dtype = chunked_array.type
+    if pyarrow.types.is_timestamp(dtype):
+        return [
+            None if v is None else format_timestamp(v, dtype.unit)
+            for v in chunked_array.cast(pyarrow.int64()).to_pylist()
+        ]
+    elif pyarrow.types.is_date32(dtype):
+        return [None if v is None else v.isoformat() for v in chunked_array.to_pylist()]
+    elif pyarrow.types.is_floating(dtype):
+        return [
+            None if v is None or not math.isfinite(v) else v
+            for v in chunked_array.to_pylist()
+        ]
+    else:
+        return chunked_array.to_pylist()
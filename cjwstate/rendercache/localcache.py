@@ -0,0 +1,132 @@
+import contextlib
+from pathlib import Path
+import threading
+from typing import ContextManager, NamedTuple
+
+from django.conf import settings
+
+from cjwstate import s3
+from cjwstate.lrufiles import LruFile, LruFiles
+
+
+class LocalCacheStats(NamedTuple):
+    n_hits: int
+    n_misses: int
+    n_bytes_downloaded: int
+    n_evictions: int
+    n_files: int
+    n_bytes: int
+
+
+class LocalCache:
+    """Size-bounded, least-recently-used on-disk copies of S3 objects.
+
+    Only cache objects that never change once written. (Cached render results
+    qualify: their keys contain delta IDs.)
+
+    Readers "pin" files with `with cache.downloaded_file(bucket, key) as path:`.
+    We never delete a pinned file; so the cache may grow past `max_bytes`
+    while many large files are in use. It shrinks as readers unpin.
+
+    Readers must not modify the yielded files.
+
+    This is thread-safe. Downloads happen outside the lock; if two threads
+    download the same key concurrently, the second one to finish deletes its
+    copy and reads the first one's.
+    """
+
+    def __init__(self, parent_dir: Path, max_bytes: int):
+        self._files = LruFiles(parent_dir, max_bytes)
+        self._lock = threading.Lock()  # for counters
+        self._n_hits = 0
+        self._n_misses = 0
+        self._n_bytes_downloaded = 0
+
+    @property
+    def root(self) -> Path:
+        """Directory holding this process's files. Created on first use."""
+        return self._files.root
+
+    @staticmethod
+    def _cache_key(bucket: str, key: str) -> str:
+        return "%s/%s" % (bucket, key)
+
+    def _download_and_pin(self, bucket: str, key: str) -> LruFile:
+        """Download `key` and add it to the cache, pinned.
+
+        Raise FileNotFoundError if the key is not on S3.
+        """
+        path = self._files.mkstemp(prefix="download-")
+        try:
+            s3.download(bucket, key, path)  # raise FileNotFoundError
+            size = path.stat().st_size
+        except BaseException:
+            path.unlink()
+            raise
+
+        with self._lock:
+            self._n_bytes_downloaded += size
+        # If another thread downloaded the same file while we did, use theirs.
+        return self._files.add(
+            self._cache_key(bucket, key), path, pin=True, replace=False
+        )
+
+    @contextlib.contextmanager
+    def downloaded_file(self, bucket: str, key: str) -> ContextManager[Path]:
+        """Yield a local, read-only copy of an S3 object.
+
+        Raise FileNotFoundError if the key is not on S3. (We never cache
+        missing keys.)
+        """
+        file = self._files.get(self._cache_key(bucket, key), pin=True)
+        with self._lock:
+            if file is None:
+                self._n_misses += 1
+            else:
+                self._n_hits += 1
+
+        if file is None:
+            file = self._download_and_pin(bucket, key)  # raise FileNotFoundError
+
+        try:
+            yield file.path
+        finally:
+            self._files.unpin(file)
+
+    def discard(self, bucket: str, key: str) -> None:
+        """Forget the local copy of `key`, if there is one.
+
+        Call this when a copy turns out to be corrupt. If a reader is using the
+        file, it will be deleted after the reader unpins it.
+        """
+        self._files.discard(self._cache_key(bucket, key))
+
+    def discard_prefix(self, bucket: str, prefix: str) -> None:
+        """Forget local copies of all keys in `bucket` that begin with `prefix`.
+
+        Call this when deleting the S3 objects.
+        """
+        cache_prefix = self._cache_key(bucket, prefix)
+        self._files.discard_matching(lambda k, _: k.startswith(cache_prefix))
+
+    def clear(self) -> None:
+        """Forget all local copies. (Useful in unit tests.)"""
+        self._files.clear()
+
+    def stats(self) -> LocalCacheStats:
+        """Report hit/miss counters and current disk usage."""
+        with self._lock:
+            return LocalCacheStats(
+                n_hits=self._n_hits,
+                n_misses=self._n_misses,
+                n_bytes_downloaded=self._n_bytes_downloaded,
+                n_evictions=self._files.n_evictions,
+                n_files=self._files.n_files,
+                n_bytes=self._files.n_bytes,
+            )
+
+
+LOCAL_CACHE = LocalCache(
+    Path(settings.RENDERCACHE_LOCAL_DIR), settings.RENDERCACHE_LOCAL_MAX_BYTES
+)
+"""Local copies of `s3.CachedRenderResultsBucket` files, shared by all threads."""
@@ -0,0 +1,287 @@
+import io
+from collections import OrderedDict
+from pathlib import Path
+import threading
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import cjwparquet
+import pyarrow
+import pyarrow.parquet
+
+from cjwstate import s3
+from cjwstate.models import CachedRenderResult
+
+
+RowGroupNRows = 10000
+"""Number of rows in each row group of a cached Parquet file.
+
+The Parquet footer records each row group's row count and each column chunk's
+byte range: it's an index from row ranges to byte ranges. Readers that want a
+few rows of a huge table fetch the footer and then only the column chunks
+they need, with S3 Range requests.
+
+Smaller row groups mean less I/O per read, but a bigger footer (the footer
+has one entry per row group per column).
+"""
+
+MaxFooterCacheBytes = 64 * 1024 * 1024
+"""Total serialized size of the Parquet footers `FOOTER_CACHE` keeps."""
+
+_MaxDictHeaderSize = 100
+"""Slack Arrow may read past a column chunk (see Arrow's PARQUET-816 fix)."""
+
+
+def write_parquet(parquet_path: Path, table: pyarrow.Table) -> None:
+    """Write `table` like `cjwparquet.write()`, in `RowGroupNRows`-row groups.
+
+    `cjwparquet.write()` writes a single row group; readers must fetch the
+    whole file to read any of it.
+    """
+    if table.num_rows <= RowGroupNRows:
+        # One row group either way. (And cjwparquet handles ARROW-6568.)
+        cjwparquet.write(parquet_path, table)
+        return
+
+    pyarrow.parquet.write_table(
+        table,
+        str(parquet_path),
+        version="2.0",
+        compression="SNAPPY",
+        # Same as cjwparquet.write(): write+read returns an exact copy
+        use_dictionary=[
+            name.encode("utf-8")
+            for name, column in zip(table.column_names, table.columns)
+            if pyarrow.types.is_dictionary(column.type)
+        ],
+        row_group_size=RowGroupNRows,
+    )
+
+
+def _combine_chunks(column: pyarrow.ChunkedArray) -> pyarrow.Array:
+    """Concatenate `column`'s chunks (one per row group) into one array."""
+    if pyarrow.types.is_dictionary(column.type):
+        # Each row group has its own dictionary, and concat_arrays() can't mix
+        # dictionaries. Decode, concatenate, then re-encode.
+        values = pyarrow.concat_arrays(
+            [chunk.dictionary_decode() for chunk in column.chunks]
+        )
+        return values.dictionary_encode()
+    return pyarrow.concat_arrays(column.chunks)
+
+
+def convert_parquet_file_to_arrow_file(parquet_path: Path, arrow_path: Path) -> None:
+    """Like `cjwparquet.convert_parquet_file_to_arrow_file()`, for any file.
+
+    Workbench's Arrow files hold a single record batch (see
+    `cjwkernel.validate.validate_table_metadata()`). A file `write_parquet()`
+    wrote in several row groups reads as several batches, with a dictionary
+    per row group for each dictionary column. We concatenate them into one.
+
+    Raise pyarrow.ArrowException or OSError if the file is not valid Parquet.
+    """
+    parquet_file = pyarrow.parquet.ParquetFile(str(parquet_path))
+    if parquet_file.metadata.num_row_groups <= 1:
+        cjwparquet.convert_parquet_file_to_arrow_file(parquet_path, arrow_path)
+        return
+
+    table = parquet_file.read(use_threads=False)
+    batch = pyarrow.RecordBatch.from_arrays(
+        [_combine_chunks(column) for column in table.columns],
+        names=table.column_names,
+    )
+    with pyarrow.RecordBatchFileWriter(str(arrow_path), batch.schema) as writer:
+        writer.write_batch(batch)
+
+
+class ParquetFooter(NamedTuple):
+    size: int
+    """Size of the whole Parquet file, in bytes."""
+
+    metadata: pyarrow.parquet.FileMetaData
+
+
+def read_parquet_footer(bucket: str, key: str) -> ParquetFooter:
+    """Read a Parquet file's footer from S3, without reading any data.
+
+    Raise FileNotFoundError if the key is not on S3. Raise
+    pyarrow.ArrowException or OSError if the file is not valid Parquet.
+    """
+    with s3.open_range_file(bucket, key) as f:
+        return ParquetFooter(f.raw.size, pyarrow.parquet.ParquetFile(f).metadata)
+
+
+class _PrefetchedFile(io.RawIOBase):
+    """Seekable, read-only file of which we only hold some byte ranges.
+
+    Pass it to `pyarrow.parquet.ParquetFile()` along with the file's metadata
+    (so pyarrow won't read the footer). Reading bytes we don't hold raises
+    OSError.
+    """
+
+    def __init__(self, size: int, ranges: List[Tuple[int, bytes]]):
+        super().__init__()
+        self.size = size
+        self._ranges = ranges
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError("invalid whence (%r)" % whence)
+        if position < 0:
+            raise ValueError("negative seek position %d" % position)
+        self._position = position
+        return position
+
+    def readinto(self, b):
+        stop = min(self._position + len(b), self.size)
+        for start, data in self._ranges:
+            if start <= self._position and stop <= start + len(data):
+                n = stop - self._position
+                b[:n] = data[self._position - start : stop - start]
+                self._position = stop
+                return n
+        raise OSError("Bytes %d-%d were not prefetched" % (self._position, stop))
+
+
+def _column_chunk_range(
+    row_group: pyarrow.parquet.RowGroupMetaData, column_index: int
+) -> Tuple[int, int]:
+    column = row_group.column(column_index)
+    start = column.data_page_offset
+    if column.has_dictionary_page and 0 < column.dictionary_page_offset < start:
+        start = column.dictionary_page_offset
+    return start, start + column.total_compressed_size
+
+
+def read_row_range(
+    bucket: str,
+    key: str,
+    footer: ParquetFooter,
+    column_indices: range,
+    row_indices: range,
+) -> List[pyarrow.ChunkedArray]:
+    """Read some rows and columns of a Parquet file on S3.
+
+    `footer` is the file's footer (see `read_parquet_footer()`). We use it
+    to find the row groups that hold `row_indices`; then we download each of
+    those row groups' `column_indices` column chunks with one Range request.
+    We never read other row groups.
+
+    `column_indices` and `row_indices` must be in bounds and non-empty.
+
+    Raise FileNotFoundError if the key is not on S3. Raise
+    pyarrow.ArrowException or OSError if the file is not valid Parquet.
+    """
+    size, metadata = footer
+    row_group_indices = []
+    ranges = []
+    first_row = None  # index of the first row we read
+    row_group_start = 0
+    for i in range(metadata.num_row_groups):
+        row_group = metadata.row_group(i)
+        row_group_stop = row_group_start + row_group.num_rows
+        if row_group_start < row_indices.stop and row_indices.start < row_group_stop:
+            if first_row is None:
+                first_row = row_group_start
+            row_group_indices.append(i)
+            # Column chunks are stored in column order. Fetch the span.
+            chunk_ranges = [_column_chunk_range(row_group, j) for j in column_indices]
+            start = min(r[0] for r in chunk_ranges)
+            stop = min(max(r[1] for r in chunk_ranges) + _MaxDictHeaderSize, size)
+            ranges.append((start, s3.get_range(bucket, key, start, stop)))
+        row_group_start = row_group_stop
+
+    column_names = [metadata.schema.column(j).name for j in column_indices]
+    parquet_file = pyarrow.parquet.ParquetFile(
+        _PrefetchedFile(size, ranges), metadata=metadata
+    )
+    table = parquet_file.read_row_groups(row_group_indices, columns=column_names)
+    table = table.slice(row_indices.start - first_row, len(row_indices))
+    return table.columns
+
+
+class _Key(NamedTuple):
+    workflow_id: int
+    step_id: int
+    delta_id: int
+
+
+class _Entry(NamedTuple):
+    file_hash: Optional[str]
+    footer: ParquetFooter
+    n_bytes: int
+
+
+class FooterCache:
+    """Parsed Parquet footers of cached render results.
+
+    Reading a footer costs two S3 requests; a table viewer scrolling through a
+    big table would pay them for every tile. Entries are immutable, like
+    `TableCache` entries: keys include delta IDs, and we compare `hash` on
+    read.
+
+    Total serialized size is bounded by `max_bytes`, evicting least-recently
+    used footers first.
+
+    This is thread-safe. Reads happen outside the lock.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: Dict[_Key, _Entry] = OrderedDict()  # oldest first
+        self._n_bytes = 0
+
+    def footer(
+        self, crr: CachedRenderResult, read_footer: Callable[[], ParquetFooter]
+    ) -> ParquetFooter:
+        """Return the footer of `crr`'s Parquet file.
+
+        On miss, call `read_footer()`. Any error it raises is re-raised.
+        """
+        key = _Key(crr.workflow_id, crr.step_id, crr.delta_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.file_hash == crr.hash:
+                self._entries.move_to_end(key)
+                return entry.footer
+
+        footer = read_footer()  # outside of the lock
+        n_bytes = footer.metadata.serialized_size
+
+        with self._lock:
+            old_entry = self._entries.pop(key, None)
+            if old_entry is not None:
+                self._n_bytes -= old_entry.n_bytes
+            if n_bytes <= self.max_bytes:
+                self._entries[key] = _Entry(crr.hash, footer, n_bytes)
+                self._n_bytes += n_bytes
+                while self._n_bytes > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._n_bytes -= evicted.n_bytes
+        return footer
+
+    def clear(self) -> None:
+        """Forget all footers. (Useful in unit tests.)"""
+        with self._lock:
+            self._entries.clear()
+            self._n_bytes = 0
+
+
+FOOTER_CACHE = FooterCache(MaxFooterCacheBytes)
+"""Footers for ranged reads of cached render results, shared by all threads."""
@@ -0,0 +1,128 @@
+from pathlib import Path
+import threading
+from typing import Callable, NamedTuple, Optional
+
+import pyarrow
+from django.conf import settings
+
+from cjwkernel.types import TableMetadata
+from cjwstate.lrufiles import LruFiles
+from cjwstate.models import CachedRenderResult
+
+
+class _Key(NamedTuple):
+    workflow_id: int
+    step_id: int
+    delta_id: int
+
+
+class _Table(NamedTuple):
+    table_metadata: TableMetadata
+    file_hash: Optional[str]
+    table: pyarrow.Table
+    """Table backed by a memory map of the file."""
+
+
+class TableCacheStats(NamedTuple):
+    n_hits: int
+    n_misses: int
+    n_evictions: int
+    n_tables: int
+    n_bytes: int
+
+
+class TableCache:
+    """Open, memory-mapped Arrow copies of cached render results.
+
+    The table viewer requests a cached render result one small tile at a
+    time. Decoding the whole Parquet file for each tile is wasteful. Instead,
+    we decode it once into an Arrow file, memory-map it, and keep it open: each
+    tile is a zero-copy slice.
+
+    Entries are immutable: the render cache's key for an output includes its
+    delta ID. We also compare `TableMetadata` and `hash` on read, in case a
+    renderer re-rendered the same delta differently (e.g., after a module
+    upgrade).
+
+    Total size on disk is bounded by `max_bytes`, evicting least-recently-used
+    files first. Evicting unlinks the file; a reader still holding the table
+    can keep reading it, because the memory map keeps the data alive until the
+    table is garbage-collected.
+
+    We never evict the table we just converted, even if it is larger than
+    `max_bytes` on its own: the viewer will request more tiles of it soon. It
+    evicts every other table, and stays until the next conversion.
+
+    This is thread-safe. If two threads convert the same result concurrently,
+    the second one to finish replaces the first one's copy.
+    """
+
+    def __init__(self, parent_dir: Path, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._files = LruFiles(parent_dir, max_bytes)  # values: _Table
+        self._lock = threading.Lock()  # for counters
+        self._n_hits = 0
+        self._n_misses = 0
+
+    @property
+    def root(self) -> Path:
+        """Directory holding this process's files. Created on first use."""
+        return self._files.root
+
+    def table(
+        self, crr: CachedRenderResult, write_arrow_file: Callable[[Path], None]
+    ) -> pyarrow.Table:
+        """Return the memory-mapped table that matches `crr`.
+
+        On miss, call `write_arrow_file(path)` to write an Arrow file and then
+        open it. Any error `write_arrow_file()` raises is re-raised.
+        """
+        key = _Key(crr.workflow_id, crr.step_id, crr.delta_id)
+        file = self._files.get(key)
+        is_hit = (
+            file is not None
+            and file.value.table_metadata == crr.table_metadata
+            and file.value.file_hash == crr.hash
+        )
+        with self._lock:
+            if is_hit:
+                self._n_hits += 1
+            else:
+                self._n_misses += 1
+        if is_hit:
+            return file.value.table
+
+        path = self._files.mkstemp(prefix="table-", suffix=".arrow")
+        try:
+            write_arrow_file(path)
+            reader = pyarrow.ipc.open_file(pyarrow.memory_map(str(path)))
+            table = reader.read_all()  # zero-copy: backed by the memory map
+        except BaseException:
+            path.unlink()
+            raise
+
+        # If another thread converted the same file while we did, or if an
+        # old entry has stale metadata or hash, replace it.
+        self._files.add(key, path, _Table(crr.table_metadata, crr.hash, table))
+        return table
+
+    def clear(self) -> None:
+        """Forget all tables. (Useful in unit tests.)"""
+        self._files.clear()
+
+    def stats(self) -> TableCacheStats:
+        """Report hit/miss counters and current disk usage."""
+        with self._lock:
+            return TableCacheStats(
+                n_hits=self._n_hits,
+                n_misses=self._n_misses,
+                n_evictions=self._files.n_evictions,
+                n_tables=self._files.n_files,
+                n_bytes=self._files.n_bytes,
+            )
+
+
+TABLE_CACHE = TableCache(
+    Path(settings.RENDERCACHE_TABLES_DIR), settings.RENDERCACHE_TABLES_MAX_BYTES
+)
+"""Open tables for slicing cached render results, shared by all threads."""
@@ -0,0 +1,111 @@
+import json
+import re
+from typing import Any, Iterator, List, Literal
+
+import pyarrow
+import pyarrow.parquet
+
+from .jsonformat import chunked_array_to_json_values
+
+
+NRowsPerChunk = 1000
+"""Number of rows we encode at a time.
+
+Each chunk is a few kilobytes to a few megabytes of text. The caller sends
+one chunk before we encode the next, so a slow client slows down encoding
+instead of making us buffer the whole export.
+"""
+
+
+_CsvNeedsQuotes = re.compile(r'[,"\r\n]')
+
+
+def _format_csv_value(value) -> str:
+    """Format a JSON-ready value like `parquet-to-text-stream` formats CSV."""
+    if value is None:
+        return ""
+    elif isinstance(value, float):
+        text = repr(value)
+        if text.endswith(".0"):
+            return text[:-2]  # "1", not "1.0"
+        return text
+    elif isinstance(value, str):
+        if _CsvNeedsQuotes.search(value):
+            return '"' + value.replace('"', '""') + '"'
+        return value
+    else:
+        return str(value)
+
+
+def _encode_csv_row(values: List[Any]) -> str:
+    return ",".join(_format_csv_value(v) for v in values) + "\n"
+
+
+def _encode_csv_rows(table: pyarrow.Table) -> bytes:
+    columns = [chunked_array_to_json_values(column) for column in table.columns]
+    return "".join(_encode_csv_row(row) for row in zip(*columns)).encode("utf-8")
+
+
+def _encode_json_records(table: pyarrow.Table) -> List[bytes]:
+    names = table.column_names
+    columns = [chunked_array_to_json_values(column) for column in table.columns]
+    return [
+        json.dumps(
+            dict(zip(names, row)),
+            ensure_ascii=False,
+            allow_nan=False,
+            separators=(",", ":"),
+        ).encode("utf-8")
+        for row in zip(*columns)
+    ]
+
+
+def _iter_row_chunks(
+    parquet_file: pyarrow.parquet.ParquetFile,
+) -> Iterator[pyarrow.Table]:
+    """Yield tables of at most `NRowsPerChunk` rows, reading one row group at a time.
+
+    Each row group is a separate read. When `parquet_file` reads from S3, the
+    first rows are ready as soon as the first row group is downloaded.
+    """
+    for i in range(parquet_file.num_row_groups):
+        row_group = parquet_file.read_row_group(i)
+        for start in range(0, row_group.num_rows, NRowsPerChunk):
+            yield row_group.slice(start, NRowsPerChunk)
+
+
+def iter_parquet_file_as_csv(
+    parquet_file: pyarrow.parquet.ParquetFile,
+) -> Iterator[bytes]:
+    """Yield UTF-8 CSV, a header and then `NRowsPerChunk` rows at a time.
+
+    Nulls become empty strings; timestamps become ISO8601 strings.
+    """
+    yield _encode_csv_row(parquet_file.schema_arrow.names).encode("utf-8")
+    for table in _iter_row_chunks(parquet_file):
+        yield _encode_csv_rows(table)
+
+
+def iter_parquet_file_as_json(
+    parquet_file: pyarrow.parquet.ParquetFile,
+) -> Iterator[bytes]:
+    """Yield a UTF-8 JSON Array of records, `NRowsPerChunk` records at a time.
+
+    NaN and infinity become `null`; timestamps become ISO8601 strings.
+    """
+    is_first = True
+    for table in _iter_row_chunks(parquet_file):
+        records = _encode_json_records(table)
+        if records:
+            yield (b"[" if is_first else b",") + b",".join(records)
+            is_first = False
+    yield b"[]" if is_first else b"]"
+
+
+def iter_parquet_file_as_text(
+    parquet_file: pyarrow.parquet.ParquetFile, format: Literal["csv", "json"]
+) -> Iterator[bytes]:
+    if format == "csv":
+        return iter_parquet_file_as_csv(parquet_file)
+    else:
+        return iter_parquet_file_as_json(parquet_file)
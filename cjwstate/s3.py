@@ -1,15 +1,20 @@
 """High-level storage backed by AWS S3, Google GCS, or Minio.
 """
 
+import asyncio
 import errno
+import io
 import json
 import logging
 import pathlib
 import sys
+import threading
 import urllib3
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
-from typing import ContextManager, NamedTuple
+from functools import partial
+from typing import ContextManager, Iterable, Iterator, List, NamedTuple
 
 import boto3
 import botocore
@@ -33,6 +38,9 @@ class Layer:
         self._client = None
         self._uploader = None
         self._downloader = None
+        self._deleter = None
+        self._transferrer = None
+        self._executor_lock = threading.Lock()
 
     @property
     def client(self):
@@ -46,7 +54,13 @@ class Layer:
             self._client = session.client(
                 "s3",
                 endpoint_url=settings.AWS_S3_ENDPOINT,  # e.g., 'https://localhost:9001/'
-                config=botocore.client.Config(max_pool_connections=50),
+                config=botocore.client.Config(
+                    max_pool_connections=(
+                        50
+                        + settings.S3_N_CONCURRENT_DELETES
+                        + settings.S3_N_CONCURRENT_TRANSFERS
+                    )
+                ),
             )
         return self._client
 
@@ -75,6 +89,38 @@ class Layer:
             )
         return self._uploader
 
+    @property
+    def deleter(self) -> ThreadPoolExecutor:
+        """Singleton thread pool for concurrent single-object deletes.
+
+        All concurrent deletes share this pool. This caps the number of
+        connections deletes use.
+        """
+        with self._executor_lock:
+            if self._deleter is None:
+                self._deleter = ThreadPoolExecutor(
+                    max_workers=settings.S3_N_CONCURRENT_DELETES,
+                    thread_name_prefix="s3-deleter-",
+                )
+            return self._deleter
+
+    @property
+    def transferrer(self) -> ThreadPoolExecutor:
+        """Singleton thread pool for the `*_async()` functions.
+
+        asyncio callers must not block the event loop on S3, and they must not
+        borrow a database thread to wait for S3 either. All async transfers
+        share this pool. This caps the number of threads (and connections)
+        they use.
+        """
+        with self._executor_lock:
+            if self._transferrer is None:
+                self._transferrer = ThreadPoolExecutor(
+                    max_workers=settings.S3_N_CONCURRENT_TRANSFERS,
+                    thread_name_prefix="s3-transferrer-",
+                )
+            return self._transferrer
+
     @property
     def error(self):
         """Namespace for exceptions.
@@ -165,14 +211,83 @@ def copy(bucket: str, key: str, copy_source: str, **kwargs) -> None:
     layer.client.copy_object(Bucket=bucket, Key=key, CopySource=copy_source, **kwargs)
 
 
+_MaxNKeysPerDeleteObjects = 1000  # S3's limit
+
+
+def _remove_many_with_delete_objects(bucket: str, keys: List[str]) -> None:
+    for i in range(0, len(keys), _MaxNKeysPerDeleteObjects):
+        response = layer.client.delete_objects(
+            Bucket=bucket,
+            Delete={
+                "Objects": [
+                    {"Key": key} for key in keys[i : i + _MaxNKeysPerDeleteObjects]
+                ],
+                "Quiet": True,
+            },
+        )
+        errors = [e for e in response.get("Errors", []) if e["Code"] != "NoSuchKey"]
+        if errors:
+            raise RuntimeError(
+                "DeleteObjects failed on %d keys; first error: %r"
+                % (len(errors), errors[0])
+            )
+
+
+def remove_many(bucket: str, keys: Iterable[str]) -> None:
+    """Delete the files. No-op for files that are already deleted.
+
+    This is _not atomic_. An aborted delete may leave some objects deleted
+    and others not-deleted.
+
+    If `settings.S3_SUPPORTS_DELETE_OBJECTS`, send batches of 1,000 keys per
+    request. Otherwise, send one request per key, on `layer.deleter`'s
+    threads. (Google Cloud Storage doesn't emulate DeleteObjects.)
+    """
+    keys = list(keys)
+    if not keys:
+        return
+    if len(keys) == 1:
+        remove(bucket, keys[0])
+    elif settings.S3_SUPPORTS_DELETE_OBJECTS:
+        _remove_many_with_delete_objects(bucket, keys)
+    else:
+        # list() waits for all, and re-raises the first error
+        list(layer.deleter.map(lambda key: remove(bucket, key), keys))
+
+
+def _list_keys_recursive(bucket: str, prefix: str) -> Iterator[List[str]]:
+    """Yield lists of keys in `bucket` that begin with `prefix`, page by page."""
+    # Use list_objects, not list_objects_v2, because Google Cloud Storage's
+    # AWS emulation doesn't support v2.
+    marker = ""
+    while True:
+        # no Delimiter="/" means it's a recursive request
+        list_response = layer.client.list_objects(
+            Bucket=bucket, Prefix=prefix, Marker=marker
+        )
+        keys = [o["Key"] for o in list_response.get("Contents", [])]
+        if keys:
+            yield keys
+        if not list_response.get("IsTruncated", False) or not keys:
+            return
+        marker = keys[-1]
+
+
+def list_keys_recursive(bucket: str, prefix: str) -> List[str]:
+    """List keys of all objects in `bucket` whose keys begin with `prefix`.
+
+    >>> s3.list_keys_recursive('bucket', 'wf-1/')
+    ['wf-1/wfm-2/delta-3.dat', 'wf-1/wfm-4/delta-5.dat']
+    """
+    return [key for keys in _list_keys_recursive(bucket, prefix) for key in keys]
+
+
 def _remove_by_prefix(bucket: str, prefix: str, force=False) -> None:
     """Remove all objects in `bucket` whose keys begin with `prefix`.
 
     This is _not atomic_. An aborted delete may leave some objects deleted
     and others not-deleted.
 
-    It's also slow. Be certain there aren't many files to delete.
-
     If you mean to use a directory-style `prefix` -- that is, one that ends in
     `"/"` -- then use `remove_recursive()` to signal your intent.
 
@@ -183,30 +298,15 @@ def _remove_by_prefix(bucket: str, prefix: str, force=False) -> None:
     if prefix in ("/", "") and not force:
         raise ValueError("Refusing to remove prefix=/ when force=False")
 
-    # Use list_objects, not list_objects_v2, because Google Cloud Storage's
-    # AWS emulation doesn't support v2.
-    #
-    # Loop, deleting 1,000 keys at a time. S3 DELETE is strongly-consistent:
-    # after we delete 1,000 keys, we're guaranteed list_objects() won't re-list
-    # them. Same with Google Cloud Storage, which we configure to emulate AWS on
+    # Delete each page of keys as we list it. S3 DELETE is strongly-consistent,
+    # and so is Google Cloud Storage, which we configure to emulate AWS on
     # production.
     #
     # ref: https://docs.aws.amazon.com/AmazonS3/latest/dev/Introduction.html#ConsistencyModel
     # ref: https://cloud.google.com/storage/docs/consistency#strongly_consistent_operations
     # ref: https://cloud.google.com/storage/docs/interoperability
-    done = False
-    while not done:
-        # no Delimiter="/" means it's a recursive request
-        list_response = layer.client.list_objects(Bucket=bucket, Prefix=prefix)
-        done = not list_response.get("IsTruncated", False)
-        keys = [o["Key"] for o in list_response.get("Contents", [])]
-        # Use layer.client.delete_object(), not delete_objects(), because Google Cloud
-        # Storage doesn't emulate DeleteObjects.
-        #
-        # This is slow. But so is multi-delete through s3, because s3's
-        # GCS gateway deletes one-at-a-time anyway.
-        for key in keys:
-            remove(bucket, key)
+    for keys in _list_keys_recursive(bucket, prefix):
+        remove_many(bucket, keys)
 
 
 def remove_recursive(bucket: str, prefix: str, force=False) -> None:
@@ -224,6 +324,55 @@ def remove_recursive(bucket: str, prefix: str, force=False) -> None:
     return _remove_by_prefix(bucket, prefix, force)
 
 
+class BackgroundRemover:
+    """Delete files on a background thread, in the order they're queued.
+
+    Use this when the caller shouldn't wait for deletes: for instance, when
+    the renderer removes stale cached render results. Only queue keys nobody
+    will read or write again. (A delete may run long after it's queued, and
+    other processes can't see our queue. So the caller can't safely wait for
+    a pending delete and then re-use its key: it must write a new key.)
+
+    Errors are logged, not raised: the files simply stay where they are.
+
+    This is thread-safe.
+    """
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="s3-background-remover-"
+        )
+        self._condition = threading.Condition()
+        self._n_pending = 0  # queued or running remove_many() calls
+
+    def remove_many(self, bucket: str, keys: Iterable[str]) -> None:
+        """Queue deletion of `keys`, and return immediately."""
+        keys = list(keys)
+        if not keys:
+            return
+        with self._condition:
+            self._n_pending += 1
+        self._executor.submit(self._remove_many, bucket, keys)
+
+    def _remove_many(self, bucket: str, keys: List[str]) -> None:
+        try:
+            remove_many(bucket, keys)
+        except Exception:
+            logger.exception("Error removing %d keys from %s", len(keys), bucket)
+        finally:
+            with self._condition:
+                self._n_pending -= 1
+                self._condition.notify_all()
+
+    def wait_for_all(self) -> None:
+        """Block until the queue is empty. (Useful in unit tests.)"""
+        with self._condition:
+            self._condition.wait_for(lambda: self._n_pending == 0)
+
+
+background_remover = BackgroundRemover()
+
+
 @contextmanager
 def temporarily_download(
     bucket: str, key: str, dir=None
@@ -260,3 +409,130 @@ def download(bucket: str, key: str, path: pathlib.Path) -> None:
             raise FileNotFoundError(errno.ENOENT, f"No file at {bucket}/{key}")
         else:
             raise
+
+
+def get_range(bucket: str, key: str, start: int, stop: int) -> bytes:
+    """Read bytes `start` (inclusive) through `stop` (exclusive) of a file.
+
+    This is one HTTP Range request: use it to read a small part of a large
+    file without downloading all of it. As with Python slices, the result is
+    shorter than requested if the file is shorter than `stop`.
+
+    Raise FileNotFoundError if the key is not on S3.
+    """
+    if stop <= start:
+        return b""
+    try:
+        response = layer.client.get_object(
+            Bucket=bucket, Key=key, Range="bytes=%d-%d" % (start, stop - 1)
+        )
+    except layer.error.NoSuchKey:
+        raise FileNotFoundError(errno.ENOENT, f"No file at {bucket}/{key}")
+    except layer.error.ClientError as err:
+        code = err.response.get("Error", {}).get("Code")
+        if code == "404":
+            raise FileNotFoundError(errno.ENOENT, f"No file at {bucket}/{key}")
+        elif code == "InvalidRange":
+            return b""  # start >= file size
+        else:
+            raise
+    with response["Body"] as body:
+        return body.read()
+
+
+class RangeFile(io.RawIOBase):
+    """Seekable, read-only file that reads an S3 object with Range requests.
+
+    Each `readinto()` is one `get_range()` call. Wrap this in an
+    `io.BufferedReader` (see `open_range_file()`) so small reads don't each
+    cost a request.
+
+    Not thread-safe.
+    """
+
+    def __init__(self, bucket: str, key: str, size: int):
+        super().__init__()
+        self.bucket = bucket
+        self.key = key
+        self.size = size
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError("invalid whence (%r)" % whence)
+        if position < 0:
+            raise ValueError("negative seek position %d" % position)
+        self._position = position
+        return position
+
+    def readinto(self, b):
+        stop = min(self._position + len(b), self.size)
+        data = get_range(self.bucket, self.key, self._position, stop)
+        n = len(data)
+        b[:n] = data
+        self._position += n
+        return n
+
+
+def open_range_file(
+    bucket: str, key: str, buffer_size: int = 65536
+) -> io.BufferedReader:
+    """Open an S3 object as a seekable file, without downloading it.
+
+    Use this to read a small part of a large file: for instance, a Parquet
+    footer and a few row groups.
+
+    Raise FileNotFoundError if the key is not on S3.
+    """
+    try:
+        size = stat(bucket, key).size
+    except layer.error.NoSuchKey:
+        raise FileNotFoundError(errno.ENOENT, f"No file at {bucket}/{key}")
+    except layer.error.ClientError as err:
+        if err.response.get("Error", {}).get("Code") == "404":
+            raise FileNotFoundError(errno.ENOENT, f"No file at {bucket}/{key}")
+        else:
+            raise
+    return io.BufferedReader(RangeFile(bucket, key, size), buffer_size)
+
+
+async def _run_in_transferrer(fn, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(layer.transferrer, partial(fn, *args))
+
+
+async def download_async(bucket: str, key: str, path: pathlib.Path) -> None:
+    """Copy a file from S3 to a pathlib.Path, without blocking the event loop.
+
+    Like `download()`, this streams to disk: it never holds the whole file in
+    memory. Raise FileNotFoundError if the key is not on S3.
+    """
+    await _run_in_transferrer(download, bucket, key, path)
+
+
+async def fput_file_async(bucket: str, key: str, path: pathlib.Path) -> None:
+    """Copy a pathlib.Path to S3, without blocking the event loop.
+
+    Like `fput_file()`, this streams from disk.
+    """
+    await _run_in_transferrer(fput_file, bucket, key, path)
+
+
+async def put_bytes_async(bucket: str, key: str, body: bytes) -> None:
+    """Like `put_bytes()`, without blocking the event loop."""
+    await _run_in_transferrer(put_bytes, bucket, key, body)
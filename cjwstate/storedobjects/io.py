@@ -1,14 +1,14 @@
 import datetime
-import uuid
 from pathlib import Path
 from typing import ContextManager, Optional
 
 from django.conf import settings
+from django.db import connection, transaction
 
 from cjwkernel.util import tempfile_context
 from cjwstate import s3
-from cjwstate.models import Step, StoredObject
-from cjwstate.util import find_deletable_ids
+from cjwstate.models import Step, StoredObject, StoredObjectBlob
+from cjwstate.util import find_deletable_ids, hash_file
 
 BUCKET = s3.StoredObjectsBucket
 
@@ -37,9 +37,36 @@ def downloaded_file(stored_object: StoredObject, dir=None) -> ContextManager[Pat
         )
 
 
-def _build_key(workflow_id: int, step_id: int) -> str:
-    """Build a helpful S3 key."""
-    return f"{workflow_id}/{step_id}/{uuid.uuid1()}.dat"
+def _add_blob_reference(path: Path, file_hash: str, size: int) -> str:
+    """Make sure there's a blob with `path`'s contents; return its key.
+
+    Increment the blob's `n_references`. Upload `path` if no other StoredObject
+    references the blob.
+
+    Call this within a transaction. The INSERT locks the blob's row until the
+    transaction ends. That's how we avoid races: `cron.storedobjectblobdeleter`
+    can't delete the file while we add our reference (it waits for us, then
+    sees `n_references > 0`); and if it's deleting right now, we wait for it
+    and then upload again.
+    """
+    key = StoredObjectBlob.build_key(file_hash, size)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            INSERT INTO stored_object_blob (key, size, n_references)
+            VALUES (%(key)s, %(size)s, 1)
+            ON CONFLICT (key) DO UPDATE
+            SET n_references = stored_object_blob.n_references + 1
+            RETURNING n_references
+            """,
+            dict(key=key, size=size),
+        )
+        n_references = cursor.fetchone()[0]
+    if n_references == 1:
+        # The blob is new -- or it was an orphan, so its file may have been
+        # deleted. Either way, (re)write the file.
+        s3.fput_file(BUCKET, key, path)
+    return key
 
 
 def create_stored_object(
@@ -47,28 +74,35 @@ def create_stored_object(
     step_id: int,
     path: Path,
     stored_at: Optional[datetime.datetime] = None,
+    file_hash: Optional[str] = None,
 ) -> StoredObject:
     """Write and return a new StoredObject.
 
     The caller should call enforce_storage_limits() after calling this.
 
+    Pass `file_hash` if the caller already called `hash_file(path)`, to avoid
+    reading `path` twice.
+
+    If another StoredObject (in any Step of any Workflow) has the same
+    contents, the two share a file: we don't upload anything.
+
     Raise IntegrityError if a database race prevents saving this. Raise a s3
-    error if writing to s3 failed. In case of partial completion, a
-    StoredObject will exist in the database but no file will be saved in s3.
+    error if writing to s3 failed. Either way, the database is unchanged.
     """
     if stored_at is None:
         stored_at = datetime.datetime.now()
-    key = _build_key(workflow_id, step_id)
     size = path.stat().st_size
-    stored_object = StoredObject.objects.create(
-        stored_at=stored_at,
-        step_id=step_id,
-        key=key,
-        size=size,
-        hash="unhashed",
-    )
-    s3.fput_file(BUCKET, key, path)
-    return stored_object
+    if file_hash is None:
+        file_hash = hash_file(path)
+    with transaction.atomic():
+        key = _add_blob_reference(path, file_hash, size)
+        return StoredObject.objects.create(
+            stored_at=stored_at,
+            step_id=step_id,
+            key=key,
+            size=size,
+            hash=file_hash,
+        )
 
 
 def delete_old_files_to_enforce_storage_limits(*, step: Step) -> None:
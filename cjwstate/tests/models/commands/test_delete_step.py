@@ -1,9 +1,10 @@
 import asyncio
+import datetime
 from unittest.mock import patch
 
 from cjwstate import clientside, commands
 from cjwstate.models import Workflow, Block
-from cjwstate.models.commands import DeleteStep
+from cjwstate.models.commands import DeleteStep, delete_step
 from cjwstate.tests.utils import DbTestCase
 
 
@@ -42,6 +43,24 @@ class DeleteStepTest(DbTestCase):
         self.assertEqual(step.is_deleted, True)
         self.assertEqual(list(tab1.live_steps.values_list("slug", "order")), [])
 
+    @patch.object(commands, "websockets_notify", async_noop)
+    @patch.object(delete_step, "notify_autofetch_schedule_changed")
+    def test_undo_notifies_autofetch(self, notify):
+        workflow = Workflow.create_and_init()
+        step = workflow.tabs.first().steps.create(
+            order=0,
+            slug="step-1",
+            last_relevant_delta_id=workflow.last_delta_id,
+            auto_update_data=True,
+            next_update=datetime.datetime.now(),
+        )
+        self.run_with_async_db(
+            commands.do(DeleteStep, workflow_id=workflow.id, step=step)
+        )
+        notify.assert_not_called()
+        self.run_with_async_db(commands.undo(workflow.id))
+        notify.assert_called_with(step.id)
+
     @patch.object(commands, "websockets_notify")
     def test_delete_custom_report_blocks(self, send_update):
         future_none = asyncio.Future()
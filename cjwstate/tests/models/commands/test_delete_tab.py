@@ -1,9 +1,10 @@
 import asyncio
+import datetime
 from unittest.mock import patch
 
 from cjwstate import clientside, commands
 from cjwstate.models import Block, Workflow
-from cjwstate.models.commands import DeleteTab
+from cjwstate.models.commands import DeleteTab, delete_tab
 from cjwstate.tests.utils import DbTestCase
 
 
@@ -44,6 +45,26 @@ class DeleteTabTest(DbTestCase):
             [("tab-1", 0), ("tab-3", 1)],
         )
 
+    @patch.object(commands, "websockets_notify", async_noop)
+    @patch.object(delete_tab, "notify_autofetch_schedule_changed")
+    def test_undo_notifies_autofetch(self, notify):
+        workflow = Workflow.create_and_init()  # tab-1
+        tab2 = workflow.tabs.create(position=1, slug="tab-2")
+        step = tab2.steps.create(
+            order=0,
+            slug="step-1",
+            auto_update_data=True,
+            next_update=datetime.datetime.now(),
+        )
+        tab2.steps.create(order=1, slug="step-2")  # not auto-update
+
+        self.run_with_async_db(
+            commands.do(DeleteTab, workflow_id=workflow.id, tab=tab2)
+        )
+        notify.assert_not_called()
+        self.run_with_async_db(commands.undo(workflow.id))
+        notify.assert_called_once_with(step.id)
+
     @patch.object(commands, "websockets_notify", async_noop)
     def test_delete_tab_before_selected_position_changes_position(self):
         workflow = Workflow.create_and_init(selected_tab_position=1)
@@ -90,7 +90,35 @@ class SetStepParamsTests(DbTestCase):
             )
         )
 
-        queue_render.assert_called_with(self.step.workflow_id, delta.id)
+        # A user picked this version: render it on the user's queue
+        queue_render.assert_called_with(
+            self.step.workflow_id, delta.id, queue=rabbitmq.Render
+        )
+
+    @patch.object(rabbitmq, "queue_render")
+    def test_change_version_queue_render_on_render_queue(self, queue_render):
+        queue_render.return_value = future_none
+
+        date1 = self._store_fetched_table()
+        date2 = self._store_fetched_table()
+
+        self.step.notifications = True
+        self.step.stored_data_version = date1
+        self.step.save()
+
+        delta = self.run_with_async_db(
+            commands.do(
+                SetStepDataVersion,
+                workflow_id=self.workflow.id,
+                step=self.step,
+                new_version=date2,
+                render_queue=rabbitmq.RenderAutofetch,  # e.g., cron's fetch
+            )
+        )
+
+        queue_render.assert_called_with(
+            self.step.workflow_id, delta.id, queue=rabbitmq.RenderAutofetch
+        )
 
     @patch.object(rabbitmq, "queue_render_if_consumers_are_listening", async_noop)
     @patch.object(rabbitmq, "queue_render", async_noop)
@@ -151,4 +179,6 @@ class SetStepParamsTests(DbTestCase):
         )
 
         queue_render.assert_not_called()
-        queue_render_if_listening.assert_called_with(self.step.workflow_id, delta.id)
+        queue_render_if_listening.assert_called_with(
+            self.step.workflow_id, delta.id, queue=rabbitmq.Render
+        )
@@ -1,14 +1,16 @@
+import asyncio
 import io
 import json
 import time
 import zipfile
 from cjwkernel.errors import ModuleExitedError
+from cjworkbench.sync import database_sync_to_async
 from cjwstate import s3
 from cjwstate.models.module_registry import MODULE_REGISTRY
 from cjwstate.models.module_version import ModuleVersion
 from cjwstate.modules import init_module_system
 from cjwstate.modules.types import ModuleSpec
-from cjwstate.tests.utils import DbTestCase
+from cjwstate.tests.utils import DbTestCase, create_module_zipfile
 
 
 class ModuleRegistryTest(DbTestCase):
@@ -237,3 +239,52 @@ class ModuleRegistryTest(DbTestCase):
 
         zf = MODULE_REGISTRY.all_latest()["regtest6"]
         self.assertEqual(zf.get_spec(), ModuleSpec(**v2.spec))
+
+    def test_listening_all_latest_without_queries(self):
+        create_module_zipfile(
+            "regtest10",
+            spec_kwargs={"name": "regtest10 v1"},
+            python_code="def render(table, params):\n    return table",
+        )
+
+        @database_sync_to_async
+        def all_latest_without_queries():
+            with self.assertNumQueries(0):
+                return MODULE_REGISTRY.all_latest()
+
+        async def inner():
+            async with MODULE_REGISTRY.listening_for_updates():
+                await database_sync_to_async(MODULE_REGISTRY.all_latest)()
+                return await all_latest_without_queries()
+
+        result = self.run_with_async_db(inner())
+        self.assertEqual(result["regtest10"].get_spec().name, "regtest10 v1")
+
+    def test_listening_reload_after_notify(self):
+        create_module_zipfile(
+            "regtest11",
+            spec_kwargs={"name": "regtest11 v1"},
+            python_code="def render(table, params):\n    return table",
+        )
+
+        async def inner():
+            async with MODULE_REGISTRY.listening_for_updates():
+                zf1 = await database_sync_to_async(MODULE_REGISTRY.latest)("regtest11")
+                time.sleep(0.000002)  # guarantee new timestamp
+                await database_sync_to_async(create_module_zipfile)(
+                    "regtest11",
+                    spec_kwargs={"name": "regtest11 v2"},
+                    python_code="def render(table, params):\n    return table",
+                )
+                # Wait for Postgres to deliver the NOTIFY
+                for _ in range(100):
+                    zf2 = await database_sync_to_async(MODULE_REGISTRY.latest)(
+                        "regtest11"
+                    )
+                    if zf2 is not zf1:
+                        return zf2
+                    await asyncio.sleep(0.01)
+                return zf2
+
+        zf = self.run_with_async_db(inner())
+        self.assertEqual(zf.get_spec().name, "regtest11 v2")
@@ -4,7 +4,7 @@ import uuid as uuidgen
 from cjwkernel.util import tempfile_context
 from cjwstate import s3
 from cjwstate.storedobjects import create_stored_object
-from cjwstate.models import Workflow
+from cjwstate.models import StoredObjectBlob, Workflow
 from cjwstate.tests.utils import DbTestCase, get_s3_object_with_data
 
 
@@ -54,12 +54,9 @@ class StepTests(DbTestCase):
         self.assertEqual(step1d.stored_objects.count(), 1)
         self.assertEqual(step1d.stored_data_version, step1.stored_data_version)
         so2d = step1d.stored_objects.first()
-        # The StoredObject was copied byte for byte into a different file
-        self.assertNotEqual(so2d.key, so2.key)
-        self.assertEqual(
-            get_s3_object_with_data(s3.StoredObjectsBucket, so2d.key)["Body"],
-            get_s3_object_with_data(s3.StoredObjectsBucket, so2.key)["Body"],
-        )
+        # The StoredObject shares its file with the original
+        self.assertEqual(so2d.key, so2.key)
+        self.assertEqual(StoredObjectBlob.objects.get(key=so2.key).n_references, 2)
 
     def test_step_duplicate_disable_auto_update(self):
         # Duplicates should be lightweight by default: no auto-updating.
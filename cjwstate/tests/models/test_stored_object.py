@@ -1,6 +1,8 @@
 from uuid import uuid1
+from cjwkernel.util import tempfile_context
 from cjwstate import s3
-from cjwstate.models import Workflow
+from cjwstate.models import StoredObjectBlob, Workflow
+from cjwstate.storedobjects import create_stored_object
 from cjwstate.tests.utils import DbTestCase, get_s3_object_with_data
 
 
@@ -28,6 +30,30 @@ class StoredObjectTests(DbTestCase):
             b"12345",
         )
 
+    def test_duplicate_blob_shares_file(self):
+        with tempfile_context() as path:
+            path.write_bytes(b"12345")
+            so1 = create_stored_object(self.workflow.id, self.step1.id, path)
+        self.step2 = self.step1.tab.steps.create(order=1, slug="step-2")
+        so2 = so1.duplicate(self.step2)
+
+        self.assertEqual(so2.stored_at, so1.stored_at)
+        self.assertEqual(so2.hash, so1.hash)
+        self.assertEqual(so2.key, so1.key)
+        self.assertEqual(StoredObjectBlob.objects.get(key=so1.key).n_references, 2)
+
+    def test_delete_blob_reference_leaves_file(self):
+        with tempfile_context() as path:
+            path.write_bytes(b"12345")
+            so1 = create_stored_object(self.workflow.id, self.step1.id, path)
+            so2 = create_stored_object(self.workflow.id, self.step1.id, path)
+        so1.delete()
+        self.assertEqual(StoredObjectBlob.objects.get(key=so2.key).n_references, 1)
+        so2.delete()
+        # cron.storedobjectblobdeleter will delete the file
+        self.assertEqual(StoredObjectBlob.objects.get(key=so2.key).n_references, 0)
+        self.assertTrue(s3.exists(s3.StoredObjectsBucket, so2.key))
+
     def test_delete_workflow_deletes_from_s3(self):
         s3.put_bytes(s3.StoredObjectsBucket, "test.dat", b"abcd")
         workflow = Workflow.create_and_init()
@@ -0,0 +1,89 @@
+import unittest
+from unittest.mock import patch
+
+import pyarrow as pa
+
+from cjwstate.rendercache import columnstats
+from cjwstate.rendercache.columnstats import (
+    ColumnStats,
+    column_stats_from_json_bytes,
+    column_stats_to_json_bytes,
+    compute_column_stats,
+)
+
+
+class ColumnStatsTest(unittest.TestCase):
+    def test_text(self):
+        table = pa.table({"A": ["a", "b", "b", None]})
+        self.assertEqual(
+            compute_column_stats(table),
+            [ColumnStats(n_nulls=1, n_distinct=2, value_counts={"a": 1, "b": 2})],
+        )
+
+    def test_dictionary(self):
+        table = pa.table({"A": pa.array(["a", "b", "b", None]).dictionary_encode()})
+        self.assertEqual(
+            compute_column_stats(table),
+            [ColumnStats(n_nulls=1, n_distinct=2, value_counts={"a": 1, "b": 2})],
+        )
+
+    def test_text_too_many_values(self):
+        table = pa.table({"A": ["a", "b", "c"]})
+        with patch.object(columnstats, "MaxNValueCounts", 2):
+            self.assertEqual(
+                compute_column_stats(table),
+                [ColumnStats(n_nulls=0, n_distinct=3, value_counts=None)],
+            )
+
+    def test_number(self):
+        table = pa.table({"A": [3.5, 1.0, None, 1.0], "B": [2, 5, 2, 1]})
+        self.assertEqual(
+            compute_column_stats(table),
+            [
+                ColumnStats(n_nulls=1, n_distinct=2, min=1.0, max=3.5),
+                ColumnStats(n_nulls=0, n_distinct=3, min=1, max=5),
+            ],
+        )
+
+    def test_number_all_null(self):
+        table = pa.table({"A": pa.array([None, None], pa.float64())})
+        self.assertEqual(
+            compute_column_stats(table),
+            [ColumnStats(n_nulls=2, n_distinct=0, min=None, max=None)],
+        )
+
+    def test_timestamp(self):
+        table = pa.table(
+            {
+                "A": pa.array(
+                    [1546398245006007000, None, 1546398245000000000],
+                    pa.timestamp("ns"),
+                )
+            }
+        )
+        self.assertEqual(
+            compute_column_stats(table),
+            [
+                ColumnStats(
+                    n_nulls=1,
+                    n_distinct=2,
+                    min="2019-01-02T03:04:05Z",
+                    max="2019-01-02T03:04:05.006007Z",
+                )
+            ],
+        )
+
+    def test_json_round_trip(self):
+        stats = [
+            ColumnStats(n_nulls=1, n_distinct=2, value_counts={"a": 1, "é": 2}),
+            ColumnStats(n_nulls=0, n_distinct=3, min=1, max=5),
+        ]
+        self.assertEqual(
+            column_stats_from_json_bytes(column_stats_to_json_bytes(stats)), stats
+        )
+
+    def test_from_json_bytes_invalid(self):
+        with self.assertRaises(ValueError):
+            column_stats_from_json_bytes(b"not JSON")
+        with self.assertRaises(ValueError):
+            column_stats_from_json_bytes(b'[{"foo": 1}]')
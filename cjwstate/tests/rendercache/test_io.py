@@ -1,4 +1,6 @@
+import asyncio
 import datetime
+from unittest.mock import patch
 import numpy as np
 import pyarrow as pa
 from cjwkernel.tests.util import arrow_table, assert_render_result_equals
@@ -13,6 +15,7 @@ from cjwkernel.types import (
     TableMetadata,
 )
 from cjwkernel.tests.util import tempfile_context
+from cjwkernel.validate import validate_arrow_file, validate_table_metadata
 from cjwstate import s3
 from cjwstate.models import Workflow, Step
 from cjwstate.tests.utils import DbTestCase
@@ -20,12 +23,26 @@ from cjwstate.rendercache.io import (
     BUCKET,
     CorruptCacheError,
     cache_render_result,
+    commit_staged_render_result,
+    discard_staged_render_result,
     load_cached_render_result,
     open_cached_render_result,
     clear_cached_render_result_for_step,
+    crr_column_stats_key,
+    crr_export_key,
     crr_parquet_key,
+    delete_parquet_files_for_step,
+    read_cached_render_result_column_stats,
+    read_cached_render_result_slice_as_rows,
     read_cached_render_result_slice_as_text,
+    stage_cached_render_result_copy,
+    stage_render_result,
+    stage_render_result_async,
+    streamed_cached_render_result_as_text,
 )
+from cjwstate.rendercache import rowgroups
+from cjwstate.rendercache.columnstats import ColumnStats
+from cjwstate.rendercache.tablecache import TABLE_CACHE
 
 
 class RendercacheIoTests(DbTestCase):
@@ -62,7 +79,7 @@ class RendercacheIoTests(DbTestCase):
 
         self.assertEqual(
             crr_parquet_key(cached),
-            f"wf-{self.workflow.id}/wfm-{self.step.id}/delta-1.dat",
+            f"wf-{self.workflow.id}/wfm-{self.step.id}/delta-1-{cached.nonce}.dat",
         )
 
         # Reading completely freshly from the DB should give the same thing
@@ -73,6 +90,134 @@ class RendercacheIoTests(DbTestCase):
         with open_cached_render_result(from_db) as result2:
             assert_render_result_equals(result2, result)
 
+    def test_cache_render_result_deletes_stale_files(self):
+        cache_render_result(
+            self.workflow, self.step, 1, RenderResult(arrow_table({"A": [1]}))
+        )
+        stale_key = crr_parquet_key(self.step.cached_render_result)
+        self.step.last_relevant_delta_id = 2
+        cache_render_result(
+            self.workflow, self.step, 2, RenderResult(arrow_table({"A": [2]}))
+        )
+        s3.background_remover.wait_for_all()
+        self.assertFalse(s3.exists(BUCKET, stale_key))
+        self.assertTrue(
+            s3.exists(BUCKET, crr_parquet_key(self.step.cached_render_result))
+        )
+
+    def test_cache_render_result_again_uses_new_keys(self):
+        # Another process's queued delete of delta 1's stale keys must not
+        # clobber delta 1, rendered again (e.g., after undo)
+        cache_render_result(
+            self.workflow, self.step, 1, RenderResult(arrow_table({"A": [1]}))
+        )
+        stale_key = crr_parquet_key(self.step.cached_render_result)
+        self.step.last_relevant_delta_id = 2
+        cache_render_result(
+            self.workflow, self.step, 2, RenderResult(arrow_table({"A": [2]}))
+        )
+        self.step.last_relevant_delta_id = 1
+        cache_render_result(
+            self.workflow, self.step, 1, RenderResult(arrow_table({"A": [1]}))
+        )
+        self.assertNotEqual(crr_parquet_key(self.step.cached_render_result), stale_key)
+        s3.remove(BUCKET, stale_key)  # as the other process's delete would
+        with open_cached_render_result(self.step.cached_render_result) as result:
+            assert_render_result_equals(result, RenderResult(arrow_table({"A": [1]})))
+
+    def test_cache_render_result_deletes_stale_exports(self):
+        cache_render_result(
+            self.workflow, self.step, 1, RenderResult(arrow_table({"A": [1]}))
+        )
+        stale_key = crr_export_key(self.step.cached_render_result, "csv")
+        s3.put_bytes(BUCKET, stale_key, b"A\n1\n")
+        self.step.last_relevant_delta_id = 2
+        cache_render_result(
+            self.workflow, self.step, 2, RenderResult(arrow_table({"A": [2]}))
+        )
+        s3.background_remover.wait_for_all()
+        self.assertFalse(s3.exists(BUCKET, stale_key))
+
+    def _copy_stale_result(self, delta_id):
+        crr = self.step.cached_render_result
+        with open_cached_render_result(crr) as result:
+            staged = stage_cached_render_result_copy(crr, delta_id, result)
+        self.step.last_relevant_delta_id = delta_id
+        commit_staged_render_result(self.step, staged)
+
+    def test_stage_cached_render_result_copy_deletes_stale_exports(self):
+        cache_render_result(
+            self.workflow, self.step, 1, RenderResult(arrow_table({"A": [1]}))
+        )
+        stale_key = crr_export_key(self.step.cached_render_result, "json")
+        s3.put_bytes(BUCKET, stale_key, b'[{"A":1}]')
+        self._copy_stale_result(2)
+        s3.background_remover.wait_for_all()
+        self.assertFalse(s3.exists(BUCKET, stale_key))
+
+    def test_stage_and_commit_render_result(self):
+        cache_render_result(
+            self.workflow, self.step, 1, RenderResult(arrow_table({"A": [1]}))
+        )
+        stale_key = crr_parquet_key(self.step.cached_render_result)
+        self.step.last_relevant_delta_id = 2
+        with tempfile_context() as path:
+            staged = stage_render_result(
+                self.workflow.id,
+                self.step.id,
+                2,
+                RenderResult(arrow_table({"A": [2]})),
+                path,
+            )
+        # Staging doesn't touch the database
+        db_step = Step.objects.get(id=self.step.id)
+        self.assertEqual(db_step.cached_render_result_delta_id, 1)
+        commit_staged_render_result(self.step, staged)
+        db_step = Step.objects.get(id=self.step.id)
+        self.assertEqual(db_step.cached_render_result.hash, staged.hash)
+        with open_cached_render_result(db_step.cached_render_result) as result:
+            assert_render_result_equals(result, RenderResult(arrow_table({"A": [2]})))
+        s3.background_remover.wait_for_all()
+        self.assertFalse(s3.exists(BUCKET, stale_key))
+
+    def test_stage_render_result_async(self):
+        with tempfile_context() as path:
+            staged = asyncio.run(
+                stage_render_result_async(
+                    self.workflow.id,
+                    self.step.id,
+                    1,
+                    RenderResult(arrow_table({"A": [1]})),
+                    path,
+                )
+            )
+        commit_staged_render_result(self.step, staged)
+        crr = self.step.cached_render_result
+        with open_cached_render_result(crr) as result:
+            assert_render_result_equals(result, RenderResult(arrow_table({"A": [1]})))
+        self.assertEqual(
+            read_cached_render_result_column_stats(crr),
+            [ColumnStats(n_nulls=0, n_distinct=1, min=1, max=1)],
+        )
+
+    def test_commit_staged_render_result_wrong_delta_id(self):
+        with tempfile_context() as path:
+            staged = stage_render_result(
+                self.workflow.id,
+                self.step.id,
+                1,
+                RenderResult(arrow_table({"A": [1]})),
+                path,
+            )
+        self.step.last_relevant_delta_id = 2
+        with self.assertRaises(AssertionError):
+            commit_staged_render_result(self.step, staged)
+        discard_staged_render_result(staged)
+        s3.background_remover.wait_for_all()
+        self.assertEqual(
+            s3.list_keys_recursive(BUCKET, "wf-%d/" % self.workflow.id), []
+        )
+
     def test_clear(self):
         result = RenderResult(arrow_table({"A": [1]}))
         cache_render_result(self.workflow, self.step, 1, result)
@@ -84,6 +229,98 @@ class RendercacheIoTests(DbTestCase):
 
         self.assertFalse(s3.exists(BUCKET, parquet_key))
 
+    def test_cache_render_result_hash(self):
+        cache_render_result(
+            self.workflow, self.step, 1, RenderResult(arrow_table({"A": [1]}))
+        )
+        hash1 = self.step.cached_render_result.hash
+        self.assertIsNotNone(hash1)
+        self.step.last_relevant_delta_id = 2
+        cache_render_result(
+            self.workflow, self.step, 2, RenderResult(arrow_table({"A": [1]}))
+        )
+        self.assertEqual(self.step.cached_render_result.hash, hash1)
+        self.step.last_relevant_delta_id = 3
+        cache_render_result(
+            self.workflow, self.step, 3, RenderResult(arrow_table({"A": [2]}))
+        )
+        self.assertNotEqual(self.step.cached_render_result.hash, hash1)
+
+    def test_cache_render_result_zero_columns_has_no_hash(self):
+        cache_render_result(self.workflow, self.step, 1, RenderResult())
+        self.assertIsNone(self.step.cached_render_result.hash)
+
+    def test_stage_cached_render_result_copy(self):
+        result = RenderResult(arrow_table({"A": [1]}))
+        cache_render_result(self.workflow, self.step, 1, result, "input-hash")
+        stale_key = crr_parquet_key(self.step.cached_render_result)
+        self._copy_stale_result(2)
+
+        db_step = Step.objects.get(id=self.step.id)
+        crr = db_step.cached_render_result
+        self.assertEqual(crr.delta_id, 2)
+        self.assertEqual(crr.input_hash, "input-hash")
+        s3.background_remover.wait_for_all()
+        self.assertFalse(s3.exists(BUCKET, stale_key))
+        with open_cached_render_result(crr) as result2:
+            assert_render_result_equals(result2, result)
+        self.assertEqual(
+            read_cached_render_result_column_stats(crr),
+            [ColumnStats(n_nulls=0, n_distinct=1, min=1, max=1)],
+        )
+
+    def test_stage_cached_render_result_copy_does_not_touch_database(self):
+        cache_render_result(
+            self.workflow, self.step, 1, RenderResult(arrow_table({"A": [1]}))
+        )
+        crr = self.step.cached_render_result
+        with open_cached_render_result(crr) as result:
+            staged = stage_cached_render_result_copy(crr, 2, result)
+        db_step = Step.objects.get(id=self.step.id)
+        self.assertEqual(db_step.cached_render_result, crr)
+        discard_staged_render_result(staged)
+        s3.background_remover.wait_for_all()
+        self.assertEqual(
+            s3.list_keys_recursive(BUCKET, "wf-%d/" % self.workflow.id),
+            [crr_parquet_key(crr), crr_column_stats_key(crr)],
+        )
+
+    def test_stage_cached_render_result_copy_missing_file(self):
+        cache_render_result(
+            self.workflow, self.step, 1, RenderResult(arrow_table({"A": [1]}))
+        )
+        crr = self.step.cached_render_result
+        s3.remove(BUCKET, crr_parquet_key(crr))
+        with self.assertRaises(CorruptCacheError):
+            stage_cached_render_result_copy(crr, 2, RenderResult())
+
+    def test_read_cached_render_result_column_stats(self):
+        result = RenderResult(arrow_table({"A": ["a", "b", "a"], "B": [1, 2, None]}))
+        cache_render_result(self.workflow, self.step, 1, result)
+        self.assertEqual(
+            read_cached_render_result_column_stats(self.step.cached_render_result),
+            [
+                ColumnStats(n_nulls=0, n_distinct=2, value_counts={"a": 2, "b": 1}),
+                ColumnStats(n_nulls=1, n_distinct=2, min=1, max=2),
+            ],
+        )
+
+    def test_read_cached_render_result_column_stats_missing(self):
+        cache_render_result(
+            self.workflow, self.step, 1, RenderResult(arrow_table({"A": [1]}))
+        )
+        crr = self.step.cached_render_result
+        s3.remove(BUCKET, crr_column_stats_key(crr))
+        self.assertIsNone(read_cached_render_result_column_stats(crr))
+
+    def test_read_cached_render_result_column_stats_invalid(self):
+        cache_render_result(
+            self.workflow, self.step, 1, RenderResult(arrow_table({"A": [1]}))
+        )
+        crr = self.step.cached_render_result
+        s3.put_bytes(BUCKET, crr_column_stats_key(crr), b"NOT JSON")
+        self.assertIsNone(read_cached_render_result_column_stats(crr))
+
     def test_metadata_comes_from_db_columns(self):
         columns = [
             Column("A", ColumnType.Number(format="{:,.2f}")),
@@ -119,6 +356,129 @@ class RendercacheIoTests(DbTestCase):
             with self.assertRaises(CorruptCacheError):
                 load_cached_render_result(crr, arrow_path)
 
+    @patch.object(rowgroups, "RowGroupNRows", 2)
+    def test_load_cached_render_result_from_row_groups(self):
+        # Each row group has its own dictionary for "B": ["a", "b"], ["c"]...
+        result = RenderResult(
+            arrow_table(
+                {"A": [1, 2, 3, 4, 5], "B": pa.array(list("abcde")).dictionary_encode()}
+            )
+        )
+        cache_render_result(self.workflow, self.step, 1, result)
+        crr = self.step.cached_render_result
+        with tempfile_context() as arrow_path:
+            loaded = load_cached_render_result(crr, arrow_path)
+            validate_arrow_file(arrow_path)
+            # One record batch
+            validate_table_metadata(loaded.table.table, crr.table_metadata)
+            assert_render_result_equals(loaded, result)
+
+    def test_read_cached_render_result_slice_as_rows(self):
+        result = RenderResult(
+            arrow_table(
+                {
+                    "A": [1, 2, 3],
+                    "B": ["a", "b", None],
+                    "C": pa.array([1.5, float("nan"), None], pa.float64()),
+                    "D": pa.array(
+                        [2134213412341232967, 1546398245006007000, None],
+                        pa.timestamp("ns"),
+                    ),
+                },
+                columns=[
+                    Column("A", ColumnType.Number()),
+                    Column("B", ColumnType.Text()),
+                    Column("C", ColumnType.Number()),
+                    Column("D", ColumnType.Timestamp()),
+                ],
+            )
+        )
+        cache_render_result(self.workflow, self.step, 1, result)
+        crr = self.step.cached_render_result
+        self.assertEqual(
+            read_cached_render_result_slice_as_rows(crr, range(1, 9), range(1, 9)),
+            [
+                ["b", None, "2019-01-02T03:04:05.006007Z"],
+                [None, None, None],
+            ],
+        )
+
+    def test_read_cached_render_result_slice_as_rows_reuse_table(self):
+        result = RenderResult(arrow_table({"A": [1, 2, 3]}))
+        cache_render_result(self.workflow, self.step, 1, result)
+        crr = self.step.cached_render_result
+        read_cached_render_result_slice_as_rows(crr, range(1), range(1))
+        # prove we don't re-read (from s3 or LOCAL_CACHE)
+        delete_parquet_files_for_step(self.workflow.id, self.step.id)
+        self.assertEqual(
+            read_cached_render_result_slice_as_rows(crr, range(1), range(1, 3)),
+            [[2], [3]],
+        )
+
+    @patch.object(rowgroups, "RowGroupNRows", 2)
+    def test_read_cached_render_result_slice_as_rows_from_row_groups(self):
+        result = RenderResult(arrow_table({"A": [1, 2, 3, 4, 5], "B": list("abcde")}))
+        cache_render_result(self.workflow, self.step, 1, result)
+        crr = self.step.cached_render_result
+        n_misses = TABLE_CACHE.stats().n_misses
+        self.assertEqual(
+            read_cached_render_result_slice_as_rows(crr, range(2), range(1, 4)),
+            [[2, "b"], [3, "c"], [4, "d"]],
+        )
+        # We didn't download the whole file
+        self.assertEqual(TABLE_CACHE.stats().n_misses, n_misses)
+
+    @patch.object(rowgroups, "RowGroupNRows", 2)
+    def test_read_cached_render_result_slice_as_rows_from_row_groups_missing(self):
+        result = RenderResult(arrow_table({"A": [1, 2, 3, 4, 5]}))
+        cache_render_result(self.workflow, self.step, 1, result)
+        crr = self.step.cached_render_result
+        read_cached_render_result_slice_as_rows(crr, range(1), range(1))  # footer
+        s3.remove(BUCKET, crr_parquet_key(crr))
+        with self.assertRaises(CorruptCacheError):
+            read_cached_render_result_slice_as_rows(crr, range(1), range(3, 4))
+
+    def test_read_cached_render_result_slice_as_rows_corrupt_cache_error(self):
+        result = RenderResult(arrow_table({"A": [1]}))
+        cache_render_result(self.workflow, self.step, 1, result)
+        crr = self.step.cached_render_result
+        s3.remove(BUCKET, crr_parquet_key(crr))
+        with self.assertRaises(CorruptCacheError):
+            read_cached_render_result_slice_as_rows(crr, range(1), range(1))
+
+    def test_streamed_cached_render_result_as_text(self):
+        cache_render_result(
+            self.workflow,
+            self.step,
+            1,
+            RenderResult(arrow_table({"A": [1, 2], "B": ["x", None]})),
+        )
+        crr = self.step.cached_render_result
+        with streamed_cached_render_result_as_text(crr, "csv") as chunks:
+            self.assertEqual(b"".join(chunks), b"A,B\n1,x\n2,\n")
+        with streamed_cached_render_result_as_text(crr, "json") as chunks:
+            self.assertEqual(b"".join(chunks), b'[{"A":1,"B":"x"},{"A":2,"B":null}]')
+
+    def test_streamed_cached_render_result_as_text_missing_file(self):
+        cache_render_result(
+            self.workflow, self.step, 1, RenderResult(arrow_table({"A": [1]}))
+        )
+        crr = self.step.cached_render_result
+        s3.remove(BUCKET, crr_parquet_key(crr))
+        with self.assertRaises(CorruptCacheError):
+            with streamed_cached_render_result_as_text(crr, "csv"):
+                pass
+
+    def test_streamed_cached_render_result_as_text_invalid_parquet(self):
+        cache_render_result(
+            self.workflow, self.step, 1, RenderResult(arrow_table({"A": [1]}))
+        )
+        crr = self.step.cached_render_result
+        s3.put_bytes(BUCKET, crr_parquet_key(crr), b"NOT PARQUET")
+        with self.assertRaises(CorruptCacheError):
+            with streamed_cached_render_result_as_text(crr, "csv"):
+                pass
+
     def test_read_cached_render_result_slice_as_text_timestamp(self):
         result = RenderResult(
             arrow_table(
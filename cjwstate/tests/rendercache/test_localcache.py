@@ -0,0 +1,88 @@
+import unittest
+
+from cjwkernel.util import tempdir_context
+from cjwstate import s3
+from cjwstate.rendercache.localcache import LocalCache
+
+Bucket = s3.CachedRenderResultsBucket
+
+
+class LocalCacheTest(unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        s3.remove_recursive(Bucket, "localcache-test/")
+        self.ctx = tempdir_context(prefix="test-localcache-")
+        self.tempdir = self.ctx.__enter__()
+
+    def tearDown(self):
+        self.ctx.__exit__(None, None, None)
+        s3.remove_recursive(Bucket, "localcache-test/")
+        super().tearDown()
+
+    def _cache(self, max_bytes: int = 1000) -> LocalCache:
+        return LocalCache(self.tempdir, max_bytes)
+
+    def test_miss_then_hit(self):
+        s3.put_bytes(Bucket, "localcache-test/a", b"1234")
+        cache = self._cache()
+        with cache.downloaded_file(Bucket, "localcache-test/a") as path:
+            self.assertEqual(path.read_bytes(), b"1234")
+        s3.remove(Bucket, "localcache-test/a")  # prove we don't re-download
+        with cache.downloaded_file(Bucket, "localcache-test/a") as path:
+            self.assertEqual(path.read_bytes(), b"1234")
+        stats = cache.stats()
+        self.assertEqual(stats.n_hits, 1)
+        self.assertEqual(stats.n_misses, 1)
+        self.assertEqual(stats.n_bytes_downloaded, 4)
+        self.assertEqual(stats.n_files, 1)
+        self.assertEqual(stats.n_bytes, 4)
+
+    def test_file_not_found(self):
+        cache = self._cache()
+        with self.assertRaises(FileNotFoundError):
+            with cache.downloaded_file(Bucket, "localcache-test/missing"):
+                pass
+        self.assertEqual(cache.stats().n_files, 0)
+        self.assertEqual(list(cache.root.iterdir()), [])
+
+    def test_evict_least_recently_used(self):
+        s3.put_bytes(Bucket, "localcache-test/a", b"123")
+        s3.put_bytes(Bucket, "localcache-test/b", b"456")
+        s3.put_bytes(Bucket, "localcache-test/c", b"789")
+        cache = self._cache(max_bytes=6)
+        with cache.downloaded_file(Bucket, "localcache-test/a"):
+            pass
+        with cache.downloaded_file(Bucket, "localcache-test/b"):
+            pass
+        with cache.downloaded_file(Bucket, "localcache-test/a"):
+            pass  # now "b" is least-recently used
+        with cache.downloaded_file(Bucket, "localcache-test/c"):
+            pass
+        stats = cache.stats()
+        self.assertEqual(stats.n_evictions, 1)
+        self.assertEqual(stats.n_bytes, 6)
+        with cache.downloaded_file(Bucket, "localcache-test/a"):
+            pass
+        self.assertEqual(cache.stats().n_hits, 2)  # "a" was not evicted
+
+    def test_do_not_evict_pinned_file(self):
+        s3.put_bytes(Bucket, "localcache-test/a", b"123")
+        s3.put_bytes(Bucket, "localcache-test/b", b"456")
+        cache = self._cache(max_bytes=3)
+        with cache.downloaded_file(Bucket, "localcache-test/a") as path_a:
+            with cache.downloaded_file(Bucket, "localcache-test/b") as path_b:
+                self.assertEqual(path_a.read_bytes(), b"123")
+                self.assertEqual(cache.stats().n_bytes, 6)  # both pinned
+            self.assertEqual(path_a.read_bytes(), b"123")
+        # "b" was evicted after unpin, because "a" was pinned
+        self.assertFalse(path_b.exists())
+        self.assertEqual(cache.stats().n_bytes, 3)
+
+    def test_discard_pinned_file_deletes_on_unpin(self):
+        s3.put_bytes(Bucket, "localcache-test/a", b"123")
+        cache = self._cache()
+        with cache.downloaded_file(Bucket, "localcache-test/a") as path:
+            cache.discard_prefix(Bucket, "localcache-test/")
+            self.assertEqual(path.read_bytes(), b"123")
+        self.assertFalse(path.exists())
+        self.assertEqual(cache.stats().n_files, 0)
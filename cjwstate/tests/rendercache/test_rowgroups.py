@@ -0,0 +1,141 @@
+import unittest
+from unittest.mock import patch
+
+import pyarrow as pa
+import pyarrow.parquet
+
+from cjwkernel.types import TableMetadata
+from cjwkernel.util import tempfile_context
+from cjwstate import s3
+from cjwstate.models import CachedRenderResult
+from cjwstate.rendercache import rowgroups
+from cjwstate.rendercache.rowgroups import (
+    FooterCache,
+    ParquetFooter,
+    read_parquet_footer,
+    read_row_range,
+    write_parquet,
+)
+
+Bucket = s3.CachedRenderResultsBucket
+Key = "rowgroups-test.parquet"
+
+
+def _crr(delta_id: int, hash: str = "abc") -> CachedRenderResult:
+    return CachedRenderResult(
+        workflow_id=1,
+        step_id=2,
+        delta_id=delta_id,
+        status="ok",
+        errors=[],
+        json={},
+        table_metadata=TableMetadata(1, []),
+        hash=hash,
+    )
+
+
+class WriteParquetTest(unittest.TestCase):
+    def test_row_groups(self):
+        table = pa.table({"A": [1, 2, 3, 4, 5], "B": ["a", "b", "c", "d", "e"]})
+        with patch.object(rowgroups, "RowGroupNRows", 2):
+            with tempfile_context(suffix=".parquet") as path:
+                write_parquet(path, table)
+                parquet_file = pyarrow.parquet.ParquetFile(str(path))
+                self.assertEqual(parquet_file.num_row_groups, 3)
+                self.assertEqual(parquet_file.read().to_pydict(), table.to_pydict())
+
+    def test_small_table_is_one_row_group(self):
+        with tempfile_context(suffix=".parquet") as path:
+            write_parquet(path, pa.table({"A": [1, 2]}))
+            self.assertEqual(pyarrow.parquet.ParquetFile(str(path)).num_row_groups, 1)
+
+
+class ReadRowRangeTest(unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        s3.remove(Bucket, Key)
+
+    def tearDown(self):
+        s3.remove(Bucket, Key)
+        super().tearDown()
+
+    def _put_table(self, table: pa.Table) -> None:
+        with patch.object(rowgroups, "RowGroupNRows", 3):
+            with tempfile_context(suffix=".parquet") as path:
+                write_parquet(path, table)
+                s3.fput_file(Bucket, Key, path)
+
+    def test_read_across_row_groups(self):
+        self._put_table(
+            pa.table(
+                {
+                    "A": list(range(10)),
+                    "B": [str(i) for i in range(10)],
+                    "C": [float(i) for i in range(10)],
+                }
+            )
+        )
+        footer = read_parquet_footer(Bucket, Key)
+        self.assertEqual(footer.metadata.num_row_groups, 4)
+        columns = read_row_range(Bucket, Key, footer, range(1, 3), range(2, 7))
+        self.assertEqual(
+            [column.to_pylist() for column in columns],
+            [["2", "3", "4", "5", "6"], [2.0, 3.0, 4.0, 5.0, 6.0]],
+        )
+
+    def test_read_dictionary_column(self):
+        self._put_table(
+            pa.table({"A": pa.array(["a", "b", "a", "c", "b"]).dictionary_encode()})
+        )
+        footer = read_parquet_footer(Bucket, Key)
+        columns = read_row_range(Bucket, Key, footer, range(0, 1), range(3, 5))
+        self.assertEqual(columns[0].to_pylist(), ["c", "b"])
+
+    def test_read_footer_file_not_found(self):
+        with self.assertRaises(FileNotFoundError):
+            read_parquet_footer(Bucket, Key)
+
+
+class FooterCacheTest(unittest.TestCase):
+    def _footer(self) -> ParquetFooter:
+        with tempfile_context(suffix=".parquet") as path:
+            write_parquet(path, pa.table({"A": [1, 2]}))
+            return ParquetFooter(
+                path.stat().st_size, pyarrow.parquet.ParquetFile(str(path)).metadata
+            )
+
+    def test_miss_then_hit(self):
+        cache = FooterCache(100000)
+        calls = []
+
+        def read_footer():
+            calls.append(None)
+            return self._footer()
+
+        footer1 = cache.footer(_crr(3), read_footer)
+        footer2 = cache.footer(_crr(3), read_footer)
+        self.assertIs(footer2, footer1)
+        self.assertEqual(len(calls), 1)
+
+    def test_miss_different_hash(self):
+        cache = FooterCache(100000)
+        calls = []
+
+        def read_footer():
+            calls.append(None)
+            return self._footer()
+
+        cache.footer(_crr(3, "abc"), read_footer)
+        cache.footer(_crr(3, "def"), read_footer)
+        self.assertEqual(len(calls), 2)
+
+    def test_read_error_is_not_cached(self):
+        cache = FooterCache(100000)
+
+        def read_footer():
+            raise RuntimeError("corrupt")
+
+        with self.assertRaises(RuntimeError):
+            cache.footer(_crr(3), read_footer)
+        footer = cache.footer(_crr(3), self._footer)
+        self.assertEqual(footer.metadata.num_rows, 2)
@@ -0,0 +1,115 @@
+import shutil
+import unittest
+
+from cjwkernel.tests.util import arrow_table_context
+from cjwkernel.types import TableMetadata
+from cjwkernel.util import tempdir_context
+from cjwstate.models import CachedRenderResult
+from cjwstate.rendercache.tablecache import TableCache
+
+
+def _crr(
+    delta_id: int, table_metadata: TableMetadata, hash: str = "abc"
+) -> CachedRenderResult:
+    return CachedRenderResult(
+        workflow_id=1,
+        step_id=2,
+        delta_id=delta_id,
+        status="ok",
+        errors=[],
+        json={},
+        table_metadata=table_metadata,
+        hash=hash,
+    )
+
+
+class TableCacheTest(unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.ctx = tempdir_context(prefix="test-tablecache-")
+        self.tempdir = self.ctx.__enter__()
+
+    def tearDown(self):
+        self.ctx.__exit__(None, None, None)
+        super().tearDown()
+
+    def test_miss_then_hit(self):
+        cache = TableCache(self.tempdir, 10000)
+        with arrow_table_context({"A": [1, 2]}) as table:
+            calls = []
+
+            def write_arrow_file(path):
+                calls.append(path)
+                shutil.copyfile(table.path, path)
+
+            crr = _crr(3, table.metadata)
+            result1 = cache.table(crr, write_arrow_file)
+            result2 = cache.table(crr, write_arrow_file)
+        self.assertEqual(result1.to_pydict(), {"A": [1, 2]})
+        self.assertIs(result2, result1)
+        self.assertEqual(len(calls), 1)
+        stats = cache.stats()
+        self.assertEqual(stats.n_hits, 1)
+        self.assertEqual(stats.n_misses, 1)
+        self.assertEqual(stats.n_tables, 1)
+
+    def test_miss_different_hash(self):
+        cache = TableCache(self.tempdir, 10000)
+        with arrow_table_context({"A": [1, 2]}) as table:
+            write_arrow_file = lambda path: shutil.copyfile(table.path, path)
+            cache.table(_crr(3, table.metadata, "abc"), write_arrow_file)
+            cache.table(_crr(3, table.metadata, "def"), write_arrow_file)
+        stats = cache.stats()
+        self.assertEqual(stats.n_misses, 2)
+        self.assertEqual(stats.n_tables, 1)  # the old entry was replaced
+
+    def test_write_error_is_not_cached(self):
+        cache = TableCache(self.tempdir, 10000)
+
+        def write_arrow_file(path):
+            raise RuntimeError("corrupt")
+
+        with self.assertRaises(RuntimeError):
+            cache.table(_crr(3, TableMetadata(2, [])), write_arrow_file)
+        self.assertEqual(cache.stats().n_tables, 0)
+        self.assertEqual(list(cache.root.iterdir()), [])
+
+    def test_evict_least_recently_used_but_keep_reading(self):
+        with arrow_table_context({"A": [1, 2]}) as table:
+            size = table.path.stat().st_size
+            cache = TableCache(self.tempdir, size * 2)
+            write_arrow_file = lambda path: shutil.copyfile(table.path, path)
+            result1 = cache.table(_crr(1, table.metadata), write_arrow_file)
+            cache.table(_crr(2, table.metadata), write_arrow_file)
+            cache.table(_crr(1, table.metadata), write_arrow_file)  # 2 is LRU
+            cache.table(_crr(3, table.metadata), write_arrow_file)
+        stats = cache.stats()
+        self.assertEqual(stats.n_evictions, 1)
+        self.assertEqual(stats.n_tables, 2)
+        self.assertEqual(stats.n_bytes, size * 2)
+        # delta 2 was evicted; delta 1 was not
+        cache.table(_crr(1, table.metadata), write_arrow_file)
+        self.assertEqual(cache.stats().n_hits, 2)
+        # An evicted table's memory map outlives its file
+        cache.clear()
+        self.assertEqual(result1.to_pydict(), {"A": [1, 2]})
+
+    def test_keep_oversized_table_for_the_next_tile(self):
+        with arrow_table_context({"A": [1, 2]}) as table:
+            size = table.path.stat().st_size
+            cache = TableCache(self.tempdir, size - 1)
+            calls = []
+
+            def write_arrow_file(path):
+                calls.append(path)
+                shutil.copyfile(table.path, path)
+
+            cache.table(_crr(1, table.metadata), write_arrow_file)
+            cache.table(_crr(1, table.metadata), write_arrow_file)
+            self.assertEqual(len(calls), 1)
+            self.assertEqual(cache.stats().n_bytes, size)
+            # The next conversion evicts it
+            cache.table(_crr(2, table.metadata), write_arrow_file)
+        stats = cache.stats()
+        self.assertEqual(stats.n_evictions, 1)
+        self.assertEqual(stats.n_tables, 1)
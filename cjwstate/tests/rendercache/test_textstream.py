@@ -0,0 +1,65 @@
+import json
+import unittest
+from unittest.mock import patch
+
+import pyarrow as pa
+import pyarrow.parquet
+
+from cjwkernel.tests.util import parquet_file
+from cjwstate.rendercache import textstream
+from cjwstate.rendercache.textstream import (
+    iter_parquet_file_as_csv,
+    iter_parquet_file_as_json,
+)
+
+
+def _csv(table) -> bytes:
+    with parquet_file(table) as path:
+        return b"".join(iter_parquet_file_as_csv(pyarrow.parquet.ParquetFile(path)))
+
+
+def _json(table) -> bytes:
+    with parquet_file(table) as path:
+        return b"".join(iter_parquet_file_as_json(pyarrow.parquet.ParquetFile(path)))
+
+
+class TextStreamTest(unittest.TestCase):
+    def test_csv(self):
+        self.assertEqual(
+            _csv({"A": [1, 2], "B": ["x", None], "C": [1.0, 2.5]}),
+            b"A,B,C\n1,x,1\n2,,2.5\n",
+        )
+
+    def test_csv_quote(self):
+        self.assertEqual(
+            _csv({"A,B": ['a "b"', "c\nd"]}), b'"A,B"\n"a ""b"""\n"c\nd"\n'
+        )
+
+    def test_csv_timestamp(self):
+        table = pa.table(
+            {"A": pa.array([1546398245006007000, None], pa.timestamp("ns"))}
+        )
+        self.assertEqual(_csv(table), b"A\n2019-01-02T03:04:05.006007Z\n\n")
+
+    def test_csv_no_rows(self):
+        self.assertEqual(_csv({"A": pa.array([], pa.utf8())}), b"A\n")
+
+    def test_json(self):
+        self.assertEqual(
+            json.loads(_json({"A": [1, 2], "B": ["x", None]})),
+            [{"A": 1, "B": "x"}, {"A": 2, "B": None}],
+        )
+
+    def test_json_nan_is_null(self):
+        self.assertEqual(_json({"A": [float("nan")]}), b'[{"A":null}]')
+
+    def test_json_no_rows(self):
+        self.assertEqual(_json({"A": pa.array([], pa.utf8())}), b"[]")
+
+    def test_chunks(self):
+        with patch.object(textstream, "NRowsPerChunk", 2):
+            with parquet_file({"A": [1, 2, 3]}) as path:
+                chunks = list(
+                    iter_parquet_file_as_json(pyarrow.parquet.ParquetFile(path))
+                )
+        self.assertEqual(chunks, [b'[{"A":1},{"A":2}', b',{"A":3}', b"]"])
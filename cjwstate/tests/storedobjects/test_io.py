@@ -1,12 +1,58 @@
 from django.test.utils import override_settings
 
 from cjwkernel.tests.util import tempfile_context
-from cjwstate.models import Workflow
+from cjwstate import s3
+from cjwstate.models import StoredObjectBlob, Workflow
 from cjwstate.storedobjects.io import (
     create_stored_object,
     delete_old_files_to_enforce_storage_limits,
 )
-from cjwstate.tests.utils import DbTestCase
+from cjwstate.tests.utils import DbTestCase, get_s3_object_with_data
+from cjwstate.util import hash_file
+
+
+class CreateStoredObjectTests(DbTestCase):
+    def test_hash(self):
+        workflow = Workflow.create_and_init()
+        step = workflow.tabs.first().steps.create(order=1, module_id_name="x")
+
+        with tempfile_context() as path:
+            path.write_text("abc123")
+            stored_object = create_stored_object(workflow.id, step.id, path)
+            self.assertEqual(stored_object.hash, hash_file(path))
+
+    def test_identical_contents_share_a_file(self):
+        workflow1 = Workflow.create_and_init()
+        step1 = workflow1.tabs.first().steps.create(order=1, module_id_name="x")
+        workflow2 = Workflow.create_and_init()
+        step2 = workflow2.tabs.first().steps.create(order=1, module_id_name="x")
+
+        with tempfile_context() as path:
+            path.write_text("abc123")
+            so1 = create_stored_object(workflow1.id, step1.id, path)
+            so2 = create_stored_object(workflow2.id, step2.id, path)
+
+        self.assertEqual(so1.key, so2.key)
+        self.assertEqual(StoredObjectBlob.objects.get(key=so1.key).n_references, 2)
+        self.assertEqual(
+            get_s3_object_with_data(s3.StoredObjectsBucket, so1.key)["Body"],
+            b"abc123",
+        )
+
+    def test_reupload_orphan_blob(self):
+        workflow = Workflow.create_and_init()
+        step = workflow.tabs.first().steps.create(order=1, module_id_name="x")
+
+        with tempfile_context() as path:
+            path.write_text("abc123")
+            so1 = create_stored_object(workflow.id, step.id, path)
+            so1.delete()
+            # cron.storedobjectblobdeleter has begun deleting the file
+            s3.remove(s3.StoredObjectsBucket, so1.key)
+            so2 = create_stored_object(workflow.id, step.id, path)
+
+        self.assertEqual(StoredObjectBlob.objects.get(key=so2.key).n_references, 1)
+        self.assertTrue(s3.exists(s3.StoredObjectsBucket, so2.key))
 
 
 class EnforceStorageLimitsTests(DbTestCase):
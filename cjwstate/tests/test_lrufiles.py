@@ -0,0 +1,119 @@
+import os
+import subprocess
+import unittest
+
+from cjwkernel.util import tempdir_context
+from cjwstate.lrufiles import LruFiles, make_process_dir
+
+
+class MakeProcessDirTest(unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.ctx = tempdir_context(prefix="test-lrufiles-")
+        self.tempdir = self.ctx.__enter__()
+
+    def tearDown(self):
+        self.ctx.__exit__(None, None, None)
+        super().tearDown()
+
+    def test_remove_dead_process_dirs(self):
+        dead_process = subprocess.Popen(["true"])
+        dead_process.wait()  # now its PID is free
+        dead_dir = self.tempdir / ("pid-%d-abc" % dead_process.pid)
+        dead_dir.mkdir()
+        (dead_dir / "file").write_bytes(b"data")
+        live_dir = self.tempdir / ("pid-%d-abc" % os.getppid())
+        live_dir.mkdir()
+        other_dir = self.tempdir / "not-a-pid"
+        other_dir.mkdir()
+
+        path = make_process_dir(self.tempdir)
+        self.assertTrue(path.name.startswith("pid-%d-" % os.getpid()))
+        self.assertFalse(dead_dir.exists())
+        self.assertTrue(live_dir.exists())
+        self.assertTrue(other_dir.exists())
+
+    def test_remove_dir_of_dead_process_with_our_pid(self):
+        old_dir = self.tempdir / ("pid-%d-old" % os.getpid())
+        old_dir.mkdir()
+        make_process_dir(self.tempdir)
+        self.assertFalse(old_dir.exists())
+
+    def test_keep_own_dirs(self):
+        path1 = make_process_dir(self.tempdir)
+        path2 = make_process_dir(self.tempdir)
+        self.assertTrue(path1.exists())
+        self.assertTrue(path2.exists())
+
+
+class LruFilesTest(unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.ctx = tempdir_context(prefix="test-lrufiles-")
+        self.tempdir = self.ctx.__enter__()
+
+    def tearDown(self):
+        self.ctx.__exit__(None, None, None)
+        super().tearDown()
+
+    def _add(self, files: LruFiles, key: str, data: bytes, **kwargs):
+        path = files.mkstemp(prefix="test-")
+        path.write_bytes(data)
+        return files.add(key, path, **kwargs)
+
+    def test_evict_least_recently_used(self):
+        files = LruFiles(self.tempdir, 6)
+        a = self._add(files, "a", b"123")
+        self._add(files, "b", b"456")
+        files.get("a")  # now "b" is least-recently used
+        self._add(files, "c", b"789")
+        self.assertIsNone(files.get("b"))
+        self.assertEqual(files.get("a"), a)
+        self.assertEqual(files.n_evictions, 1)
+        self.assertEqual(files.n_bytes, 6)
+
+    def test_keep_oversized_file_until_next_add(self):
+        files = LruFiles(self.tempdir, 2)
+        self._add(files, "a", b"1")
+        big = self._add(files, "b", b"12345")
+        self.assertIsNone(files.get("a"))
+        self.assertEqual(files.get("b"), big)
+        self._add(files, "c", b"1")
+        self.assertIsNone(files.get("b"))
+        self.assertFalse(big.path.exists())
+
+    def test_do_not_evict_pinned_file(self):
+        files = LruFiles(self.tempdir, 3)
+        a = self._add(files, "a", b"123", pin=True)
+        self._add(files, "b", b"456")
+        self._add(files, "c", b"789")
+        self.assertTrue(a.path.exists())
+        self.assertEqual(files.n_files, 2)  # "b" was evicted; "c" is new
+        files.unpin(a)
+        self.assertFalse(a.path.exists())  # evicted after unpin
+        self.assertEqual(files.n_bytes, 3)
+
+    def test_discard_pinned_file_deletes_on_unpin(self):
+        files = LruFiles(self.tempdir, 10)
+        a = self._add(files, "a", b"123", pin=True)
+        files.discard("a")
+        self.assertTrue(a.path.exists())
+        self.assertEqual(files.n_files, 0)
+        files.unpin(a)
+        self.assertFalse(a.path.exists())
+
+    def test_add_no_replace_returns_existing(self):
+        files = LruFiles(self.tempdir, 10)
+        a = self._add(files, "a", b"123", value="first")
+        a2 = self._add(files, "a", b"456", value="second", replace=False)
+        self.assertIs(a2, a)
+        self.assertEqual(a.path.read_bytes(), b"123")
+        self.assertEqual(len(list(files.root.iterdir())), 1)
+
+    def test_add_replace(self):
+        files = LruFiles(self.tempdir, 10)
+        a = self._add(files, "a", b"123", value="first")
+        self._add(files, "a", b"456", value="second")
+        self.assertEqual(files.get("a").value, "second")
+        self.assertFalse(a.path.exists())
+        self.assertEqual(files.n_bytes, 3)
@@ -1,5 +1,10 @@
+import asyncio
+import io
 import unittest
 
+from django.test import override_settings
+
+from cjwkernel.util import tempfile_context
 from cjwstate import s3
 
 Bucket = s3.CachedRenderResultsBucket
@@ -32,3 +37,123 @@ class TemporarilyDownloadTest(unittest.TestCase):
         with self.assertRaises(FileNotFoundError):
             with s3.temporarily_download(Bucket, Key) as _:
                 pass
+
+
+class GetRangeTest(unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        _clear()
+
+    def tearDown(self):
+        _clear()
+        super().tearDown()
+
+    def test_get_range(self):
+        _put(b"0123456789")
+        self.assertEqual(s3.get_range(Bucket, Key, 2, 5), b"234")
+
+    def test_get_range_past_end(self):
+        _put(b"0123456789")
+        self.assertEqual(s3.get_range(Bucket, Key, 8, 20), b"89")
+        self.assertEqual(s3.get_range(Bucket, Key, 10, 20), b"")
+
+    def test_get_range_empty(self):
+        _put(b"0123456789")
+        self.assertEqual(s3.get_range(Bucket, Key, 5, 5), b"")
+
+    def test_get_range_file_not_found(self):
+        with self.assertRaises(FileNotFoundError):
+            s3.get_range(Bucket, Key, 0, 1)
+
+
+class RangeFileTest(unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        _clear()
+
+    def tearDown(self):
+        _clear()
+        super().tearDown()
+
+    def test_read_and_seek(self):
+        _put(b"0123456789")
+        with s3.open_range_file(Bucket, Key, buffer_size=4) as f:
+            self.assertEqual(f.read(3), b"012")
+            f.seek(-2, io.SEEK_END)
+            self.assertEqual(f.read(), b"89")
+            f.seek(4)
+            self.assertEqual(f.read(2), b"45")
+            self.assertEqual(f.tell(), 6)
+
+    def test_file_not_found(self):
+        with self.assertRaises(FileNotFoundError):
+            s3.open_range_file(Bucket, Key)
+
+
+class AsyncTransferTest(unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        _clear()
+
+    def tearDown(self):
+        _clear()
+        super().tearDown()
+
+    def test_fput_file_and_download(self):
+        with tempfile_context() as path:
+            path.write_bytes(b"1234")
+            asyncio.run(s3.fput_file_async(Bucket, Key, path))
+        with tempfile_context() as path:
+            asyncio.run(s3.download_async(Bucket, Key, path))
+            self.assertEqual(path.read_bytes(), b"1234")
+
+    def test_download_file_not_found(self):
+        with tempfile_context() as path:
+            with self.assertRaises(FileNotFoundError):
+                asyncio.run(s3.download_async(Bucket, Key, path))
+
+
+class RemoveTest(unittest.TestCase):
+    Prefix = "s3-remove-test/"
+
+    def setUp(self):
+        super().setUp()
+        s3.remove_recursive(Bucket, self.Prefix)
+
+    def tearDown(self):
+        s3.remove_recursive(Bucket, self.Prefix)
+        super().tearDown()
+
+    def _put_keys(self, n: int):
+        keys = ["%sfile-%d" % (self.Prefix, i) for i in range(n)]
+        for key in keys:
+            s3.put_bytes(Bucket, key, b"x")
+        return keys
+
+    @override_settings(S3_SUPPORTS_DELETE_OBJECTS=True)
+    def test_remove_many_delete_objects(self):
+        keys = self._put_keys(3)
+        s3.remove_many(Bucket, keys[:2] + [self.Prefix + "missing"])
+        self.assertEqual(s3.list_keys_recursive(Bucket, self.Prefix), keys[2:])
+
+    @override_settings(S3_SUPPORTS_DELETE_OBJECTS=False)
+    def test_remove_many_one_at_a_time(self):
+        keys = self._put_keys(3)
+        s3.remove_many(Bucket, keys[:2] + [self.Prefix + "missing"])
+        self.assertEqual(s3.list_keys_recursive(Bucket, self.Prefix), keys[2:])
+
+    def test_remove_recursive(self):
+        self._put_keys(3)
+        s3.put_bytes(Bucket, "s3-remove-test-other", b"x")
+        try:
+            s3.remove_recursive(Bucket, self.Prefix)
+            self.assertEqual(s3.list_keys_recursive(Bucket, self.Prefix), [])
+            self.assertTrue(s3.exists(Bucket, "s3-remove-test-other"))
+        finally:
+            s3.remove(Bucket, "s3-remove-test-other")
+
+    def test_background_remover(self):
+        keys = self._put_keys(2)
+        s3.background_remover.remove_many(Bucket, keys[:1])
+        s3.background_remover.wait_for_all()
+        self.assertEqual(s3.list_keys_recursive(Bucket, self.Prefix), keys[1:])
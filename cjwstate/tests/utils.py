@@ -13,6 +13,9 @@ from cjwstate import s3
 from cjwstate.models.module_version import ModuleVersion
 from cjwstate.models.module_registry import MODULE_REGISTRY
 from cjwstate.modules.types import ModuleZipfile
+from cjwstate.rendercache.localcache import LOCAL_CACHE
+from cjwstate.rendercache.rowgroups import FOOTER_CACHE
+from cjwstate.rendercache.tablecache import TABLE_CACHE
 
 
 class DbTestCase(BaseDbTestCase):
@@ -123,6 +126,9 @@ def create_module_zipfile(
 
 
 def clear_s3():
+    # Don't let a previous test's queued deletes remove this test's files
+    s3.background_remover.wait_for_all()
+
     buckets = (
         s3.UserFilesBucket,
         s3.StoredObjectsBucket,
@@ -134,6 +140,10 @@ def clear_s3():
     for bucket in buckets:
         s3.remove_recursive(bucket, "/", force=True)
 
+    LOCAL_CACHE.clear()
+    TABLE_CACHE.clear()
+    FOOTER_CACHE.clear()
+
 
 def get_s3_object_with_data(bucket: str, key: str, **kwargs) -> Dict[str, Any]:
     """Like client.get_object(), but response['Body'] is bytes."""
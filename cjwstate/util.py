@@ -1,3 +1,5 @@
+import hashlib
+from pathlib import Path
 from typing import Any, Iterable, List, Tuple
 
 
@@ -27,3 +29,18 @@ def find_deletable_ids(
                 ret.append(id)
 
     return ret
+
+
+def hash_file(path: Path) -> str:
+    """Return a hex digest of the file at `path`, reading it in chunks.
+
+    Two files with the same digest have the same contents.
+    """
+    digest = hashlib.blake2b(digest_size=16)  # fits StoredObject.hash
+    with path.open("rb") as f:
+        while True:
+            chunk = f.read(1024 * 1024)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
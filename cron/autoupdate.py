@@ -1,72 +1,330 @@
+import asyncio
+from contextlib import asynccontextmanager
 import datetime
+import heapq
 import logging
-from typing import List, Tuple
+import time
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+import asyncpg
+from django.conf import settings
 
 from cjworkbench.pg_render_locker import PgRenderLocker, WorkflowAlreadyLocked
 from cjworkbench.sync import database_sync_to_async
 from cjwstate import clientside, rabbitmq
 from cjwstate.models import Step
+from cjwstate.models.step import AUTOFETCH_NOTIFY_CHANNEL
 
 
 logger = logging.getLogger(__name__)
 
 
+ResyncInterval = 600  # seconds between full reloads, in case we missed a NOTIFY
+LockedRetryDelay = 10  # seconds to wait before retrying a rendering workflow
+
+
 @database_sync_to_async
-def load_pending_steps() -> List[Tuple[int, Step]]:
-    """Return list of (workflow_id, step_id) with pending fetches."""
-    now = datetime.datetime.now()
-    # Step.workflow_id is a database operation
-    return list(
-        Step.objects.filter(
-            is_deleted=False,
-            tab__is_deleted=False,
-            is_busy=False,  # not already scheduled
-            auto_update_data=True,  # user wants auto-update
-            next_update__isnull=False,  # DB isn't inconsistent
-            next_update__lte=now,  # enough time has passed
-        ).values_list("tab__workflow_id", "id")
+def load_pending_steps(
+    step_ids: Optional[List[int]] = None,
+) -> List[Tuple[int, int, datetime.datetime]]:
+    """Return list of (workflow_id, step_id, next_update) of auto-update steps.
+
+    If `step_ids` is set, only consider those steps.
+    """
+    steps = Step.objects.filter(
+        is_deleted=False,
+        tab__is_deleted=False,
+        is_busy=False,  # not already scheduled
+        auto_update_data=True,  # user wants auto-update
+        next_update__isnull=False,  # DB isn't inconsistent
     )
+    if step_ids is not None:
+        steps = steps.filter(id__in=step_ids)
+    # Step.workflow_id is a database operation
+    return list(steps.values_list("tab__workflow_id", "id", "next_update"))
 
 
 @database_sync_to_async
-def set_step_busy(step_id):
+def set_steps_busy(step_ids: List[int]) -> None:
     # Database writes can't be on the event-loop thread
-    Step.objects.filter(id=step_id).update(is_busy=True)
+    Step.objects.filter(id__in=step_ids).update(is_busy=True)
 
 
-async def queue_fetches(pg_render_locker: PgRenderLocker):
-    """
-    Queue all pending fetches in RabbitMQ.
+class _Scheduled(NamedTuple):
+    workflow_id: int
+    next_update: datetime.datetime
+    due_at: datetime.datetime
+    """When to queue: `next_update`, or later if the workflow was rendering."""
+
+
+class AutofetchStats(NamedTuple):
+    n_scheduled: int
+    """Number of steps waiting for their `next_update`."""
+
+    n_queued: int
+    """Number of fetches queued."""
 
-    We'll set is_busy=True as we queue them, so we don't send double-fetches.
+    lag_seconds: float
+    """Total time between fetches' `next_update` and when we queued them."""
+
+    max_lag_seconds: float
+    """Longest time between a fetch's `next_update` and when we queued it."""
+
+
+class AutofetchScheduler:
+    """Queue each auto-update step's fetch when its `next_update` arrives.
+
+    We keep a min-heap of every auto-update step's `next_update`, loaded from
+    the "pending_update_queue" index. Then we sleep until the earliest one.
+
+    Within `listening()`, Postgres tells us (via AUTOFETCH_NOTIFY_CHANNEL)
+    when a step's schedule may have changed. We re-read those steps, in a
+    batch, before we sleep again. Writers that don't NOTIFY (e.g., deleting a
+    tab) leave stale entries; so when an entry comes due we re-read it before
+    queueing it, and every `ResyncInterval` we reload everything.
+
+    This runs on one event loop. It isn't thread-safe.
     """
-    pending_ids = await load_pending_steps()
-
-    for workflow_id, step_id in pending_ids:
-        # Don't schedule a fetch if we're currently rendering.
-        #
-        # This still lets us schedule a fetch if a render is _queued_, so it
-        # doesn't solve any races. But it should lower the number of fetches of
-        # resource-intensive workflows.
-        #
-        # Using pg_render_locker means we can only queue a fetch _between_
-        # renders. The fetch/render queues may be non-empty (we aren't
-        # checking); but we're giving the renderers a chance to tackle some
-        # backlog.
+
+    def __init__(self):
+        self._heap: List[Tuple[datetime.datetime, int]] = []  # (due_at, step_id)
+        self._scheduled: Dict[int, _Scheduled] = {}  # step_id => _Scheduled
+        self._changed_step_ids: Set[int] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._n_queued = 0
+        self._lag_seconds = 0.0
+        self._max_lag_seconds = 0.0
+
+    def _schedule(
+        self,
+        workflow_id: int,
+        step_id: int,
+        next_update: datetime.datetime,
+        due_at: Optional[datetime.datetime] = None,
+    ) -> None:
+        scheduled = _Scheduled(workflow_id, next_update, due_at or next_update)
+        self._scheduled[step_id] = scheduled
+        # Leave any old heap entry: _pop_due() will skip it.
+        heapq.heappush(self._heap, (scheduled.due_at, step_id))
+
+    def _peek_due_at(self) -> Optional[datetime.datetime]:
+        """Return when the next fetch is due, or None if nothing is scheduled."""
+        while self._heap:
+            due_at, step_id = self._heap[0]
+            scheduled = self._scheduled.get(step_id)
+            if scheduled is not None and scheduled.due_at == due_at:
+                return due_at
+            heapq.heappop(self._heap)  # stale
+        return None
+
+    def _pop_due(self, now: datetime.datetime) -> Dict[int, _Scheduled]:
+        """Unschedule and return steps due at or before `now`."""
+        due = {}
+        while True:
+            due_at = self._peek_due_at()
+            if due_at is None or due_at > now:
+                return due
+            _, step_id = heapq.heappop(self._heap)
+            due[step_id] = self._scheduled.pop(step_id)
+
+    async def reload(self, step_ids: Optional[List[int]] = None) -> None:
+        """Re-read `step_ids` (or all steps) from the database."""
+        rows = await load_pending_steps(step_ids)
+        if step_ids is None:
+            self._scheduled = {}
+            self._heap = []
+        else:
+            for step_id in step_ids:
+                self._scheduled.pop(step_id, None)
+        for workflow_id, step_id, next_update in rows:
+            self._schedule(workflow_id, step_id, next_update)
+        if step_ids is None:
+            logger.info("Loaded %d autofetch steps", len(self._scheduled))
+
+    async def queue_due_fetches(
+        self, pg_render_locker: PgRenderLocker, now: datetime.datetime
+    ) -> None:
+        """Queue fetches of all steps due at `now`.
+
+        We'll set is_busy=True as we queue them, so we don't send double-fetches.
+        """
+        due = self._pop_due(now)
+        if not due:
+            return
+
+        # A NOTIFY may not have reached us yet. Queue only steps that are
+        # still due according to the database.
+        step_ids_by_workflow: Dict[int, List[int]] = {}
+        next_updates: Dict[int, datetime.datetime] = {}  # step_id => next_update
+        for workflow_id, step_id, next_update in await load_pending_steps(list(due)):
+            if next_update > now:
+                self._schedule(workflow_id, step_id, next_update)
+            else:
+                step_ids_by_workflow.setdefault(workflow_id, []).append(step_id)
+                next_updates[step_id] = next_update
+
+        retry_at = now + datetime.timedelta(seconds=LockedRetryDelay)
+        for workflow_id, step_ids in list(step_ids_by_workflow.items()):
+            # Don't schedule a fetch if we're currently rendering.
+            #
+            # This still lets us schedule a fetch if a render is _queued_, so
+            # it doesn't solve any races. But it should lower the number of
+            # fetches of resource-intensive workflows.
+            #
+            # Using pg_render_locker means we can only queue a fetch _between_
+            # renders. The fetch/render queues may be non-empty (we aren't
+            # checking); but we're giving the renderers a chance to tackle
+            # some backlog.
+            try:
+                async with pg_render_locker.render_lock(workflow_id) as lock:
+                    # At this moment, the workflow isn't rendering. Let's pass
+                    # through and queue the fetch.
+                    await lock.stall_others()  # required by the PgRenderLocker API
+            except WorkflowAlreadyLocked:
+                # Don't queue a fetch. Try again soon.
+                del step_ids_by_workflow[workflow_id]
+                for step_id in step_ids:
+                    self._schedule(
+                        workflow_id, step_id, next_updates[step_id], retry_at
+                    )
+
+        step_ids = [
+            step_id
+            for workflow_step_ids in step_ids_by_workflow.values()
+            for step_id in workflow_step_ids
+        ]
+        if not step_ids:
+            return
+
+        await set_steps_busy(step_ids)
+        await asyncio.gather(
+            *(
+                rabbitmq.send_update_to_workflow_clients(
+                    workflow_id,
+                    clientside.Update(
+                        steps={
+                            step_id: clientside.StepUpdate(is_busy=True)
+                            for step_id in workflow_step_ids
+                        }
+                    ),
+                )
+                for workflow_id, workflow_step_ids in step_ids_by_workflow.items()
+            ),
+            *(
+                # Nobody is waiting for these renders
+                rabbitmq.queue_fetch(
+                    workflow_id, step_id, render_queue=rabbitmq.RenderAutofetch
+                )
+                for workflow_id, workflow_step_ids in step_ids_by_workflow.items()
+                for step_id in workflow_step_ids
+            ),
+        )
+
+        lags = [(now - next_updates[step_id]).total_seconds() for step_id in step_ids]
+        self._n_queued += len(lags)
+        self._lag_seconds += sum(lags)
+        self._max_lag_seconds = max(self._max_lag_seconds, *lags)
+        logger.info(
+            "Queued %d fetches (lag: mean %0.1fs, max %0.1fs)",
+            len(lags),
+            sum(lags) / len(lags),
+            max(lags),
+        )
+
+    def stats(self) -> AutofetchStats:
+        """Report how many fetches we queued, and how late."""
+        return AutofetchStats(
+            n_scheduled=len(self._scheduled),
+            n_queued=self._n_queued,
+            lag_seconds=self._lag_seconds,
+            max_lag_seconds=self._max_lag_seconds,
+        )
+
+    def _on_notify(self, connection, pid, channel, payload):
         try:
-            async with pg_render_locker.render_lock(workflow_id) as lock:
-                # At this moment, the workflow isn't rendering. Let's pass
-                # through and queue the fetch.
-                await lock.stall_others()  # required by the PgRenderLocker API
-
-            logger.info("Queue fetch of step(%d, %d)", workflow_id, step_id)
-            await set_step_busy(step_id)
-            await rabbitmq.send_update_to_workflow_clients(
-                workflow_id,
-                clientside.Update(steps={step_id: clientside.StepUpdate(is_busy=True)}),
+            step_id = int(payload)
+        except ValueError:
+            logger.warning("Ignoring invalid %s payload %r", channel, payload)
+            return
+        self._changed_step_ids.add(step_id)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    @asynccontextmanager
+    async def listening(self):
+        """Re-read steps when Postgres notifies us, within this block.
+
+        We LISTEN on a dedicated asyncpg connection. If it dies, we log it and
+        rely on `ResyncInterval` reloads.
+        """
+        pg_config = settings.DATABASES["default"]
+        pg_connection = await asyncpg.connect(
+            host=pg_config["HOST"],
+            user=pg_config["USER"],
+            password=pg_config["PASSWORD"],
+            database=pg_config["NAME"],
+            port=pg_config["PORT"],
+            timeout=pg_config["CONN_MAX_AGE"],
+            command_timeout=pg_config["CONN_MAX_AGE"],
+        )
+        await pg_connection.add_listener(AUTOFETCH_NOTIFY_CHANNEL, self._on_notify)
+
+        heartbeat_task = asyncio.get_event_loop().create_task(
+            self._send_pg_heartbeats_forever(pg_connection, pg_config["CONN_MAX_AGE"])
+        )
+
+        try:
+            yield
+        finally:
+            heartbeat_task.cancel()
+            # Like PgRenderLocker, don't try to .close(): terminate() can't
+            # be interrupted.
+            pg_connection.terminate()
+
+    async def _send_pg_heartbeats_forever(
+        self, pg_connection: asyncpg.Connection, interval: float
+    ) -> None:
+        """Keep the LISTEN connection alive; log if it dies."""
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                await pg_connection.fetchval(
+                    "SELECT 'autofetch_heartbeat'", timeout=interval
+                )
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception(
+                "Lost LISTEN connection; autofetch will only reload every %ds",
+                ResyncInterval,
             )
-            await rabbitmq.queue_fetch(workflow_id, step_id)
-        except WorkflowAlreadyLocked:
-            # Don't queue a fetch. We'll revisit this Step next time we
-            # query for pending fetches.
-            pass
+
+    async def run_forever(self, pg_render_locker: PgRenderLocker) -> None:
+        """Queue fetches as they come due, forever."""
+        self._wakeup = asyncio.Event()
+        next_resync_at = 0.0
+
+        while True:
+            # Clear before reading: a NOTIFY that arrives while we work will
+            # wake the next wait.
+            self._wakeup.clear()
+
+            if time.time() >= next_resync_at:
+                self._changed_step_ids = set()  # reload() reads everything
+                await self.reload()
+                next_resync_at = time.time() + ResyncInterval
+            elif self._changed_step_ids:
+                step_ids = list(self._changed_step_ids)
+                self._changed_step_ids = set()
+                await self.reload(step_ids)
+
+            await self.queue_due_fetches(pg_render_locker, datetime.datetime.now())
+
+            delay = next_resync_at - time.time()
+            due_at = self._peek_due_at()
+            if due_at is not None:
+                delay = min(delay, (due_at - datetime.datetime.now()).total_seconds())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(0, delay))
+            except asyncio.TimeoutError:
+                pass
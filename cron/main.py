@@ -1,36 +1,19 @@
 import asyncio
 import logging
-import math
 import os
-import time
-import warnings
 
 from cjworkbench.pg_render_locker import PgRenderLocker
-from cjworkbench.util import benchmark
 
 
 logger = logging.getLogger(__name__)
 
 
-FetchInterval = 60  # seconds
-
-
 async def queue_fetches_forever():
-    from .autoupdate import queue_fetches  # AFTER django.setup() init
-
-    async with PgRenderLocker() as pg_render_locker:
-        while True:
-            t1 = time.time()
-
-            await benchmark(logger, queue_fetches(pg_render_locker), "queue_fetches()")
-
-            # Try to fetch at the beginning of each interval. Canonical example
-            # is FetchInterval=60: queue all our fetches as soon as the minute
-            # hand of the clock moves.
+    from .autoupdate import AutofetchScheduler  # AFTER django.setup() init
 
-            next_t = (math.floor(t1 / FetchInterval) + 1) * FetchInterval
-            delay = max(0, next_t - time.time())
-            await asyncio.sleep(delay)
+    scheduler = AutofetchScheduler()
+    async with PgRenderLocker() as pg_render_locker, scheduler.listening():
+        await scheduler.run_forever(pg_render_locker)
 
 
 def exit_on_exception(loop, context):
@@ -0,0 +1,57 @@
+import logging
+import time
+
+import django
+import django.db
+
+from cjworkbench.util import benchmark_sync
+
+logger = logging.getLogger(__name__)
+
+MaxNBlobsPerCycle = 1000  # SQL LIMIT to avoid too-big query results
+Interval = 300  # seconds
+
+
+def delete_orphan_blob(key: str) -> None:
+    """Delete the blob `key` from s3 and the database, if nothing references it.
+
+    The DELETE locks the blob's row until we've deleted the file. Meanwhile, a
+    new StoredObject with the same contents will wait; then it will write a new
+    row and re-upload the file.
+    """
+    from cjwstate import s3
+    from cjwstate.models import StoredObjectBlob
+
+    with django.db.transaction.atomic():
+        n_deleted, _ = StoredObjectBlob.objects.filter(key=key, n_references=0).delete()
+        if n_deleted:
+            s3.remove(s3.StoredObjectsBucket, key)
+
+
+def delete_orphan_blobs() -> None:
+    """Delete StoredObjectBlobs that no StoredObject references.
+
+    Rationale: deleting a StoredObject only decrements its blob's
+    `n_references`. If the deleting transaction rolls back, the blob must still
+    be there.
+    """
+    # import _after_ django.setup() initializes apps
+    from cjwstate.models import StoredObjectBlob
+
+    keys = StoredObjectBlob.objects.filter(n_references=0)[
+        :MaxNBlobsPerCycle
+    ].values_list("key", flat=True)
+
+    for key in keys:
+        logger.info("Deleting orphan blob %s", key)
+        delete_orphan_blob(key)
+
+
+if __name__ == "__main__":
+    django.setup()
+
+    while True:
+        django.db.close_old_connections()
+        with benchmark_sync(logger, "Deleting orphan stored-object blobs"):
+            delete_orphan_blobs()
+        time.sleep(Interval)
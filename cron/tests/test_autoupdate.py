@@ -1,11 +1,12 @@
 import asyncio
+import datetime
 import logging
 from contextlib import asynccontextmanager
 from unittest.mock import patch
 
-from freezegun import freeze_time
 from dateutil import parser
 
+from cjworkbench.pg_render_locker import WorkflowAlreadyLocked
 from cjwstate import rabbitmq
 from cjwstate.models import Workflow
 from cjwstate.tests.utils import DbTestCase
@@ -34,6 +35,13 @@ class SuccessfulRenderLock:
             assert lock.stalled
 
 
+class FailedRenderLock:
+    @asynccontextmanager
+    async def render_lock(self, workflow_id: int):
+        raise WorkflowAlreadyLocked
+        yield  # unreachable, but makes this a generator
+
+
 class UpdatesTests(DbTestCase):
     @patch.object(rabbitmq, "queue_fetch")
     @patch.object(
@@ -68,19 +76,100 @@ class UpdatesTests(DbTestCase):
 
         mock_queue_fetch.return_value = future_none
 
-        with freeze_time("1999-08-28T14:35"):
-            # eat log messages
-            with self.assertLogs(autoupdate.__name__, logging.INFO):
-                self.run_with_async_db(autoupdate.queue_fetches(SuccessfulRenderLock()))
+        scheduler = autoupdate.AutofetchScheduler()
+        with self.assertLogs(autoupdate.__name__, logging.INFO):
+            self.run_with_async_db(scheduler.reload())
+        self.assertEqual(scheduler.stats().n_scheduled, 2)
+
+        # eat log messages
+        with self.assertLogs(autoupdate.__name__, logging.INFO):
+            self.run_with_async_db(
+                scheduler.queue_due_fetches(
+                    SuccessfulRenderLock(), parser.parse("1999-08-28T14:35")
+                )
+            )
 
         self.assertEqual(mock_queue_fetch.call_count, 1)
-        mock_queue_fetch.assert_called_with(workflow.id, step2.id)
+        mock_queue_fetch.assert_called_with(
+            workflow.id, step2.id, render_queue=rabbitmq.RenderAutofetch
+        )
+        stats = scheduler.stats()
+        self.assertEqual(stats.n_scheduled, 1)
+        self.assertEqual(stats.n_queued, 1)
+        self.assertEqual(stats.max_lag_seconds, 60.0)
 
         step2.refresh_from_db()
         self.assertTrue(step2.is_busy)
 
-        # Second call shouldn't fetch again, because it's busy
-        with freeze_time("1999-08-28T14:36"):
-            self.run_with_async_db(autoupdate.queue_fetches(SuccessfulRenderLock()))
-
+        # Reloading shouldn't fetch again, because it's busy
+        with self.assertLogs(autoupdate.__name__, logging.INFO):
+            self.run_with_async_db(scheduler.reload())
+        self.run_with_async_db(
+            scheduler.queue_due_fetches(
+                SuccessfulRenderLock(), parser.parse("1999-08-28T14:36")
+            )
+        )
         self.assertEqual(mock_queue_fetch.call_count, 1)
+
+    @patch.object(rabbitmq, "queue_fetch")
+    def test_skip_step_changed_since_load(self, mock_queue_fetch):
+        workflow = Workflow.objects.create()
+        tab = workflow.tabs.create(position=0)
+        step = tab.steps.create(
+            order=0,
+            slug="step-1",
+            auto_update_data=True,
+            next_update=parser.parse("1999-08-28T14:34"),
+            update_interval=600,
+        )
+
+        scheduler = autoupdate.AutofetchScheduler()
+        with self.assertLogs(autoupdate.__name__, logging.INFO):
+            self.run_with_async_db(scheduler.reload())
+        # The user changed the schedule, and we haven't heard yet
+        step.next_update = parser.parse("1999-08-28T14:44")
+        step.save(update_fields=["next_update"])
+
+        self.run_with_async_db(
+            scheduler.queue_due_fetches(
+                SuccessfulRenderLock(), parser.parse("1999-08-28T14:35")
+            )
+        )
+        mock_queue_fetch.assert_not_called()
+        # ... and we rescheduled
+        self.assertEqual(scheduler.stats().n_scheduled, 1)
+
+    @patch.object(rabbitmq, "queue_fetch")
+    def test_retry_rendering_workflow(self, mock_queue_fetch):
+        workflow = Workflow.objects.create()
+        tab = workflow.tabs.create(position=0)
+        tab.steps.create(
+            order=0,
+            slug="step-1",
+            auto_update_data=True,
+            next_update=parser.parse("1999-08-28T14:34"),
+            update_interval=600,
+        )
+
+        scheduler = autoupdate.AutofetchScheduler()
+        with self.assertLogs(autoupdate.__name__, logging.INFO):
+            self.run_with_async_db(scheduler.reload())
+        self.run_with_async_db(
+            scheduler.queue_due_fetches(
+                FailedRenderLock(), parser.parse("1999-08-28T14:35")
+            )
+        )
+        mock_queue_fetch.assert_not_called()
+        self.assertEqual(
+            scheduler._peek_due_at(),
+            parser.parse("1999-08-28T14:35")
+            + datetime.timedelta(seconds=autoupdate.LockedRetryDelay),
+        )
+
+    def test_notify_marks_step_changed(self):
+        scheduler = autoupdate.AutofetchScheduler()
+        scheduler._on_notify(None, 123, "step_autofetch", "12")
+        self.assertEqual(scheduler._changed_step_ids, {12})
+        with self.assertLogs(autoupdate.__name__, logging.WARNING):
+            scheduler._on_notify(None, 123, "step_autofetch", "x")
+        self.assertEqual(scheduler._changed_step_ids, {12})
@@ -0,0 +1,36 @@
+from cjwkernel.util import tempfile_context
+from cjwstate import s3
+from cjwstate.models import StoredObjectBlob, Workflow
+from cjwstate.storedobjects import create_stored_object
+from cjwstate.tests.utils import DbTestCase
+from cron.storedobjectblobdeleter import delete_orphan_blobs
+
+
+class DeleteOrphanBlobsTest(DbTestCase):
+    def test_delete_orphan(self):
+        workflow = Workflow.create_and_init()
+        step = workflow.tabs.first().steps.create(order=0, slug="step-1")
+        with tempfile_context() as path:
+            path.write_bytes(b"abcd")
+            stored_object = create_stored_object(workflow.id, step.id, path)
+        key = stored_object.key
+        stored_object.delete()
+
+        delete_orphan_blobs()
+        self.assertFalse(StoredObjectBlob.objects.filter(key=key).exists())
+        self.assertFalse(s3.exists(s3.StoredObjectsBucket, key))
+
+    def test_keep_referenced_blob(self):
+        workflow = Workflow.create_and_init()
+        step = workflow.tabs.first().steps.create(order=0, slug="step-1")
+        with tempfile_context() as path:
+            path.write_bytes(b"abcd")
+            create_stored_object(workflow.id, step.id, path)
+            stored_object = create_stored_object(workflow.id, step.id, path)
+        stored_object.delete()  # the other StoredObject still references it
+
+        delete_orphan_blobs()
+        self.assertEqual(
+            StoredObjectBlob.objects.get(key=stored_object.key).n_references, 1
+        )
+        self.assertTrue(s3.exists(s3.StoredObjectsBucket, stored_object.key))
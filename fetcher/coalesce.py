@@ -0,0 +1,187 @@
+from concurrent.futures import Future
+import hashlib
+import json
+import logging
+from pathlib import Path
+import shutil
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from django.conf import settings
+
+from cjwkernel.types import FetchResult, Params, RenderError
+from cjwstate.lrufiles import LruFile, LruFiles
+from cjwstate.modules.types import ModuleZipfile
+
+
+logger = logging.getLogger(__name__)
+
+
+MaxBytes = 1024 * 1024 * 1024
+"""Total size of finished results `FetchCoalescer` keeps for reuse.
+
+Past this, we forget the oldest results before their freshness window ends.
+"""
+
+
+def fetch_key(
+    module_zipfile: ModuleZipfile,
+    params: Params,
+    secrets: Dict[str, Any],
+    last_fetch_result: Optional[FetchResult],
+    last_fetch_result_hash: Optional[str],
+    input_parquet_hash: Optional[str],
+) -> Optional[str]:
+    """Digest of everything a module's `fetch()` sees, or None if we can't tell.
+
+    Two fetches with the same key would call the same module code with the
+    same arguments -- including the same last fetch result, for modules that
+    build on it -- so they may share one call.
+
+    `input_parquet_hash` is the digest of the input table's Parquet file, or
+    None if there is no input table.
+
+    Return None if `last_fetch_result` is set but we don't know its hash.
+    """
+    if last_fetch_result is not None and last_fetch_result_hash is None:
+        return None
+    if last_fetch_result is None:
+        last_fetch = None
+    else:
+        last_fetch = [last_fetch_result_hash, repr(last_fetch_result.errors)]
+
+    data = json.dumps(
+        [
+            module_zipfile.module_id,
+            module_zipfile.version,
+            params.params,
+            secrets,
+            last_fetch,
+            input_parquet_hash,
+        ],
+        sort_keys=True,
+        default=repr,
+    )
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class _SharedResult(NamedTuple):
+    errors: List[RenderError]
+    finished_at: float
+
+
+class FetchCoalescer:
+    """Share one module `fetch()` among fetches with the same `fetch_key()`.
+
+    Thousands of lesson and duplicated workflows fetch the same public URL
+    with the same params. Without coalescing, each runs `fetch()` in its own
+    sandbox and downloads the same bytes.
+
+    The first caller for a key (the "leader") invokes `fetch()`. Callers that
+    arrive while it runs wait for it; callers that arrive up to
+    `freshness_seconds` after it finishes reuse its result, too. Each caller
+    gets its own copy of the result file, and saves it as usual: this only
+    shares the upstream call.
+
+    We keep our copies of results in `cjwstate.lrufiles.LruFiles`, outside of
+    any fetch's chroot.
+
+    This is thread-safe: `fetch_or_wrap_error()` calls it from executor
+    threads. Callers wait on a thread, not on the event loop.
+    """
+
+    def __init__(self, parent_dir: Path, freshness_seconds: float, max_bytes: int):
+        self.freshness_seconds = freshness_seconds
+        self._files = LruFiles(parent_dir, max_bytes)  # values: _SharedResult
+        self._lock = threading.Lock()
+        self._leaders: Dict[str, Future] = {}  # key => Future (of None)
+
+    def _expire(self) -> None:
+        """Forget stale results."""
+        min_finished_at = time.time() - self.freshness_seconds
+        self._files.discard_matching(
+            lambda _, file: file.value.finished_at < min_finished_at
+        )
+
+    def fetch(
+        self, key: str, output_path: Path, invoke: Callable[[], FetchResult]
+    ) -> FetchResult:
+        """Call `invoke()`, or copy another caller's result to `output_path`.
+
+        `invoke()` must write its result to `output_path`.
+        """
+        self._expire()
+        with self._lock:
+            file = self._files.get(key, pin=True)
+            if file is None:
+                leader = self._leaders.get(key)
+                if leader is None:
+                    leader = self._leaders[key] = Future()
+                    is_leader = True
+                else:
+                    is_leader = False
+
+        if file is not None:
+            return self._copy(file, output_path)
+        elif is_leader:
+            return self._lead(key, leader, invoke)
+        else:
+            return self._follow(key, leader, output_path, invoke)
+
+    def _lead(
+        self, key: str, leader: Future, invoke: Callable[[], FetchResult]
+    ) -> FetchResult:
+        try:
+            result = invoke()
+            path = self._files.mkstemp(prefix="fetch-")
+            shutil.copyfile(result.path, path)
+            self._files.add(key, path, _SharedResult(result.errors, time.time()))
+        except BaseException as err:
+            with self._lock:
+                del self._leaders[key]
+            leader.set_exception(err)
+            raise
+
+        with self._lock:
+            del self._leaders[key]
+        leader.set_result(None)
+        return result
+
+    def _follow(
+        self,
+        key: str,
+        leader: Future,
+        output_path: Path,
+        invoke: Callable[[], FetchResult],
+    ) -> FetchResult:
+        try:
+            leader.result()  # wait for the leader
+        except Exception:
+            # The leader hit a bug. Maybe we won't.
+            return invoke()
+        file = self._files.get(key, pin=True)
+        if file is None:
+            return invoke()  # we forgot the leader's result already
+        return self._copy(file, output_path)
+
+    def _copy(self, file: LruFile, output_path: Path) -> FetchResult:
+        try:
+            logger.info(
+                "Reusing a fetch result from %0.1fs ago",
+                time.time() - file.value.finished_at,
+            )
+            shutil.copyfile(file.path, output_path)
+            return FetchResult(output_path, file.value.errors)
+        finally:
+            self._files.unpin(file)
+
+    def clear(self) -> None:
+        """Forget all results. (Useful in unit tests.)"""
+        self._files.clear()
+
+
+COALESCER = FetchCoalescer(
+    Path(settings.FETCHER_COALESCE_DIR), settings.FETCHER_COALESCE_SECONDS, MaxBytes
+)
+"""Fetches in progress and recently finished, shared by all threads."""
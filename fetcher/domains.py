@@ -0,0 +1,105 @@
+import asyncio
+import contextlib
+from contextlib import asynccontextmanager
+import logging
+from typing import Any, Dict, Optional
+import urllib.parse
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+def fetch_domain(params: Any) -> Optional[str]:
+    """Name the remote server a fetch will contact, for `DomainLimiter`.
+
+    That's the hostname of a "url" param, if there is one (e.g., "loadurl").
+    Otherwise, return None: we can't tell whom the module will contact, and
+    many such fetches (e.g., "googlesheets" on different users' files) don't
+    slow each other down.
+
+    `params` may be anything, including a ModuleError.
+    """
+    url = params.get("url") if isinstance(params, dict) else None
+    if isinstance(url, str):
+        try:
+            hostname = urllib.parse.urlsplit(url.strip()).hostname
+        except ValueError:
+            hostname = None  # e.g., invalid IPv6 -- the module will complain
+        if hostname:
+            return hostname
+    return None
+
+
+class DomainLimiter:
+    """Cap how many fetches in this process run at once, in all and per domain.
+
+    One slow server shouldn't fill all a fetcher's slots. And dozens of
+    fetches shouldn't hit one server at the same moment because their
+    `next_update` happened to coincide.
+
+    A fetch waits for its domain first, and then for one of `total_limit`
+    process-wide slots. So fetches queued behind a busy domain don't hold
+    slots that fetches from other domains could use. (The fetcher must
+    prefetch more messages than `total_limit` for that to matter.)
+
+    Fetches wait here _before_ acquiring a chroot, so a waiting fetch doesn't
+    hold a sandbox. The limits are per process: with P fetcher processes, a
+    domain sees up to P * `limit` fetches at once.
+
+    This runs on one event loop. It isn't thread-safe.
+    """
+
+    def __init__(self, limit: int, total_limit: int):
+        self.limit = limit
+        self.total_limit = total_limit
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._n_fetches: Dict[str, int] = {}  # running or waiting, per domain
+        self._total_semaphore: Optional[asyncio.Semaphore] = None
+
+    @asynccontextmanager
+    async def acquire(self, domain: Optional[str]):
+        """Wait for a slot for `domain` and then a process-wide slot.
+
+        `domain=None` means, "no domain limit": wait only for the process-wide
+        slot.
+        """
+        async with contextlib.AsyncExitStack() as ctx:
+            if domain is not None:
+                await ctx.enter_async_context(self._acquire_domain(domain))
+            if self._total_semaphore is None:
+                # Create lazily, on the event loop that uses it
+                self._total_semaphore = asyncio.Semaphore(self.total_limit)
+            await ctx.enter_async_context(self._total_semaphore)
+            yield
+
+    @asynccontextmanager
+    async def _acquire_domain(self, domain: str):
+        """Wait until fewer than `limit` fetches contact `domain`; count this one."""
+        semaphore = self._semaphores.get(domain)
+        if semaphore is None:
+            semaphore = self._semaphores[domain] = asyncio.Semaphore(self.limit)
+        self._n_fetches[domain] = self._n_fetches.get(domain, 0) + 1
+        try:
+            if semaphore.locked():
+                logger.info(
+                    "Waiting for one of %d fetches from %s to finish",
+                    self.limit,
+                    domain,
+                )
+            async with semaphore:
+                yield
+        finally:
+            self._n_fetches[domain] -= 1
+            if self._n_fetches[domain] == 0:
+                # Forget idle domains, so we don't grow forever
+                del self._n_fetches[domain]
+                del self._semaphores[domain]
+
+
+DOMAIN_LIMITER = DomainLimiter(
+    settings.FETCHER_N_CONCURRENT_FETCHES_PER_DOMAIN,
+    settings.FETCHER_N_CONCURRENT_FETCHES,
+)
+"""Limits on fetches, shared by all of this process's fetches."""
@@ -1,6 +1,8 @@
 import asyncio
 import contextlib
+from concurrent.futures import ThreadPoolExecutor
 import datetime
+from functools import partial
 import logging
 import os
 from pathlib import Path
@@ -8,22 +10,34 @@ import time
 from typing import Any, ContextManager, Dict, List, NamedTuple, Optional, Union
 from django.conf import settings
 from django.db import DatabaseError, InterfaceError
-from cjwkernel.chroot import EDITABLE_CHROOT, ChrootContext
+from cjwkernel.chroot import EDITABLE_CHROOT_POOL, ChrootContext
 from cjwkernel.errors import ModuleError, format_for_user_debugging
 from cjwkernel.types import FetchResult, I18nMessage, Params, RenderError, TableMetadata
 from cjworkbench.sync import database_sync_to_async
 from cjwstate.models import CachedRenderResult, StoredObject, Step, Workflow
 from cjwstate.models.module_registry import MODULE_REGISTRY
+from cjwstate.models.step import notify_autofetch_schedule_changed
 from cjwstate.modules.types import ModuleZipfile
 import cjwstate.params
-from cjwstate import rendercache, storedobjects
+from cjwstate import rabbitmq, rendercache, storedobjects
+from cjwstate.util import hash_file
 import fetcher.secrets
-from . import fetchprep, save, versions
+from . import coalesce, domains, fetchprep, save, versions
 
 
 logger = logging.getLogger(__name__)
 
 
+_fetch_executor = ThreadPoolExecutor(
+    max_workers=settings.FETCHER_N_CONCURRENT_FETCHES, thread_name_prefix="fetch-"
+)
+"""Threads that run `fetch_or_wrap_error()`: one per concurrent fetch.
+
+Each thread mostly waits for its module. A dedicated pool means waiting
+fetches can't starve the default executor, which hashes and downloads.
+"""
+
+
 def invoke_fetch(
     module_zipfile: ModuleZipfile,
     *,
@@ -34,10 +48,13 @@ def invoke_fetch(
     last_fetch_result: Optional[FetchResult],
     input_parquet_filename: Optional[str],
     output_filename: str,
+    timeout: Optional[float] = None,
 ) -> FetchResult:
     """Use kernel to invoke module `fetch(...)` method and build a `FetchResult`.
 
     Raise `ModuleError` on error. (This is usually the module author's fault.)
+    That includes `ModuleTimeoutError` after `timeout` seconds (or the kernel's
+    default timeout, if `timeout` is None).
 
     Log any ModuleError. Also log success.
 
@@ -60,6 +77,7 @@ def invoke_fetch(
             last_fetch_result=last_fetch_result,
             input_parquet_filename=input_parquet_filename,
             output_filename=output_filename,
+            timeout=timeout,
         )
         status = "%0.1fMB" % (ret.path.stat().st_size / 1024 / 1024)
         return ret
@@ -162,6 +180,7 @@ def update_next_update_time(workflow_id, step, now):
             Step.objects.filter(id=step.id).update(
                 last_update_check=now, next_update=next_update
             )
+            notify_autofetch_schedule_changed(step.id)
     except (Step.DoesNotExist, Workflow.DoesNotExist):
         # [2019-05-27] `step.workflow` throws `Workflow.DoesNotExist` if
         # the Step is deleted. This handler is for deleted-Workflow _and_
@@ -243,6 +262,10 @@ def fetch_or_wrap_error(
     last_fetch_result: Optional[FetchResult],
     maybe_input_crr: Optional[CachedRenderResult],
     output_path: Path,
+    *,
+    last_fetch_result_hash: Optional[str] = None,
+    coalescer: Optional[coalesce.FetchCoalescer] = None,
+    deadline: Optional[float] = None,
 ):
     """Fetch, and do not raise any exceptions worth catching.
 
@@ -261,6 +284,13 @@ def fetch_or_wrap_error(
     * migrated_params_or_error is a `ModuleError`
     * migrated_params_or_error is invalid (`ValueError`)
     * input_crr points to a nonexistent file (`FileNotFoundError`)
+
+    If you pass `coalescer`, identical fetches share one call to the module's
+    `fetch()` (see `fetcher.coalesce`). To share calls that take a last fetch
+    result, pass its `last_fetch_result_hash`, too.
+
+    If you pass `deadline` (a `time.time()` value), kill the module's `fetch()`
+    at that time. Its result will be a ModuleTimeoutError.
     """
     # module_zipfile=None is allowed
     if module_zipfile is None:
@@ -315,29 +345,56 @@ def fetch_or_wrap_error(
     )
 
     # actually fetch
-    try:
-        return invoke_fetch(
-            module_zipfile,
-            chroot_context=chroot_context,
-            basedir=basedir,
-            params=params,
-            secrets=secrets,
-            last_fetch_result=last_fetch_result,
-            input_parquet_filename=(
-                None if input_parquet_path is None else input_parquet_path.name
-            ),
-            output_filename=output_path.name,
-        )
-    except ModuleError as err:
-        logger.exception("Error calling %s:fetch()", module_zipfile.path.name)
-        return user_visible_bug_fetch_result(
-            output_path, format_for_user_debugging(err)
-        )
+    def invoke() -> FetchResult:
+        try:
+            return invoke_fetch(
+                module_zipfile,
+                chroot_context=chroot_context,
+                basedir=basedir,
+                params=params,
+                secrets=secrets,
+                last_fetch_result=last_fetch_result,
+                input_parquet_filename=(
+                    None if input_parquet_path is None else input_parquet_path.name
+                ),
+                output_filename=output_path.name,
+                timeout=None if deadline is None else max(0.0, deadline - time.time()),
+            )
+        except ModuleError as err:
+            logger.exception("Error calling %s:fetch()", module_zipfile.path.name)
+            return user_visible_bug_fetch_result(
+                output_path, format_for_user_debugging(err)
+            )
+
+    if coalescer is None:
+        return invoke()
+    if input_parquet_path is not None and maybe_input_crr.hash is None:
+        return invoke()  # we can't tell which input fetch() will see
+    key = coalesce.fetch_key(
+        module_zipfile,
+        params,
+        secrets,
+        last_fetch_result,
+        last_fetch_result_hash,
+        None if input_parquet_path is None else maybe_input_crr.hash,
+    )
+    if key is None:
+        return invoke()
+    return coalescer.fetch(key, output_path, invoke)
 
 
 async def fetch(
-    *, workflow_id: int, step_id: int, now: Optional[datetime.datetime] = None
+    *,
+    workflow_id: int,
+    step_id: int,
+    now: Optional[datetime.datetime] = None,
+    render_queue: str = rabbitmq.Render,
 ) -> None:
+    """Fetch `step_id` and store the result.
+
+    If the data changed, queue a render on `render_queue` (see
+    `rabbitmq.queue_fetch()`).
+    """
     # 1. Load database objects
     #    - missing Step? Return prematurely
     #    - database error? Raise
@@ -382,8 +439,15 @@ async def fetch(
     if now is None:
         now = datetime.datetime.now()
 
-    with contextlib.ExitStack() as ctx:
-        chroot_context = ctx.enter_context(EDITABLE_CHROOT.acquire_context())
+    async with contextlib.AsyncExitStack() as ctx:
+        # Wait for the domain before the chroot: don't hold a sandbox idle
+        await ctx.enter_async_context(
+            domains.DOMAIN_LIMITER.acquire(domains.fetch_domain(migrated_params))
+        )
+        chroot_context = await ctx.enter_async_context(
+            EDITABLE_CHROOT_POOL.acquire_context()
+        )
+        deadline = time.time() + settings.FETCHER_TIMEOUT
         basedir = ctx.enter_context(chroot_context.tempdir_context(prefix="fetch-"))
         output_path = ctx.enter_context(
             chroot_context.tempfile_context(prefix="fetch-result-", dir=basedir)
@@ -393,26 +457,43 @@ async def fetch(
             ctx, stored_object, step.fetch_errors, dir=basedir
         )
         result = await asyncio.get_event_loop().run_in_executor(
-            None,
-            fetch_or_wrap_error,
-            ctx,
-            chroot_context,
-            basedir,
-            step.module_id_name,
-            module_zipfile,
-            migrated_params,
-            secrets,
-            last_fetch_result,
-            input_crr,
-            output_path,
+            _fetch_executor,
+            partial(
+                fetch_or_wrap_error,
+                ctx,
+                chroot_context,
+                basedir,
+                step.module_id_name,
+                module_zipfile,
+                migrated_params,
+                secrets,
+                last_fetch_result,
+                input_crr,
+                output_path,
+                last_fetch_result_hash=(
+                    None if stored_object is None else stored_object.hash
+                ),
+                coalescer=coalesce.COALESCER,
+                deadline=deadline,
+            ),
         )
 
+        result_hash = await asyncio.get_event_loop().run_in_executor(
+            None, hash_file, result.path
+        )
         if last_fetch_result is not None and versions.are_fetch_results_equal(
-            last_fetch_result, result
+            result, last_fetch_result, result_hash, stored_object.hash
         ):
             await save.mark_result_unchanged(workflow_id, step, now)
         else:
-            await save.create_result(workflow_id, step, result, now)
+            await save.create_result(
+                workflow_id,
+                step,
+                result,
+                now,
+                result_hash,
+                render_queue=render_queue,
+            )
 
     await update_next_update_time(workflow_id, step, now)
 
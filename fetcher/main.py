@@ -3,13 +3,17 @@ import asyncio
 from django.conf import settings
 
 from cjwstate import rabbitmq
+from cjwstate.models.module_registry import MODULE_REGISTRY
 from .fetch import handle_fetch
 
 
 async def main_loop():
     """Fetch, forever."""
-    connection = rabbitmq.get_connection()
-    connection.declare_queue_consume(
-        rabbitmq.Fetch, rabbitmq.acking_callback(handle_fetch)
-    )
-    await connection.wait_closed()
+    async with MODULE_REGISTRY.listening_for_updates():
+        connection = rabbitmq.get_connection()
+        connection.declare_queue_consume(
+            rabbitmq.Fetch,
+            rabbitmq.acking_callback(handle_fetch),
+            settings.FETCHER_N_PREFETCHED_FETCHES,
+        )
+        await connection.wait_closed()
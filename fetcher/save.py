@@ -1,5 +1,6 @@
 import contextlib
 import datetime
+from typing import Optional
 
 from cjwkernel.types import FetchResult
 from cjworkbench.sync import database_sync_to_async
@@ -40,7 +41,11 @@ async def _notify_websockets(workflow_id: int, step: Step) -> None:
 
 @database_sync_to_async
 def _do_create_result(
-    workflow_id: int, step: Step, result: FetchResult, now: datetime.datetime
+    workflow_id: int,
+    step: Step,
+    result: FetchResult,
+    now: datetime.datetime,
+    file_hash: Optional[str],
 ) -> None:
     """Do database manipulations for create_result().
 
@@ -53,7 +58,7 @@ def _do_create_result(
     """
     with _locked_step(workflow_id, step):
         storedobjects.create_stored_object(
-            workflow_id, step.id, result.path, stored_at=now
+            workflow_id, step.id, result.path, stored_at=now, file_hash=file_hash
         )
         storedobjects.delete_old_files_to_enforce_storage_limits(step=step)
         # Assume caller sends new list to clients via SetStepDataVersion
@@ -65,23 +70,31 @@ def _do_create_result(
 
 
 async def create_result(
-    workflow_id: int, step: Step, result: FetchResult, now: datetime.datetime
+    workflow_id: int,
+    step: Step,
+    result: FetchResult,
+    now: datetime.datetime,
+    file_hash: Optional[str] = None,
+    *,
+    render_queue: str = rabbitmq.Render,
 ) -> None:
     """Store fetched table as storedobject.
 
+    `file_hash` is `hash_file(result.path)`, if the caller has computed it.
+
     Set `fetch_errors` to `result.errors`. Set `is_busy` to `False`. Set
     `last_update_check`.
 
     Create (and run) a SetStepDataVersion. This will kick off an execute
-    cycle, which will render each module and email the owner if data has
-    changed and notifications are enabled.
+    cycle -- queued on `render_queue` -- which will render each module and
+    email the owner if data has changed and notifications are enabled.
 
     Notify the user over Websockets.
 
     No-op if `workflow` or `step` has been deleted.
     """
     try:
-        await _do_create_result(workflow_id, step, result, now)
+        await _do_create_result(workflow_id, step, result, now, file_hash)
     except (Step.DoesNotExist, Workflow.DoesNotExist):
         return  # there's nothing more to do
 
@@ -99,6 +112,7 @@ async def create_result(
         workflow_id=workflow_id,
         step=step,
         new_version=now,
+        render_queue=render_queue,
     )
 
     # XXX odd design: SetStepDataVersion happens to update "versions"
@@ -0,0 +1,149 @@
+from pathlib import Path
+import threading
+import unittest
+from unittest.mock import patch
+
+from cjwkernel.types import FetchResult, I18nMessage, Params, RenderError
+from cjwkernel.util import tempdir_context
+from cjwstate.modules.types import ModuleZipfile
+from fetcher import coalesce
+from fetcher.coalesce import FetchCoalescer, fetch_key
+
+
+def _write_result(path: Path, data: bytes, errors=[]) -> FetchResult:
+    path.write_bytes(data)
+    return FetchResult(path, errors)
+
+
+class FetchKeyTest(unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.module_zipfile = ModuleZipfile(Path("/modules/loadurl.abc123.zip"))
+
+    def test_same_inputs_same_key(self):
+        self.assertEqual(
+            fetch_key(self.module_zipfile, Params({"url": "x"}), {}, None, None, None),
+            fetch_key(self.module_zipfile, Params({"url": "x"}), {}, None, None, None),
+        )
+
+    def test_different_params_different_key(self):
+        self.assertNotEqual(
+            fetch_key(self.module_zipfile, Params({"url": "x"}), {}, None, None, None),
+            fetch_key(self.module_zipfile, Params({"url": "y"}), {}, None, None, None),
+        )
+
+    def test_different_last_fetch_result_different_key(self):
+        last_result = FetchResult(Path("/tmp/x"), [])
+        self.assertNotEqual(
+            fetch_key(self.module_zipfile, Params({}), {}, last_result, "hash1", None),
+            fetch_key(self.module_zipfile, Params({}), {}, last_result, "hash2", None),
+        )
+
+    def test_unknown_last_fetch_result_hash_is_none(self):
+        last_result = FetchResult(Path("/tmp/x"), [])
+        self.assertIsNone(
+            fetch_key(self.module_zipfile, Params({}), {}, last_result, None, None)
+        )
+
+
+class FetchCoalescerTest(unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.ctx = tempdir_context(prefix="test-coalesce-")
+        self.tempdir = self.ctx.__enter__()
+        self.coalescer = FetchCoalescer(self.tempdir / "shared", 60, 1000000)
+
+    def tearDown(self):
+        self.coalescer.clear()
+        self.ctx.__exit__(None, None, None)
+        super().tearDown()
+
+    def test_reuse_recent_result(self):
+        error = RenderError(I18nMessage("x", {}, None))
+        result1 = self.coalescer.fetch(
+            "key",
+            self.tempdir / "1",
+            lambda: _write_result(self.tempdir / "1", b"data", [error]),
+        )
+        self.assertEqual(result1, FetchResult(self.tempdir / "1", [error]))
+
+        def invoke2():
+            raise AssertionError("should reuse the first result")
+
+        with self.assertLogs(coalesce.logger, level="INFO"):
+            result2 = self.coalescer.fetch("key", self.tempdir / "2", invoke2)
+        self.assertEqual(result2, FetchResult(self.tempdir / "2", [error]))
+        self.assertEqual(result2.path.read_bytes(), b"data")
+
+    def test_refetch_after_freshness_window(self):
+        with patch.object(coalesce.time, "time", return_value=1000.0):
+            self.coalescer.fetch(
+                "key",
+                self.tempdir / "1",
+                lambda: _write_result(self.tempdir / "1", b"old"),
+            )
+        with patch.object(coalesce.time, "time", return_value=1061.0):
+            result = self.coalescer.fetch(
+                "key",
+                self.tempdir / "2",
+                lambda: _write_result(self.tempdir / "2", b"new"),
+            )
+        self.assertEqual(result.path.read_bytes(), b"new")
+        # The old copy is gone; the new one is kept
+        self.assertEqual(len(list((self.tempdir / "shared").glob("*/*"))), 1)
+
+    def test_different_keys_do_not_share(self):
+        self.coalescer.fetch(
+            "key1", self.tempdir / "1", lambda: _write_result(self.tempdir / "1", b"1")
+        )
+        result = self.coalescer.fetch(
+            "key2", self.tempdir / "2", lambda: _write_result(self.tempdir / "2", b"2")
+        )
+        self.assertEqual(result.path.read_bytes(), b"2")
+
+    def test_concurrent_fetches_share_one_call(self):
+        started = threading.Event()
+        finish = threading.Event()
+        calls = []
+
+        def invoke1():
+            calls.append(1)
+            started.set()
+            finish.wait()
+            return _write_result(self.tempdir / "1", b"data")
+
+        def invoke2():
+            calls.append(2)
+            return _write_result(self.tempdir / "2", b"other")
+
+        results = {}
+        leader = threading.Thread(
+            target=lambda: results.update(
+                leader=self.coalescer.fetch("key", self.tempdir / "1", invoke1)
+            )
+        )
+        follower = threading.Thread(
+            target=lambda: results.update(
+                follower=self.coalescer.fetch("key", self.tempdir / "2", invoke2)
+            )
+        )
+        with self.assertLogs(coalesce.logger, level="INFO"):
+            leader.start()
+            started.wait()
+            follower.start()
+            finish.set()
+            leader.join()
+            follower.join()
+        self.assertEqual(calls, [1])
+        self.assertEqual(results["follower"].path.read_bytes(), b"data")
+
+    def test_leader_error_is_not_shared(self):
+        def invoke1():
+            raise RuntimeError("bug")
+
+        with self.assertRaises(RuntimeError):
+            self.coalescer.fetch("key", self.tempdir / "1", invoke1)
+        result = self.coalescer.fetch(
+            "key", self.tempdir / "2", lambda: _write_result(self.tempdir / "2", b"ok")
+        )
+        self.assertEqual(result.path.read_bytes(), b"ok")
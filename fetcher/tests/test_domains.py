@@ -0,0 +1,92 @@
+import asyncio
+import unittest
+
+from cjwkernel.errors import ModuleExitedError
+from fetcher.domains import DomainLimiter, fetch_domain
+
+
+class FetchDomainTest(unittest.TestCase):
+    def test_url_hostname(self):
+        self.assertEqual(
+            fetch_domain({"url": " https://Example.com:8080/x.csv"}), "example.com"
+        )
+
+    def test_no_url_param_means_none(self):
+        self.assertIsNone(fetch_domain({"file": None}))
+
+    def test_invalid_url_means_none(self):
+        self.assertIsNone(fetch_domain({"url": "not a url"}))
+        self.assertIsNone(fetch_domain({"url": "http://[::1"}))
+
+    def test_module_error_means_none(self):
+        self.assertIsNone(fetch_domain(ModuleExitedError("loadurl", 1, "")))
+
+
+class DomainLimiterTest(unittest.TestCase):
+    def test_limit_per_domain(self):
+        async def inner():
+            limiter = DomainLimiter(2, 10)
+            n_running = {"a": 0, "b": 0}
+            max_n_running = {"a": 0, "b": 0}
+
+            async def fetch(domain):
+                async with limiter.acquire(domain):
+                    n_running[domain] += 1
+                    max_n_running[domain] = max(
+                        n_running[domain], max_n_running[domain]
+                    )
+                    await asyncio.sleep(0)
+                    n_running[domain] -= 1
+
+            with self.assertLogs("fetcher.domains", level="INFO"):
+                await asyncio.gather(
+                    *(fetch("a") for _ in range(5)), *(fetch("b") for _ in range(2))
+                )
+            self.assertEqual(max_n_running, {"a": 2, "b": 2})
+            # Idle domains are forgotten
+            self.assertEqual(limiter._semaphores, {})
+
+        asyncio.run(inner())
+
+    def test_total_limit(self):
+        async def inner():
+            limiter = DomainLimiter(2, 3)
+            n_running = 0
+            max_n_running = 0
+
+            async def fetch(domain):
+                nonlocal n_running, max_n_running
+                async with limiter.acquire(domain):
+                    n_running += 1
+                    max_n_running = max(n_running, max_n_running)
+                    await asyncio.sleep(0)
+                    n_running -= 1
+
+            await asyncio.gather(*(fetch(None) for _ in range(5)))
+            self.assertEqual(max_n_running, 3)  # None has no per-domain limit
+
+        asyncio.run(inner())
+
+    def test_waiting_for_domain_does_not_take_a_slot(self):
+        async def inner():
+            limiter = DomainLimiter(1, 2)
+            a_may_finish = asyncio.Event()
+            b_done = asyncio.Event()
+
+            async def fetch_a():
+                async with limiter.acquire("a"):
+                    await a_may_finish.wait()
+
+            async def fetch_b():
+                async with limiter.acquire("b"):
+                    b_done.set()
+
+            with self.assertLogs("fetcher.domains", level="INFO"):
+                a_tasks = [asyncio.create_task(fetch_a()) for _ in range(3)]
+                await asyncio.sleep(0)  # one "a" runs; two wait for "a"
+                await asyncio.wait_for(fetch_b(), timeout=1)
+            self.assertTrue(b_done.is_set())
+            a_may_finish.set()
+            await asyncio.gather(*a_tasks)
+
+        asyncio.run(inner())
@@ -3,6 +3,7 @@ import datetime
 import logging
 import shutil
 import textwrap
+import time
 import unittest
 from dataclasses import dataclass, field
 from functools import partial
@@ -39,7 +40,7 @@ from cjwstate.tests.utils import (
     DbTestCaseWithModuleRegistryAndMockKernel,
     create_module_zipfile,
 )
-from fetcher import fetch, fetchprep, save
+from fetcher import coalesce, fetch, fetchprep, save
 
 
 def async_value(v):
@@ -411,6 +412,46 @@ class FetchOrWrapErrorTests(DbTestCaseWithModuleRegistryAndMockKernel):
             FetchResult(last_result_path, []),
         )
 
+    def test_coalesce_identical_fetches(self):
+        self.kernel.fetch.return_value = FetchResult(self.output_path)
+        self.output_path.write_bytes(b"data")
+        module_zipfile = create_module_zipfile(
+            "mod", spec_kwargs={"parameters": [{"id_name": "A", "type": "string"}]}
+        )
+        coalescer = coalesce.FetchCoalescer(self.basedir / "shared", 60, 1000000)
+        with self.assertLogs("fetcher", level=logging.INFO):
+            fetch.fetch_or_wrap_error(
+                self.ctx,
+                self.chroot_context,
+                self.basedir,
+                "mod",
+                module_zipfile,
+                {"A": "B"},
+                {},
+                None,
+                None,
+                self.output_path,
+                coalescer=coalescer,
+            )
+            output_path2 = self.basedir / "output2"
+            result2 = fetch.fetch_or_wrap_error(
+                self.ctx,
+                self.chroot_context,
+                self.basedir,
+                "mod",
+                module_zipfile,
+                {"A": "B"},
+                {},
+                None,
+                None,
+                output_path2,
+                coalescer=coalescer,
+            )
+        self.assertEqual(self.kernel.fetch.call_count, 1)
+        self.assertEqual(result2, FetchResult(output_path2, []))
+        self.assertEqual(output_path2.read_bytes(), b"data")
+        coalescer.clear()
+
     def test_fetch_module_error(self):
         self.kernel.fetch.side_effect = ModuleExitedError("mod", 1, "RuntimeError: bad")
         with self.assertLogs(level=logging.ERROR):
@@ -428,8 +469,31 @@ class FetchOrWrapErrorTests(DbTestCaseWithModuleRegistryAndMockKernel):
             )
         self.assertEqual(result, self._bug_err("exit code 1: RuntimeError: bad"))
 
+    def test_deadline_is_timeout(self):
+        self.kernel.fetch.return_value = FetchResult(self.output_path)
+        with self.assertLogs("fetcher.fetch", level=logging.INFO):
+            fetch.fetch_or_wrap_error(
+                self.ctx,
+                self.chroot_context,
+                self.basedir,
+                "mod",
+                create_module_zipfile("mod"),
+                {},
+                {},
+                None,
+                None,
+                self.output_path,
+                deadline=time.time() + 30,
+            )
+        self.assertGreater(self.kernel.fetch.call_args[1]["timeout"], 25)
+        self.assertLessEqual(self.kernel.fetch.call_args[1]["timeout"], 30)
+
 
 class FetchTests(DbTestCaseWithModuleRegistry):
+    def setUp(self):
+        super().setUp()
+        coalesce.COALESCER.clear()  # don't reuse another test's fetch result
+
     @patch.object(rabbitmq, "queue_render_if_consumers_are_listening")
     @patch.object(rabbitmq, "send_update_to_workflow_clients")
     def test_fetch_integration(self, send_update, queue_render):
@@ -458,7 +522,9 @@ class FetchTests(DbTestCaseWithModuleRegistry):
             assert_arrow_table_equals(table, {"A": [1]})
 
         workflow.refresh_from_db()
-        queue_render.assert_called_with(workflow.id, workflow.last_delta_id)
+        queue_render.assert_called_with(
+            workflow.id, workflow.last_delta_id, queue=rabbitmq.Render
+        )
         send_update.assert_called()
 
     @patch.object(save, "create_result")
@@ -88,3 +88,42 @@ class DiffTest(unittest.TestCase):
                 FetchResult(self.old_path), FetchResult(self.new_path)
             )
         )
+
+    def test_hash_same(self):
+        # We trust equal digests. (We don't even read the files.)
+        self.old_path.write_bytes(b"12304987kljnmfe092394hkljdfs")
+        self.new_path.write_bytes(b"12304987kljnmfe092394hkljdfX")
+        self.assertTrue(
+            are_fetch_results_equal(
+                FetchResult(self.new_path),
+                FetchResult(self.old_path),
+                "0123456789abcdef0123456789abcdef",
+                "0123456789abcdef0123456789abcdef",
+            )
+        )
+
+    def test_hash_different_parquet_same_data(self):
+        # We don't trust different digests: Parquet bytes may differ
+        cjwparquet.write(self.old_path, arrow_table({"A": ["a"]}).table)
+        cjwparquet.write(
+            self.new_path,
+            arrow_table({"A": pyarrow.array(["a"]).dictionary_encode()}).table,
+        )
+        self.assertTrue(
+            are_fetch_results_equal(
+                FetchResult(self.new_path),
+                FetchResult(self.old_path),
+                "0123456789abcdef0123456789abcdef",
+                "fedcba9876543210fedcba9876543210",
+            )
+        )
+
+    def test_hash_same_errors_different(self):
+        self.assertFalse(
+            are_fetch_results_equal(
+                FetchResult(self.new_path, [RenderError(I18nMessage("foo"))]),
+                FetchResult(self.old_path, [RenderError(I18nMessage("bar"))]),
+                "0123456789abcdef0123456789abcdef",
+                "0123456789abcdef0123456789abcdef",
+            )
+        )
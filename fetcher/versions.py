@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import Optional
 import cjwparquet
 from cjwkernel.types import FetchResult
 
@@ -30,7 +31,12 @@ def _are_file_contents_equal(path1: Path, path2: Path) -> bool:
                     return True
 
 
-def are_fetch_results_equal(new_result: FetchResult, old_result: FetchResult) -> bool:
+def are_fetch_results_equal(
+    new_result: FetchResult,
+    old_result: FetchResult,
+    new_hash: Optional[str] = None,
+    old_hash: Optional[str] = None,
+) -> bool:
     """
     Determine whether `new_result` is worth saving in the database.
 
@@ -62,15 +68,22 @@ def are_fetch_results_equal(new_result: FetchResult, old_result: FetchResult) ->
     Heuristics:
 
         1. If errors are different, the results are different.
-        2. If the render result is a Parquet file (legacy fetch retval),
+        2. If `new_hash` and `old_hash` (digests of the two files) are
+           equal, the results are equal. (We don't trust _different_
+           digests: old StoredObjects have placeholder digests, and Parquet
+           files with different bytes may hold the same table.)
+        3. If the render result is a Parquet file (legacy fetch retval),
            compare schemas and values in the two Parquet files; return the
            result.
-        3. Otherwise, compare file contents of the two files on disk; return
+        4. Otherwise, compare file contents of the two files on disk; return
            the result.
     """
     if new_result.errors != old_result.errors:
         return False
 
+    if new_hash is not None and new_hash == old_hash:
+        return True
+
     if _is_parquet_path(old_result.path) and _is_parquet_path(new_result.path):
         return cjwparquet.are_files_equal(old_result.path, new_result.path)
     else:
@@ -0,0 +1,113 @@
+import asyncio
+from contextlib import asynccontextmanager, contextmanager
+import logging
+import threading
+from typing import ContextManager, Dict, List, Tuple
+
+import asyncpg
+from django.conf import settings
+
+from cjwstate.commands import RENDER_DELTA_NOTIFY_CHANNEL
+
+
+logger = logging.getLogger(__name__)
+
+
+class DeltaWatcher:
+    """Tell renders when a newer delta makes their output obsolete.
+
+    `cjwstate.commands` sends a NOTIFY each time a delta that changes render
+    output is applied or undone. A render at any other delta of that workflow
+    is wasted work: the renderer will render again at the new delta.
+
+    The renderer should wrap its work in `listening()`, and each render in
+    `watch()`. Outside `listening()` (e.g., in unit tests), `watch()` events
+    are never set.
+    """
+
+    def __init__(self):
+        self._watches: Dict[int, List[Tuple[int, threading.Event]]] = {}
+
+    @contextmanager
+    def watch(self, workflow_id: int, delta_id: int) -> ContextManager[threading.Event]:
+        """Yield an Event that is set when `delta_id` becomes obsolete.
+
+        The Event is thread-safe: the kernel polls it from an executor thread.
+        """
+        cancelled = threading.Event()
+        watch = (delta_id, cancelled)
+        self._watches.setdefault(workflow_id, []).append(watch)
+        try:
+            yield cancelled
+        finally:
+            watches = self._watches[workflow_id]
+            watches.remove(watch)
+            if not watches:
+                del self._watches[workflow_id]
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            workflow_id, delta_id = (int(s) for s in payload.split(" "))
+        except ValueError:
+            logger.warning("Ignoring invalid %s payload %r", channel, payload)
+            return
+
+        for watched_delta_id, cancelled in self._watches.get(workflow_id, []):
+            if watched_delta_id != delta_id and not cancelled.is_set():
+                logger.info(
+                    "Cancelling render(workflow=%d, delta=%d): now at delta %d",
+                    workflow_id,
+                    watched_delta_id,
+                    delta_id,
+                )
+                cancelled.set()
+
+    @asynccontextmanager
+    async def listening(self):
+        """Set `watch()` events when Postgres notifies us, within this block.
+
+        We LISTEN on a dedicated asyncpg connection. If it dies, we log it and
+        renders run to completion, as they would without cancellation.
+        """
+        pg_config = settings.DATABASES["default"]
+        pg_connection = await asyncpg.connect(
+            host=pg_config["HOST"],
+            user=pg_config["USER"],
+            password=pg_config["PASSWORD"],
+            database=pg_config["NAME"],
+            port=pg_config["PORT"],
+            timeout=pg_config["CONN_MAX_AGE"],
+            command_timeout=pg_config["CONN_MAX_AGE"],
+        )
+        await pg_connection.add_listener(RENDER_DELTA_NOTIFY_CHANNEL, self._on_notify)
+
+        heartbeat_task = asyncio.get_event_loop().create_task(
+            self._send_pg_heartbeats_forever(pg_connection, pg_config["CONN_MAX_AGE"])
+        )
+
+        try:
+            yield
+        finally:
+            heartbeat_task.cancel()
+            # Like PgRenderLocker, don't try to .close(): terminate() can't
+            # be interrupted.
+            pg_connection.terminate()
+
+    async def _send_pg_heartbeats_forever(
+        self, pg_connection: asyncpg.Connection, interval: float
+    ) -> None:
+        """Keep the LISTEN connection alive; log if it dies."""
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                await pg_connection.fetchval(
+                    "SELECT 'delta_watcher_heartbeat'", timeout=interval
+                )
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Lost LISTEN connection; renders won't be cancelled")
+
+
+DELTA_WATCHER = DeltaWatcher()
+"""Watches for obsolete renders, for all of this process's renders."""
@@ -0,0 +1,93 @@
+from pathlib import Path
+import shutil
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+
+from cjwkernel.types import ArrowTable, RenderResult
+from cjwstate.lrufiles import LruFiles
+from cjwstate.models import CachedRenderResult
+
+
+class _Key(NamedTuple):
+    workflow_id: int
+    step_id: int
+    delta_id: int
+
+
+class HotOutputs:
+    """Arrow files this renderer wrote recently, keyed by step and delta.
+
+    When a user edits step N, the renderer needs step N-1's output. The
+    renderer wrote that output moments ago, as an Arrow file; re-reading it
+    from the render cache means an S3 download and a Parquet-to-Arrow decode.
+    HotOutputs keeps a local copy of each "ok" output instead.
+
+    Entries are immutable: the render cache's key for an output includes its
+    delta ID. We also compare `TableMetadata` on read, in case another renderer
+    re-rendered the same delta differently (e.g., after a module upgrade).
+
+    We copy files in and out, rather than hard-linking. Renderer and modules
+    overwrite output files in place, so a hard link would let them clobber
+    our copy.
+
+    Total size on disk is bounded by `max_bytes`, evicting least-recently-used
+    files first (see `cjwstate.lrufiles`). This is thread-safe.
+    """
+
+    def __init__(self, parent_dir: Path, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._files = LruFiles(parent_dir, max_bytes)  # values: TableMetadata
+
+    @property
+    def root(self) -> Path:
+        """Directory holding this process's files. Created on first use."""
+        return self._files.root
+
+    def put(
+        self,
+        workflow_id: int,
+        step_id: int,
+        delta_id: int,
+        result: RenderResult,
+    ) -> None:
+        """Copy `result`'s Arrow file, so `load()` can find it later.
+
+        No-op if `result` has no table data or is larger than `max_bytes`.
+        """
+        if not result.table.metadata.columns or result.table.path is None:
+            return
+        size = result.table.path.stat().st_size
+        if size > self.max_bytes:
+            return
+
+        path = self._files.mkstemp(prefix="hot-", suffix=".arrow")
+        shutil.copyfile(result.table.path, path)
+        self._files.add(
+            _Key(workflow_id, step_id, delta_id), path, result.table.metadata
+        )
+
+    def load(self, crr: CachedRenderResult, path: Path) -> Optional[RenderResult]:
+        """Copy the output that matches `crr` to `path`; return it.
+
+        Return `None` if we don't have a copy. (The caller should read the
+        render cache instead.)
+        """
+        key = _Key(crr.workflow_id, crr.step_id, crr.delta_id)
+        file = self._files.get(key, pin=True)
+        if file is None:
+            return None
+        try:
+            if file.value != crr.table_metadata:
+                return None
+            shutil.copyfile(file.path, path)
+        finally:
+            self._files.unpin(file)
+        arrow_table = ArrowTable.from_trusted_file(path, crr.table_metadata)
+        return RenderResult(arrow_table, crr.errors, crr.json)
+
+
+HOT_OUTPUTS = HotOutputs(
+    Path(settings.RENDERER_HOT_OUTPUTS_DIR), settings.RENDERER_HOT_OUTPUTS_MAX_BYTES
+)
+"""Recent step outputs, shared by all of this renderer's threads."""
@@ -3,13 +3,20 @@ from collections import namedtuple
 import contextlib
 import datetime
 from functools import partial
+import hashlib
+import json
 import logging
 from pathlib import Path
+import threading
 import time
-from typing import Any, Dict, NamedTuple, Optional
+from typing import Any, Dict, List, NamedTuple, Optional
 from cjworkbench.sync import database_sync_to_async
 from cjwkernel.chroot import ChrootContext
-from cjwkernel.errors import ModuleError, format_for_user_debugging
+from cjwkernel.errors import (
+    ModuleCancelledError,
+    ModuleError,
+    format_for_user_debugging,
+)
 from cjwkernel.types import (
     ArrowTable,
     FetchResult,
@@ -22,10 +29,12 @@ from cjwkernel.types import (
 from cjwkernel.util import tempfile_context
 import cjwparquet
 from cjwstate import clientside, s3, rabbitmq, rendercache
-from cjwstate.models import StoredObject, Step, Workflow
+from cjwstate.models import CachedRenderResult, StoredObject, Step, Workflow
 import cjwstate.modules
+from cjwstate.modules.param_dtype import ParamDType
 from cjwstate.modules.types import ModuleZipfile
 from renderer import notifications
+from .hot_outputs import HOT_OUTPUTS
 from .types import (
     TabCycleError,
     TabOutputUnreachableError,
@@ -41,6 +50,14 @@ logger = logging.getLogger(__name__)
 SaveResult = namedtuple("SaveResult", ["cached_render_result", "maybe_delta"])
 
 
+class ExecuteStepResult(NamedTuple):
+    result: RenderResult
+    """Output, for the next step to use as input."""
+
+    cached_render_result: CachedRenderResult
+    """Database record of `result` -- fresh, as of the render."""
+
+
 @contextlib.contextmanager
 def locked_step(workflow, step):
     """Concurrency guarantees for execute_step().
@@ -73,25 +90,39 @@ def locked_step(workflow, step):
     return retval
 
 
-def _load_fetch_result(
-    step: Step, basedir: Path, exit_stack: contextlib.ExitStack
+def _find_fetch_result_key(step: Step) -> Optional[str]:
+    """Find the S3 key of the user-selected StoredObject, or return `None`.
+
+    Return `None` if the user did not select a StoredObject, or if the selected
+    StoredObject does not point to a file on s3.
+    """
+    try:
+        stored_object = step.stored_objects.get(stored_at=step.stored_data_version)
+    except StoredObject.DoesNotExist:
+        return None
+    return stored_object.key or None
+
+
+async def _load_fetch_result(
+    key: Optional[str],
+    fetch_errors: List[RenderError],
+    basedir: Path,
+    exit_stack: contextlib.ExitStack,
 ) -> Optional[FetchResult]:
-    """Download user-selected StoredObject to `basedir`, so render() can read it.
+    """Download a StoredObject to `basedir`, so render() can read it.
+
+    This runs outside of the database lock and outside of database threads:
+    S3 can be slow.
 
     Edge cases:
 
-    Create no file (and return `None`) if the user did not select a
-    StoredObject, or if the selected StoredObject does not point to a file
-    on s3.
+    Create no file (and return `None`) if `key` is `None` or does not point to
+    a file on s3.
 
     The caller should ensure "leave `path` alone" means "return an empty
     FetchResult". The FetchResult may still have an error.
     """
-    try:
-        stored_object = step.stored_objects.get(stored_at=step.stored_data_version)
-    except StoredObject.DoesNotExist:
-        return None
-    if not stored_object.key:
+    if key is None:
         return None
 
     with contextlib.ExitStack() as inner_stack:
@@ -100,7 +131,7 @@ def _load_fetch_result(
         )
 
         try:
-            s3.download(s3.StoredObjectsBucket, stored_object.key, path)
+            await s3.download_async(s3.StoredObjectsBucket, key, path)
             # Download succeeded, so we no longer want to delete `path`
             # right _now_ ("now" means, "in inner_stack.close()"). Instead,
             # transfer ownership of `path` to exit_stack.
@@ -120,7 +151,7 @@ def _load_fetch_result(
             # return `None`.
             return None
 
-    return FetchResult(path, step.fetch_errors)
+    return FetchResult(path, fetch_errors)
 
 
 def _wrap_render_errors(render_call):
@@ -151,11 +182,14 @@ def invoke_render(
     tab: Tab,
     fetch_result: Optional[FetchResult],
     output_filename: str,
+    cancelled: Optional[threading.Event] = None,
 ) -> RenderResult:
     """Use kernel to process `table` with module `render` function.
 
     Raise `ModuleError` on error. (This is usually the module author's fault.)
 
+    Raise `ModuleCancelledError` if another thread sets `cancelled`.
+
     Log any ModuleError. Also log success.
 
     This synchronous method can be slow for complex modules or large
@@ -181,6 +215,7 @@ def invoke_render(
             tab=tab,
             fetch_result=fetch_result,
             output_filename=output_filename,
+            cancelled=cancelled,
         )
         status = "(%drows, %dcols, %0.1fMB)" % (
             result.table.metadata.n_rows,
@@ -192,6 +227,9 @@ def invoke_render(
         logger.exception("Exception in %s:render", module_zipfile.path.name)
         status = type(err).__name__
         raise
+    except ModuleCancelledError:
+        status = "cancelled"
+        raise
     finally:
         time2 = time.time()
 
@@ -204,7 +242,10 @@ def invoke_render(
 
 
 class ExecuteStepPreResult(NamedTuple):
-    fetch_result: Optional[FetchResult]
+    fetch_result_key: Optional[str]
+    """S3 key of the StoredObject to download (outside the lock), if any."""
+
+    fetch_errors: List[RenderError]
     params: Dict[str, Any]
 
 
@@ -231,13 +272,14 @@ def _execute_step_pre(
 
     All this runs synchronously within a database lock. (It's a separate
     function so that when we're done awaiting it, we can continue executing in
-    a context that doesn't use a database thread.)
+    a context that doesn't use a database thread.) It does not download the
+    fetch result: the caller should do that after the lock is released.
 
     `tab_results.keys()` must be ordered as the Workflow's tabs are.
     """
     # raises UnneededExecution
     with locked_step(workflow, step) as safe_step:
-        fetch_result = _load_fetch_result(safe_step, basedir, exit_stack)
+        fetch_result_key = _find_fetch_result_key(safe_step)
 
         module_spec = module_zipfile.get_spec()
         param_schema = module_spec.get_param_schema()
@@ -252,53 +294,298 @@ def _execute_step_pre(
         # raise TabCycleError, TabOutputUnreachableError, PromptingError
         params = renderprep.get_param_values(param_schema, raw_params, render_context)
 
-        return ExecuteStepPreResult(fetch_result, params)
+        return ExecuteStepPreResult(fetch_result_key, safe_step.fetch_errors, params)
+
+
+def _render_input_hash(
+    step: Step,
+    module_zipfile: Optional[ModuleZipfile],
+    raw_params: Dict[str, Any],
+    tab: Tab,
+    input_crr: Optional[CachedRenderResult],
+) -> Optional[str]:
+    """Digest everything that goes into `step`'s render(); or return None.
+
+    Return None if the same digest might not mean the same render() result.
+    That happens when the module is in development (its code changes but its
+    version doesn't), when params select tabs (we don't digest tab outputs),
+    or when we don't have a digest of the input table.
+
+    `input_crr` is the cached result of the previous step. It is ignored for
+    the first step (which has no input).
+    """
+    if module_zipfile is None or module_zipfile.version == "develop":
+        return None
+
+    param_schema = module_zipfile.get_spec().get_param_schema()
+    if any(
+        isinstance(dtype, ParamDType.Tab)
+        for dtype, _ in param_schema.iter_dfs_dtype_values(raw_params)
+    ):
+        return None
+
+    if step.order == 0:
+        input_description = None
+    elif input_crr is None or (input_crr.status == "ok" and input_crr.hash is None):
+        return None
+    else:
+        input_description = (
+            input_crr.status,
+            input_crr.hash,
+            input_crr.table_metadata.n_rows,
+            input_crr.table_metadata.columns,
+        )
+
+    digest = hashlib.blake2b(digest_size=20)
+    for part in (
+        module_zipfile.module_id,
+        module_zipfile.version,
+        json.dumps(raw_params, sort_keys=True),
+        repr(input_description),
+        repr(step.stored_data_version),
+        repr(step.fetch_errors),
+        tab.name,
+    ):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ReuseCandidate(NamedTuple):
+    input_hash: Optional[str]
+    """Digest of render() inputs, to store with the result; None if unknown."""
+
+    stale_crr: Optional[CachedRenderResult]
+    """Stale result rendered from identical inputs, or None."""
+
+
+@database_sync_to_async
+def _execute_step_reuse_pre(
+    workflow: Workflow,
+    step: Step,
+    module_zipfile: Optional[ModuleZipfile],
+    raw_params: Dict[str, Any],
+    tab: Tab,
+    input_crr: Optional[CachedRenderResult],
+) -> ReuseCandidate:
+    """Digest render() inputs, and find a stale result rendered from them.
+
+    When a previous step re-renders and its output is identical to its
+    previous output, our inputs are identical, too. Then our stale output is
+    still correct: we needn't call render().
+
+    All this runs synchronously within a database lock. It doesn't touch S3.
+
+    Raise UnneededExecution if the Step has changed in the interim.
+    """
+    # raises UnneededExecution
+    with locked_step(workflow, step) as safe_step:
+        input_hash = _render_input_hash(
+            safe_step, module_zipfile, raw_params, tab, input_crr
+        )
+        if input_hash is None:
+            return ReuseCandidate(None, None)
+
+        stale_crr = safe_step.get_stale_cached_render_result()
+        if stale_crr is None or stale_crr.input_hash != input_hash:
+            return ReuseCandidate(input_hash, None)
+
+        return ReuseCandidate(input_hash, stale_crr)
+
+
+def _stage_reused_result(
+    workflow: Workflow, step: Step, stale_crr: CachedRenderResult, output_path: Path
+) -> Optional[rendercache.StagedRenderResult]:
+    """Copy `stale_crr` to `output_path` and to fresh S3 keys; or return None.
+
+    Return None if the cache is corrupt. (The caller should render instead.)
+
+    This reads and writes S3 without a lock or a database thread.
+    `_execute_step_reuse_save()` will check that `stale_crr` is still the
+    stale result.
+    """
+    try:
+        result = HOT_OUTPUTS.load(stale_crr, output_path)
+        if result is None:
+            result = rendercache.load_cached_render_result(stale_crr, output_path)
+        return rendercache.stage_cached_render_result_copy(
+            stale_crr, step.last_relevant_delta_id, result
+        )
+    except rendercache.CorruptCacheError:
+        logger.exception(
+            "Rendering instead of reusing corrupt cache in wf-%d/wfm-%d",
+            workflow.id,
+            step.id,
+        )
+        return None
+
+
+@database_sync_to_async
+def _execute_step_reuse_save(
+    workflow: Workflow,
+    step: Step,
+    module_zipfile: Optional[ModuleZipfile],
+    raw_params: Dict[str, Any],
+    tab: Tab,
+    input_crr: Optional[CachedRenderResult],
+    candidate: ReuseCandidate,
+    staged: rendercache.StagedRenderResult,
+) -> Optional[CachedRenderResult]:
+    """Commit the staged copy of `candidate.stale_crr`; return the fresh result.
+
+    Return None if `step`'s stale result or inputs changed while we copied.
+    (The caller should discard `staged` and render instead.)
+
+    All this runs synchronously within a database lock. It doesn't touch S3.
+
+    Raise UnneededExecution if the Step has changed in the interim.
+    """
+    # raises UnneededExecution
+    with locked_step(workflow, step) as safe_step:
+        if (
+            safe_step.get_stale_cached_render_result() != candidate.stale_crr
+            or _render_input_hash(safe_step, module_zipfile, raw_params, tab, input_crr)
+            != candidate.input_hash
+        ):
+            return None
+
+        rendercache.commit_staged_render_result(safe_step, staged)
+        return safe_step.cached_render_result
+
+
+async def _reuse_step(
+    workflow: Workflow,
+    step: Step,
+    module_zipfile: Optional[ModuleZipfile],
+    raw_params: Dict[str, Any],
+    tab: Tab,
+    input_crr: Optional[CachedRenderResult],
+    candidate: ReuseCandidate,
+    output_path: Path,
+) -> Optional[ExecuteStepResult]:
+    """Make `candidate.stale_crr` fresh, instead of rendering; or return None.
+
+    Copy files _before_ taking the database lock, as `_save_step()` does.
+    Within the lock, only check `step` still has the stale result and inputs
+    we copied, and point the database at the copies.
+
+    Return None if the caller must render after all.
+
+    Raise UnneededExecution if the Step has changed in the interim.
+    """
+    loop = asyncio.get_event_loop()
+    staged = await loop.run_in_executor(
+        None,
+        _stage_reused_result,
+        workflow,
+        step,
+        candidate.stale_crr,
+        output_path,
+    )
+    if staged is None:
+        return None
+
+    try:
+        crr = await _execute_step_reuse_save(
+            workflow,
+            step,
+            module_zipfile,
+            raw_params,
+            tab,
+            input_crr,
+            candidate,
+            staged,
+        )
+    except UnneededExecution:
+        rendercache.discard_staged_render_result(staged)
+        raise
+    if crr is None:
+        rendercache.discard_staged_render_result(staged)
+        return None
+
+    return ExecuteStepResult(staged.result, crr)
+
+
+class LegacyStaleParquetFile(NamedTuple):
+    crr: CachedRenderResult
+    """Stale result cached before we computed digests."""
+
+    path: Path
+    """Local copy of `crr`'s Parquet file, to compare with the fresh one."""
+
+
+async def _download_legacy_stale_parquet_file(
+    workflow: Workflow, step: Step, basedir: Path, exit_stack: contextlib.ExitStack
+) -> Optional[LegacyStaleParquetFile]:
+    """Download `step`'s stale Parquet file if we'll need it for notifications.
+
+    We only need it if `step` has notifications enabled and its stale result
+    was cached before we computed digests. (Otherwise, we compare digests.)
+
+    This reads S3 without a lock or a database thread. `_execute_step_save()`
+    will check that `crr` is still the stale result.
+    """
+    if not step.notifications:
+        return None
+    stale_crr = step.get_stale_cached_render_result()
+    if stale_crr is None or stale_crr.status != "ok" or stale_crr.hash is not None:
+        return None
+    path = exit_stack.enter_context(
+        tempfile_context(prefix="stale-render-result-", suffix=".parquet", dir=basedir)
+    )
+    try:
+        await rendercache.download_parquet_file_async(stale_crr, path)
+    except rendercache.CorruptCacheError:
+        # No, let's not send an email. Corrupt cache probably means we've been
+        # messing with our codebase.
+        logger.exception(
+            "Ignoring CorruptCacheError on workflow %d, step %d because we are about to overwrite it",
+            workflow.id,
+            step.id,
+        )
+        return None
+    return LegacyStaleParquetFile(stale_crr, path)
 
 
 @database_sync_to_async
 def _execute_step_save(
-    workflow: Workflow, step: Step, result: RenderResult
+    workflow: Workflow,
+    step: Step,
+    staged: rendercache.StagedRenderResult,
+    fresh_parquet_file: Path,
+    legacy_stale_parquet_file: Optional[LegacyStaleParquetFile],
 ) -> SaveResult:
-    """Call rendercache.cache_render_result() and build notifications.OutputDelta.
+    """Commit the staged result and build notifications.OutputDelta.
 
     All this runs synchronously within a database lock. (It's a separate
     function so that when we're done awaiting it, we can continue executing in
-    a context that doesn't use a database thread.)
+    a context that doesn't use a database thread.) The caller must stage the
+    result -- and download any file we compare it with -- before calling: the
+    lock blocks users' edits, so we don't want it to wait for S3.
 
     Raise UnneededExecution if the Step has changed in the interim.
     """
     # raises UnneededExecution
-    with contextlib.ExitStack() as exit_stack:
-        safe_step = exit_stack.enter_context(locked_step(workflow, step))
+    with locked_step(workflow, step) as safe_step:
         if safe_step.notifications:
             stale_crr = safe_step.get_stale_cached_render_result()
-            if stale_crr is None:
-                stale_parquet_file = None
-            elif stale_crr.status == "ok":
-                try:
-                    stale_parquet_file = exit_stack.enter_context(
-                        rendercache.downloaded_parquet_file(stale_crr)
-                    )
-                except rendercache.CorruptCacheError:
-                    # No, let's not send an email. Corrupt cache probably means
-                    # we've been messing with our codebase.
-                    logger.exception(
-                        "Ignoring CorruptCacheError on workflow %d, step %d because we are about to overwrite it",
-                        workflow.id,
-                        step.id,
-                    )
+            if (
+                stale_crr is not None
+                and stale_crr.status == "ok"
+                and stale_crr.hash is None
+            ):
+                # Cached before we computed digests. Compare files instead.
+                if (
+                    legacy_stale_parquet_file is None
+                    or legacy_stale_parquet_file.crr.delta_id != stale_crr.delta_id
+                ):
+                    # We didn't download it (it was corrupt), or it changed
+                    # since. Don't email.
                     stale_crr = None
-                    stale_parquet_file = None
-            else:
-                # status is 'error'/'unreachable'. There's no Parquet file.
-                stale_parquet_file = None
         else:
             stale_crr = None
-            stale_parquet_file = None
 
-        rendercache.cache_render_result(
-            workflow, safe_step, step.last_relevant_delta_id, result
-        )
+        rendercache.commit_staged_render_result(safe_step, staged)
 
         is_changed = False  # nothing to email, usually
         if stale_crr is not None:
@@ -314,13 +601,13 @@ def _execute_step_save(
                 is_changed = True
 
             if not is_changed and fresh_crr.status == "ok":
-                # Download the new parquet file and compare to the old one
-                fresh_parquet_file = exit_stack.enter_context(
-                    rendercache.downloaded_parquet_file(fresh_crr)
-                )
-                is_changed = not cjwparquet.are_files_equal(
-                    stale_parquet_file, fresh_parquet_file
-                )
+                if stale_crr.hash is not None:
+                    is_changed = fresh_crr.hash != stale_crr.hash
+                else:
+                    # We staged the new parquet file from fresh_parquet_file
+                    is_changed = not cjwparquet.are_files_equal(
+                        legacy_stale_parquet_file.path, fresh_parquet_file
+                    )
 
         if is_changed:
             safe_step.has_unseen_notification = True
@@ -336,6 +623,46 @@ def _execute_step_save(
         return SaveResult(safe_step.cached_render_result, maybe_delta)
 
 
+async def _save_step(
+    workflow: Workflow,
+    step: Step,
+    result: RenderResult,
+    input_hash: Optional[str],
+    basedir: Path,
+) -> SaveResult:
+    """Cache `result` and build notifications.OutputDelta.
+
+    Encode, download and upload _before_ taking the database lock: the lock
+    blocks users' edits, and S3 transfers can take seconds. Within the lock,
+    only check `step` is still what we rendered and point the database at
+    the uploaded files. If `step` changed, delete the uploaded files.
+
+    Raise UnneededExecution if the Step has changed in the interim.
+    """
+    with contextlib.ExitStack() as exit_stack:
+        legacy_stale_parquet_file = await _download_legacy_stale_parquet_file(
+            workflow, step, basedir, exit_stack
+        )
+        parquet_path = exit_stack.enter_context(
+            tempfile_context(prefix="render-result-", suffix=".parquet", dir=basedir)
+        )
+        staged = await rendercache.stage_render_result_async(
+            workflow.id,
+            step.id,
+            step.last_relevant_delta_id,
+            result,
+            parquet_path,
+            input_hash,
+        )
+        try:
+            return await _execute_step_save(
+                workflow, step, staged, parquet_path, legacy_stale_parquet_file
+            )
+        except UnneededExecution:
+            rendercache.discard_staged_render_result(staged)
+            raise
+
+
 async def _render_step(
     chroot_context: ChrootContext,
     workflow: Workflow,
@@ -346,11 +673,14 @@ async def _render_step(
     input_result: RenderResult,
     tab_results: Dict[Tab, Optional[RenderResult]],
     output_path: Path,
+    cancelled: Optional[threading.Event] = None,
 ) -> RenderResult:
     """Prepare and call `step`'s `render()`; return a RenderResult.
 
     The actual render runs in a background thread so the event loop can process
     other events.
+
+    Raise UnneededExecution if `cancelled` is set while `render()` runs.
     """
     basedir = output_path.parent
 
@@ -374,7 +704,7 @@ async def _render_step(
         try:
             # raise UnneededExecution, TabCycleError, TabOutputUnreachableError,
             # PromptingError
-            fetch_result, params = await _execute_step_pre(
+            fetch_result_key, fetch_errors, params = await _execute_step_pre(
                 basedir,
                 exit_stack,
                 workflow,
@@ -409,24 +739,32 @@ async def _render_step(
         except PromptingError as err:
             return RenderResult(errors=err.as_render_errors())
 
+        fetch_result = await _load_fetch_result(
+            fetch_result_key, fetch_errors, basedir, exit_stack
+        )
+
         # Render may take a while. run_in_executor to push that slowdown to a
         # thread and keep our event loop responsive.
         loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(
-            None,
-            _wrap_render_errors,
-            partial(
-                invoke_render,
-                module_zipfile,
-                chroot_context=chroot_context,
-                basedir=basedir,
-                input_table=input_result.table,
-                params=params,
-                tab=tab,
-                fetch_result=fetch_result,
-                output_filename=output_path.name,
-            ),
-        )
+        try:
+            return await loop.run_in_executor(
+                None,
+                _wrap_render_errors,
+                partial(
+                    invoke_render,
+                    module_zipfile,
+                    chroot_context=chroot_context,
+                    basedir=basedir,
+                    input_table=input_result.table,
+                    params=params,
+                    tab=tab,
+                    fetch_result=fetch_result,
+                    output_filename=output_path.name,
+                    cancelled=cancelled,
+                ),
+            )
+        except ModuleCancelledError:
+            raise UnneededExecution from None
 
 
 async def execute_step(
@@ -439,9 +777,21 @@ async def execute_step(
     input_result: RenderResult,
     tab_results: Dict[Tab, Optional[RenderResult]],
     output_path: Path,
-) -> RenderResult:
+    input_crr: Optional[CachedRenderResult] = None,
+    cancelled: Optional[threading.Event] = None,
+) -> ExecuteStepResult:
     """Render a single Step; cache, broadcast and return output.
 
+    `input_crr` is the cached result `input_result` came from, if the caller
+    knows it. When `step`'s stale cached result was rendered from identical
+    inputs, we reuse it instead of calling render(). (This is common: an
+    auto-updating workflow re-fetches the same data, or a user changes a
+    param and then changes it back.)
+
+    `cancelled` is set (by another thread) when a newer delta makes this
+    render obsolete. Then we kill render() and raise UnneededExecution,
+    without waiting for render() to finish only to find out at save time.
+
     CONCURRENCY NOTES: This function is reasonably concurrency-friendly:
 
     * It returns a valid cache result immediately.
@@ -467,6 +817,36 @@ async def execute_step(
 
     Raises `UnneededExecution` when the input Step should not be rendered.
     """
+    # may raise UnneededExecution
+    candidate = await _execute_step_reuse_pre(
+        workflow, step, module_zipfile, params, tab, input_crr
+    )
+    if candidate.stale_crr is None:
+        reused = None
+    else:
+        # may raise UnneededExecution
+        reused = await _reuse_step(
+            workflow,
+            step,
+            module_zipfile,
+            params,
+            tab,
+            input_crr,
+            candidate,
+            output_path,
+        )
+    if reused is not None:
+        update = clientside.Update(
+            steps={
+                step.id: clientside.StepUpdate(
+                    render_result=reused.cached_render_result,
+                    module_slug=step.module_id_name,
+                )
+            }
+        )
+        await rabbitmq.send_update_to_workflow_clients(workflow.id, update)
+        return reused
+
     # may raise UnneededExecution
     result = await _render_step(
         chroot_context=chroot_context,
@@ -478,10 +858,13 @@ async def execute_step(
         input_result=input_result,
         tab_results=tab_results,
         output_path=output_path,
+        cancelled=cancelled,
     )
 
     # may raise UnneededExecution
-    crr, output_delta = await _execute_step_save(workflow, step, result)
+    crr, output_delta = await _save_step(
+        workflow, step, result, candidate.input_hash, output_path.parent
+    )
 
     update = clientside.Update(
         steps={
@@ -504,7 +887,4 @@ async def execute_step(
             datetime.datetime.now(),
         )
 
-    # TODO if there's no change, is it possible for us to skip the render
-    # of future modules, setting their cached_render_result_delta_id =
-    # last_relevant_delta_id?  Investigate whether this is worthwhile.
-    return result
+    return ExecuteStepResult(result, crr)
@@ -1,7 +1,10 @@
+import asyncio
 from dataclasses import dataclass
+from functools import partial
 from itertools import cycle
 import logging
 from pathlib import Path
+import threading
 from typing import Any, Dict, List, Optional, FrozenSet
 from cjworkbench.sync import database_sync_to_async
 from cjwkernel.chroot import ChrootContext
@@ -10,7 +13,9 @@ from cjwstate.rendercache import load_cached_render_result, CorruptCacheError
 from cjwstate.models import Step, Workflow
 from cjwstate.modules.param_dtype import ParamDType
 from cjwstate.modules.types import ModuleZipfile
+from .hot_outputs import HOT_OUTPUTS
 from .step import execute_step, locked_step
+from .types import UnneededExecution
 
 
 logger = logging.getLogger(__name__)
@@ -116,6 +121,12 @@ def _load_step_output_from_rendercache(
         crr = safe_step.cached_render_result
         assert crr is not None  # otherwise we'd have raised UnneededExecution
 
+        # Maybe we rendered this output recently. Then we needn't read the
+        # render cache at all.
+        hot_result = HOT_OUTPUTS.load(crr, path)
+        if hot_result is not None:
+            return hot_result
+
         # Read the entire input Parquet file. Raise CorruptCacheError.
         return load_cached_render_result(crr, path)
 
@@ -126,6 +137,7 @@ async def execute_tab_flow(
     flow: TabFlow,
     tab_results: Dict[Tab, Optional[RenderResult]],
     output_path: Path,
+    cancelled: Optional[threading.Event] = None,
 ) -> RenderResult:
     """Ensure `flow.tab.live_steps` all cache fresh render results.
 
@@ -133,7 +145,9 @@ async def execute_tab_flow(
 
     Raise `UnneededExecution` if something changes underneath us such that we
     can't guarantee all render results will be fresh. (The remaining execution
-    is "unneeded" because we assume another render has been queued.)
+    is "unneeded" because we assume another render has been queued.) That
+    includes when another thread sets `cancelled`: we skip the remaining
+    steps, and kill the running one.
 
     WEBSOCKET NOTES: each step is executed in turn. After each execution,
     we notify clients of its new columns and status.
@@ -200,6 +214,7 @@ async def execute_tab_flow(
                         workflow, step, step_output_path
                     )
                     # `last_result` will be the input into steps[step_index]
+                    last_crr = step.cached_render_result
                     step_index += 1
                     break
                 except CorruptCacheError:
@@ -216,11 +231,14 @@ async def execute_tab_flow(
             # but if it did, it would be `next(step_output_paths)`.
             next(step_output_paths)
             last_result = RenderResult()
+            last_crr = None
             step_index = 0  # needed when there are no steps at all
 
         for step, step_output_path in zip(flow.steps[step_index:], step_output_paths):
+            if cancelled is not None and cancelled.is_set():
+                raise UnneededExecution
             step_output_path.write_bytes(b"")  # don't leak data from two steps ago
-            next_result = await execute_step(
+            next_result, next_crr = await execute_step(
                 chroot_context=chroot_context,
                 workflow=workflow,
                 step=step.step,
@@ -230,7 +248,22 @@ async def execute_tab_flow(
                 input_result=last_result,
                 tab_results=tab_results,
                 output_path=step_output_path,
+                input_crr=last_crr,
+                cancelled=cancelled,
+            )
+            # Keep a copy, in case the next render needs this as input. Copy
+            # now: the next-next step will overwrite `step_output_path`.
+            await asyncio.get_event_loop().run_in_executor(
+                None,
+                partial(
+                    HOT_OUTPUTS.put,
+                    workflow.id,
+                    step.step.id,
+                    step.step.last_relevant_delta_id,
+                    next_result,
+                ),
             )
             last_result = next_result
+            last_crr = next_crr
 
         return last_result
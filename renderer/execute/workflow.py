@@ -1,13 +1,23 @@
+import asyncio
+from dataclasses import replace
 import logging
+from pathlib import Path
+import shutil
+import threading
 from typing import Any, Dict, List, Optional, Tuple
 from cjworkbench.sync import database_sync_to_async
-from cjwkernel.chroot import EDITABLE_CHROOT
+from cjwkernel.chroot import EDITABLE_CHROOT_POOL
 from cjwkernel.errors import ModuleError
-from cjwkernel.types import RenderResult, Tab
+from cjwkernel.types import ArrowTable, RenderResult, Tab
+from cjwkernel.util import tempdir_context
 from cjwstate.models import Step, Workflow
 from cjwstate.models.module_registry import MODULE_REGISTRY
 from cjwstate.modules.types import ModuleZipfile
-from cjwstate.params import get_migrated_params
+from cjwstate.params import (
+    are_cached_migrated_params_stale,
+    invoke_migrate_params,
+    invoke_migrate_params_batch,
+)
 from .tab import ExecuteStep, TabFlow, execute_tab_flow
 from .types import UnneededExecution
 
@@ -15,10 +25,15 @@ from .types import UnneededExecution
 logger = logging.getLogger(__name__)
 
 
-def _get_migrated_params(step: Step, module_zipfile: ModuleZipfile) -> Dict[str, Any]:
+def _get_migrated_params(
+    step: Step,
+    module_zipfile: Optional[ModuleZipfile],
+    migrated_params: Dict[int, Optional[Dict[str, Any]]],
+) -> Dict[str, Any]:
     """Build the Params dict which will be passed to render().
 
-    Call LoadedModule.migrate_params() to ensure the params are up-to-date.
+    Use `migrated_params[step.id]` if `_migrate_stale_params()` migrated this
+    step; otherwise, use `step.cached_migrated_params`.
 
     On ModuleError or ValueError, log the error and return default params. This
     will render the "wrong" thing ... but the front-end should show the migrate
@@ -26,8 +41,6 @@ def _get_migrated_params(step: Step, module_zipfile: ModuleZipfile) -> Dict[str,
     (What's the alternative? Abort the whole workflow render? We can't render
     _any_ module until we've migrated _all_ modules; and it's hard to imagine
     showing the user a huge, aborted render.)
-
-    Assume we are called within a `workflow.cooperative_lock()`.
     """
     if module_zipfile is None:
         # This is a deleted module. Renderer will pass the input through to
@@ -37,11 +50,13 @@ def _get_migrated_params(step: Step, module_zipfile: ModuleZipfile) -> Dict[str,
     module_spec = module_zipfile.get_spec()
     param_schema = module_spec.get_param_schema()
 
-    try:
-        result = get_migrated_params(step, module_zipfile=module_zipfile)
-    except ModuleError:
-        # LoadedModule logged this error; no need to log it again.
-        return param_schema.coerce(None)
+    if step.id in migrated_params:
+        result = migrated_params[step.id]
+        if result is None:
+            # ModuleError. invoke_migrate_params() logged it.
+            return param_schema.coerce(None)
+    else:
+        result = step.cached_migrated_params
 
     # Is the module buggy? It might be. Log that error, and return a valid
     # set of params anyway -- even if it isn't the params the user wants.
@@ -57,64 +72,159 @@ def _get_migrated_params(step: Step, module_zipfile: ModuleZipfile) -> Dict[str,
         return param_schema.coerce(result)
 
 
-def _build_execute_step(
-    step: Step, *, module_zipfiles: Dict[str, ModuleZipfile]
-) -> ExecuteStep:
-    try:
-        module_zipfile = module_zipfiles[step.module_id_name]
-    except KeyError:
-        module_zipfile = None
-
-    return ExecuteStep(
-        step,
-        module_zipfile,
-        # We need to invoke the kernel and migrate _all_ modules'
-        # params (Step.get_params), because we can only check
-        # for tab cycles after migrating (and before calling any
-        # render()).
-        _get_migrated_params(step, module_zipfile=module_zipfile),
-    )
+def _migrate_stale_params(
+    steps: List[Step], module_zipfiles: Dict[str, ModuleZipfile]
+) -> Dict[int, Optional[Dict[str, Any]]]:
+    """Call migrate_params() for each step whose cached migrated params are stale.
+
+    Return `{step_id: params}`; `params` is `None` if migrate_params() raised
+    ModuleError.
+
+    Spawn one kernel child per module, not one per step. (After we deploy a
+    new module version, every step that uses it is stale.) If a batch fails,
+    retry its steps one by one so only the broken steps get default params.
+
+    This doesn't touch the database: call it without holding a lock.
+    """
+    stale_steps: Dict[str, List[Step]] = {}  # module_id_name => steps
+    for step in steps:
+        module_zipfile = module_zipfiles.get(step.module_id_name)
+        if module_zipfile is not None and are_cached_migrated_params_stale(
+            step, module_zipfile
+        ):
+            stale_steps.setdefault(step.module_id_name, []).append(step)
+
+    ret = {}
+    for module_id_name, module_steps in stale_steps.items():
+        module_zipfile = module_zipfiles[module_id_name]
+        try:
+            results = invoke_migrate_params_batch(
+                module_zipfile, [step.params for step in module_steps]
+            )
+        except ModuleError:
+            results = []
+            for step in module_steps:
+                try:
+                    results.append(invoke_migrate_params(module_zipfile, step.params))
+                except ModuleError:
+                    results.append(None)
+        for step, result in zip(module_steps, results):
+            ret[step.id] = result
+    return ret
 
 
 @database_sync_to_async
-def _load_tab_flows(workflow: Workflow, delta_id: int) -> List[TabFlow]:
-    """Query `workflow` for each tab's `TabFlow` (ordered by tab position).
+def _load_tabs_and_steps(
+    workflow: Workflow, delta_id: int
+) -> Tuple[List[Tuple[Tab, List[Step]]], Dict[str, ModuleZipfile]]:
+    """Query `workflow` for its tabs and steps (ordered by position).
+
+    Also return the module zipfiles we'll use to render them.
 
-    Raise `ModuleError` or `ValueError` if migrate_params() fails. Failed
-    migration means the whole execute can't happen.
+    Raise UnneededExecution if `workflow` has changed since `delta_id`.
     """
-    ret = []
     with workflow.cooperative_lock():  # reloads workflow
         if workflow.last_delta_id != delta_id:
             raise UnneededExecution
 
         module_zipfiles = MODULE_REGISTRY.all_latest()
+        tabs = [
+            (Tab(tab_model.slug, tab_model.name), list(tab_model.live_steps.all()))
+            for tab_model in workflow.live_tabs.all()
+        ]
+    return tabs, module_zipfiles
 
-        for tab_model in workflow.live_tabs.all():
-            steps = [
-                _build_execute_step(step, module_zipfiles=module_zipfiles)
-                for step in tab_model.live_steps.all()
-            ]
-            ret.append(TabFlow(Tab(tab_model.slug, tab_model.name), steps))
-    return ret
+
+@database_sync_to_async
+def _cache_migrated_params(
+    workflow: Workflow,
+    delta_id: int,
+    steps: List[Step],
+    module_zipfiles: Dict[str, ModuleZipfile],
+    migrated_params: Dict[int, Optional[Dict[str, Any]]],
+) -> None:
+    """Store `migrated_params` in the database, so we needn't migrate again.
+
+    Raise UnneededExecution if `workflow` has changed since `delta_id`. (If it
+    hasn't, no step's params have changed since we read them.)
+    """
+    with workflow.cooperative_lock():  # reloads workflow
+        if workflow.last_delta_id != delta_id:
+            raise UnneededExecution
+
+        for step in steps:
+            params = migrated_params.get(step.id)
+            if params is None:
+                continue  # not migrated, or ModuleError: don't cache
+            version = module_zipfiles[step.module_id_name].version
+            step.cached_migrated_params = params
+            step.cached_migrated_params_module_version = version
+            Step.objects.filter(id=step.id).update(
+                cached_migrated_params=params,
+                cached_migrated_params_module_version=version,
+            )
+
+
+async def _load_tab_flows(workflow: Workflow, delta_id: int) -> List[TabFlow]:
+    """Query `workflow` for each tab's `TabFlow` (ordered by tab position).
+
+    We need to invoke the kernel and migrate _all_ modules' params, because we
+    can only check for tab cycles after migrating (and before calling any
+    render()). We do that without holding the workflow lock, batched by
+    module; then we lock again to cache the results.
+
+    Raise UnneededExecution if `workflow` changes while we work.
+    """
+    tabs, module_zipfiles = await _load_tabs_and_steps(workflow, delta_id)
+    steps = [step for _, tab_steps in tabs for step in tab_steps]
+
+    migrated_params = await asyncio.get_event_loop().run_in_executor(
+        None, _migrate_stale_params, steps, module_zipfiles
+    )
+    if migrated_params:
+        await _cache_migrated_params(
+            workflow, delta_id, steps, module_zipfiles, migrated_params
+        )
+
+    return [
+        TabFlow(
+            tab,
+            [
+                ExecuteStep(
+                    step,
+                    module_zipfiles.get(step.module_id_name),
+                    _get_migrated_params(
+                        step,
+                        module_zipfiles.get(step.module_id_name),
+                        migrated_params,
+                    ),
+                )
+                for step in tab_steps
+            ],
+        )
+        for tab, tab_steps in tabs
+    ]
 
 
 def partition_ready_and_dependent(
-    flows: List[TabFlow],
+    flows: List[TabFlow], running_flows: Optional[List[TabFlow]] = None
 ) -> Tuple[List[TabFlow], List[TabFlow]]:
     """Find `(ready_flows, dependent_flows)` from `flows`.
 
     "Ready" TabFlows are TabFlows that don't depend on not-yet-rendered Tabs.
 
     "Dependent" TabFlows are TabFlows that have one or more Tab parameters that
-    refer to Tabs that haven't been rendered.
+    refer to Tabs that haven't been rendered -- that is, Tabs in `flows` or
+    `running_flows`.
 
     Tab parameters with no value -- and Tab parameters that point to
     nonexistent Tabs -- are treated as "ready". (This lets us optimize
     cleverly: we don't even need to know the list of already-rendered tabs to
     know whether a TabFlow is ready.)
     """
-    pending_tab_slugs = frozenset(flow.tab_slug for flow in flows)
+    if running_flows is None:
+        running_flows = []
+    pending_tab_slugs = frozenset(flow.tab_slug for flow in [*flows, *running_flows])
 
     ready = []
     dependent = []
@@ -126,11 +236,28 @@ def partition_ready_and_dependent(
     return (ready, dependent)
 
 
-async def execute_workflow(workflow: Workflow, delta_id: int) -> None:
+def _copy_render_result(result: RenderResult, path: Path) -> RenderResult:
+    """Copy `result`'s Arrow file to `path`; return a RenderResult backed by it."""
+    shutil.copyfile(result.table.path, path)
+    return replace(
+        result, table=ArrowTable.from_trusted_file(path, result.table.metadata)
+    )
+
+
+async def execute_workflow(
+    workflow: Workflow, delta_id: int, cancelled: Optional[threading.Event] = None
+) -> None:
     """Ensure all `workflow.tabs[*].live_steps` cache fresh render results.
 
     Raise UnneededExecution if the inputs become stale (at which point we don't
-    care about results any more).
+    care about results any more). If another thread sets `cancelled`, the
+    inputs are stale: we kill running modules and raise UnneededExecution soon.
+
+    Tabs that don't depend on one another render concurrently, each in its own
+    chroot from `EDITABLE_CHROOT_POOL`. As soon as a tab finishes, tabs that
+    depend on it become ready. The renderer renders several workflows at once:
+    a workflow may use every free chroot, but while other workflows wait for
+    chroots, the pool shares them equally (see `ChrootPool`).
 
     WEBSOCKET NOTES: each step is executed in turn. After each execution,
     we notify clients of its new columns and status.
@@ -149,44 +276,110 @@ async def execute_workflow(workflow: Workflow, delta_id: int) -> None:
     tab_results: Dict[Tab, Optional[RenderResult]] = {
         flow.tab: None for flow in pending_tab_flows
     }
-    output_paths = []
-
-    # Execute one tab_flow at a time.
-    #
-    # We don't hold a DB lock throughout the loop: the loop can take a long
-    # time; it might be run multiple times simultaneously (even on different
-    # computers); and `await` doesn't work with locks.
 
-    with EDITABLE_CHROOT.acquire_context() as chroot_context:
-        with chroot_context.tempdir_context("render-") as basedir:
+    # Tabs other tabs read. Each tab renders in a chroot that is wiped when the
+    # tab is done; so we copy these tabs' outputs to `tab_outputs_dir`. Tabs
+    # that read them copy them into their own chroots.
+    input_tab_slugs = frozenset().union(
+        *(flow.input_tab_slugs for flow in pending_tab_flows)
+    )
 
-            async def execute_tab_flow_into_new_file(tab_flow: TabFlow) -> RenderResult:
-                nonlocal workflow, tab_results, output_paths
-                output_path = basedir / (
-                    "tab-output-%s.arrow" % tab_flow.tab_slug.replace("/", "-")
-                )
-                return await execute_tab_flow(
-                    chroot_context, workflow, tab_flow, tab_results, output_path
-                )
+    # We don't hold a DB lock throughout the render: it can take a long time;
+    # it might be run multiple times simultaneously (even on different
+    # computers); and `await` doesn't work with locks.
 
-            while pending_tab_flows:
-                ready_flows, dependent_flows = partition_ready_and_dependent(
-                    pending_tab_flows
+    with tempdir_context(prefix="render-tab-outputs-") as tab_outputs_dir:
+
+        async def execute_tab_flow_in_chroot(tab_flow: TabFlow) -> RenderResult:
+            loop = asyncio.get_event_loop()
+            async with EDITABLE_CHROOT_POOL.acquire_context(
+                group=workflow.id
+            ) as chroot_context:
+                if error is not None:
+                    # Another tab failed while we waited for a chroot
+                    raise UnneededExecution
+                with chroot_context.tempdir_context("render-") as basedir:
+                    # Copy input tabs' outputs into our chroot, so modules can
+                    # read them.
+                    chroot_tab_results = {}
+                    for tab, result in tab_results.items():
+                        if (
+                            result is not None
+                            and result.table.path is not None
+                            and tab.slug in tab_flow.input_tab_slugs
+                        ):
+                            path = basedir / (
+                                "input-tab-output-%s.arrow" % tab.slug.replace("/", "-")
+                            )
+                            result = await loop.run_in_executor(
+                                None, _copy_render_result, result, path
+                            )
+                        chroot_tab_results[tab] = result
+
+                    output_path = basedir / (
+                        "tab-output-%s.arrow" % tab_flow.tab_slug.replace("/", "-")
+                    )
+                    result = await execute_tab_flow(
+                        chroot_context,
+                        workflow,
+                        tab_flow,
+                        chroot_tab_results,
+                        output_path,
+                        cancelled,
+                    )
+
+                    if (
+                        tab_flow.tab_slug in input_tab_slugs
+                        and result.table.path is not None
+                    ):
+                        # Copy the output before the chroot is wiped
+                        result = await loop.run_in_executor(
+                            None,
+                            _copy_render_result,
+                            result,
+                            tab_outputs_dir / output_path.name,
+                        )
+                    return result
+
+        running: Dict[asyncio.Future, TabFlow] = {}
+        cycle_flows: List[TabFlow] = []
+        error: Optional[BaseException] = None
+        while True:
+            if error is None:
+                ready_flows, pending_tab_flows = partition_ready_and_dependent(
+                    pending_tab_flows, list(running.values())
                 )
-
-                if not ready_flows:
-                    # All flows are dependent -- meaning they all have cycles. Execute
-                    # them last; they can detect their cycles through `tab_results`.
-                    break
-
+                if not ready_flows and not running and pending_tab_flows:
+                    # All flows are dependent -- meaning they all have cycles.
+                    # Execute them last; they can detect their cycles through
+                    # `tab_results`. No need to update `tab_results`: If tab1
+                    # and tab 2 depend on each other, they should have the same
+                    # error ("Cycle").
+                    cycle_flows.extend(pending_tab_flows)
+                    ready_flows, pending_tab_flows = pending_tab_flows, []
                 for tab_flow in ready_flows:
-                    result = await execute_tab_flow_into_new_file(tab_flow)
+                    task = asyncio.ensure_future(execute_tab_flow_in_chroot(tab_flow))
+                    running[task] = tab_flow
+
+            if not running:
+                break
+
+            done, _ = await asyncio.wait(
+                running.keys(), return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                tab_flow = running.pop(task)
+                try:
+                    result = task.result()
+                except Exception as err:
+                    # Stop scheduling. Let running tabs finish: we mustn't wipe
+                    # a chroot while a module is running in it. (They'll
+                    # probably finish soon, with UnneededExecution.)
+                    if error is None:
+                        error = err
+                    continue
+                if tab_flow not in cycle_flows:
                     tab_results[tab_flow.tab] = result
 
-                pending_tab_flows = dependent_flows  # iterate
-
-            # Now, `pending_tab_flows` only contains flows with cycles. Execute
-            # them. No need to update `tab_results`: If tab1 and tab 2 depend on
-            # each other, they should have the same error ("Cycle").
-            for tab_flow in pending_tab_flows:
-                await execute_tab_flow_into_new_file(tab_flow)
+        if error is not None:
+            raise error
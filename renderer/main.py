@@ -1,43 +1,111 @@
 import asyncio
+import logging
+
+from django.conf import settings
 
 from cjwstate import rabbitmq
+from cjwstate.models.module_registry import MODULE_REGISTRY
 from cjworkbench.pg_render_locker import PgRenderLocker
+from .delta_watcher import DELTA_WATCHER
 from .render import handle_render
+from .scheduler import RenderScheduler
+
+
+logger = logging.getLogger(__name__)
+
+
+async def log_stats_forever(scheduler: RenderScheduler, interval: float) -> None:
+    """Log each queue's depth and wait times every `interval` seconds."""
+    last_stats = scheduler.stats()
+    while True:
+        await asyncio.sleep(interval)
+        stats = scheduler.stats()
+        for queue, queue_stats in stats.queues.items():
+            last_queue_stats = last_stats.queues[queue]
+            n_started = queue_stats.n_started - last_queue_stats.n_started
+            n_superseded = queue_stats.n_superseded - last_queue_stats.n_superseded
+            wait_seconds = queue_stats.wait_seconds - last_queue_stats.wait_seconds
+            logger.info(
+                (
+                    "Render queue %s: %d waiting (oldest %0.1fs); "
+                    "%d started (mean wait %0.1fs); %d superseded"
+                ),
+                queue,
+                queue_stats.n_waiting,
+                queue_stats.oldest_wait_seconds,
+                n_started,
+                wait_seconds / n_started if n_started else 0.0,
+                n_superseded,
+            )
+        last_stats = stats
 
 
 async def main_loop():
     """Run fetchers and renderers, forever."""
+    listening_for_module_updates = MODULE_REGISTRY.listening_for_updates()
+    async with listening_for_module_updates, DELTA_WATCHER.listening():
+        await render_forever()
+
+
+async def render_forever():
+    """Consume render requests until the RabbitMQ connection closes."""
     async with PgRenderLocker() as pg_render_locker:
+        scheduler = RenderScheduler(settings.RENDERER_N_CONCURRENT_RENDERS)
 
-        @rabbitmq.acking_callback
-        async def render_callback(message):
-            await handle_render(message, pg_render_locker)
-            # Possible errors: DatabaseError, InterfaceError. Explanations:
-            #
-            # 1. There's a bug in renderer.execute. This may leave the event
-            # loop's executor thread's database connection in an inconsistent
-            # state. [2018-11-06 saw this on production.] The best way to clear
-            # up the leaked, broken connection is to die. (Our parent process
-            # should restart us, and RabbitMQ will give the job to someone
-            # else.)
-            #
-            # 2. The database connection died (e.g., Postgres went away). The
-            # best way to clear up the leaked, broken connection is to die.
-            # (Our parent process should restart us, and RabbitMQ will give the
-            # job to someone else.)
-            #
-            # 3. PgRenderLocker's database connection died (e.g., Postgres went
-            # away). We haven't seen this much in practice; so let's die and let
-            # the parent process restart us.
-            #
-            # 4. There's some design flaw we haven't thought of, and we
-            # shouldn't ever render this workflow. If this is the case, we're
-            # doomed.
-            #
-            # If you're seeing an error that means there's a bug somewhere
-            # _else_. If you're staring at a case-3 situation, please remember
-            # that cases 1 and 2 are important, too.
+        def make_render_callback(queue: str):
+            @rabbitmq.acking_callback
+            async def render_callback(message):
+                await handle_render(
+                    message, pg_render_locker, scheduler=scheduler, queue=queue
+                )
+                # Possible errors: DatabaseError, InterfaceError. Explanations:
+                #
+                # 1. There's a bug in renderer.execute. This may leave the event
+                # loop's executor thread's database connection in an inconsistent
+                # state. [2018-11-06 saw this on production.] The best way to clear
+                # up the leaked, broken connection is to die. (Our parent process
+                # should restart us, and RabbitMQ will give the job to someone
+                # else.)
+                #
+                # 2. The database connection died (e.g., Postgres went away). The
+                # best way to clear up the leaked, broken connection is to die.
+                # (Our parent process should restart us, and RabbitMQ will give the
+                # job to someone else.)
+                #
+                # 3. PgRenderLocker's database connection died (e.g., Postgres went
+                # away). We haven't seen this much in practice; so let's die and let
+                # the parent process restart us.
+                #
+                # 4. There's some design flaw we haven't thought of, and we
+                # shouldn't ever render this workflow. If this is the case, we're
+                # doomed.
+                #
+                # If you're seeing an error that means there's a bug somewhere
+                # _else_. If you're staring at a case-3 situation, please remember
+                # that cases 1 and 2 are important, too.
+
+            return render_callback
 
         connection = rabbitmq.get_connection()
-        connection.declare_queue_consume(rabbitmq.Render, render_callback)
-        await connection.wait_closed()
+        # Prefetch more background renders than we render, so `scheduler` has
+        # choices. Messages stay un-acked while they wait their turn: if we
+        # die, RabbitMQ redelivers them.
+        #
+        # Don't hoard users' renders, though: a busy renderer would hold them
+        # while other renderers sit idle. Hold only as many as we can run.
+        for queue in rabbitmq.RenderQueues:
+            if queue == rabbitmq.Render:
+                prefetch_count = settings.RENDERER_N_CONCURRENT_RENDERS
+            else:
+                prefetch_count = settings.RENDERER_N_PREFETCHED_RENDERS
+            connection.declare_queue_consume(
+                queue, make_render_callback(queue), prefetch_count
+            )
+
+        log_stats = asyncio.ensure_future(
+            log_stats_forever(scheduler, settings.RENDERER_STATS_INTERVAL)
+        )
+        try:
+            await connection.wait_closed()
+        finally:
+            log_stats.cancel()
@@ -2,7 +2,7 @@ import asyncio
 import logging
 import os
 from enum import Enum
-from typing import Any, Awaitable, Callable, Dict
+from typing import Any, Awaitable, Callable, Dict, Optional
 
 from django.db import DatabaseError, InterfaceError
 
@@ -12,6 +12,8 @@ from cjworkbench.pg_render_locker import PgRenderLocker, WorkflowAlreadyLocked
 from cjworkbench.sync import database_sync_to_async
 from cjworkbench.util import benchmark
 from . import execute
+from .delta_watcher import DELTA_WATCHER
+from .scheduler import RenderScheduler, RenderSuperseded
 
 
 logger = logging.getLogger(__name__)
@@ -52,8 +54,12 @@ async def render_workflow_once(workflow: Workflow, delta_id: int):
     # `execute_workflow()` _anticipates_ that `workflow` data may be
     # stale.
     try:
-        task = execute.execute_workflow(workflow, delta_id)
-        await benchmark(logger, task, "execute_workflow(%d, %d)", workflow.id, delta_id)
+        # Cancel if a newer delta arrives: this render's output is doomed.
+        with DELTA_WATCHER.watch(workflow.id, delta_id) as cancelled:
+            task = execute.execute_workflow(workflow, delta_id, cancelled=cancelled)
+            await benchmark(
+                logger, task, "execute_workflow(%d, %d)", workflow.id, delta_id
+            )
         return RenderResult.CHECK_TO_REQUEUE
     except execute.UnneededExecution:
         logger.info(
@@ -74,6 +80,8 @@ async def render_workflow_and_maybe_requeue(
     pg_render_locker: PgRenderLocker,
     workflow_id: int,
     delta_id: int,
+    *,
+    is_render_pending: Callable[[int], bool] = lambda workflow_id: False,
 ) -> None:
     """
     Acquire an advisory lock and render, or re-queue task if the lock is held.
@@ -82,6 +90,10 @@ async def render_workflow_and_maybe_requeue(
     there's no point in wasting CPU cycles starting from scratch. Wait for the
     first render to exit (which will happen at the next stale database-write).
     It should then re-schedule a render.
+
+    `is_render_pending(workflow_id)` returns True if this process already
+    holds a request to render the workflow again. In that case, we needn't
+    re-schedule a render: that request is the follow-up.
     """
     # Query for workflow before locking. We don't need a lock for this, and no
     # lock means we can dismiss spurious renders sooner, so they don't fill the
@@ -118,7 +130,16 @@ async def render_workflow_and_maybe_requeue(
                 except Workflow.DoesNotExist:
                     logger.info("Skipping requeue of deleted Workflow %d", workflow_id)
                     want_requeue = False
+            if want_requeue and is_render_pending(workflow_id):
+                logger.info(
+                    "Not requeueing Workflow %d: a render request is pending here",
+                    workflow_id,
+                )
+                want_requeue = False
             if want_requeue:
+                # Requeue on rabbitmq.Render, whatever queue we came from. The
+                # workflow changed while we rendered: most likely a user edited
+                # it, and its render request hit WorkflowAlreadyLocked.
                 await rabbitmq.queue_render(workflow_id, workflow.last_delta_id)
                 # This is why we used `lock.stall_others()`: after requeue,
                 # another renderer may try to lock this workflow and we want
@@ -134,7 +155,16 @@ async def render_workflow_and_maybe_requeue(
 async def handle_render(
     message: Dict[str, Any],
     pg_render_locker: PgRenderLocker,
+    *,
+    scheduler: Optional[RenderScheduler] = None,
+    queue: str = rabbitmq.Render,
 ) -> None:
+    """Render the workflow `message` describes.
+
+    If `scheduler` is set, wait for this render's turn first; skip the render
+    if a newer request for the same workflow supersedes it. `queue` is the
+    RabbitMQ queue `message` came from.
+    """
     try:
         workflow_id = int(message["workflow_id"])
         delta_id = int(message["delta_id"])
@@ -149,4 +179,20 @@ async def handle_render(
         )
         return
 
-    await render_workflow_and_maybe_requeue(pg_render_locker, workflow_id, delta_id)
+    if scheduler is None:
+        await render_workflow_and_maybe_requeue(pg_render_locker, workflow_id, delta_id)
+    else:
+        try:
+            async with scheduler.turn(queue, workflow_id):
+                await render_workflow_and_maybe_requeue(
+                    pg_render_locker,
+                    workflow_id,
+                    delta_id,
+                    is_render_pending=scheduler.is_render_pending,
+                )
+        except RenderSuperseded:
+            logger.info(
+                "Skipping render(workflow=%d, delta=%d): a newer request replaced it",
+                workflow_id,
+                delta_id,
+            )
@@ -0,0 +1,226 @@
+import asyncio
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+import time
+from typing import Dict, NamedTuple, Set, Tuple
+
+from cjwstate import rabbitmq
+
+
+Weights = {rabbitmq.Render: 8, rabbitmq.RenderAutofetch: 2, rabbitmq.RenderBulk: 1}
+"""Share of render turns each queue gets while all queues are backlogged.
+
+When only some queues have waiting renders, those queues split all turns.
+Queues are listed most urgent first.
+"""
+
+
+class RenderSuperseded(Exception):
+    """A newer request to render the same workflow arrived while we waited."""
+
+
+class _Waiter(NamedTuple):
+    future: asyncio.Future
+    queued_at: float
+
+
+class _WaitingRenders:
+    """Renders waiting in one queue: at most one per workflow, oldest first."""
+
+    def __init__(self):
+        self._workflows: Dict[int, _Waiter] = OrderedDict()  # next first
+
+    @property
+    def n_waiting(self) -> int:
+        return len(self._workflows)
+
+    def put(self, workflow_id: int, waiter: _Waiter) -> None:
+        """Queue `waiter` last; or if `workflow_id` is queued, take its place."""
+        self._workflows[workflow_id] = waiter
+
+    def is_ready(self, running_workflow_ids: Set[int]) -> bool:
+        """Return True if `pop(running_workflow_ids)` would return a waiter."""
+        return any(
+            workflow_id not in running_workflow_ids for workflow_id in self._workflows
+        )
+
+    def pop(self, running_workflow_ids: Set[int]) -> Tuple[int, _Waiter]:
+        """Take the oldest waiter whose workflow isn't in `running_workflow_ids`."""
+        for workflow_id in self._workflows:
+            if workflow_id not in running_workflow_ids:
+                return workflow_id, self._workflows.pop(workflow_id)
+        raise KeyError("no ready waiter")
+
+    def remove(self, workflow_id: int) -> None:
+        self._workflows.pop(workflow_id, None)
+
+    def oldest_queued_at(self) -> float:
+        """Return when the longest-waiting render was queued. Don't call if empty."""
+        return min(waiter.queued_at for waiter in self._workflows.values())
+
+
+class RenderQueueStats(NamedTuple):
+    n_waiting: int
+    """Number of renders waiting for a turn right now."""
+
+    oldest_wait_seconds: float
+    """How long the longest-waiting render has been waiting (0 if none)."""
+
+    n_started: int
+    """Number of renders that have had a turn."""
+
+    n_superseded: int
+    """Number of renders dropped while waiting, because a newer one arrived."""
+
+    wait_seconds: float
+    """Total time renders waited before their turns."""
+
+
+class RenderSchedulerStats(NamedTuple):
+    n_running: int
+    queues: Dict[str, RenderQueueStats]
+
+
+class RenderScheduler:
+    """Decide which of the renders RabbitMQ delivered runs next.
+
+    The renderer consumes each of `rabbitmq.RenderQueues`, prefetching more
+    background messages than it renders at once (see `renderer.main`). Each
+    message handler waits for its `turn()`. At most `n_concurrent` turns are
+    running at a time.
+
+    When a turn ends, the next one goes to a queue chosen by smooth weighted
+    round-robin over the queues that have waiting renders: with weights 8:2:1,
+    if all queues are backlogged, eight in eleven renders come from the first
+    queue and none waits more than a few turns.
+
+    Each workflow has at most one waiting render. A user who types quickly
+    queues a render per edit; but a render renders the whole workflow at its
+    latest delta, so only the newest request matters. When a request arrives
+    for a workflow that already has one waiting, the older one's `turn()`
+    raises RenderSuperseded and the newer one takes its place in line (or a
+    place in a more urgent queue). A workflow that is rendering doesn't get
+    another turn until that render ends: requests that arrive meanwhile
+    collapse into one follow-up render.
+
+    This runs on one event loop. It isn't thread-safe.
+    """
+
+    def __init__(self, n_concurrent: int, weights: Dict[str, int] = Weights):
+        self.n_concurrent = n_concurrent
+        self.weights = weights
+        self._urgency = {queue: i for i, queue in enumerate(weights)}  # 0 is top
+        self._waiting = {queue: _WaitingRenders() for queue in weights}
+        self._pending: Dict[int, Tuple[str, _Waiter]] = {}
+        self._running_workflow_ids: Set[int] = set()
+        self._credits = {queue: 0 for queue in weights}
+        self._n_started = {queue: 0 for queue in weights}
+        self._n_superseded = {queue: 0 for queue in weights}
+        self._wait_seconds = {queue: 0.0 for queue in weights}
+
+    def is_render_pending(self, workflow_id: int) -> bool:
+        """Return True if a request to render `workflow_id` is waiting."""
+        return workflow_id in self._pending
+
+    @asynccontextmanager
+    async def turn(self, queue: str, workflow_id: int):
+        """Wait until it's this render's turn; count it as running until exit.
+
+        Raise RenderSuperseded if a newer request for `workflow_id` arrives
+        before this render's turn.
+        """
+        future = asyncio.get_event_loop().create_future()
+        self._enqueue(queue, workflow_id, _Waiter(future, time.time()))
+        self._start_turns()
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.cancelled():
+                pending = self._pending.get(workflow_id)
+                if pending is not None and pending[1].future is future:
+                    del self._pending[workflow_id]
+                    self._waiting[pending[0]].remove(workflow_id)
+            else:
+                # We were given a turn and cancelled at the same time
+                self._end_turn(workflow_id)
+            raise
+
+        try:
+            yield
+        finally:
+            self._end_turn(workflow_id)
+
+    def _enqueue(self, queue: str, workflow_id: int, waiter: _Waiter) -> None:
+        old = self._pending.get(workflow_id)
+        if old is not None:
+            old_queue, old_waiter = old
+            if not old_waiter.future.done():  # else it was cancelled
+                old_waiter.future.set_exception(RenderSuperseded())
+            self._n_superseded[old_queue] += 1
+            # The workflow has been waiting since old_waiter was queued
+            waiter = waiter._replace(queued_at=old_waiter.queued_at)
+            if self._urgency[old_queue] <= self._urgency[queue]:
+                queue = old_queue  # keep old_waiter's place in line
+            else:
+                self._waiting[old_queue].remove(workflow_id)
+        self._waiting[queue].put(workflow_id, waiter)
+        self._pending[workflow_id] = (queue, waiter)
+
+    def _pick_queue(self) -> str:
+        """Choose a ready queue to start a render from; raise KeyError if none."""
+        queues = [
+            queue
+            for queue, waiting in self._waiting.items()
+            if waiting.is_ready(self._running_workflow_ids)
+        ]
+        if not queues:
+            raise KeyError("no ready queue")
+        total = 0
+        for queue in queues:
+            self._credits[queue] += self.weights[queue]
+            total += self.weights[queue]
+        queue = max(queues, key=self._credits.__getitem__)  # tie: first queue
+        self._credits[queue] -= total
+        return queue
+
+    def _start_turns(self) -> None:
+        while len(self._running_workflow_ids) < self.n_concurrent:
+            try:
+                queue = self._pick_queue()
+            except KeyError:
+                return  # nothing waiting, except follow-ups to running renders
+            workflow_id, waiter = self._waiting[queue].pop(self._running_workflow_ids)
+            del self._pending[workflow_id]
+            if not self._waiting[queue].n_waiting:
+                # Don't let an idle queue bank turns for later
+                self._credits[queue] = 0
+            if waiter.future.done():
+                continue  # cancelled
+            self._running_workflow_ids.add(workflow_id)
+            self._n_started[queue] += 1
+            self._wait_seconds[queue] += time.time() - waiter.queued_at
+            waiter.future.set_result(None)
+
+    def _end_turn(self, workflow_id: int) -> None:
+        self._running_workflow_ids.discard(workflow_id)
+        self._start_turns()
+
+    def stats(self) -> RenderSchedulerStats:
+        """Report queue depths and wait times, per queue."""
+        now = time.time()
+        return RenderSchedulerStats(
+            n_running=len(self._running_workflow_ids),
+            queues={
+                queue: RenderQueueStats(
+                    n_waiting=waiting.n_waiting,
+                    oldest_wait_seconds=(
+                        now - waiting.oldest_queued_at() if waiting.n_waiting else 0.0
+                    ),
+                    n_started=self._n_started[queue],
+                    n_superseded=self._n_superseded[queue],
+                    wait_seconds=self._wait_seconds[queue],
+                )
+                for queue, waiting in self._waiting.items()
+            },
+        )
@@ -0,0 +1,80 @@
+import unittest
+
+from cjwkernel.tests.util import (
+    arrow_table_context,
+    assert_render_result_equals,
+    tempfile_context,
+)
+from cjwkernel.types import RenderResult, TableMetadata
+from cjwkernel.util import tempdir_context
+from cjwstate.models import CachedRenderResult
+from renderer.execute.hot_outputs import HotOutputs
+
+
+def _crr(delta_id: int, table_metadata: TableMetadata) -> CachedRenderResult:
+    return CachedRenderResult(
+        workflow_id=1,
+        step_id=2,
+        delta_id=delta_id,
+        status="ok",
+        errors=[],
+        json={},
+        table_metadata=table_metadata,
+    )
+
+
+class HotOutputsTest(unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.ctx = tempdir_context(prefix="test-hot-outputs-")
+        self.tempdir = self.ctx.__enter__()
+
+    def tearDown(self):
+        self.ctx.__exit__(None, None, None)
+        super().tearDown()
+
+    def test_put_and_load(self):
+        hot_outputs = HotOutputs(self.tempdir, 10000)
+        with arrow_table_context({"A": [1, 2]}) as table:
+            result = RenderResult(table)
+            hot_outputs.put(1, 2, 3, result)
+            crr = _crr(3, table.metadata)
+        with tempfile_context(suffix=".arrow") as path:
+            loaded = hot_outputs.load(crr, path)
+            assert_render_result_equals(loaded, result)
+
+    def test_load_miss_wrong_delta_id(self):
+        hot_outputs = HotOutputs(self.tempdir, 10000)
+        with arrow_table_context({"A": [1, 2]}) as table:
+            hot_outputs.put(1, 2, 3, RenderResult(table))
+            crr = _crr(4, table.metadata)
+        with tempfile_context(suffix=".arrow") as path:
+            self.assertIsNone(hot_outputs.load(crr, path))
+
+    def test_load_miss_wrong_metadata(self):
+        hot_outputs = HotOutputs(self.tempdir, 10000)
+        with arrow_table_context({"A": [1, 2]}) as table:
+            hot_outputs.put(1, 2, 3, RenderResult(table))
+            crr = _crr(3, TableMetadata(2, []))
+        with tempfile_context(suffix=".arrow") as path:
+            self.assertIsNone(hot_outputs.load(crr, path))
+
+    def test_evict_least_recently_used(self):
+        with arrow_table_context({"A": [1, 2]}) as table:
+            size = table.path.stat().st_size
+            hot_outputs = HotOutputs(self.tempdir, size * 2)
+            hot_outputs.put(1, 2, 1, RenderResult(table))
+            hot_outputs.put(1, 2, 2, RenderResult(table))
+            with tempfile_context(suffix=".arrow") as path:
+                hot_outputs.load(_crr(1, table.metadata), path)  # delta 2 is LRU
+            hot_outputs.put(1, 2, 3, RenderResult(table))
+            with tempfile_context(suffix=".arrow") as path:
+                self.assertIsNotNone(hot_outputs.load(_crr(1, table.metadata), path))
+                self.assertIsNone(hot_outputs.load(_crr(2, table.metadata), path))
+                self.assertIsNotNone(hot_outputs.load(_crr(3, table.metadata), path))
+
+    def test_ignore_zero_column_result(self):
+        hot_outputs = HotOutputs(self.tempdir, 10000)
+        hot_outputs.put(1, 2, 3, RenderResult())
+        with tempfile_context(suffix=".arrow") as path:
+            self.assertIsNone(hot_outputs.load(_crr(3, TableMetadata()), path))
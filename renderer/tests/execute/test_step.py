@@ -45,7 +45,7 @@ class StepTests(DbTestCaseWithModuleRegistry):
             module_id_name="deleted_module",
             last_relevant_delta_id=workflow.last_delta_id,
         )
-        result = self.run_with_async_db(
+        result, _ = self.run_with_async_db(
             execute_step(
                 self.chroot_context,
                 workflow,
@@ -112,7 +112,7 @@ class StepTests(DbTestCaseWithModuleRegistry):
         self.assertEqual(delta.step, step)
 
     @patch.object(rabbitmq, "send_update_to_workflow_clients", noop)
-    @patch.object(rendercache, "downloaded_parquet_file")
+    @patch.object(rendercache, "download_parquet_file_async")
     @patch.object(notifications, "email_output_delta")
     def test_email_delta_ignore_corrupt_cache_error(self, email_delta, read_cache):
         read_cache.side_effect = rendercache.CorruptCacheError
@@ -134,8 +134,10 @@ class StepTests(DbTestCaseWithModuleRegistry):
             workflow.last_delta_id - 1,
             RenderResult(arrow_table({"A": [1]})),
         )
+        # Pretend it was cached before we computed digests: we'll compare files
+        step.cached_render_result_hash = None
         step.last_relevant_delta_id = workflow.last_delta_id
-        step.save(update_fields=["last_relevant_delta_id"])
+        step.save(update_fields=["cached_render_result_hash", "last_relevant_delta_id"])
 
         module_zipfile = create_module_zipfile(
             "x",
@@ -252,7 +254,7 @@ class StepTests(DbTestCaseWithModuleRegistry):
         email_delta.assert_not_called()  # error is the same error
 
     @patch.object(rabbitmq, "send_update_to_workflow_clients", noop)
-    @patch.object(rendercache, "downloaded_parquet_file")
+    @patch.object(rendercache, "download_parquet_file_async")
     @patch.object(notifications, "email_output_delta")
     def test_email_delta_when_stale_crr_is_unreachable(self, email_delta, read_cache):
         workflow = Workflow.create_and_init()
@@ -587,7 +589,7 @@ class StepTests(DbTestCaseWithModuleRegistry):
         )
 
         with self.assertLogs(level=logging.INFO):
-            result = self.run_with_async_db(
+            result, _ = self.run_with_async_db(
                 execute_step(
                     self.chroot_context,
                     workflow,
@@ -2,6 +2,7 @@ import contextlib
 from dataclasses import replace
 import logging
 import shutil
+import threading
 from unittest.mock import patch
 from cjwkernel.chroot import EDITABLE_CHROOT
 from cjwkernel.kernel import Kernel
@@ -15,6 +16,7 @@ from cjwstate import s3, rabbitmq, rendercache
 from cjwstate.models import Workflow
 from cjwstate.tests.utils import DbTestCaseWithModuleRegistry, create_module_zipfile
 from renderer.execute.tab import execute_tab_flow, ExecuteStep, TabFlow
+from renderer.execute.types import UnneededExecution
 
 
 async def fake_send(*args, **kwargs):
@@ -32,6 +34,7 @@ def mock_render(arrow_table_dict):
         tab,
         fetch_result,
         output_filename,
+        cancelled=None,
     ):
         output_path = basedir / output_filename
         with arrow_table_context(arrow_table_dict) as arrow_table:
@@ -102,6 +105,39 @@ class TabTests(DbTestCaseWithModuleRegistry):
                     result, RenderResult(arrow_table({"B": [2]}), [])
                 )
 
+    def test_execute_cancelled(self):
+        module_zipfile = create_module_zipfile("mod")
+        workflow = Workflow.create_and_init()
+        tab = workflow.tabs.first()
+        step1 = tab.steps.create(
+            order=0,
+            slug="step-1",
+            module_id_name="mod",
+            last_relevant_delta_id=workflow.last_delta_id,
+        )
+        tab_flow = TabFlow(tab.to_arrow(), [ExecuteStep(step1, module_zipfile, {})])
+        cancelled = threading.Event()
+        cancelled.set()
+
+        with patch.object(Kernel, "render", side_effect=mock_render({"B": [2]})):
+            with EDITABLE_CHROOT.acquire_context() as chroot_context:
+                with chroot_context.tempdir_context(prefix="test_tab") as tempdir:
+                    with chroot_context.tempfile_context(
+                        prefix="execute-tab-output", suffix=".arrow", dir=tempdir
+                    ) as out_path:
+                        with self.assertRaises(UnneededExecution):
+                            self.run_with_async_db(
+                                execute_tab_flow(
+                                    chroot_context,
+                                    workflow,
+                                    tab_flow,
+                                    {},
+                                    out_path,
+                                    cancelled=cancelled,
+                                )
+                            )
+            Kernel.render.assert_not_called()
+
     @patch.object(rabbitmq, "send_update_to_workflow_clients", fake_send)
     def test_execute_cache_miss(self):
         module_zipfile = create_module_zipfile("mod")
@@ -247,3 +283,58 @@ class TabTests(DbTestCaseWithModuleRegistry):
                 Kernel.render.call_args[1]["output_filename"],
                 r"execute-tab-output.*\.arrow",
             )
+
+    @patch.object(rabbitmq, "send_update_to_workflow_clients", fake_send)
+    def test_skip_render_when_input_is_unchanged(self):
+        module_zipfile = create_module_zipfile("mod")
+        workflow = Workflow.create_and_init()
+        tab = workflow.tabs.first()
+        step1 = tab.steps.create(
+            order=0,
+            slug="step-1",
+            module_id_name="mod",
+            last_relevant_delta_id=workflow.last_delta_id - 1,
+        )
+        step2 = tab.steps.create(
+            order=1,
+            slug="step-2",
+            module_id_name="mod",
+            last_relevant_delta_id=workflow.last_delta_id - 1,
+        )
+        tab_flow = TabFlow(
+            tab.to_arrow(),
+            [
+                ExecuteStep(step1, module_zipfile, {"x": 1}),
+                ExecuteStep(step2, module_zipfile, {}),
+            ],
+        )
+        with patch.object(Kernel, "render", side_effect=mock_render({"A": [1]})):
+            with self._execute(workflow, tab_flow, {}):
+                pass
+
+        # step1's params change; but its output will not
+        step1.last_relevant_delta_id = workflow.last_delta_id
+        step1.save(update_fields=["last_relevant_delta_id"])
+        step2.last_relevant_delta_id = workflow.last_delta_id
+        step2.save(update_fields=["last_relevant_delta_id"])
+        tab_flow = TabFlow(
+            tab.to_arrow(),
+            [
+                ExecuteStep(step1, module_zipfile, {"x": 2}),
+                ExecuteStep(step2, module_zipfile, {}),
+            ],
+        )
+        with patch.object(Kernel, "render", side_effect=mock_render({"A": [1]})):
+            with self._execute(workflow, tab_flow, {}) as result:
+                assert_render_result_equals(
+                    result, RenderResult(arrow_table({"A": [1]}))
+                )
+
+            Kernel.render.assert_called_once()  # step1, not step2
+
+        step2.refresh_from_db()
+        self.assertEqual(step2.cached_render_result.delta_id, workflow.last_delta_id)
+        with rendercache.open_cached_render_result(
+            step2.cached_render_result
+        ) as cached:
+            assert_render_result_equals(cached, RenderResult(arrow_table({"A": [1]})))
@@ -218,6 +218,41 @@ class WorkflowTests(DbTestCaseWithModuleRegistry):
             [RenderError(I18nMessage.TODO_i18n('params: {"x": "def"}'))],
         )
 
+    @patch.object(rabbitmq, "send_update_to_workflow_clients", fake_send)
+    def test_execute_migrate_params_batch_caches_each_step(self):
+        workflow = Workflow.create_and_init()
+        tab = workflow.tabs.first()
+        module_zipfile = create_module_zipfile(
+            "mod",
+            version="abc123",
+            spec_kwargs={"parameters": [{"id_name": "x", "type": "string"}]},
+            python_code=textwrap.dedent(
+                """
+                def render(table, params): return table
+                def migrate_params(params): return {"x": params["x"] + "!"}
+                """
+            ),
+        )
+        step1 = tab.steps.create(
+            order=0, slug="step-1", module_id_name="mod", params={"x": "a"}
+        )
+        step2 = tab.steps.create(
+            order=1, slug="step-2", module_id_name="mod", params={"x": "b"}
+        )
+
+        with patch.object(
+            Kernel, "migrate_params", side_effect=AssertionError("not batched")
+        ):
+            self._execute(workflow)
+
+        step1.refresh_from_db()
+        step2.refresh_from_db()
+        self.assertEqual(step1.cached_migrated_params, {"x": "a!"})
+        self.assertEqual(step2.cached_migrated_params, {"x": "b!"})
+        self.assertEqual(
+            step1.cached_migrated_params_module_version, module_zipfile.version
+        )
+
     @patch.object(rabbitmq, "send_update_to_workflow_clients", fake_send)
     def test_execute_cache_hit(self):
         workflow = Workflow.objects.create()
@@ -398,3 +433,13 @@ class PartitionReadyAndDependentTests(unittest.TestCase):
     def test_tab_self_reference(self):
         flows = [self.MockTabFlow("t1", frozenset({"t1"}))]
         self.assertEqual(([], flows), partition_ready_and_dependent(flows))
+
+    def test_running_flows_are_pending(self):
+        flows = [
+            self.MockTabFlow("t1", frozenset({"t2"})),
+            self.MockTabFlow("t3", frozenset()),
+        ]
+        running_flows = [self.MockTabFlow("t2", frozenset())]
+        self.assertEqual(
+            (flows[1:], flows[:1]), partition_ready_and_dependent(flows, running_flows)
+        )
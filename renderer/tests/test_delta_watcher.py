@@ -0,0 +1,43 @@
+import unittest
+
+from renderer.delta_watcher import DeltaWatcher
+
+
+class DeltaWatcherTest(unittest.TestCase):
+    def _notify(self, watcher, payload):
+        watcher._on_notify(None, 123, "workflow_render_delta", payload)
+
+    def test_newer_delta_sets_event(self):
+        watcher = DeltaWatcher()
+        with watcher.watch(1, 10) as cancelled:
+            self.assertFalse(cancelled.is_set())
+            with self.assertLogs("renderer.delta_watcher", level="INFO"):
+                self._notify(watcher, "1 11")
+            self.assertTrue(cancelled.is_set())
+
+    def test_same_delta_does_not_set_event(self):
+        watcher = DeltaWatcher()
+        with watcher.watch(1, 10) as cancelled:
+            self._notify(watcher, "1 10")
+            self.assertFalse(cancelled.is_set())
+
+    def test_other_workflow_does_not_set_event(self):
+        watcher = DeltaWatcher()
+        with watcher.watch(1, 10) as cancelled:
+            self._notify(watcher, "2 11")
+            self.assertFalse(cancelled.is_set())
+
+    def test_invalid_payload(self):
+        watcher = DeltaWatcher()
+        with watcher.watch(1, 10) as cancelled:
+            with self.assertLogs("renderer.delta_watcher", level="WARNING"):
+                self._notify(watcher, "1")
+            self.assertFalse(cancelled.is_set())
+
+    def test_forget_after_watch(self):
+        watcher = DeltaWatcher()
+        with watcher.watch(1, 10) as cancelled:
+            pass
+        self._notify(watcher, "1 11")
+        self.assertFalse(cancelled.is_set())
+        self.assertEqual(watcher._watches, {})
@@ -1,5 +1,5 @@
 from contextlib import asynccontextmanager
-from unittest.mock import Mock, patch
+from unittest.mock import ANY, Mock, patch
 
 from cjworkbench.pg_render_locker import WorkflowAlreadyLocked
 from cjwstate import rabbitmq
@@ -77,7 +77,7 @@ class RenderTest(DbTestCase):
                 )
             )
 
-        execute.assert_called_with(workflow, 123)
+        execute.assert_called_with(workflow, 123, cancelled=ANY)
         queue_render.assert_not_called()
 
     @patch("cjwstate.rabbitmq.queue_render")
@@ -186,3 +186,30 @@ class RenderTest(DbTestCase):
 
         self.run_with_async_db(inner())
         queue_render.assert_called_with(workflow.id, 123)
+
+    @patch("cjwstate.rabbitmq.queue_render")
+    @patch("renderer.execute.execute_workflow")
+    def test_render_unneeded_execution_but_render_pending(
+        self, mock_execute, queue_render
+    ):
+        mock_execute.side_effect = async_err(execute.UnneededExecution)
+        workflow = Workflow.objects.create(last_delta_id=123)
+
+        async def inner():
+            with self.assertLogs("renderer", level="INFO") as cm:
+                await render_workflow_and_maybe_requeue(
+                    SuccessfulRenderLocker(),
+                    workflow.id,
+                    123,
+                    is_render_pending=lambda workflow_id: workflow_id == workflow.id,
+                )
+                self.assertEqual(
+                    cm.output[-1],
+                    (
+                        f"INFO:renderer.render:Not requeueing Workflow {workflow.id}: "
+                        "a render request is pending here"
+                    ),
+                )
+
+        self.run_with_async_db(inner())
+        queue_render.assert_not_called()
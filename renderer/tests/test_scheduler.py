@@ -0,0 +1,195 @@
+import asyncio
+import unittest
+
+from renderer.scheduler import RenderScheduler, RenderSuperseded
+
+
+Weights = {"interactive": 3, "autofetch": 1}
+
+
+async def _run_in_turns(scheduler, requests):
+    """Queue `requests` behind a running render; return the order they ran in.
+
+    `scheduler` must run one render at a time.
+    """
+    order = []
+
+    async def render(queue, workflow_id):
+        try:
+            async with scheduler.turn(queue, workflow_id):
+                order.append((queue, workflow_id))
+        except RenderSuperseded:
+            pass
+
+    async with scheduler.turn("autofetch", 0):  # hold the only slot
+        tasks = [
+            asyncio.ensure_future(render(queue, workflow_id))
+            for queue, workflow_id in requests
+        ]
+        await asyncio.sleep(0)  # let every task queue
+    await asyncio.gather(*tasks)
+    return order
+
+
+class RenderSchedulerTest(unittest.TestCase):
+    def test_run_up_to_n_concurrent(self):
+        async def inner():
+            scheduler = RenderScheduler(2, Weights)
+            n_running = 0
+            max_n_running = 0
+
+            async def render(workflow_id):
+                nonlocal n_running, max_n_running
+                async with scheduler.turn("interactive", workflow_id):
+                    n_running += 1
+                    max_n_running = max(n_running, max_n_running)
+                    await asyncio.sleep(0)
+                    n_running -= 1
+
+            await asyncio.gather(*(render(i) for i in range(5)))
+            self.assertEqual(max_n_running, 2)
+            self.assertEqual(scheduler.stats().n_running, 0)
+
+        asyncio.run(inner())
+
+    def test_weighted_fair_dequeue(self):
+        async def inner():
+            scheduler = RenderScheduler(1, Weights)
+            order = await _run_in_turns(
+                scheduler,
+                [("autofetch", i) for i in range(1, 5)]
+                + [("interactive", i) for i in range(11, 17)],
+            )
+            self.assertEqual(
+                [queue for queue, _ in order],
+                [
+                    "interactive",
+                    "interactive",
+                    "autofetch",
+                    "interactive",
+                    "interactive",
+                    "interactive",
+                    "autofetch",
+                    "interactive",
+                    "autofetch",
+                    "autofetch",
+                ],
+            )
+
+        asyncio.run(inner())
+
+    def test_newer_request_supersedes_waiting_request(self):
+        async def inner():
+            scheduler = RenderScheduler(1, Weights)
+            order = await _run_in_turns(
+                scheduler,
+                [("interactive", 1), ("interactive", 2), ("interactive", 1)],
+            )
+            # Workflow 1 keeps its place in line
+            self.assertEqual(order, [("interactive", 1), ("interactive", 2)])
+            self.assertEqual(scheduler.stats().queues["interactive"].n_superseded, 1)
+
+        asyncio.run(inner())
+
+    def test_newer_request_moves_to_more_urgent_queue(self):
+        async def inner():
+            scheduler = RenderScheduler(1, Weights)
+            order = await _run_in_turns(
+                scheduler,
+                [("autofetch", 1), ("autofetch", 2), ("interactive", 2)],
+            )
+            self.assertEqual(order, [("interactive", 2), ("autofetch", 1)])
+            self.assertEqual(scheduler.stats().queues["autofetch"].n_superseded, 1)
+
+        asyncio.run(inner())
+
+    def test_newer_request_does_not_move_to_less_urgent_queue(self):
+        async def inner():
+            scheduler = RenderScheduler(1, Weights)
+            order = await _run_in_turns(
+                scheduler,
+                [("interactive", 1), ("interactive", 2), ("autofetch", 1)],
+            )
+            # The autofetch request replaced the first; it runs in its place
+            self.assertEqual(order, [("autofetch", 1), ("interactive", 2)])
+            self.assertEqual(scheduler.stats().queues["interactive"].n_superseded, 1)
+
+        asyncio.run(inner())
+
+    def test_follow_up_waits_for_running_render(self):
+        async def inner():
+            scheduler = RenderScheduler(2, Weights)
+            events = []
+
+            async def render(workflow_id, name):
+                async with scheduler.turn("interactive", workflow_id):
+                    events.append("start " + name)
+                    await asyncio.sleep(0.01)
+                    events.append("end " + name)
+
+            first = asyncio.ensure_future(render(1, "first"))
+            await asyncio.sleep(0)
+            follow_ups = [
+                asyncio.ensure_future(render(1, "follow-up %d" % i)) for i in range(3)
+            ]
+            other = asyncio.ensure_future(render(2, "other"))
+            await asyncio.sleep(0)
+            self.assertTrue(scheduler.is_render_pending(1))
+            self.assertEqual(events, ["start first", "start other"])
+            await asyncio.gather(first, other)
+            results = await asyncio.gather(*follow_ups, return_exceptions=True)
+            self.assertIsInstance(results[0], RenderSuperseded)
+            self.assertIsInstance(results[1], RenderSuperseded)
+            self.assertIsNone(results[2])
+            self.assertEqual(events[-2:], ["start follow-up 2", "end follow-up 2"])
+            self.assertFalse(scheduler.is_render_pending(1))
+
+        asyncio.run(inner())
+
+    def test_cancel_while_waiting(self):
+        async def inner():
+            scheduler = RenderScheduler(1, Weights)
+            async with scheduler.turn("interactive", 1):
+
+                async def wait_forever():
+                    async with scheduler.turn("interactive", 2):
+                        pass
+
+                task = asyncio.ensure_future(wait_forever())
+                await asyncio.sleep(0)
+                self.assertEqual(scheduler.stats().queues["interactive"].n_waiting, 1)
+                task.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+                self.assertEqual(scheduler.stats().queues["interactive"].n_waiting, 0)
+
+            # The slot is free
+            async with scheduler.turn("autofetch", 3):
+                pass
+
+        asyncio.run(inner())
+
+    def test_stats(self):
+        async def inner():
+            scheduler = RenderScheduler(1, Weights)
+
+            async def render(queue, workflow_id):
+                async with scheduler.turn(queue, workflow_id):
+                    pass
+
+            async with scheduler.turn("interactive", 1):
+                task = asyncio.ensure_future(render("autofetch", 2))
+                await asyncio.sleep(0.01)
+                stats = scheduler.stats()
+                self.assertEqual(stats.n_running, 1)
+                self.assertEqual(stats.queues["autofetch"].n_waiting, 1)
+                self.assertGreater(stats.queues["autofetch"].oldest_wait_seconds, 0)
+                self.assertEqual(stats.queues["interactive"].n_started, 1)
+            await task
+            stats = scheduler.stats()
+            self.assertEqual(stats.queues["autofetch"].n_waiting, 0)
+            self.assertEqual(stats.queues["autofetch"].oldest_wait_seconds, 0.0)
+            self.assertEqual(stats.queues["autofetch"].n_started, 1)
+            self.assertGreater(stats.queues["autofetch"].wait_seconds, 0)
+
+        asyncio.run(inner())
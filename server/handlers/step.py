@@ -18,6 +18,7 @@ from cjwstate.models.commands import (
     SetStepNote,
 )
 from cjwstate.models.module_registry import MODULE_REGISTRY
+from cjwstate.models.step import notify_autofetch_schedule_changed
 from cjwstate.modules.param_spec import ParamSpec
 import server.utils
 from . import autofetch
@@ -278,6 +279,7 @@ def _do_try_set_autofetch(
             step.save(
                 update_fields=["auto_update_data", "update_interval", "next_update"]
             )
+            notify_autofetch_schedule_changed(step.id)
 
             # Now before we commit, let's see if we've surpassed the user's limit;
             # roll back if we have.
@@ -0,0 +1,23 @@
+# Generated by Django 3.1.6 on 2021-02-08 16:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("server", "0033_auto_20210202_1848"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="step",
+            name="cached_render_result_hash",
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name="step",
+            name="cached_render_result_input_hash",
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+    ]
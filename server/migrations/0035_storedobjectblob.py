@@ -0,0 +1,35 @@
+# Generated by Django 3.1.6 on 2021-02-09 14:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("server", "0034_step_cached_render_result_hash"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StoredObjectBlob",
+            fields=[
+                (
+                    "key",
+                    models.CharField(max_length=255, primary_key=True, serialize=False),
+                ),
+                ("size", models.IntegerField()),
+                ("n_references", models.IntegerField()),
+            ],
+            options={
+                "db_table": "stored_object_blob",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="storedobjectblob",
+            index=models.Index(
+                condition=models.Q(n_references=0),
+                fields=["key"],
+                name="stored_object_blob_orphans",
+            ),
+        ),
+    ]
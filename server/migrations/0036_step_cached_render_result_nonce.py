@@ -0,0 +1,18 @@
+# Generated by Django 3.1.6 on 2021-02-11 15:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("server", "0035_storedobjectblob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="step",
+            name="cached_render_result_nonce",
+            field=models.CharField(blank=True, max_length=16, null=True),
+        ),
+    ]
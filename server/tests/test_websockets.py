@@ -191,8 +191,8 @@ class ChannelTests(DbTestCase):
     async def test_queue_render_if_listening(self, communicate, queue_render):
         future_args = asyncio.get_event_loop().create_future()
 
-        async def do_queue(*args):
-            future_args.set_result(args)
+        async def do_queue(*args, **kwargs):
+            future_args.set_result((args, kwargs))
 
         queue_render.side_effect = do_queue
 
@@ -200,9 +200,12 @@ class ChannelTests(DbTestCase):
         connected, _ = await comm.connect()
         self.assertTrue(connected)
         await comm.receive_from()  # ignore initial workflow delta
-        await queue_render_if_consumers_are_listening(self.workflow.id, 123)
-        args = await asyncio.wait_for(future_args, 0.005)
+        await queue_render_if_consumers_are_listening(
+            self.workflow.id, 123, queue=rabbitmq.RenderAutofetch
+        )
+        args, kwargs = await asyncio.wait_for(future_args, 0.005)
         self.assertEqual(args, (self.workflow.id, 123))
+        self.assertEqual(kwargs, {"queue": rabbitmq.RenderAutofetch})
 
     @patch.object(rabbitmq, "queue_render")
     @async_test
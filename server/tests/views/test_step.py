@@ -4,19 +4,25 @@ from datetime import datetime as dt
 from http import HTTPStatus as status
 from unittest.mock import patch
 
+from channels.testing import HttpCommunicator
 from django.contrib.auth.models import User
 from django.test import override_settings
 import pyarrow as pa
 
 from cjwkernel.types import Column, ColumnType, RenderResult
 from cjwkernel.tests.util import arrow_table
-from cjwstate import commands, rabbitmq
+from cjwstate import commands, rabbitmq, s3
 from cjwstate.models import Workflow
+from cjwstate.rendercache import columnstats
 from cjwstate.rendercache.io import (
+    BUCKET,
     cache_render_result,
+    crr_export_key,
+    crr_parquet_key,
     delete_parquet_files_for_step,
 )
 from cjwstate.tests.utils import LoggedInTestCase
+from server.views.steps import StepPublicCsvConsumer, StepPublicJsonConsumer
 
 
 FakeSession = namedtuple("FakeSession", ["session_key"])
@@ -120,6 +126,46 @@ class StepTests(LoggedInTestCase):
             },
         )
 
+    def test_step_render_if_none_match(self):
+        cache_render_result(
+            self.workflow,
+            self.step2,
+            self.step2.last_relevant_delta_id,
+            RenderResult(arrow_table({"A": [1]})),
+        )
+        url = "/api/wfmodules/%d/render" % self.step2.id
+        response = self.client.get(url)
+        self.assertEqual(response["Cache-Control"], "private, no-cache")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+        # A new cached result means a new ETag
+        self.step2.last_relevant_delta_id = 3
+        cache_render_result(
+            self.workflow, self.step2, 3, RenderResult(arrow_table({"A": [2]}))
+        )
+        response2 = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response2.status_code, 200)
+
+    def test_step_embeddata_cache_headers(self):
+        cache_render_result(
+            self.workflow,
+            self.step2,
+            self.step2.last_relevant_delta_id,
+            RenderResult(arrow_table({"A": [1]}), json={"foo": "bar"}),
+        )
+        url = "/api/wfmodules/%d/embeddata" % self.step2.id
+        response = self.client.get(url)
+        self.assertEqual(json.loads(response.content), {"foo": "bar"})
+        self.assertEqual(response["Cache-Control"], "private, no-cache")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+        self.workflow.public = True
+        self.workflow.save(update_fields=["public"])
+        response = self.client.get(url)
+        self.assertEqual(response["Cache-Control"], "public, max-age=60")
+
     def test_step_render_null_timestamp(self):
         # Ran into problems 2019-09-06, when switching to Arrow
         cache_render_result(
@@ -261,6 +307,41 @@ class StepTests(LoggedInTestCase):
             json.loads(response.content), {"values": {"a": 2, "b": 2, "c": 1}}
         )
 
+    def test_value_counts_from_column_stats(self):
+        cache_render_result(
+            self.workflow,
+            self.step2,
+            self.step2.last_relevant_delta_id,
+            RenderResult(arrow_table({"A": ["a", "b", "b"]})),
+        )
+        # Delete the table, to prove we don't read it
+        s3.remove(BUCKET, crr_parquet_key(self.step2.cached_render_result))
+
+        response = self.client.get(
+            f"/api/wfmodules/{self.step2.id}/value-counts?column=A"
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), {"values": {"a": 1, "b": 2}})
+
+    @patch.object(columnstats, "MaxNValueCounts", 2)
+    def test_value_counts_too_many_for_column_stats(self):
+        cache_render_result(
+            self.workflow,
+            self.step2,
+            self.step2.last_relevant_delta_id,
+            RenderResult(arrow_table({"A": ["a", "b", "c"]})),
+        )
+
+        response = self.client.get(
+            f"/api/wfmodules/{self.step2.id}/value-counts?column=A"
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            json.loads(response.content), {"values": {"a": 1, "b": 1, "c": 1}}
+        )
+
     def test_value_counts_corrupt_cache(self):
         # https://www.pivotaltracker.com/story/show/161988744
         cache_render_result(
@@ -406,3 +487,160 @@ class StepTests(LoggedInTestCase):
         )
         self.assertEqual(response.status_code, 200)
         self.assertEqual(json.loads(response.content), {"rows": [["a"], ["b"]]})
+
+
+@patch.object(rabbitmq, "queue_render", async_noop)
+class StepPublicExportTests(LoggedInTestCase):
+    def setUp(self):
+        super().setUp()  # log in
+
+        self.workflow = Workflow.objects.create(name="test", owner=self.user)
+        self.tab = self.workflow.tabs.create(position=0)
+        self.step = self.tab.steps.create(
+            order=0, slug="step-1", module_id_name="x", last_relevant_delta_id=1
+        )
+
+    def _communicator(self, consumer, headers=None):
+        async def application(scope, receive, send):
+            scope = {
+                **scope,
+                "user": self.user,
+                "session": FakeSession("a-key"),
+                "url_route": {"args": (), "kwargs": {"step_id": self.step.id}},
+            }
+            return await consumer.as_asgi()(scope, receive, send)
+
+        return HttpCommunicator(
+            application,
+            "GET",
+            "/public/moduledata/live/%d.csv" % self.step.id,
+            headers=headers,
+        )
+
+    def _get(self, consumer, headers=None):
+        communicator = self._communicator(consumer, headers)
+        response = self.run_with_async_db(communicator.get_response())
+        response["headers"] = dict(response["headers"])
+        return response
+
+    def test_csv(self):
+        cache_render_result(
+            self.workflow,
+            self.step,
+            1,
+            RenderResult(arrow_table({"A": [1, 2], "B": ["x", None]})),
+        )
+        response = self._get(StepPublicCsvConsumer)
+        self.assertEqual(response["status"], 200)
+        self.assertEqual(response["body"], b"A,B\n1,x\n2,\n")
+        self.assertEqual(
+            response["headers"][b"Content-Type"],
+            b"text/csv; charset=utf-8; header=present",
+        )
+
+    def test_json(self):
+        cache_render_result(
+            self.workflow,
+            self.step,
+            1,
+            RenderResult(arrow_table({"A": [1, 2], "B": ["x", None]})),
+        )
+        response = self._get(StepPublicJsonConsumer)
+        self.assertEqual(response["status"], 200)
+        self.assertEqual(
+            json.loads(response["body"]), [{"A": 1, "B": "x"}, {"A": 2, "B": None}]
+        )
+
+    def test_if_none_match(self):
+        cache_render_result(
+            self.workflow, self.step, 1, RenderResult(arrow_table({"A": [1]}))
+        )
+        etag = self._get(StepPublicCsvConsumer)["headers"][b"ETag"]
+        response = self._get(StepPublicCsvConsumer, [(b"if-none-match", etag)])
+        self.assertEqual(response["status"], 304)
+        self.assertEqual(response["body"], b"")
+
+    def test_cache_control(self):
+        cache_render_result(
+            self.workflow, self.step, 1, RenderResult(arrow_table({"A": [1]}))
+        )
+        response = self._get(StepPublicCsvConsumer)
+        self.assertEqual(response["headers"][b"Cache-Control"], b"private, no-cache")
+
+        self.workflow.public = True
+        self.workflow.save(update_fields=["public"])
+        response = self._get(StepPublicCsvConsumer)
+        self.assertEqual(response["headers"][b"Cache-Control"], b"public, max-age=60")
+
+    def test_store_export_and_serve_it_next_time(self):
+        cache_render_result(
+            self.workflow, self.step, 1, RenderResult(arrow_table({"A": [1]}))
+        )
+        crr = self.step.cached_render_result
+        response = self._get(StepPublicCsvConsumer)
+        self.assertEqual(response["body"], b"A\n1\n")
+        self.assertEqual(
+            s3.get_range(BUCKET, crr_export_key(crr, "csv"), 0, 100), b"A\n1\n"
+        )
+
+        # Prove the next request reads the stored export, not the Parquet file
+        s3.put_bytes(BUCKET, crr_export_key(crr, "csv"), b"A\nstored\n")
+        response = self._get(StepPublicCsvConsumer)
+        self.assertEqual(response["status"], 200)
+        self.assertEqual(response["body"], b"A\nstored\n")
+        self.assertEqual(response["headers"][b"Content-Length"], b"9")
+
+    def test_client_disconnect_stops_export(self):
+        cache_render_result(
+            self.workflow, self.step, 1, RenderResult(arrow_table({"A": [1]}))
+        )
+        crr = self.step.cached_render_result
+        communicator = self._communicator(StepPublicCsvConsumer)
+
+        async def get_and_disconnect():
+            await communicator.send_input({"type": "http.request", "body": b""})
+            await communicator.send_input({"type": "http.disconnect"})
+            await communicator.wait()
+
+        self.run_with_async_db(get_and_disconnect())
+        # We stopped encoding, so we didn't store a (partial) export
+        self.assertFalse(s3.exists(BUCKET, crr_export_key(crr, "csv")))
+
+    def test_new_cached_result_deletes_stored_export(self):
+        cache_render_result(
+            self.workflow, self.step, 1, RenderResult(arrow_table({"A": [1]}))
+        )
+        old_key = crr_export_key(self.step.cached_render_result, "json")
+        self._get(StepPublicJsonConsumer)
+        self.assertTrue(s3.exists(BUCKET, old_key))
+
+        self.step.last_relevant_delta_id = 2
+        cache_render_result(
+            self.workflow, self.step, 2, RenderResult(arrow_table({"A": [2]}))
+        )
+        s3.background_remover.wait_for_all()
+        self.assertFalse(s3.exists(BUCKET, old_key))
+        response = self._get(StepPublicJsonConsumer)
+        self.assertEqual(json.loads(response["body"]), [{"A": 2}])
+
+    def test_no_cached_result(self):
+        response = self._get(StepPublicCsvConsumer)
+        self.assertEqual(response["status"], 503)
+        self.assertEqual(response["headers"][b"Retry-After"], b"30")
+
+    def test_missing_parquet_file(self):
+        cache_render_result(
+            self.workflow, self.step, 1, RenderResult(arrow_table({"A": [1]}))
+        )
+        delete_parquet_files_for_step(self.workflow.id, self.step.id)
+        response = self._get(StepPublicJsonConsumer)
+        self.assertEqual(response["status"], 503)
+        self.assertEqual(response["body"], b"[]")
+
+    def test_other_users_workflow(self):
+        self.workflow.owner = User.objects.create(
+            username="other", email="other@example.org"
+        )
+        self.workflow.save(update_fields=["owner"])
+        response = self._get(StepPublicCsvConsumer)
+        self.assertEqual(response["status"], 403)
@@ -108,8 +108,7 @@ urlpatterns = [
     path("api/wfmodules/<int:step_id>/output", views.step_output),
     path("api/wfmodules/<int:step_id>/embeddata", views.step_embeddata),
     path("api/wfmodules/<int:step_id>/value-counts", views.step_value_counts),
-    path("public/moduledata/live/<int:step_id>.csv", views.step_public_csv),
-    path("public/moduledata/live/<int:step_id>.json", views.step_public_json),
+    # public/moduledata/live/<int:step_id>.{csv,json}: see cjworkbench/asgi.py
     # Parameters
     url(
         r"^oauth/create-secret/(?P<workflow_id>[0-9]+)/(?P<step_id>[0-9]+)/(?P<param>[-_a-zA-Z0-9]+)/",
@@ -1,37 +1,67 @@
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 import contextlib
 import io
 import json
-import subprocess
+import logging
 from http import HTTPStatus as status
 from pathlib import Path
-from typing import Awaitable, ContextManager, Literal, Tuple
+from typing import (
+    AsyncIterator,
+    BinaryIO,
+    ContextManager,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Tuple,
+)
 
 import numpy as np
 import pyarrow as pa
+from channels.generic.http import AsyncHttpConsumer
 from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.base import SessionBase
 from django.core.exceptions import PermissionDenied
-from django.http import FileResponse, HttpRequest, HttpResponse, Http404, JsonResponse
+from django.http import (
+    HttpRequest,
+    HttpResponse,
+    HttpResponseNotModified,
+    Http404,
+    JsonResponse,
+)
 from django.shortcuts import get_object_or_404
-from django.utils.cache import add_never_cache_headers, patch_response_headers
+from django.utils.cache import patch_response_headers
 from django.views.decorators.http import require_GET
 
 from cjwkernel.types import ColumnType
+from cjwkernel.util import tempfile_context
 from cjworkbench.middleware.clickjacking import xframe_options_exempt
 from cjworkbench.sync import database_sync_to_async
-from cjwstate import rabbitmq
+from cjwstate import rabbitmq, s3
 from cjwstate.rendercache import (
+    CachedRenderResult,
     CorruptCacheError,
-    downloaded_parquet_file,
+    discard_cached_render_result_export,
     open_cached_render_result,
-    read_cached_render_result_slice_as_text,
+    open_cached_render_result_export,
+    read_cached_render_result_column_stats,
+    read_cached_render_result_slice_as_rows,
+    store_cached_render_result_export,
+    streamed_cached_render_result_as_text,
 )
 from cjwstate.models import Tab, Step, Workflow
 from cjwstate.models.module_registry import MODULE_REGISTRY
 
 
+logger = logging.getLogger(__name__)
+
+
 _MaxNRowsPerRequest = 300
 
+_StoredExportChunkSize = 1024 * 1024
+
 
 def _with_unlocked_step_for_read(fn):
     """Decorate: `fn(request, workflow_id, step_slug, ...)` becomes `fn(request, step, ...)`
@@ -63,7 +93,7 @@ def _with_unlocked_step_for_read(fn):
 
 @database_sync_to_async
 def _load_step_by_id_oops_where_is_workflow(
-    request: HttpRequest, step_id: int
+    user: User, session: SessionBase, step_id: int
 ) -> Tuple[Workflow, Tab, Step]:
     """Load Step from database, or raise Http404 or PermissionDenied.
 
@@ -85,7 +115,7 @@ def _load_step_by_id_oops_where_is_workflow(
         # raise Workflow.DoesNotExist
         # also, implies workflow.refresh_from_db()
         with workflow.cooperative_lock() as workflow_lock:
-            if not workflow_lock.workflow.request_authorized_read(request):
+            if not workflow_lock.workflow.user_session_authorized_read(user, session):
                 raise PermissionDenied()
 
             step.refresh_from_db()  # raise Step.DoesNotExist
@@ -136,6 +166,44 @@ def _with_step_for_read_by_id(fn):
     return inner
 
 
+def _etag(step: Step) -> str:
+    """Strong ETag for data derived from `step`'s cached render result.
+
+    The render cache never changes a result without changing its delta ID or
+    its Parquet digest; so same step, delta and digest mean same data.
+    """
+    return '"wfm-%d-delta-%s-%s"' % (
+        step.id,
+        step.cached_render_result_delta_id,
+        step.cached_render_result_hash or "",
+    )
+
+
+def _parse_if_none_match(value: str) -> List[str]:
+    return [etag.strip().replace("W/", "", 1) for etag in value.split(",")]
+
+
+def _cache_control(workflow: Workflow) -> str:
+    """Let browsers and CDNs reuse a public workflow's data for a little while.
+
+    Published data gets bursty traffic (from embeds on news sites, say). A
+    short max-age absorbs bursts; after it, clients revalidate with our ETag.
+    Private data is always revalidated, and never stored by shared caches.
+    """
+    if workflow.public:
+        return "public, max-age=%d" % settings.PUBLIC_DATA_MAX_AGE
+    else:
+        return "private, no-cache"
+
+
+def _with_cache_headers(
+    response: HttpResponse, etag: str, cache_control: str
+) -> HttpResponse:
+    response["ETag"] = etag
+    response["Cache-Control"] = cache_control
+    return response
+
+
 # ---- render / input / livedata ----
 # These endpoints return actual table data
 
@@ -161,16 +229,21 @@ def _make_render_tuple(cached_result, startrow=None, endrow=None):
         ),
     )
 
+    # Return one column more than configured, so the client knows there are
+    # "too many columns".
+    only_columns = range(settings.MAX_COLUMNS_PER_CLIENT_REQUEST + 1)
+    column_names = [
+        column.name
+        for column in cached_result.table_metadata.columns[: only_columns.stop]
+    ]
     # raise CorruptCacheError
-    record_json = read_cached_render_result_slice_as_text(
+    rows = read_cached_render_result_slice_as_rows(
         cached_result,
-        "json",
-        # Return one row more than configured, so the client knows there
-        # are "too many rows".
-        only_columns=range(settings.MAX_COLUMNS_PER_CLIENT_REQUEST + 1),
+        only_columns=only_columns,
         only_rows=range(startrow, endrow),
     )
-    return (startrow, endrow, record_json)
+    records = [dict(zip(column_names, row)) for row in rows]
+    return (startrow, endrow, records)
 
 
 def int_or_none(x):
@@ -191,26 +264,28 @@ async def step_render(request: HttpRequest, step_id: int):
         )
 
     # raise Http404, PermissionDenied
-    _, __, step = await _load_step_by_id_oops_where_is_workflow(request, step_id)
+    _, __, step = await _load_step_by_id_oops_where_is_workflow(
+        request.user, request.session, step_id
+    )
     cached_result = step.cached_render_result
     if cached_result is None:
         # assume we'll get another request after execute finishes
         return JsonResponse({"start_row": 0, "end_row": 0, "rows": []})
 
+    # The browser may keep rows, but it must ask whether they're still current
+    etag = _etag(step)
+    cache_control = "private, no-cache"
+    if etag in _parse_if_none_match(request.headers.get("If-None-Match", "")):
+        return _with_cache_headers(HttpResponseNotModified(), etag, cache_control)
+
     try:
-        startrow, endrow, record_json = _make_render_tuple(
-            cached_result, startrow, endrow
-        )
+        startrow, endrow, records = _make_render_tuple(cached_result, startrow, endrow)
     except CorruptCacheError:
         # assume we'll get another request after execute finishes
         return JsonResponse({"start_row": 0, "end_row": 0, "rows": []})
 
-    data = '{"start_row":%d,"end_row":%d,"rows":%s}' % (startrow, endrow, record_json)
-    response = HttpResponse(
-        data.encode("utf-8"), content_type="application/json", charset="utf-8"
-    )
-    add_never_cache_headers(response)
-    return response
+    response = JsonResponse({"start_row": startrow, "end_row": endrow, "rows": records})
+    return _with_cache_headers(response, etag, cache_control)
 
 
 # /tiles/:slug/v:delta_id/:tile_row,:tile_column.json: table data
@@ -239,9 +314,8 @@ def step_tile(
         return JsonResponse({"error": "tile out of bounds"}, status=status.NOT_FOUND)
 
     try:
-        record_json = read_cached_render_result_slice_as_text(
+        rows = read_cached_render_result_slice_as_rows(
             cached_result,
-            "json",
             only_rows=range(row_begin, row_end),
             only_columns=range(column_begin, column_end),
         )
@@ -252,11 +326,6 @@ def step_tile(
             status=status.NOT_FOUND,
         )
 
-    # Convert from [{"a": "b", "c": "d"}, ...] to [["b", "d"], ...]
-    rows = json.loads(
-        record_json, object_pairs_hook=lambda pairs: [v for k, v in pairs]
-    )
-
     response = JsonResponse({"rows": rows})
     patch_response_headers(response, cache_timeout=600)
     return response
@@ -265,7 +334,9 @@ def step_tile(
 @xframe_options_exempt
 async def step_output(request: HttpRequest, step_id: int):
     # raise Http404, PermissionDenied
-    _, __, step = await _load_step_by_id_oops_where_is_workflow(request, step_id)
+    _, __, step = await _load_step_by_id_oops_where_is_workflow(
+        request.user, request.session, step_id
+    )
     try:
         module_zipfile = await database_sync_to_async(MODULE_REGISTRY.latest)(
             step.module_id_name
@@ -278,7 +349,14 @@ async def step_output(request: HttpRequest, step_id: int):
 
 async def step_embeddata(request: HttpRequest, step_id: int):
     # raise Http404, PermissionDenied
-    _, __, step = await _load_step_by_id_oops_where_is_workflow(request, step_id)
+    workflow, __, step = await _load_step_by_id_oops_where_is_workflow(
+        request.user, request.session, step_id
+    )
+
+    etag = _etag(step)
+    cache_control = _cache_control(workflow)
+    if etag in _parse_if_none_match(request.headers.get("If-None-Match", "")):
+        return _with_cache_headers(HttpResponseNotModified(), etag, cache_control)
 
     # Speedy bypassing of locks: we don't care if we get out-of-date data
     # because we assume the client will re-request when it gets a new
@@ -290,7 +368,8 @@ async def step_embeddata(request: HttpRequest, step_id: int):
     except ValueError:
         result_json = None
 
-    return JsonResponse(result_json, safe=False)
+    response = JsonResponse(result_json, safe=False)
+    return _with_cache_headers(response, etag, cache_control)
 
 
 async def step_value_counts(request: HttpRequest, step_id: int) -> JsonResponse:
@@ -306,7 +385,9 @@ async def step_value_counts(request: HttpRequest, step_id: int) -> JsonResponse:
         return JsonResponse({"values": {}})
 
     # raise Http404, PermissionDenied
-    _, __, step = await _load_step_by_id_oops_where_is_workflow(request, step_id)
+    _, __, step = await _load_step_by_id_oops_where_is_workflow(
+        request.user, request.session, step_id
+    )
     cached_result = step.cached_render_result
     if cached_result is None:
         # assume we'll get another request after execute finishes
@@ -333,6 +414,13 @@ async def step_value_counts(request: HttpRequest, step_id: int) -> JsonResponse:
         # to convert to text before doing anything else, no?)
         return JsonResponse({"values": {}})
 
+    column_stats = read_cached_render_result_column_stats(cached_result)
+    if column_stats is not None:
+        value_counts = column_stats[column_index].value_counts
+        if value_counts is not None:
+            return JsonResponse({"values": value_counts})
+        # else there are too many values to precompute. Scan the table.
+
     try:
         # raise CorruptCacheError
         with open_cached_render_result(cached_result) as result:
@@ -363,179 +451,301 @@ async def step_value_counts(request: HttpRequest, step_id: int) -> JsonResponse:
     return JsonResponse({"values": value_counts})
 
 
-class SubprocessOutputFileLike(io.RawIOBase):
-    """Run a subrocess; .read() reads its stdout and stderr (combined).
+_export_executor = ThreadPoolExecutor(
+    max_workers=settings.N_CONCURRENT_EXPORTS, thread_name_prefix="export-"
+)
+_export_semaphore: Optional[asyncio.Semaphore] = None
+_export_semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
 
-    On close(), kill the subprocess (if it's still running) and wait for it.
 
-    close() is the only way to wait for the subprocess. Don't worry: __del__()
-    calls close().
+def _get_export_semaphore() -> asyncio.Semaphore:
+    """Semaphore that caps the number of exports encoding at once.
 
-    If the process cannot be started, raise OSError.
+    asyncio.Semaphore belongs to an event loop, so we create it lazily. (Unit
+    tests start many event loops.)
+    """
+    global _export_semaphore, _export_semaphore_loop
+    loop = asyncio.get_running_loop()
+    if _export_semaphore_loop is not loop:
+        _export_semaphore = asyncio.Semaphore(settings.N_CONCURRENT_EXPORTS)
+        _export_semaphore_loop = loop
+    return _export_semaphore
 
-    If read() is called after the subprocess terminates and the subprocess's
-    exit code is not 0, raise IOError.
 
-    Not thread-safe.
+def _iter_and_copy(chunks: Iterator[bytes], copy: BinaryIO) -> Iterator[bytes]:
+    for chunk in chunks:
+        copy.write(chunk)
+        yield chunk
 
-    HACK: this is only safe for Django 3.1 async-view responses.
-    `django.core.handlers.asgi.ASGIHandler#send_response()` has this loop:
 
-        for part in response:  # calls .read() -- SYNCHRONOUS!!!
-            await send(...)  # async (safe)
+@database_sync_to_async
+def _is_cached_render_result_current(cached_result: CachedRenderResult) -> bool:
+    return Step.objects.filter(
+        id=cached_result.step_id,
+        cached_render_result_delta_id=cached_result.delta_id,
+        cached_render_result_hash=cached_result.hash,
+    ).exists()
 
-    We make assumptions about Django, the caller, the client....:
 
-        * The caller can `await filelike.stdout_ready()` to ensure the first
-          bytes of stdout are available. This ensures the streaming has begun:
-          the subprocess's has started up (which may be slow). If the subprocess
-          opened temporary files, it's safe to delete them now.
-        * The process must stream stdout _quickly_. Django calls `.readinto()`
-          synchronously in the event-loop thread: it stalls the web server.
-        * Django `send()` must back-pressure. That's when other HTTP request
-          processing happens.
-        * The process must not consume much RAM/disk/CPU; or the caller must
-          arrange throttling. Django won't limit the number of concurrent
-          ASGI requests.
-    """
+class _StepPublicTextExportConsumer(AsyncHttpConsumer):
+    """Stream a step's cached result as CSV or JSON.
 
-    def __init__(self, args):
-        super().__init__()
+    This is an ASGI consumer, not a Django view: Django 3.1 iterates over
+    streaming responses synchronously, in the event-loop thread, so every
+    slow read would stall the whole web server. Here, we read and encode
+    each chunk on an `_export_executor` thread, and `send_body()` waits for
+    the client to accept each chunk before we encode the next (backpressure).
 
-        # Raises OSError
-        self.process = subprocess.Popen(
-            args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
-        )
+    We don't download the whole Parquet file first: we read it with S3 Range
+    requests, one row group at a time. At most `settings.N_CONCURRENT_EXPORTS`
+    exports stream at once; the rest wait their turn.
 
-    async def stdout_ready(self) -> Awaitable[None]:
-        """Return when `self.process.stdout.read()` is guaranteed not to block.
+    The first complete export of each cached result is stored on S3, beside
+    the Parquet file; later requests stream that file instead of encoding
+    again. Responses carry a strong ETag and `Cache-Control`, so browsers and
+    CDNs can skip us entirely until the step has a new cached result.
 
-        After this returns, the subprocess is "started up". If it's streaming
-        from a file, it has certainly opened that file -- and so on UNIX, that
-        file may be safely deleted.
+    If the client disconnects, we stop reading and encoding (and we don't
+    store the partial export).
 
-        This uses loop.add_reader() to watch the file descriptor. That only
-        works because [2020-12-22] Django 3.1 _doesn't_ use loop.add_reader()!
-        When Django allows streaming async output, let's use that.
-        """
-        loop = asyncio.get_running_loop()
-        event = asyncio.Event()
-        fd = self.process.stdout.fileno()
+    `cjworkbench.asgi` routes to subclasses ahead of Django, within
+    `AuthMiddlewareStack` (which sets `scope["user"]` and `scope["session"]`).
+    """
+
+    format: Literal["csv", "json"]
+    content_type: bytes
+
+    async def __call__(self, scope, receive, send):
+        # AsyncHttpConsumer stops calling receive() while handle() runs. Keep
+        # it, so handle() can notice the client disconnecting.
+        self._receive = receive
+        await super().__call__(scope, receive, send)
 
-        def ready():
-            event.set()
-            loop.remove_reader(fd)
+    @contextlib.asynccontextmanager
+    async def _watching_for_disconnect(self) -> AsyncIterator[asyncio.Event]:
+        """Yield an Event that is set when the client disconnects."""
+        disconnected = asyncio.Event()
 
-        loop.add_reader(fd, ready)
+        async def watch():
+            while (await self._receive())["type"] != "http.disconnect":
+                pass
+            disconnected.set()
 
+        task = asyncio.create_task(watch())
         try:
-            await event.wait()
+            yield disconnected
         finally:
-            loop.remove_reader(fd)  # in case ready() was never called
+            task.cancel()
 
-    def readable(self):
-        return True
+    async def _send_text(self, status_code: int, body: bytes) -> None:
+        await self.send_response(
+            status_code, body, headers=[(b"Content-Type", b"text/plain")]
+        )
 
-    def fileno(self):
-        return self.process.stdout.fileno()
+    async def handle(self, body: bytes) -> None:
+        if self.scope["method"] not in ("GET", "HEAD"):
+            await self._send_text(status.METHOD_NOT_ALLOWED, b"Method not allowed")
+            return
 
-    def readinto(self, b):
-        # Assume this is fast. (It's called synchronously.)
-        ret = self.process.stdout.readinto(b)
-        return ret
+        step_id = self.scope["url_route"]["kwargs"]["step_id"]
+        try:
+            # raise Http404, PermissionDenied
+            workflow, _, step = await _load_step_by_id_oops_where_is_workflow(
+                self.scope["user"], self.scope["session"], step_id
+            )
+        except Http404:
+            await self._send_text(status.NOT_FOUND, b"Not found")
+            return
+        except PermissionDenied:
+            await self._send_text(status.FORBIDDEN, b"Forbidden")
+            return
 
-    def close(self):
-        if self.closed:
+        cached_result = step.cached_render_result
+        if cached_result is None:
+            await self._send_retry_later(workflow)
             return
 
-        self.process.stdout.close()
-        self.process.kill()
-        # wait() should not deadlock, because process will certainly die.
-        self.process.wait()  # ignore exit code
-        super().close()  # sets self.closed
+        etag = _etag(step)
+        cache_control = _cache_control(workflow)
+        if_none_match = ",".join(
+            value.decode("latin1")
+            for name, value in self.scope["headers"]
+            if name == b"if-none-match"
+        )
+        if etag in _parse_if_none_match(if_none_match):
+            await self.send_response(
+                status.NOT_MODIFIED,
+                b"",
+                headers=[
+                    (b"ETag", etag.encode("latin1")),
+                    (b"Cache-Control", cache_control.encode("latin1")),
+                ],
+            )
+            return
 
+        filename = "Workflow %d - %s-%d.%s" % (
+            workflow.id,
+            step.module_id_name,
+            step.id,
+            self.format,
+        )
+        headers = [
+            (b"Content-Type", self.content_type),
+            (
+                b"Content-Disposition",
+                s3.encode_content_disposition(filename).encode("latin1"),
+            ),
+            (b"ETag", etag.encode("latin1")),
+            (b"Cache-Control", cache_control.encode("latin1")),
+        ]
 
-async def _step_to_text_stream(
-    step: Step, format: Literal["csv", "json"]
-) -> Awaitable[SubprocessOutputFileLike]:
-    """Download the step's cached result and streaming it as CSV/JSON.
+        loop = asyncio.get_running_loop()
+        async with self._watching_for_disconnect() as disconnected:
+            async with _get_export_semaphore():
+                if disconnected.is_set():
+                    return  # the client gave up while we waited our turn
+                # Exiting closes the stored export or the encoder
+                with contextlib.ExitStack() as exit_stack:
+                    stored_export = await loop.run_in_executor(
+                        _export_executor,
+                        open_cached_render_result_export,
+                        cached_result,
+                        self.format,
+                    )
+                    if stored_export is not None:
+                        exit_stack.callback(stored_export.close)
+                        await self._send_stored_export(
+                            stored_export, headers, disconnected
+                        )
+                    else:
+                        await self._send_and_store_export(
+                            workflow, cached_result, headers, exit_stack, disconnected
+                        )
+
+    async def _send_stored_export(
+        self,
+        stored_export: io.BufferedReader,
+        headers: List[Tuple[bytes, bytes]],
+        disconnected: asyncio.Event,
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        size = stored_export.raw.size
+        await self.send_headers(
+            status=status.OK,
+            headers=headers + [(b"Content-Length", str(size).encode("latin1"))],
+        )
+        if self.scope["method"] == "GET":
+            while True:
+                if disconnected.is_set():
+                    return
+                chunk = await loop.run_in_executor(
+                    _export_executor, stored_export.read, _StoredExportChunkSize
+                )
+                if not chunk:
+                    break
+                await self.send_body(chunk, more_body=True)
+        await self.send_body(b"")
+
+    async def _send_and_store_export(
+        self,
+        workflow: Workflow,
+        cached_result: CachedRenderResult,
+        headers: List[Tuple[bytes, bytes]],
+        exit_stack: contextlib.ExitStack,
+        disconnected: asyncio.Event,
+    ) -> None:
+        """Encode the export from Parquet; then store it for the next request.
+
+        Stop encoding if the client disconnects: `exit_stack` will close
+        `chunks`. Don't store a partial export.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            chunks = await loop.run_in_executor(
+                _export_executor,
+                exit_stack.enter_context,
+                streamed_cached_render_result_as_text(cached_result, self.format),
+            )
+        except CorruptCacheError:
+            await self._send_retry_later(workflow)
+            return
 
-    Raise CorruptCacheError if there is no cached result or it is invalid.
+        await self.send_headers(status=status.OK, headers=headers)
+        if self.scope["method"] != "GET":
+            await self.send_body(b"")
+            return
 
-    Raise OSError if `/usr/bin/parquet-to-text-stream` cannot start.
-    """
-    cached_result = step.cached_render_result
-    if not cached_result:
-        raise CorruptCacheError
+        if cached_result.hash is None:
+            copy_path = None  # no Parquet file, so nothing to store
+        else:
+            copy_path = exit_stack.enter_context(
+                tempfile_context(prefix="export-", suffix="." + self.format)
+            )
+            copy_file = exit_stack.enter_context(copy_path.open("wb"))
+            chunks = _iter_and_copy(chunks, copy_file)
+
+        while True:
+            if disconnected.is_set():
+                return
+            # raise CorruptCacheError -- there's no way to report it now
+            # that we've sent headers, so let the ASGI server close the
+            # connection mid-response.
+            chunk = await loop.run_in_executor(_export_executor, next, chunks, None)
+            if chunk is None:
+                break
+            await self.send_body(chunk, more_body=True)
+        await self.send_body(b"")
+
+        if copy_path is not None:
+            # The client has its response. Store the export for the next one.
+            copy_file.close()
+            try:
+                await loop.run_in_executor(
+                    _export_executor,
+                    store_cached_render_result_export,
+                    cached_result,
+                    self.format,
+                    copy_path,
+                )
+                if not await _is_cached_render_result_current(cached_result):
+                    # A new result was cached while we exported. It may have
+                    # queued deletion of our key before we stored it.
+                    discard_cached_render_result_export(cached_result, self.format)
+            except Exception:
+                logger.exception(
+                    "Error storing export of step %d", cached_result.step_id
+                )
 
-    # raise CorruptCacheError
-    with downloaded_parquet_file(cached_result) as parquet_path:
-        output = SubprocessOutputFileLike(
-            ["/usr/bin/parquet-to-text-stream", str(parquet_path), format]
-        )
-        await output.stdout_ready()
-        # It's okay to delete the file now (i.e., exit the context manager)
+    async def _send_retry_later(self, workflow: Workflow) -> None:
+        """Schedule a render and respond asking the user to retry.
 
-        return output
+        We don't have a cached result, and we don't know how long it'll take
+        to get one. The user will simply need to try again....
 
+        It is a *bug* that we publish URLs that aren't guaranteed to work.
+        Because we publish URLs that do not work, let's be transparent and
+        give them the 500-level error code they deserve.
+        """
+        # API clients poll exports in bursts. Don't delay users' edits.
+        await rabbitmq.queue_render(
+            workflow.id, workflow.last_delta_id, queue=rabbitmq.RenderBulk
+        )
+        await self.send_response(
+            status.SERVICE_UNAVAILABLE,
+            b"[]" if self.format == "json" else b"",
+            headers=[(b"Content-Type", self.content_type), (b"Retry-After", b"30")],
+        )
 
-async def step_public_json(request: HttpRequest, step_id: int) -> FileResponse:
-    # raise Http404, PermissionDenied
-    workflow, _, step = await _load_step_by_id_oops_where_is_workflow(request, step_id)
 
-    try:
-        output = await _step_to_text_stream(step, "json")
-    except CorruptCacheError:
-        # Schedule a render and return a response asking the user to retry.
-        #
-        # We don't have a cached result, and we don't know how long it'll
-        # take to get one. The user will simply need to try again....
-        #
-        # It is a *bug* that we publish URLs that aren't guaranteed to work.
-        # Because we publish URLs that do not work, let's be transparent and
-        # give them the 500-level error code they deserve.
-        await rabbitmq.queue_render(workflow.id, workflow.last_delta_id)
-        response = JsonResponse([], safe=False, status=status.SERVICE_UNAVAILABLE)
-        response["Retry-After"] = "30"
-        return response
-
-    return FileResponse(
-        output,
-        as_attachment=True,
-        filename=(
-            "Workflow %d - %s-%d.json" % (workflow.id, step.module_id_name, step.id)
-        ),
-        content_type="application/json",
-    )
+class StepPublicCsvConsumer(_StepPublicTextExportConsumer):
+    """Serve `/public/moduledata/live/<step_id>.csv`."""
 
+    format = "csv"
+    content_type = b"text/csv; charset=utf-8; header=present"
 
-async def step_public_csv(request: HttpRequest, step_id: int) -> FileResponse:
-    # raise Http404, PermissionDenied
-    workflow, _, step = await _load_step_by_id_oops_where_is_workflow(request, step_id)
 
-    try:
-        output = await _step_to_text_stream(step, "csv")
-    except CorruptCacheError:
-        # Schedule a render and return a response asking the user to retry.
-        #
-        # We don't have a cached result, and we don't know how long it'll
-        # take to get one. The user will simply need to try again....
-        #
-        # It is a *bug* that we publish URLs that aren't guaranteed to work.
-        # Because we publish URLs that do not work, let's be transparent and
-        # give them the 500-level error code they deserve.
-        await rabbitmq.queue_render(workflow.id, workflow.last_delta_id)
-        response = HttpResponse(
-            b"", content_type="text/csv", status=status.SERVICE_UNAVAILABLE
-        )
-        response["Retry-After"] = "30"
-        return response
-
-    return FileResponse(
-        output,
-        as_attachment=True,
-        filename=(
-            "Workflow %d - %s-%d.csv" % (workflow.id, step.module_id_name, step.id)
-        ),
-        content_type="text/csv; charset=utf-8; header=present",
-    )
+class StepPublicJsonConsumer(_StepPublicTextExportConsumer):
+    """Serve `/public/moduledata/live/<step_id>.json`."""
+
+    format = "json"
+    content_type = b"application/json"
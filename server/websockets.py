@@ -226,8 +226,9 @@ class WorkflowConsumer(AsyncJsonWebsocketConsumer):
         user who has the workflow open and wants to see the render.
         """
         delta_id = message["delta_id"]
+        queue = message.get("queue", rabbitmq.Render)
         logger.debug("Queue render of Workflow %d v%d", self.workflow_id, delta_id)
-        await rabbitmq.queue_render(self.workflow_id, delta_id)
+        await rabbitmq.queue_render(self.workflow_id, delta_id, queue=queue)
 
     async def receive_json(self, content):
         """Handle a query from the client."""